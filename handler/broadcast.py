@@ -1,24 +1,196 @@
+import asyncio
+import struct
+from typing import TYPE_CHECKING, Optional
+
+from service.connection.adapt import QualityController
+from service.connection.framing import (
+    droppable,
+    encode_audio,
+    encode_format,
+    encode_silence,
+    encode_timestamp,
+    pack_format,
+)
 from service.connection.handler import WebTransportHandler, WebTransportStream
-from service.controller import FetchService
+from service.connection.interface.dataclass import AdaptConfig
+from service.connection.interface.enum import ControlMethod, StreamPriority
+from service.connection.rpc import RpcChannel
+from service.controller import CaptureConfig, FetchService
+from service.controller.interface.dataclass import AudioFormat, Rendition
+
+if TYPE_CHECKING:
+    from service.controller.rendition import RenditionSet
+    from service.controller.tuner import TunerChip
+
+STATS = struct.Struct("<IIIIBB")
+"""`STATS` 应答 依次为往返时延微秒数、拥塞窗口、在途字节、发送积压、当前档位序号、档位是否固定"""
+
+LEVEL = struct.Struct("<B")
+"""`LEVEL` 请求 档位序号"""
+
+AUTO_LEVEL = 0xFF
+"""`LEVEL` 请求中表示恢复自动选择档位"""
+
+TUNE = struct.Struct("<I")
+"""`TUNE` 请求 目标频率的 kHz"""
+
+TUNED = struct.Struct("<If")
+"""`TUNE` 应答 依次为调谐到的 kHz 与耗时秒数"""
 
 
 class BroadcastHandler(WebTransportHandler):
-    def __init__(self, session_id: int, **kwargs) -> None:
+    def __init__(
+        self,
+        session_id: int,
+        adapt: Optional[AdaptConfig] = None,
+        tuner: Optional["TunerChip"] = None,
+        **kwargs,
+    ) -> None:
         super().__init__(session_id=session_id, **kwargs)
         self._fetch = FetchService()
         self._stream: WebTransportStream | None = None
+        self._quality = QualityController(adapt)
+        self._renditions: Optional["RenditionSet"] = None
+        self._level: Rendition = Rendition.FULL
+        self._sent: Optional[AudioFormat] = None
+        """最近一次告知客户端的格式"""
+        self._adapt_task: Optional[asyncio.Task] = None
+        self._tuner = tuner
+        self._pinned: Optional[int] = None
+        """客户端通过控制流固定的档位序号"""
+        self._control: Optional[RpcChannel] = None
 
     async def on_session_ready(self) -> None:
-        self._stream = await self.create_stream(bidirectional=False)
+        # 音频在 QUIC 中的积压受预算限制 控制流的应答不会排在大量音频之后
+        # 跟不上码率时丢弃最旧的音频帧 格式帧总会送达
+        self._stream = await self.create_stream(
+            bidirectional=False, priority=StreamPriority.LOW, droppable=droppable
+        )
+
+        # 客户端先得知当前格式 再开始收到音频帧
+        await self._reformat(self._fetch.config)
+
+        # 流 ID 只在单个 QUIC 连接内唯一 订阅编号需要在所有连接间唯一
+        self._fetch.subscribe(
+            id(self), self._push, on_format=self._reformat, on_silence=self._silence
+        )
+        # 中继等需要原始格式的客户端用 `?adapt=0` 关闭自动档位
+        query = self.session_info.path.query if self.session_info else {}
+        if query.get("adapt") != "0":
+            self._adapt_task = asyncio.create_task(self._adapt())
+
+    async def on_stream_bidirectional(self, stream: WebTransportStream) -> None:
+        """客户端打开的第一条双向流作为控制流"""
+        if self._control is not None:
+            stream.close()
+            return
+        self.prioritize(stream, StreamPriority.HIGH)
+        channel = RpcChannel(stream)
+        channel.register(ControlMethod.PING, lambda payload: payload)
+        channel.register(ControlMethod.STATS, self._stats)
+        channel.register(ControlMethod.LEVEL, self._pin)
+        channel.register(ControlMethod.TUNE, self._tune)
+        self._control = channel
+        try:
+            await channel.serve()
+        finally:
+            self._control = None
+
+    def _stats(self, _payload: bytes) -> bytes:
+        stats = self.connection_stats()
+        levels = self._renditions.levels if self._renditions else [self._level]
+        return STATS.pack(
+            int(stats.rtt * 1_000_000),
+            stats.congestion_window,
+            stats.bytes_in_flight,
+            stats.send_backlog,
+            levels.index(self._level),
+            self._pinned is not None,
+        )
+
+    def _pin(self, payload: bytes) -> bytes:
+        """固定档位或恢复自动选择 应答之后的音频帧采用的格式"""
+        if self._renditions is None:
+            raise RuntimeError("尚未开始广播")
+        (index,) = LEVEL.unpack(payload)
+        levels = self._renditions.levels
+        if index == AUTO_LEVEL:
+            self._pinned = None
+            index = min(self._quality.level, len(levels) - 1)
+        elif index < len(levels):
+            self._pinned = index
+        else:
+            raise ValueError(f"档位 {index} 不存在 共 {len(levels)} 个档位")
+        self._level = levels[index]
+        return pack_format(self._renditions.format(self._level))
+
+    async def _tune(self, payload: bytes) -> bytes:
+        if self._tuner is None:
+            raise RuntimeError("服务端没有可用的调谐器")
+        result = await self._tuner.tune(TUNE.unpack(payload)[0])
+        return TUNED.pack(result.frequency, result.latency)
+
+    async def _push(self, data: bytes) -> None:
+        if self._stream is None or self._stream.closed or self._renditions is None:
+            return
+        level = self._level
+        await self._follow(self._stream, self._renditions.format(level))
+        # 同一帧的同一档位在所有会话间只转换与分帧一次
+        frame = self._renditions.encode(level, data)
+        await self._stream.write(encode_audio(frame, self._fetch.timestamp))
+
+    async def _silence(self, frames: int) -> None:
+        """一帧静音被省略 只告诉客户端当前格式下需要补齐的采样帧数"""
+        if self._stream is None or self._stream.closed or self._renditions is None:
+            return
+        audio_format = self._renditions.format(self._level)
+        await self._follow(self._stream, audio_format)
+        capture = self._renditions.config.blocksize.value
+        await self._stream.write(
+            encode_timestamp(self._fetch.timestamp)
+            + encode_silence(frames * audio_format.blocksize // capture)
+        )
+
+    async def _follow(self, stream: WebTransportStream, audio_format: AudioFormat) -> None:
+        """档位变化时 先告诉客户端之后的帧采用的格式"""
+        if audio_format != self._sent:
+            self._sent = audio_format
+            await stream.write(encode_format(audio_format))
+            await self._announce(audio_format)
+
+    async def _announce(self, audio_format: AudioFormat) -> None:
+        """通过控制流通知客户端格式变化"""
+        if self._control is not None:
+            await self._control.notify(ControlMethod.FORMAT, pack_format(audio_format))
 
-        async def push(data: bytes) -> None:
-            if self._stream is None or self._stream.closed:
-                return
-            await self._stream.write(data)
+    async def _reformat(self, config: CaptureConfig) -> None:
+        """采集配置变化 在新配置的第一帧之前告知客户端"""
+        if self._stream is None or self._stream.closed:
+            return
+        # 此时分发服务已经切换到新的配置 旧配置的帧已经全部分发
+        self._renditions = self._fetch.renditions
+        levels = self._renditions.levels
+        level = self._quality.level if self._pinned is None else self._pinned
+        self._level = levels[min(level, len(levels) - 1)]
+        self._sent = self._renditions.format(self._level)
+        await self._stream.write(encode_format(self._sent))
+        await self._announce(self._sent)
 
-        self._fetch.subscribe(self._stream.stream_id, push)
+    async def _adapt(self) -> None:
+        """定期采样连接状况并挑选档位"""
+        while True:
+            await asyncio.sleep(self._quality.config.interval)
+            if self._renditions is None or self._pinned is not None:
+                continue
+            index = self._quality.update(
+                self.connection_stats(), self._renditions.bitrates()
+            )
+            self._level = self._renditions.levels[index]
 
     async def on_session_closed(self, close_code: int, reason: str) -> None:
+        if self._adapt_task is not None:
+            self._adapt_task.cancel()
+            self._adapt_task = None
         if self._stream is not None:
-            self._fetch.unsubscribe(self._stream.stream_id)
+            self._fetch.unsubscribe(id(self))
             self._stream = None
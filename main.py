@@ -1,78 +1,205 @@
-import asyncio
-import logging
-from typing import Optional
-
-from aioquic.asyncio.server import QuicServer
-from aioquic.h3.connection import H3_ALPN
-from aioquic.quic.configuration import QuicConfiguration
-from pyfiglet import figlet_format
-from rich.logging import RichHandler
-
-from service.connection import start_webtransport_service
-from service.controller import CaptureConfig, start_fetch_service
-from service.controller.interface.dataclass import (
-    CaptureBlockSize,
-    CaptureChannel,
-    CaptureDtype,
-    CaptureSampleRate,
-)
-from service.controller.fetch import FetchService
-
-logging.basicConfig(
-    level="INFO",
-    format="%(name)s: %(message)s",
-    handlers=[
-        RichHandler(
-            log_time_format="[%H:%M:%S]",
-            rich_tracebacks=True,
-        )
-    ],
-)
+import time
+
+STARTUP = time.perf_counter()
+"""进程开始执行入口文件的时刻 用于统计启动耗时"""
+
+import asyncio  # noqa: E402
+import logging  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import TYPE_CHECKING, Optional  # noqa: E402
+
+if TYPE_CHECKING:
+    from aioquic.asyncio.server import QuicServer
+    from aioquic.quic.configuration import QuicConfiguration
+
+    from service.controller import CaptureConfig, CaptureSource, FetchService
+    from service.database import DatabaseContext
+    from service.diagnostic.interface.dataclass import PlacementConfig
+    from service.plugin.registry import PluginRegistry
+
+# 富文本日志与字符画横幅都不影响服务可用 先用标准库日志顶上
+logging.basicConfig(level="INFO", format="%(name)s: %(message)s")
 log = logging.getLogger(__name__)
 
-config = CaptureConfig(
-    device=1,
-    blocksize=CaptureBlockSize.B8192,
-    channel=CaptureChannel.Stereo,
-    dtype=CaptureDtype.Bit24,
-    samplerate=CaptureSampleRate.R48000,
-)
-
-configuration = QuicConfiguration(
-    alpn_protocols=H3_ALPN,
-    is_client=False,
-)
-configuration.load_cert_chain(
-    "cert/wthomec4.dns.army.cer",
-    "cert/wthomec4.dns.army.key",
-)
-
-
-async def main():
-    fetch_service: Optional[FetchService] = None
-    webtransport_service: Optional[QuicServer] = None
+WEB_ROOT = Path(__file__).resolve().parent / "web"
+"""网页客户端的默认目录 不随工作目录变化 不存在时不提供网页客户端"""
+
+
+def capture_config() -> "CaptureConfig":
+    """广播信号采集配置"""
+    from service.controller import CaptureChannel, CaptureConfig, CaptureDtype
+    from service.controller import CaptureSampleRate
+    from service.controller.interface.dataclass import CaptureBlockSize
+
+    return CaptureConfig(
+        device=1,
+        blocksize=CaptureBlockSize.B8192,
+        channel=CaptureChannel.Stereo,
+        dtype=CaptureDtype.Bit24,
+        samplerate=CaptureSampleRate.R48000,
+    )
+
+
+def placement_config() -> "PlacementConfig":
+    """RK3308B 四个核上的线程放置 采集与事件循环各独占一个核 分析一个核 其余线程一个核"""
+    from service.diagnostic.interface.dataclass import CpuPlacement, PlacementConfig
+
+    analysis = CpuPlacement(cpus=frozenset({1}))
+    return PlacementConfig(
+        capture=CpuPlacement(cpus=frozenset({3}), realtime=50),
+        loop=CpuPlacement(cpus=frozenset({2}), nice=-5),
+        pools={"AudioTap": analysis, "ProgrammeSegmenter": analysis, "PipelineStage": analysis},
+        # 日志、数据库、I2C 与 asyncio 的工作线程
+        other=CpuPlacement(cpus=frozenset({0})),
+    )
+
+
+def quic_configuration() -> "QuicConfiguration":
+    """HTTP/3 WebTransport 服务的 QUIC 配置"""
+    from service.connection.transport import LIVE
+    from service.connection.transport import quic_configuration as profile_configuration
+
+    # 服务端主要承载长时间的直播
+    configuration = profile_configuration(LIVE, is_client=False)
+    configuration.load_cert_chain(
+        "cert/wthomec4.dns.army.cer",
+        "cert/wthomec4.dns.army.key",
+    )
+    return configuration
+
+
+def setup_rich_logging() -> None:
+    """服务就绪后再换上 rich 的日志输出 渲染放在后台线程中 重复的日志限流汇总"""
+    from rich.logging import RichHandler
+
+    from service.diagnostic import install_log_queue
+
+    handler = RichHandler(log_time_format="[%H:%M:%S]", rich_tracebacks=True)
+    handler.setFormatter(logging.Formatter("%(name)s: %(message)s"))
+    install_log_queue(handler)
+
+
+def show_banner() -> None:
+    from pyfiglet import figlet_format
+
+    log.info(f"\n{figlet_format('Outdoor Aerial')}\n永远热爱户外和广播！")
+
+
+async def load_plugins(
+    registry: "PluginRegistry",
+    fetch: "FetchService",
+    database: "DatabaseContext",
+) -> None:
+    """发现插件并并发初始化有使用者的插件 单个插件缓慢不会拖慢其他插件 没有使用者的插件不会被导入"""
+    from service.plugin.interface.enum import PluginKind
+
+    await registry.discover()
+    await registry.setup({PluginKind.DATABASE: database})
+    await registry.start_taps(fetch)
+
+
+async def deferred_startup(
+    registry: "PluginRegistry",
+    fetch: "FetchService",
+    database: "DatabaseContext",
+) -> None:
+    """服务就绪之后才进行的非必要初始化"""
+    from service.controller.interface.dataclass import SilenceConfig
+    from service.diagnostic import install_memory_profiler, start_placement
+    from service.robot import start_segment_service
+
+    setup_rich_logging()
+    show_banner()
+    # 运行中向进程发送 SIGUSR1 输出内存报告 SIGUSR2 停止追踪
+    install_memory_profiler()
+    # 采集线程与事件循环各占一个核 定期输出各线程的 CPU 占用
+    start_placement(placement_config(), fetch)
+    # 静音检测依赖 numpy 就绪后再开启
+    fetch.suppress_silence(SilenceConfig())
+    # 节目分段同样依赖 numpy
+    start_segment_service(fetch)
+    await load_plugins(registry, fetch, database)
+
+
+def report_deferred_error(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception():
+        log.warning(f"非必要的初始化出错 {task.exception()}")
+
+
+async def main(
+    host: str = "wthomec4.dns.army",
+    port: int = 58908,
+    configuration: Optional["QuicConfiguration"] = None,
+    source: Optional["CaptureSource"] = None,
+    upstream: Optional[str] = None,
+    web_root: Optional[Path] = WEB_ROOT,
+) -> None:
+    from service.connection import start_webtransport_service
+    from service.controller import start_fetch_service
+    from service.database import DatabaseContext
+    from service.plugin.registry import PluginRegistry
+
+    fetch_service: Optional["FetchService"] = None
+    webtransport_service: Optional["QuicServer"] = None
+    registry = PluginRegistry()
+    database = DatabaseContext()
     try:
-        # 广播信号采集分发服务
-        fetch_service = await start_fetch_service(config=config)
+        # 广播信号采集分发服务 中继模式下收听上游服务端的广播
+        if upstream is not None:
+            from service.connection.relay import start_relay_service
+
+            fetch_service = await start_relay_service(upstream)
+        else:
+            fetch_service = await start_fetch_service(
+                config=capture_config(),
+                source=source,
+            )
 
         # HTTP/3 WebTransport 服务
         webtransport_service = await start_webtransport_service(
-            configuration=configuration,
-            host="wthomec4.dns.army",
+            configuration=configuration or quic_configuration(),
+            host=host,
+            port=port,
+            web_root=web_root,
         )
+        if webtransport_service is not None:
+            elapsed = (time.perf_counter() - STARTUP) * 1000
+            log.info(f"服务已就绪 启动用时 {elapsed:.0f}ms")
+
+        # 非必要的初始化放到服务就绪以后
+        deferred = asyncio.create_task(
+            deferred_startup(registry, fetch_service, database)
+        )
+        deferred.add_done_callback(report_deferred_error)
 
         # 服务持续运行
         await asyncio.Future()
     finally:
         if fetch_service:
+            registry.stop_taps(fetch_service)
             fetch_service.stop()
         if webtransport_service:
             webtransport_service.close()
+        # 把回写队列中剩余的行写入数据库
+        await database.close()
 
 
 if __name__ == "__main__":
-    log.info(f"\n{figlet_format('Outdoor Aerial')}\n永远热爱户外和广播！")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="室外天线服务端")
+    parser.add_argument(
+        "--upstream",
+        help="中继模式 转发该服务端的广播 例如 https://example.com:58908/broadcast",
+    )
+    parser.add_argument(
+        "--web-root",
+        type=Path,
+        default=WEB_ROOT,
+        help=f"网页客户端所在目录 默认为 {WEB_ROOT}",
+    )
+    args = parser.parse_args()
     try:
-        asyncio.run(main())
+        asyncio.run(main(upstream=args.upstream, web_root=args.web_root))
     except KeyboardInterrupt:
         log.warning("服务被 Ctrl+C 终止运行")
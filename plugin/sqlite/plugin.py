@@ -0,0 +1,106 @@
+"""使用本地 SQLite 文件的数据库插件"""
+
+import asyncio
+import json
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Optional
+
+from service.database import DatabaseContext
+from service.plugin.interface.dataclass import PluginInfo
+from service.plugin.model.database import DatabasePlugin
+
+TABLE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+"""允许的表名 表名会直接拼进 SQL"""
+
+
+class SQLitePlugin(DatabasePlugin):
+    """
+    SQLite 数据库插件
+
+    每张表只有自增编号、可选的键与 JSON 内容三列，
+    所有操作都在同一个工作线程中执行，不会阻塞事件循环
+    """
+
+    plugin_info = PluginInfo(
+        name="sqlite",
+        description="把电台消息与服务端设置保存在本地 SQLite 文件中",
+        author="Outdoor Aerial",
+        license="MIT",
+        version="0.1.0",
+    )
+
+    def __init__(self, path: Path = Path("data/outdoor-aerial.sqlite3")) -> None:
+        self.__path = path
+        """数据库文件路径"""
+
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        """执行 SQLite 操作的工作线程"""
+
+        self.__connection: Optional[sqlite3.Connection] = None
+        self.__tables: set[str] = set()
+        """已确认存在的表"""
+
+    async def setup(self, context: Optional[DatabaseContext]) -> None:
+        await self.__run(self.__open)
+        if context is not None:
+            context.attach(self)
+
+    async def write_batch(self, table: str, rows: list[dict[str, Any]]) -> None:
+        await self.__run(self.__write_batch, table, rows)
+
+    async def read(self, table: str, key: str) -> Optional[dict[str, Any]]:
+        return await self.__run(self.__read, table, key)
+
+    async def close(self) -> None:
+        await self.__run(self.__close)
+        self.__executor.shutdown()
+
+    async def __run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, func, *args)
+
+    def __open(self) -> None:
+        if self.__path != Path(":memory:"):
+            self.__path.parent.mkdir(parents=True, exist_ok=True)
+        self.__connection = sqlite3.connect(self.__path, check_same_thread=False)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("PRAGMA synchronous=NORMAL")
+
+    def __close(self) -> None:
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
+
+    def __ensure(self, table: str) -> sqlite3.Connection:
+        if self.__connection is None:
+            raise RuntimeError("SQLite 数据库尚未打开")
+        if table not in self.__tables:
+            if not TABLE_NAME.match(table):
+                raise ValueError(f"表名 {table} 不合法")
+            self.__connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(id INTEGER PRIMARY KEY, key TEXT UNIQUE, data TEXT NOT NULL)"
+            )
+            self.__tables.add(table)
+        return self.__connection
+
+    def __write_batch(self, table: str, rows: list[dict[str, Any]]) -> None:
+        connection = self.__ensure(table)
+        with connection:
+            connection.executemany(
+                f"INSERT INTO {table} (key, data) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET data = excluded.data",
+                [(row.get("key"), json.dumps(row, ensure_ascii=False)) for row in rows],
+            )
+
+    def __read(self, table: str, key: str) -> Optional[dict[str, Any]]:
+        connection = self.__ensure(table)
+        row = connection.execute(f"SELECT data FROM {table} WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def create_plugin() -> SQLitePlugin:
+    return SQLitePlugin()
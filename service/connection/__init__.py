@@ -1,6 +1,8 @@
 """基于 WebTransport 参与客户端通信的模块"""
 
+import asyncio
 import logging
+from pathlib import Path
 from socket import gaierror
 from typing import Optional
 
@@ -8,8 +10,11 @@ from aioquic.asyncio.server import serve, QuicServer
 from aioquic.quic.configuration import QuicConfiguration
 
 from handler.broadcast import BroadcastHandler
+from service.connection.asset import StaticAssetCache
+from service.connection.interface.dataclass import TransportProfile
 from service.connection.protocol import WebTransportProtocol
 from service.connection.router import WebTransportRouter
+from service.connection.transport import LIVE, configure
 
 log = logging.getLogger(__name__)
 
@@ -18,10 +23,29 @@ async def start_webtransport_service(
     configuration: QuicConfiguration,
     host: str,
     port: int = 58908,
+    web_root: Optional[Path] = None,
+    profile: Optional[TransportProfile] = None,
 ) -> Optional[QuicServer]:
-    """启动 HTTP/3 WebTransport 服务"""
+    """
+    启动 HTTP/3 WebTransport 服务 可顺带提供 `web_root` 中的网页客户端 目录不存在时不提供
+
+    给出 `profile` 时用它覆盖 `configuration` 中的传输参数
+    """
+    if profile is not None:
+        configuration = configure(configuration, profile)
+
     app = WebTransportRouter()
-    app.add_route("/broadcast", BroadcastHandler)
+    app.add_route("/broadcast", BroadcastHandler, profile=LIVE)
+
+    assets: Optional[StaticAssetCache] = None
+    if web_root is not None:
+        assets = StaticAssetCache(web_root)
+        try:
+            await asyncio.to_thread(assets.load)
+        except OSError as exc:
+            # 网页客户端不影响广播服务
+            log.warning(f"载入静态资源出错 {exc} 不提供网页客户端")
+            assets = None
 
     try:
         server = await serve(
@@ -30,6 +54,7 @@ async def start_webtransport_service(
             configuration=configuration,
             create_protocol=lambda *args, **kwargs: WebTransportProtocol(
                 app=app,
+                assets=assets,
                 *args,
                 **kwargs,
             ),
@@ -0,0 +1,89 @@
+"""按连接状况为单个会话挑选广播档位"""
+
+import logging
+from typing import Optional
+
+from service.connection.interface.dataclass import AdaptConfig, ConnectionStats
+
+log = logging.getLogger(__name__)
+
+
+class QualityController:
+    """
+    带迟滞的档位选择
+
+    发生丢包、积压过多或拥塞窗口撑不起当前码率时立即降一档；
+    连续多次采样都宽裕时才升一档，升档后很快又降档则下次升档要等更久
+    """
+
+    def __init__(self, config: Optional[AdaptConfig] = None) -> None:
+        self.config = config or AdaptConfig()
+
+        self.level: int = 0
+        """当前档位在档位列表中的下标 0 为最高档"""
+
+        self.__streak: int = 0
+        """连续满足升档条件的采样次数"""
+
+        self.__up_after: int = self.config.up_after
+        """当前升档所需的采样次数"""
+
+        self.__since_up: Optional[int] = None
+        """上次升档后经过的采样次数"""
+
+        self.__last_window: Optional[int] = None
+        """上次采样时的拥塞窗口 拥塞窗口缩小说明发生了丢包"""
+
+    def update(self, stats: ConnectionStats, bitrates: list[float]) -> int:
+        """根据一次采样更新档位 `bitrates` 为各档位每秒的字节数 由高到低排列"""
+        config = self.config
+        self.level = min(self.level, len(bitrates) - 1)
+        bitrate = bitrates[self.level]
+
+        lost = (
+            self.__last_window is not None
+            and stats.congestion_window < self.__last_window
+        )
+        self.__last_window = stats.congestion_window
+
+        backlog = stats.send_backlog / bitrate
+        # 尚未测得往返时延时不限制
+        capacity = stats.congestion_window / stats.rtt if stats.rtt else float("inf")
+        if self.__since_up is not None:
+            self.__since_up += 1
+            if self.__since_up > self.__up_after * 4:
+                # 在升上来的档位稳定了足够久 恢复升档所需的采样次数
+                self.__up_after = config.up_after
+                self.__since_up = None
+
+        congested = capacity < bitrate * config.down_headroom
+        if lost or backlog > config.down_backlog or congested:
+            self.__streak = 0
+            if self.level + 1 < len(bitrates):
+                self.level += 1
+                if self.__since_up is not None and self.__since_up <= self.__up_after:
+                    # 刚升上去就撑不住 说明上一档并不可靠
+                    self.__up_after = min(self.__up_after * 2, config.max_up_after)
+                self.__since_up = None
+                log.debug(
+                    f"降至第 {self.level} 档 丢包 {lost} 积压 {backlog:.2f}s "
+                    f"可承载 {capacity / 1024:.0f}KiB/s"
+                )
+            return self.level
+
+        if self.level == 0:
+            self.__streak = 0
+            return self.level
+
+        upper = bitrates[self.level - 1]
+        if backlog < config.up_backlog and capacity > upper * config.up_headroom:
+            self.__streak += 1
+        else:
+            self.__streak = 0
+
+        if self.__streak >= self.__up_after:
+            self.__streak = 0
+            self.level -= 1
+            self.__since_up = 0
+            log.debug(f"升至第 {self.level} 档")
+        return self.level
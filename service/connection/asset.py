@@ -0,0 +1,132 @@
+"""在 HTTP/3 服务上直接提供网页客户端的静态资源"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+from pathlib import Path
+from typing import Optional
+
+from service.connection.interface.dataclass import StaticAsset
+
+log = logging.getLogger(__name__)
+
+
+class StaticAssetCache:
+    """启动时一次性载入并预压缩的静态资源缓存"""
+
+    def __init__(self, root: Path, min_compress_size: int = 256) -> None:
+        self._root = root
+        """静态资源所在目录"""
+
+        self._min_compress_size = min_compress_size
+        """小于该字节数的资源不做压缩"""
+
+        self._assets: dict[str, StaticAsset] = {}
+        """请求路径对应的静态资源"""
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+    def load(self) -> None:
+        """扫描目录并把所有资源连同压缩版本一起载入内存 目录不存在时不提供静态资源"""
+        if not self._root.is_dir():
+            self._assets = {}
+            log.warning(f"静态资源目录 {self._root} 不存在 不提供网页客户端")
+            return
+
+        assets: dict[str, StaticAsset] = {}
+        raw_size = 0
+        for file in sorted(self._root.rglob("*")):
+            if not file.is_file():
+                continue
+            body = file.read_bytes()
+            path = "/" + file.relative_to(self._root).as_posix()
+            assets[path] = StaticAsset(
+                path=path,
+                content_type=self._guess_type(file),
+                etag=f'"{hashlib.sha1(body).hexdigest()}"',
+                variants=self._compress(body),
+            )
+            raw_size += len(body)
+
+        self._assets = assets
+        log.info(f"已载入 {len(assets)} 个静态资源 共 {raw_size} 字节")
+
+    def lookup(self, path: str) -> Optional[StaticAsset]:
+        """根据请求路径查找静态资源 目录请求指向其中的 `index.html`"""
+        if path.endswith("/"):
+            path = f"{path}index.html"
+        return self._assets.get(path)
+
+    @staticmethod
+    def negotiate(asset: StaticAsset, accept_encoding: Optional[str]) -> str:
+        """
+        根据 `accept-encoding` 选出最合适的版本
+
+        按 q 值从高到低选择，q 值相同时优先压缩版本；q=0 表示不接受，
+        未列出的编码按 `*` 的 q 值处理，没有 `*` 时只有 `identity` 默认可以接受
+        """
+        if not accept_encoding:
+            return "identity"
+        weights: dict[str, float] = {}
+        for token in accept_encoding.split(","):
+            name, *params = token.split(";")
+            name = name.strip().lower()
+            if not name:
+                continue
+            weight = 1.0
+            for param in params:
+                key, _, value = param.partition("=")
+                if key.strip().lower() == "q":
+                    try:
+                        weight = float(value)
+                    except ValueError:
+                        weight = 0.0
+            weights[name] = weight
+
+        anything = weights.get("*")
+        best, best_weight = "identity", 0.0
+        for encoding in ("gzip", "identity"):
+            if encoding not in asset.variants:
+                continue
+            default = anything if anything is not None else (1.0 if encoding == "identity" else 0.0)
+            weight = weights.get(encoding, default)
+            if weight > best_weight:
+                best, best_weight = encoding, weight
+        # 没有可以接受的版本时仍然发送未压缩的内容
+        return best
+
+    @staticmethod
+    def is_fresh(asset: StaticAsset, if_none_match: Optional[str]) -> bool:
+        """请求方缓存的 ETag 是否仍然有效"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        return any(
+            tag.strip().removeprefix("W/") == asset.etag
+            for tag in if_none_match.split(",")
+        )
+
+    def _compress(self, body: bytes) -> dict[str, bytes]:
+        variants: dict[str, bytes] = {"identity": body}
+        if len(body) < self._min_compress_size:
+            return variants
+
+        gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(gzipped) < len(body):
+            variants["gzip"] = gzipped
+        return variants
+
+    @staticmethod
+    def _guess_type(file: Path) -> str:
+        content_type, _ = mimetypes.guess_type(file.name)
+        if content_type is None:
+            return "application/octet-stream"
+        if content_type.startswith("text/") or content_type in (
+            "application/javascript",
+            "application/json",
+        ):
+            return f"{content_type}; charset=utf-8"
+        return content_type
@@ -0,0 +1,138 @@
+"""以 WebTransport 客户端身份连接其他 HTTP/3 服务的模块"""
+
+import asyncio
+from typing import Callable, Optional
+
+from aioquic.asyncio.protocol import QuicConnectionProtocol
+from aioquic.h3.connection import FrameType, H3Connection
+from aioquic.h3.events import (
+    DataReceived,
+    DatagramReceived,
+    H3Event,
+    HeadersReceived,
+    WebTransportStreamDataReceived,
+)
+from aioquic.quic.events import ConnectionTerminated, QuicEvent
+
+StreamDataCallback = Callable[[int, bytes, bool], None]
+"""收到子流数据时的回调 参数依次为流 ID、数据、流是否结束"""
+
+DatagramCallback = Callable[[bytes], None]
+"""收到数据报时的回调"""
+
+
+class WebTransportClientProtocol(QuicConnectionProtocol):
+    """
+    单会话的 WebTransport 客户端
+
+    子流数据与数据报直接在事件回调里同步交给使用方，
+    不经过队列也不为每个数据包创建任务
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._h3 = H3Connection(self._quic, enable_webtransport=True)
+        self._session_id: Optional[int] = None
+        self._ready: asyncio.Future[None] = self._loop.create_future()
+        self._closed = asyncio.Event()
+
+        self.on_stream_data: Optional[StreamDataCallback] = None
+        """子流数据回调"""
+
+        self.on_datagram: Optional[DatagramCallback] = None
+        """数据报回调"""
+
+    @property
+    def session_id(self) -> Optional[int]:
+        return self._session_id
+
+    async def open_session(self, authority: str, path: str) -> int:
+        """发起 WebTransport 的 `CONNECT` 请求并等待服务端接受"""
+        if self._session_id is not None:
+            raise RuntimeError("Session is already open.")
+        self._session_id = self._quic.get_next_available_stream_id()
+        self._h3.send_headers(
+            stream_id=self._session_id,
+            headers=[
+                (b":method", b"CONNECT"),
+                (b":protocol", b"webtransport"),
+                (b":scheme", b"https"),
+                (b":authority", authority.encode()),
+                (b":path", path.encode()),
+            ],
+            end_stream=False,
+        )
+        self.transmit()
+        await self._ready
+        return self._session_id
+
+    def send_datagram(self, data: bytes) -> None:
+        if self._session_id is None:
+            raise RuntimeError("Session is not open.")
+        self._h3.send_datagram(stream_id=self._session_id, data=data)
+        self.transmit()
+
+    def create_stream(self, bidirectional: bool = True) -> int:
+        """在会话中打开一条子流 返回流 ID"""
+        if self._session_id is None:
+            raise RuntimeError("Session is not open.")
+        stream_id = self._h3.create_webtransport_stream(
+            session_id=self._session_id, is_unidirectional=not bidirectional
+        )
+        if bidirectional:
+            # aioquic 不会标记自己打开的双向子流 对端的应答会被当作 HTTP/3 帧解析
+            with self._h3._get_or_create_stream(stream_id) as stream:
+                stream.frame_type = FrameType.WEBTRANSPORT_STREAM
+                stream.session_id = self._session_id
+        return stream_id
+
+    def send_stream_data(self, stream_id: int, data: bytes, end_stream: bool = False) -> None:
+        self._quic.send_stream_data(stream_id, data, end_stream)
+        self.transmit()
+
+    def close_session(self) -> None:
+        if self._session_id is None or self._closed.is_set():
+            return
+        self._h3.send_data(stream_id=self._session_id, data=b"", end_stream=True)
+        self.transmit()
+        self._closed.set()
+
+    async def wait_session_closed(self) -> None:
+        await self._closed.wait()
+
+    def quic_event_received(self, event: QuicEvent) -> None:
+        if isinstance(event, ConnectionTerminated):
+            if not self._ready.done():
+                self._ready.set_exception(
+                    ConnectionError(f"连接已被终止 {event.reason_phrase}")
+                )
+                if self._session_id is None:
+                    # 握手阶段就被终止 不会再有人等待会话应答
+                    self._ready.exception()
+            self._closed.set()
+
+        for h3_event in self._h3.handle_event(event):
+            self._handle_h3_event(h3_event)
+
+    def _handle_h3_event(self, event: H3Event) -> None:
+        match event:
+            case HeadersReceived() if event.stream_id == self._session_id:
+                # 会话请求的应答
+                status = dict(event.headers).get(b":status", b"")
+                if self._ready.done():
+                    return
+                if status == b"200":
+                    self._ready.set_result(None)
+                else:
+                    self._ready.set_exception(
+                        ConnectionError(f"会话请求被拒绝 状态码 {status.decode()}")
+                    )
+            case WebTransportStreamDataReceived():
+                if self.on_stream_data is not None:
+                    self.on_stream_data(event.stream_id, event.data, event.stream_ended)
+            case DatagramReceived():
+                if self.on_datagram is not None:
+                    self.on_datagram(event.data)
+            case DataReceived() if event.stream_id == self._session_id:
+                if event.stream_ended:
+                    self._closed.set()
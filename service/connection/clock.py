@@ -0,0 +1,72 @@
+"""基于数据报的时钟同步 客户端据此估计服务端时钟的偏差与往返时延"""
+
+import struct
+from collections import deque
+from typing import Optional
+
+from service.connection.interface.dataclass import ClockSample
+from service.connection.interface.enum import DatagramType
+from service.controller.source import server_time
+
+PING = struct.Struct("<B8s")
+"""对时请求 依次为类型与客户端的发送时刻"""
+
+PONG = struct.Struct("<B8sqq")
+"""对时应答 依次为类型、原样带回的客户端发送时刻、服务端收到与发出的时刻"""
+
+_CLIENT_TIME = struct.Struct("<q")
+"""本模块的客户端以微秒记录发送时刻 网页客户端可以换成自己的格式"""
+
+
+def answer(data: bytes) -> Optional[bytes]:
+    """对时请求直接生成应答 其他数据报返回空"""
+    if len(data) != PING.size or data[0] != DatagramType.CLOCK_PING:
+        return None
+    received = server_time()
+    return PONG.pack(DatagramType.CLOCK_PONG, data[1:], received, server_time())
+
+
+def encode_ping(sent: int) -> bytes:
+    """以微秒为单位的本地发送时刻生成对时请求"""
+    return PING.pack(DatagramType.CLOCK_PING, _CLIENT_TIME.pack(sent))
+
+
+def decode_pong(data: bytes, arrived: int) -> Optional[ClockSample]:
+    """按 NTP 的算法由对时应答与本地收到的时刻得出一次采样 不是对时应答时返回空"""
+    if len(data) != PONG.size or data[0] != DatagramType.CLOCK_PONG:
+        return None
+    _, echoed, received, replied = PONG.unpack(data)
+    (sent,) = _CLIENT_TIME.unpack(echoed)
+    return ClockSample(
+        offset=((received - sent) + (replied - arrived)) / 2,
+        rtt=(arrived - sent) - (replied - received),
+    )
+
+
+class ClockSync:
+    """
+    客户端的对时估计
+
+    排队与重传只会让往返时延变大，最近几次中往返时延最小的一次偏差最可信
+    """
+
+    def __init__(self, window: int = 8) -> None:
+        self.__samples: deque[ClockSample] = deque(maxlen=window)
+
+    def update(self, sample: ClockSample) -> None:
+        self.__samples.append(sample)
+
+    @property
+    def best(self) -> Optional[ClockSample]:
+        """往返时延最小的一次采样 还没有采样时为空"""
+        return min(self.__samples, key=lambda sample: sample.rtt, default=None)
+
+    def to_server(self, local: int) -> Optional[float]:
+        """把本地时刻换算为服务端时刻 单位微秒"""
+        best = self.best
+        return None if best is None else local + best.offset
+
+    def to_local(self, server: int) -> Optional[float]:
+        """把服务端时刻换算为本地时刻 单位微秒"""
+        best = self.best
+        return None if best is None else server - best.offset
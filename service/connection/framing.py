@@ -0,0 +1,121 @@
+"""广播流的分帧 让客户端无需手动选择格式 也能在采集配置变化时跟着切换"""
+
+import struct
+from functools import lru_cache
+from typing import Optional
+
+from service.connection.interface.enum import FrameType
+from service.controller.interface.dataclass import AudioFormat, CaptureConfig
+from service.controller.source import sample_width
+
+HEADER = struct.Struct("<BI")
+"""帧头 依次为类型与负载长度"""
+
+FORMAT = struct.Struct("<IBBI")
+"""格式帧负载 依次为采样率、声道数、位深与每块帧数 之后可能追加字段"""
+
+SILENCE = struct.Struct("<I")
+"""静音帧负载 需要补齐的采样帧数"""
+
+TIMESTAMP = struct.Struct("<q")
+"""时间戳帧负载 服务端采集时刻的微秒数"""
+
+_MEMO_SIZE = 4
+"""记住最近几次分帧 每个档位各占一项"""
+
+_memo: list[tuple[bytes, Optional[int], bytes]] = []
+"""最近几次分帧的输入、时间戳与结果 同一帧分发给所有会话时每个档位只分帧一次"""
+
+
+def encode_frame(frame_type: FrameType, payload: bytes) -> bytes:
+    return HEADER.pack(frame_type, len(payload)) + payload
+
+
+def encode_audio(data: bytes, timestamp: Optional[int] = None) -> bytes:
+    """把一块 PCM 数据封装为音频帧 给出采集时刻时在前面加上时间戳帧"""
+    for source, stamp, framed in _memo:
+        if source is data and stamp == timestamp:
+            return framed
+    header = HEADER.pack(FrameType.AUDIO, len(data))
+    if timestamp is None:
+        framed = header + data
+    else:
+        # 只拷贝一次 PCM 数据
+        framed = b"".join((encode_timestamp(timestamp), header, data))
+    _memo.insert(0, (data, timestamp, framed))
+    del _memo[_MEMO_SIZE:]
+    return framed
+
+
+def droppable(data: bytes) -> bool:
+    """
+    广播流的一次写入能否在积压过多时整段丢弃
+
+    音频帧与静音帧连同前面的时间戳帧丢弃后只是少了一段声音，格式帧丢弃后客户端会解错之后的帧
+    """
+    return not data or data[0] != FrameType.FORMAT
+
+
+def encode_timestamp(timestamp: int) -> bytes:
+    """把服务端采集时刻封装为时间戳帧"""
+    return encode_frame(FrameType.TIMESTAMP, TIMESTAMP.pack(timestamp))
+
+
+def decode_timestamp(payload: bytes) -> int:
+    """解析时间戳帧负载 返回服务端采集时刻的微秒数"""
+    return TIMESTAMP.unpack_from(payload)[0]
+
+
+def pack_format(config: CaptureConfig | AudioFormat) -> bytes:
+    """把采集配置或档位的格式打包为格式帧负载 控制流的格式通知也使用它"""
+    if isinstance(config, CaptureConfig):
+        config = AudioFormat(
+            config.samplerate.value,
+            config.channel.value,
+            sample_width(config.dtype) * 8,
+            config.blocksize.value,
+        )
+    return FORMAT.pack(config.samplerate, config.channels, config.bits, config.blocksize)
+
+
+def encode_format(config: CaptureConfig | AudioFormat) -> bytes:
+    """把采集配置或档位的格式封装为格式帧"""
+    return encode_frame(FrameType.FORMAT, pack_format(config))
+
+
+@lru_cache(maxsize=16)
+def encode_silence(frames: int) -> bytes:
+    """把省略的采样帧数封装为静音帧 同样的帧数只封装一次"""
+    return encode_frame(FrameType.SILENCE, SILENCE.pack(frames))
+
+
+def decode_silence(payload: bytes) -> int:
+    """解析静音帧负载 返回需要补齐的采样帧数"""
+    return SILENCE.unpack_from(payload)[0]
+
+
+def decode_format(payload: bytes) -> tuple[int, int, int, int]:
+    """解析格式帧负载 返回采样率、声道数、位深与每块帧数"""
+    return FORMAT.unpack_from(payload)
+
+
+class FrameReader:
+    """把流中任意切分的数据重新拼成完整的帧"""
+
+    def __init__(self) -> None:
+        self.__buffer = bytearray()
+
+    def feed(self, data: bytes) -> list[tuple[int, bytes]]:
+        """送入收到的数据 返回其中已经完整的 (类型, 负载)"""
+        self.__buffer += data
+        frames: list[tuple[int, bytes]] = []
+        offset = 0
+        while len(self.__buffer) - offset >= HEADER.size:
+            frame_type, length = HEADER.unpack_from(self.__buffer, offset)
+            end = offset + HEADER.size + length
+            if end > len(self.__buffer):
+                break
+            frames.append((frame_type, bytes(self.__buffer[offset + HEADER.size : end])))
+            offset = end
+        del self.__buffer[:offset]
+        return frames
@@ -4,8 +4,10 @@ import abc
 import asyncio
 from typing import TYPE_CHECKING, Callable, Protocol
 
+from service.connection.interface.enum import StreamPriority
+
 if TYPE_CHECKING:
-    from service.connection.interface.dataclass import SessionInfo
+    from service.connection.interface.dataclass import ConnectionStats, SessionInfo
 
 
 StreamSendFn = Callable[[int, bytes, bool], None]
@@ -33,7 +35,12 @@ class WebTransportStream:
         self._queue: asyncio.Queue[tuple[bytes, bool]] = asyncio.Queue(
             maxsize=queue_size
         )
-        self._closed = False
+        self._read_closed = False
+        """客户端的数据已经读完或不再读取"""
+        self._write_closed = False
+        """已经发出流结束 不能再写"""
+        self.dropped = 0
+        """读取跟不上而丢弃的数据块数"""
 
     @property
     def stream_id(self) -> int:
@@ -51,18 +58,29 @@ class WebTransportStream:
     def can_write(self) -> bool:
         return self._can_write
 
+    @property
+    def read_closed(self) -> bool:
+        return self._read_closed
+
+    @property
+    def write_closed(self) -> bool:
+        return self._write_closed
+
     @property
     def closed(self) -> bool:
-        return self._closed
+        """流的每个方向都已经结束 双向流上客户端只结束发送时仍然可以写"""
+        return (not self._can_read or self._read_closed) and (
+            not self._can_write or self._write_closed
+        )
 
     async def read(self) -> bytes:
         if not self._can_read:
             raise RuntimeError("Stream is not readable.")
-        if self._closed and self._queue.empty():
+        if self._read_closed and self._queue.empty():
             return b""
         data, end_stream = await self._queue.get()
         if end_stream:
-            self._closed = True
+            self._read_closed = True
         return data
 
     async def write(self, data: bytes, end_stream: bool = False) -> None:
@@ -70,23 +88,26 @@ class WebTransportStream:
             raise RuntimeError("Stream is not writable.")
         self._send_stream_data(self._stream_id, data, end_stream)
         if end_stream:
-            self._closed = True
+            self._write_closed = True
         self._transmit()
 
     def feed_data(self, data: bytes, end_stream: bool) -> None:
-        if self._closed:
+        if self._read_closed:
             return
         try:
             self._queue.put_nowait((data, end_stream))
         except asyncio.QueueFull:
             # Drop data if the application is too slow.
+            self.dropped += 1
             if end_stream:
-                self._closed = True
+                self._read_closed = True
 
     def close(self) -> None:
-        if self._closed:
+        """两个方向都不再使用 等待中的读取返回空数据"""
+        self._write_closed = True
+        if self._read_closed:
             return
-        self._closed = True
+        self._read_closed = True
         try:
             self._queue.put_nowait((b"", True))
         except asyncio.QueueFull:
@@ -94,12 +115,23 @@ class WebTransportStream:
 
 
 class WebTransportSessionContext(Protocol):
-    async def create_stream(self, bidirectional: bool = True) -> WebTransportStream:
+    async def create_stream(
+        self,
+        bidirectional: bool = True,
+        priority: StreamPriority = StreamPriority.NORMAL,
+        droppable: Callable[[bytes], bool] | None = None,
+    ) -> WebTransportStream:
+        ...
+
+    def prioritize(self, stream: WebTransportStream, priority: StreamPriority) -> None:
         ...
 
     def send_datagram(self, data: bytes) -> None:
         ...
 
+    def stats(self) -> ConnectionStats:
+        ...
+
     def close_session(self, code: int = 0, reason: str = "") -> None:
         ...
 
@@ -116,7 +148,7 @@ class WebTransportHandler(abc.ABC):
         self.route_params = kwargs
         self._transport_context: WebTransportSessionContext | None = None
 
-    def bind_context(self, context: WebTransportSessionContext) -> None:
+    def bind_context(self, context: WebTransportSessionContext | None) -> None:
         self._transport_context = context
 
     async def on_session_ready(self) -> None:
@@ -134,9 +166,26 @@ class WebTransportHandler(abc.ABC):
     async def on_datagram(self, data: bytes) -> None:
         pass
 
-    async def create_stream(self, bidirectional: bool = True) -> WebTransportStream:
+    async def on_datagrams(self, datagrams: list[bytes]) -> None:
+        """一次处理收件箱中积攒的所有数据报 默认逐个交给 `on_datagram`"""
+        for data in datagrams:
+            await self.on_datagram(data)
+
+    async def create_stream(
+        self,
+        bidirectional: bool = True,
+        priority: StreamPriority = StreamPriority.NORMAL,
+        droppable: Callable[[bytes], bool] | None = None,
+    ) -> WebTransportStream:
+        """`droppable` 判断低优先级流积压过多时哪些写入可以整段丢弃"""
         context = self._ensure_context()
-        return await context.create_stream(bidirectional=bidirectional)
+        return await context.create_stream(
+            bidirectional=bidirectional, priority=priority, droppable=droppable
+        )
+
+    def prioritize(self, stream: WebTransportStream, priority: StreamPriority) -> None:
+        context = self._ensure_context()
+        context.prioritize(stream, priority)
 
     def send_datagram(self, data: bytes) -> None:
         context = self._ensure_context()
@@ -146,6 +195,10 @@ class WebTransportHandler(abc.ABC):
         context = self._ensure_context()
         context.close_session(code=code, reason=reason)
 
+    def connection_stats(self) -> ConnectionStats:
+        context = self._ensure_context()
+        return context.stats()
+
     def _ensure_context(self) -> WebTransportSessionContext:
         if self._transport_context is None:
             raise RuntimeError("WebTransport context is not bound yet.")
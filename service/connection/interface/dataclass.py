@@ -29,6 +29,12 @@ class HeaderInfo:
     protocol: Optional[H3Protocol]
     """HTTP/3 的连接协议"""
 
+    accept_encoding: Optional[str] = None
+    """HTTP/3 请求方可接受的压缩编码"""
+
+    if_none_match: Optional[str] = None
+    """HTTP/3 请求方缓存资源的 ETag"""
+
     @classmethod
     def from_header(cls, header: list[tuple[bytes, bytes]]) -> "HeaderInfo":
         """从 `aioquic` 的 `header` 中一次性解析出请求信息"""
@@ -51,6 +57,10 @@ class HeaderInfo:
         match simply_header.get(":method"):
             case "CONNECT":
                 method: Optional[H3Method] = H3Method.CONNECT
+            case "GET":
+                method: Optional[H3Method] = H3Method.GET
+            case "HEAD":
+                method: Optional[H3Method] = H3Method.HEAD
             case None:
                 method: Optional[H3Method] = None
             case _:
@@ -70,9 +80,28 @@ class HeaderInfo:
             scheme=scheme,
             method=method,
             protocol=protocol,
+            accept_encoding=simply_header.get("accept-encoding"),
+            if_none_match=simply_header.get("if-none-match"),
         )
 
 
+@dataclass(frozen=True)
+class StaticAsset:
+    """预先载入内存的 HTTP/3 静态资源"""
+
+    path: str
+    """资源对应的请求路径"""
+
+    content_type: str
+    """资源的 MIME 类型"""
+
+    etag: str
+    """资源内容的强校验 ETag"""
+
+    variants: dict[str, bytes]
+    """按 `content-encoding` 区分的资源内容 未压缩版本为 `identity`"""
+
+
 @dataclass(frozen=True)
 class RouteInfo:
     """WebTransport 的路由信息"""
@@ -83,6 +112,9 @@ class RouteInfo:
     kwargs: dict[str, Any]
     """"""
 
+    profile: Optional["TransportProfile"] = None
+    """会话被接受时作用到所在连接上的传输参数 为 `None` 时沿用服务端的参数"""
+
 
 @dataclass(frozen=True)
 class SessionInfo:
@@ -96,3 +128,104 @@ class SessionInfo:
 
     client: Optional[tuple[str, int] | str]
     """在此次连接事件的客户端信息"""
+
+
+@dataclass(frozen=True)
+class TransportProfile:
+    """
+    一组具名的 QUIC 传输参数
+
+    服务端整体的参数在握手时就已经确定，
+    路由上的参数在会话被接受时才作用到所在的连接上
+    """
+
+    name: str
+    """参数组的名称"""
+
+    congestion_control: str
+    """拥塞控制算法 `aioquic` 支持 `reno` 与 `cubic`"""
+
+    initial_rtt: float
+    """首个往返时延测量之前假定的往返时延 决定最初的丢包重传时机"""
+
+    idle_timeout: float
+    """连接空闲多少秒后关闭"""
+
+    max_data: int
+    """整个连接的初始接收窗口"""
+
+    max_stream_data: int
+    """每个流的初始接收窗口"""
+
+    max_datagram_frame_size: int
+    """可以接收的数据报帧大小 WebTransport 要求两端都能接收数据报"""
+
+    send_budget: Optional[int] = None
+    """
+    每个低优先级流在 QUIC 中尚未确认的字节上限 超出的数据先留在会话中
+
+    上限越小，同一会话的控制消息在网络中排在音频之后的时间越短，
+    但需要大于码率与往返时延之积，否则低优先级流跟不上码率；
+    实际的预算至少容下流中最大的两次写入。`None` 表示不限制
+    """
+
+    send_limit: Optional[int] = None
+    """
+    超出发送预算而留在会话中的字节上限 超出时从最旧的可丢弃写入开始丢弃
+
+    订阅者长时间跟不上码率时，会话占用的内存不会无限增长；`None` 表示不限制
+    """
+
+
+@dataclass(frozen=True)
+class ClockSample:
+    """一次对时的结果 单位均为微秒"""
+
+    offset: float
+    """服务端时钟减去本地时钟"""
+
+    rtt: float
+    """扣除服务端处理时间后的往返时延"""
+
+
+@dataclass(frozen=True)
+class ConnectionStats:
+    """会话所在 QUIC 连接的传输状况"""
+
+    rtt: float
+    """平滑后的往返时延 单位秒 尚未测量时为 0"""
+
+    congestion_window: int
+    """拥塞窗口的字节数"""
+
+    bytes_in_flight: int
+    """已发送但尚未确认的字节数"""
+
+    send_backlog: int
+    """会话的流上已写入但尚未发出的字节数"""
+
+
+@dataclass(frozen=True)
+class AdaptConfig:
+    """按连接状况自动切换广播档位的参数"""
+
+    interval: float = 0.5
+    """采样连接状况的间隔 单位秒"""
+
+    down_backlog: float = 0.5
+    """积压超过多少秒的音频时降档"""
+
+    up_backlog: float = 0.05
+    """积压少于多少秒的音频才考虑升档"""
+
+    down_headroom: float = 1.2
+    """拥塞窗口能承载的速率低于当前档位码率的多少倍时降档"""
+
+    up_headroom: float = 2.0
+    """拥塞窗口能承载的速率高于上一档码率的多少倍才考虑升档"""
+
+    up_after: int = 6
+    """连续多少次采样都满足条件才升档"""
+
+    max_up_after: int = 96
+    """升档后很快又降档时 升档所需的采样次数加倍 但不超过该值"""
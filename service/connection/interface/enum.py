@@ -1,4 +1,4 @@
-from enum import Enum
+from enum import Enum, IntEnum
 
 
 class H3Method(Enum):
@@ -12,6 +12,12 @@ class H3Method(Enum):
     CONNECT = True
     """点对点连接请求"""
 
+    GET = "GET"
+    """静态资源获取请求"""
+
+    HEAD = "HEAD"
+    """静态资源元信息请求"""
+
     HTTP3 = False
     """其他 HTTP/3 请求"""
 
@@ -44,3 +50,90 @@ class H3Scheme(Enum):
 
     OTHERS = False
     """神鬼连接"""
+
+
+class FrameType(IntEnum):
+    """
+    广播流中的帧类型
+
+    每一帧由 1 字节类型、4 字节小端序长度与负载组成，
+    客户端遇到不认识的类型时按长度跳过即可
+    """
+
+    AUDIO = 0
+    """一块采集格式的 PCM 数据"""
+
+    FORMAT = 1
+    """之后的音频帧采用的格式 订阅时与采集配置变化时发送"""
+
+    SILENCE = 2
+    """代替一帧静音 负载为需要补齐的采样帧数 客户端自己生成静音"""
+
+    TIMESTAMP = 3
+    """紧随其后的音频帧或静音帧中第一个采样的服务端采集时刻 负载为 8 字节小端序的微秒数"""
+
+
+class DatagramType(IntEnum):
+    """
+    会话层直接应答的数据报类型
+
+    首字节为这些值且长度相符的数据报不会交给 handler
+    """
+
+    CLOCK_PING = 0xC0
+    """客户端的对时请求 之后是 8 字节由客户端自行解释的发送时刻"""
+
+    CLOCK_PONG = 0xC1
+    """服务端的对时应答 原样带回客户端的发送时刻 再附上服务端收到与发出的时刻"""
+
+
+class RpcKind(IntEnum):
+    """控制流中的消息种类"""
+
+    REQUEST = 0
+    """客户端的请求 服务端以相同的关联编号应答"""
+
+    RESPONSE = 1
+    """请求成功的应答"""
+
+    ERROR = 2
+    """请求失败的应答 负载为 UTF-8 编码的原因"""
+
+    NOTIFY = 3
+    """服务端主动推送的通知 关联编号为 0"""
+
+
+class ControlMethod(IntEnum):
+    """
+    控制流中的方法编号
+
+    请求与通知共用编号，各方法的负载格式见 `handler/broadcast.py`
+    """
+
+    PING = 0
+    """原样返回负载 用于测量往返时延"""
+
+    STATS = 1
+    """读取本会话所在连接的传输状况与当前档位"""
+
+    LEVEL = 2
+    """固定本会话的档位 负载为档位序号 0xFF 恢复自动选择"""
+
+    TUNE = 3
+    """把调谐器调到指定频率 负载为 4 字节小端序的 kHz"""
+
+    FORMAT = 4
+    """通知 本会话之后的音频帧采用的格式 负载与格式帧相同"""
+
+
+class StreamPriority(IntEnum):
+    """会话内流的发送优先级 数值越小越先发送"""
+
+    HIGH = 0
+    """控制消息 写入后立即排到 QUIC 发送轮转的最前面"""
+
+    NORMAL = 1
+    """元数据等少量数据 写入后直接交给 QUIC"""
+
+    LOW = 2
+    """音频等大量数据 在 QUIC 中尚未确认的字节受传输参数组的 `send_budget` 限制"""
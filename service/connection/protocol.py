@@ -12,19 +12,31 @@ from aioquic.h3.events import (
 )
 from aioquic.quic.events import ConnectionTerminated, ProtocolNegotiated, QuicEvent
 
+from service.connection.asset import StaticAssetCache
 from service.connection.router import WebTransportRouter
 from service.connection.interface.enum import H3Method, H3Protocol
 from service.connection.session import WebTransportSession
+from service.connection.transport import apply_profile
 from service.connection.interface.dataclass import HeaderInfo, SessionInfo
 
 
 class WebTransportProtocol(QuicConnectionProtocol):
-    def __init__(self, *args, app: WebTransportRouter, **kwargs):
+    def __init__(
+        self,
+        *args,
+        app: WebTransportRouter,
+        assets: Optional[StaticAssetCache] = None,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
         self._h3: Optional[H3Connection] = None
         self._app: Optional[WebTransportRouter] = app
+        self._assets: Optional[StaticAssetCache] = assets
+        """同一 QUIC 服务上提供的网页客户端静态资源"""
         self._sessions: dict[int, WebTransportSession] = {}
         """一个 ID 对应一个 Session 的列表"""
+        self._congestion_chosen = False
+        """连接上是否已经接受过会话 此后拥塞控制算法不再更换"""
 
     def quic_event_received(self, event: QuicEvent) -> None:
         match event:
@@ -43,6 +55,12 @@ class WebTransportProtocol(QuicConnectionProtocol):
                 self._handle_h3_event(h3_event)
             self.transmit()
 
+    def transmit(self) -> None:
+        # 收到确认或写入新数据后 先给受预算限制的流补充数据再组包
+        for session in self._sessions.values():
+            session.pump()
+        super().transmit()
+
     def _handle_h3_event(self, event: H3Event) -> None:
         match event:
             case HeadersReceived():
@@ -67,6 +85,9 @@ class WebTransportProtocol(QuicConnectionProtocol):
     def _handle_headers(self, event: HeadersReceived) -> None:
         header = HeaderInfo.from_header(event.headers)
 
+        if header.method in (H3Method.GET, H3Method.HEAD):
+            self._handle_static(event, header)
+            return
         if (
             header.method != H3Method.CONNECT
             or header.protocol != H3Protocol.WEBTRANSPORT
@@ -95,6 +116,11 @@ class WebTransportProtocol(QuicConnectionProtocol):
             client=client_addr,
         )
 
+        if route.profile is not None:
+            # 拥塞控制属于整个连接 只有第一个会话的路由可以更换 之前的会话结束后也不再更换
+            apply_profile(self._quic, route.profile, congestion=not self._congestion_chosen)
+        self._congestion_chosen = True
+
         handler = route.handler_factory(
             session_id=event.stream_id,
             session_info=session_info,
@@ -108,10 +134,60 @@ class WebTransportProtocol(QuicConnectionProtocol):
             session_info=session_info,
             handler=handler,
             transmit=self.transmit,
+            send_budget=route.profile.send_budget if route.profile else None,
+            send_limit=route.profile.send_limit if route.profile else None,
         )
         self._sessions[event.stream_id] = session
         asyncio.create_task(self._run_session(session))
 
+    def _handle_static(self, event: HeadersReceived, header: HeaderInfo) -> None:
+        """用内存中的预压缩资源应答 HTTP/3 GET/HEAD 请求"""
+        if self._h3 is None:
+            return
+
+        asset = self._assets.lookup(header.path.path) if self._assets else None
+        if asset is None:
+            self._h3.send_headers(
+                stream_id=event.stream_id,
+                headers=[(b":status", b"404")],
+                end_stream=True,
+            )
+            self.transmit()
+            return
+
+        headers = [
+            (b"etag", asset.etag.encode()),
+            (b"cache-control", b"no-cache"),
+            (b"vary", b"accept-encoding"),
+        ]
+        if StaticAssetCache.is_fresh(asset, header.if_none_match):
+            self._h3.send_headers(
+                stream_id=event.stream_id,
+                headers=[(b":status", b"304"), *headers],
+                end_stream=True,
+            )
+            self.transmit()
+            return
+
+        encoding = StaticAssetCache.negotiate(asset, header.accept_encoding)
+        body = asset.variants[encoding]
+        headers += [
+            (b"content-type", asset.content_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        if encoding != "identity":
+            headers.append((b"content-encoding", encoding.encode()))
+
+        head_only = header.method == H3Method.HEAD
+        self._h3.send_headers(
+            stream_id=event.stream_id,
+            headers=[(b":status", b"200"), *headers],
+            end_stream=head_only,
+        )
+        if not head_only:
+            self._h3.send_data(stream_id=event.stream_id, data=body, end_stream=True)
+        self.transmit()
+
     async def _run_session(self, session: WebTransportSession) -> None:
         try:
             await session.run()
@@ -0,0 +1,244 @@
+"""中继模式 以客户端身份收听上游服务端的广播 再交给本地的分发服务"""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from dataclasses import replace
+from typing import Callable, Optional
+
+from aioquic.asyncio import connect
+from aioquic.quic.configuration import QuicConfiguration
+from yarl import URL
+
+from service.connection.client import WebTransportClientProtocol
+from service.connection.framing import FrameReader, decode_format, decode_silence
+from service.connection.interface.enum import FrameType
+from service.connection.transport import LIVE, quic_configuration
+from service.controller import (
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+    FetchService,
+)
+from service.controller.interface.dataclass import CaptureBlockSize
+from service.controller.source import CaptureSource, FrameCallback, sample_width
+
+log = logging.getLogger(__name__)
+
+FormatCallback = Callable[[CaptureConfig], None]
+"""上游格式变化时在中继线程中调用"""
+
+_DTYPES: dict[int, CaptureDtype] = {16: CaptureDtype.Bit16, 24: CaptureDtype.Bit24, 32: CaptureDtype.Bit32}
+"""格式帧中的位深对应的采样格式"""
+
+
+class RelaySource(CaptureSource):
+    """
+    把上游服务端的 `/broadcast` 当作采集源
+
+    在独立线程的事件循环中维持到上游的连接，断开后按退避时间重连；
+    音频帧的负载原样交给分发服务，静音帧展开为全零的帧，
+    上游格式变化时暂停转发并通过 `on_format` 通知，分发服务按新格式切换时
+    只调用 `pause()` 与 `start()`，到上游的连接保持不断
+    """
+
+    def __init__(
+        self,
+        url: URL | str,
+        configuration: Optional[QuicConfiguration] = None,
+        on_format: Optional[FormatCallback] = None,
+        retry: float = 1.0,
+        max_retry: float = 30.0,
+    ) -> None:
+        self.url = URL(url)
+        self.on_format = on_format
+
+        self.config: Optional[CaptureConfig] = None
+        """上游当前的采集配置 收到第一个格式帧之前为空"""
+
+        self._configuration = configuration or quic_configuration(LIVE, is_client=True)
+        self._retry = retry
+        self._max_retry = max_retry
+
+        self._callback: Optional[FrameCallback] = None
+        self._holding = False
+        """上游格式与本地分发服务不一致 暂停转发"""
+
+        self._zero_frame = b""
+        self._ready: concurrent.futures.Future[CaptureConfig] = concurrent.futures.Future()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+        self.connects = 0
+        """连接上游的次数 包括断开后的重连"""
+
+    async def open(self, timeout: float = 5.0) -> CaptureConfig:
+        """连接上游并等待第一个格式帧 返回上游的采集配置"""
+        self._spawn()
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self._ready), timeout)
+        except BaseException:
+            self.stop()
+            raise
+
+    def start(self, callback: FrameCallback) -> None:
+        self._holding = False
+        self._callback = callback
+        self._spawn()
+
+    def pause(self) -> None:
+        # 只停止交帧 中继线程与到上游的连接保持不变
+        self._callback = None
+
+    def stop(self) -> None:
+        self._callback = None
+        if self._thread is None:
+            return
+        self._stopped.set()
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                # 中继线程的事件循环已经结束
+                pass
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _spawn(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=lambda: asyncio.run(self._run()),
+            name="RelaySource",
+            daemon=True,
+        )
+        self._thread.start()
+
+    async def _run(self) -> None:
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        delay = self._retry
+        try:
+            while not self._stopped.is_set():
+                # 握手与收听都可能长时间等待 停止时直接取消
+                session = asyncio.create_task(self._session())
+                woken = asyncio.create_task(self._wake.wait())
+                await asyncio.wait({session, woken}, return_when=asyncio.FIRST_COMPLETED)
+                woken.cancel()
+                if not session.done():
+                    session.cancel()
+                    await asyncio.gather(session, return_exceptions=True)
+                    break
+                if session.exception() is None:
+                    delay = self._retry
+                    continue
+                log.warning(f"与上游 {self.url} 的连接中断 {delay:.0f}s 后重连 {session.exception()}")
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, self._max_retry)
+        finally:
+            self._loop = None
+            self._wake = None
+
+    async def _session(self) -> None:
+        """收听一次上游广播 直到上游关闭会话"""
+        url = self.url
+        async with connect(
+            url.host or "localhost",
+            url.port or 443,
+            configuration=self._configuration,
+            create_protocol=WebTransportClientProtocol,
+        ) as client:
+            assert isinstance(client, WebTransportClientProtocol)
+            reader = FrameReader()
+            client.on_stream_data = lambda _, data, __: self._feed(reader, data)
+            # 中继只转发上游的原始格式 档位由本地的会话各自挑选
+            path = url.update_query(adapt="0").path_qs
+            await client.open_session(authority=f"{url.host}:{url.port}", path=path)
+            self.connects += 1
+            log.info(f"已作为中继连接上游 {url}")
+            try:
+                await client.wait_session_closed()
+            finally:
+                client.close_session()
+        raise ConnectionError("上游关闭了会话")
+
+    def _feed(self, reader: FrameReader, data: bytes) -> None:
+        for frame_type, payload in reader.feed(data):
+            match frame_type:
+                case FrameType.AUDIO:
+                    self._forward(payload)
+                case FrameType.SILENCE:
+                    assert self.config is not None
+                    config = self.config
+                    size = decode_silence(payload) * config.channel.value * sample_width(config.dtype)
+                    if len(self._zero_frame) != size:
+                        self._zero_frame = bytes(size)
+                    self._forward(self._zero_frame)
+                case FrameType.FORMAT:
+                    self._reformat(*decode_format(payload))
+
+    def _forward(self, frame: bytes) -> None:
+        callback = self._callback
+        if callback is not None and not self._holding:
+            callback(frame)
+
+    def _reformat(self, samplerate: int, channels: int, bits: int, blocksize: int) -> None:
+        try:
+            config = replace(
+                # 中继没有声卡
+                self.config or CaptureConfig(device=-1),
+                samplerate=CaptureSampleRate(samplerate),
+                channel=CaptureChannel(channels),
+                dtype=_DTYPES[bits],
+                blocksize=CaptureBlockSize(blocksize),
+            )
+        except (KeyError, ValueError):
+            self._holding = True
+            log.warning(f"上游格式 {samplerate}Hz/{channels}ch/{bits}bit/{blocksize} 无法作为采集配置 暂停转发")
+            return
+
+        previous, self.config = self.config, config
+        if not self._ready.done():
+            self._ready.set_result(config)
+        if previous is None or previous == config:
+            self._holding = False
+            return
+        # 新格式的帧要等本地分发服务切换配置后才能转发
+        self._holding = True
+        log.info(f"上游格式已变化 {samplerate}Hz/{channels}ch/{bits}bit")
+        if self.on_format is not None:
+            self.on_format(config)
+
+
+async def start_relay_service(
+    url: URL | str,
+    configuration: Optional[QuicConfiguration] = None,
+    timeout: float = 5.0,
+) -> Optional[FetchService]:
+    """以上游服务端的广播作为采集源启动分发服务 上游格式变化时本地跟着切换"""
+    loop = asyncio.get_running_loop()
+    relay = RelaySource(url, configuration=configuration)
+    config = await relay.open(timeout)
+    fetch_service = FetchService(config=config, source=relay)
+
+    def follow(config: CaptureConfig) -> None:
+        # 在中继线程中被调用 切换交给主事件循环
+        # 沿用同一个中继时分发服务只暂停它交帧 到上游的连接不断开 不必重新握手
+        asyncio.run_coroutine_threadsafe(
+            fetch_service.reconfigure(config, source=relay), loop
+        )
+
+    relay.on_format = follow
+    asyncio.create_task(fetch_service.start())
+    log.info(f"中继模式 上游 {relay.url} 采集配置 {config.samplerate.value}Hz")
+    return fetch_service
@@ -2,7 +2,7 @@ import logging
 from typing import Optional
 
 
-from service.connection.interface.dataclass import RouteInfo
+from service.connection.interface.dataclass import RouteInfo, TransportProfile
 from service.connection.handler import HandlerFactory
 
 
@@ -15,11 +15,18 @@ class WebTransportRouter:
     def __init__(self) -> None:
         self._routes: dict[str, RouteInfo] = {}
 
-    def add_route(self, path: str, handler_factory: HandlerFactory, **kwargs) -> None:
-        """注册 WebTransport 路由"""
+    def add_route(
+        self,
+        path: str,
+        handler_factory: HandlerFactory,
+        profile: Optional[TransportProfile] = None,
+        **kwargs,
+    ) -> None:
+        """注册 WebTransport 路由 `profile` 会在会话被接受时作用到所在的连接上"""
         self._routes[path] = RouteInfo(
             handler_factory=handler_factory,
             kwargs=kwargs,
+            profile=profile,
         )
         log.info(f"已注册 {path} 路由端点")
 
@@ -0,0 +1,213 @@
+"""
+会话控制流上的二进制请求应答协议
+
+每条消息由 4 字节小端序负载长度、1 字节种类、2 字节方法编号、4 字节关联编号与负载组成，
+客户端可以不等应答连续发出请求，服务端按关联编号应答，也可以随时推送通知
+"""
+
+import asyncio
+import inspect
+import logging
+import struct
+from typing import Awaitable, Callable, Optional
+
+from service.connection.handler import WebTransportStream
+from service.connection.interface.enum import RpcKind
+
+log = logging.getLogger(__name__)
+
+HEADER = struct.Struct("<IBHI")
+"""消息头 依次为负载长度、种类、方法编号与关联编号"""
+
+MAX_PAYLOAD = 64 * 1024
+"""单条消息负载的上限 超出时视为协议错误"""
+
+RpcHandler = Callable[[bytes], bytes | Awaitable[bytes]]
+"""方法的处理函数 同步返回的应答当场写出 返回可等待对象时在单独的任务中等待并写出应答"""
+
+NotifyCallback = Callable[[int, bytes], None]
+"""收到通知时的回调 参数依次为方法编号、负载"""
+
+
+def encode_message(kind: RpcKind, method: int, correlation: int, payload: bytes = b"") -> bytes:
+    return HEADER.pack(len(payload), kind, method, correlation) + payload
+
+
+class RpcReader:
+    """把流中任意切分的数据重新拼成完整的消息"""
+
+    def __init__(self, max_payload: int = MAX_PAYLOAD) -> None:
+        self.__buffer = bytearray()
+        self.__max_payload = max_payload
+
+    def feed(self, data: bytes) -> list[tuple[int, int, int, bytes]]:
+        """送入收到的数据 返回其中已经完整的 (种类, 方法编号, 关联编号, 负载)"""
+        self.__buffer += data
+        messages: list[tuple[int, int, int, bytes]] = []
+        offset = 0
+        while len(self.__buffer) - offset >= HEADER.size:
+            length, kind, method, correlation = HEADER.unpack_from(self.__buffer, offset)
+            if length > self.__max_payload:
+                raise ValueError(f"控制消息长度 {length} 超出上限")
+            end = offset + HEADER.size + length
+            if end > len(self.__buffer):
+                break
+            payload = bytes(self.__buffer[offset + HEADER.size : end])
+            messages.append((kind, method, correlation, payload))
+            offset = end
+        del self.__buffer[:offset]
+        return messages
+
+
+class RpcChannel:
+    """
+    服务端一侧的控制流
+
+    由一个读取循环解析消息并直接调用处理函数，同步的处理函数不为每条消息创建任务，
+    同一次读到的多条请求的应答合并为一次写入；
+    返回可等待对象的请求（如调谐）在单独的任务中等待并自己写出应答，
+    之后的请求照常应答，不会排在它后面，因此应答的顺序可能与请求不同
+    """
+
+    def __init__(self, stream: WebTransportStream) -> None:
+        self.__stream = stream
+        self.__reader = RpcReader()
+        self.__handlers: dict[int, RpcHandler] = {}
+        self.__pending: set[asyncio.Task[None]] = set()
+        """正在等待可等待对象的请求 控制流关闭时取消"""
+        self.requests = 0
+        """已经应答的请求数"""
+
+    @property
+    def closed(self) -> bool:
+        """不能再向客户端写出应答与通知"""
+        return self.__stream.write_closed
+
+    def register(self, method: int, handler: RpcHandler) -> None:
+        self.__handlers[method] = handler
+
+    async def notify(self, method: int, payload: bytes = b"") -> None:
+        """向客户端推送一条通知"""
+        if self.__stream.write_closed:
+            return
+        await self.__stream.write(encode_message(RpcKind.NOTIFY, method, 0, payload))
+
+    async def serve(self) -> None:
+        """读取并应答请求 直到客户端结束发送 之后仍然写出尚在等待的请求的应答"""
+        try:
+            await self.__serve()
+            # 客户端发完最后的请求就结束了发送方向 它仍在等待应答
+            while self.__pending and not self.__stream.write_closed:
+                await asyncio.wait(set(self.__pending))
+        finally:
+            # 控制流已经关闭 慢请求的应答无处可写
+            for task in self.__pending:
+                task.cancel()
+
+    async def __serve(self) -> None:
+        while data := await self.__stream.read():
+            try:
+                messages = self.__reader.feed(data)
+            except ValueError as exc:
+                log.warning(f"控制流协议错误 {exc}")
+                return
+            replies: list[bytes] = []
+            for kind, method, correlation, payload in messages:
+                if kind != RpcKind.REQUEST:
+                    continue
+                outcome, result = self.__call(method, payload)
+                if inspect.isawaitable(result):
+                    # 慢请求在自己的任务中等待并写出应答 不挡住之后的请求
+                    task = asyncio.create_task(self.__answer(method, correlation, result))
+                    self.__pending.add(task)
+                    task.add_done_callback(self.__pending.discard)
+                    continue
+                replies.append(encode_message(outcome, method, correlation, result))
+            await self.__flush(replies)
+            if self.__stream.dropped:
+                # 读取跟不上时流会丢弃数据 之后的消息边界已经错乱
+                log.warning("控制流的数据被丢弃 停止应答")
+                return
+
+    def __call(self, method: int, payload: bytes) -> tuple[RpcKind, bytes | Awaitable[bytes]]:
+        handler = self.__handlers.get(method)
+        if handler is None:
+            return RpcKind.ERROR, f"未知的方法 {method}".encode()
+        try:
+            return RpcKind.RESPONSE, handler(payload)
+        except Exception as exc:
+            return RpcKind.ERROR, str(exc).encode()
+
+    async def __answer(self, method: int, correlation: int, result: Awaitable[bytes]) -> None:
+        try:
+            reply = encode_message(RpcKind.RESPONSE, method, correlation, await result)
+        except Exception as exc:
+            reply = encode_message(RpcKind.ERROR, method, correlation, str(exc).encode())
+        await self.__flush([reply])
+
+    async def __flush(self, replies: list[bytes]) -> None:
+        if not replies or self.__stream.write_closed:
+            return
+        self.requests += len(replies)
+        await self.__stream.write(b"".join(replies))
+        replies.clear()
+
+
+class RpcClient:
+    """
+    客户端一侧的控制流
+
+    同一轮事件循环中发出的请求合并为一次写入，
+    应答按关联编号交给对应的 future，通知交给 `on_notify`
+    """
+
+    def __init__(
+        self,
+        send: Callable[[bytes], None],
+        on_notify: Optional[NotifyCallback] = None,
+    ) -> None:
+        self.__send = send
+        self.__reader = RpcReader()
+        self.__pending: dict[int, asyncio.Future[bytes]] = {}
+        self.__outgoing: list[bytes] = []
+        self.__next = 1
+        self.on_notify = on_notify
+
+    def call(self, method: int, payload: bytes = b"") -> asyncio.Future[bytes]:
+        """发出一个请求 返回其应答负载的 future 失败时为 `RuntimeError`"""
+        loop = asyncio.get_running_loop()
+        correlation = self.__next
+        self.__next = self.__next % 0xFFFFFFFF + 1
+        future = loop.create_future()
+        self.__pending[correlation] = future
+        if not self.__outgoing:
+            loop.call_soon(self.__flush)
+        self.__outgoing.append(encode_message(RpcKind.REQUEST, method, correlation, payload))
+        return future
+
+    def feed(self, data: bytes) -> None:
+        """送入控制流上收到的数据"""
+        for kind, method, correlation, payload in self.__reader.feed(data):
+            if kind == RpcKind.NOTIFY:
+                if self.on_notify is not None:
+                    self.on_notify(method, payload)
+                continue
+            future = self.__pending.pop(correlation, None)
+            if future is None or future.done():
+                continue
+            if kind == RpcKind.RESPONSE:
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload.decode(errors="replace")))
+
+    def close(self) -> None:
+        """让所有未应答的请求失败"""
+        for future in self.__pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("控制流已关闭"))
+        self.__pending.clear()
+
+    def __flush(self) -> None:
+        data = b"".join(self.__outgoing)
+        self.__outgoing.clear()
+        self.__send(data)
@@ -0,0 +1,165 @@
+"""
+会话内各个流的发送调度 控制消息不再排在大量音频之后
+
+调度依赖 aioquic 连接的 `_streams`、`_streams_queue` 与发送端的 `_buffer_start`、`_buffer_stop`，
+`pyproject.toml` 把 aioquic 限制在验证过的版本内；内部状态对不上时调度器只原样转发写入
+"""
+
+import collections
+import logging
+from typing import Callable, Optional
+
+from aioquic.quic.connection import QuicConnection
+
+from service.connection.interface.enum import StreamPriority
+
+log = logging.getLogger(__name__)
+
+_warned = False
+"""是否已经提示过 aioquic 的内部状态对不上 每个进程只提示一次"""
+
+
+def _incompatible(detail: str) -> None:
+    global _warned
+    if not _warned:
+        _warned = True
+        log.warning(f"aioquic 的内部状态与发送调度器不符 {detail} 之后的写入不再调度")
+
+
+class SendScheduler:
+    """
+    单个会话的发送调度器
+
+    高优先级与普通优先级的数据直接交给 QUIC，高优先级的流还会被移到 aioquic
+    发送轮转的最前面；低优先级的流在 QUIC 中尚未确认的字节达到预算后，
+    新写入的数据先留在调度器中，收到确认后由 `pump()` 补充。
+
+    预算至少容下这个流最大的两次写入，一帧在途时下一帧就能接着写入；
+    留下的数据超过 `limit` 时，从最旧的可丢弃写入开始整段丢弃
+    """
+
+    def __init__(
+        self,
+        quic: QuicConnection,
+        budget: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> None:
+        self.__quic = quic
+        self.__budget = budget
+        self.__limit = limit
+        self.__priorities: dict[int, StreamPriority] = {}
+        self.__droppable: dict[int, Callable[[bytes], bool]] = {}
+        """判断流的一次写入能否丢弃 没有登记的流除了结束流的写入都可以丢弃"""
+        self.__largest: dict[int, int] = {}
+        """低优先级流最大的一次写入"""
+        self.__held: dict[int, collections.deque[tuple[bytes, bool]]] = {}
+        self.__compatible: Optional[bool] = None
+        """aioquic 的内部状态是否与调度器相符 第一次用到时检查"""
+        self.held = 0
+        """留在调度器中尚未交给 QUIC 的字节数"""
+        self.dropped = 0
+        """留下的数据超出上限而丢弃的字节数"""
+
+    def add(
+        self,
+        stream_id: int,
+        priority: StreamPriority,
+        droppable: Optional[Callable[[bytes], bool]] = None,
+    ) -> None:
+        self.__priorities[stream_id] = priority
+        if droppable is not None:
+            self.__droppable[stream_id] = droppable
+
+    def send(self, stream_id: int, data: bytes, end_stream: bool = False) -> None:
+        """代替 `QuicConnection.send_stream_data` 写入一个流"""
+        priority = self.__priorities.get(stream_id, StreamPriority.NORMAL)
+        if priority == StreamPriority.LOW and self.__budget is not None and self.__internals():
+            self.__largest[stream_id] = max(self.__largest.get(stream_id, 0), len(data))
+            queue = self.__held.get(stream_id)
+            if queue or self.__unacked(stream_id) >= self.__allowance(stream_id):
+                # 保持流内的顺序 已有积压时新数据只能排在后面
+                self.__held.setdefault(stream_id, collections.deque()).append((data, end_stream))
+                self.held += len(data)
+                self.__trim(stream_id)
+                return
+        self.__quic.send_stream_data(stream_id, data, end_stream)
+        if priority == StreamPriority.HIGH and self.__internals():
+            self.__promote(stream_id)
+
+    def pump(self) -> None:
+        """按预算把留下的数据交给 QUIC 在发送数据包之前调用"""
+        if not self.__held:
+            return
+        for stream_id in list(self.__held):
+            queue = self.__held[stream_id]
+            if stream_id not in self.__quic._streams:
+                # 流已经结束或被重置 留下的数据不会再发出
+                self.held -= sum(len(data) for data, _ in queue)
+                queue.clear()
+            while queue and self.__unacked(stream_id) < self.__allowance(stream_id):
+                data, end_stream = queue.popleft()
+                self.held -= len(data)
+                self.__quic.send_stream_data(stream_id, data, end_stream)
+            if not queue:
+                del self.__held[stream_id]
+
+    def clear(self) -> None:
+        self.__priorities.clear()
+        self.__droppable.clear()
+        self.__largest.clear()
+        self.__held.clear()
+        self.held = 0
+
+    def __allowance(self, stream_id: int) -> int:
+        """流的预算 至少容下最大的两次写入"""
+        assert self.__budget is not None
+        return max(self.__budget, 2 * self.__largest.get(stream_id, 0))
+
+    def __trim(self, stream_id: int) -> None:
+        """留下的数据超出上限时 从最旧的写入开始整段丢弃 不可丢弃的写入保留原有顺序"""
+        if self.__limit is None or self.held <= self.__limit:
+            return
+        queue = self.__held[stream_id]
+        droppable = self.__droppable.get(stream_id)
+        kept: collections.deque[tuple[bytes, bool]] = collections.deque()
+        while queue and self.held > self.__limit:
+            data, end_stream = queue.popleft()
+            if end_stream or (droppable is not None and not droppable(data)):
+                kept.append((data, end_stream))
+                continue
+            self.held -= len(data)
+            self.dropped += len(data)
+        kept.extend(queue)
+        self.__held[stream_id] = kept
+
+    def __internals(self) -> bool:
+        """aioquic 的连接是否有调度器依赖的内部状态"""
+        if self.__compatible is None:
+            self.__compatible = isinstance(
+                getattr(self.__quic, "_streams", None), dict
+            ) and isinstance(getattr(self.__quic, "_streams_queue", None), list)
+            if not self.__compatible:
+                _incompatible("连接缺少 _streams 或 _streams_queue")
+        return self.__compatible
+
+    def __unacked(self, stream_id: int) -> int:
+        """流在 QUIC 中已写入但尚未被确认的字节数"""
+        stream = self.__quic._streams.get(stream_id)
+        if stream is None or not self.__compatible:
+            return 0
+        sender = stream.sender
+        try:
+            return sender._buffer_stop - sender._buffer_start
+        except AttributeError:
+            # 之后不再调度 留下的数据由 `pump()` 全部交给 QUIC
+            self.__compatible = False
+            _incompatible("发送端缺少 _buffer_start 或 _buffer_stop")
+            return 0
+
+    def __promote(self, stream_id: int) -> None:
+        """让 aioquic 组下一个数据包时先取这个流的数据"""
+        stream = self.__quic._streams.get(stream_id)
+        queue = self.__quic._streams_queue
+        if stream is not None and stream in queue and queue[0] is not stream:
+            queue.remove(stream)
+            queue.insert(0, stream)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import asyncio
+import collections
 import logging
 from typing import Any, Callable, Coroutine
 
@@ -16,8 +17,11 @@ from aioquic.quic.connection import (
     stream_is_unidirectional,
 )
 
+from service.connection import clock
 from service.connection.handler import WebTransportHandler, WebTransportStream
-from service.connection.interface.dataclass import SessionInfo
+from service.connection.interface.dataclass import ConnectionStats, SessionInfo
+from service.connection.interface.enum import StreamPriority
+from service.connection.schedule import SendScheduler
 
 log = logging.getLogger(__name__)
 
@@ -33,6 +37,9 @@ class WebTransportSession:
         session_info: SessionInfo,
         handler: WebTransportHandler,
         transmit: Callable[[], None],
+        datagram_inbox: int = 256,
+        send_budget: int | None = None,
+        send_limit: int | None = None,
     ) -> None:
         self._h3 = h3
         self._quic = quic
@@ -49,8 +56,20 @@ class WebTransportSession:
         self._closed_event = asyncio.Event()
 
         self._streams: dict[int, WebTransportStream] = {}
+        # 各个流的写入经过调度器 低优先级的流在 QUIC 中的积压受预算限制
+        # 留在调度器中的数据超过上限时丢弃最旧的写入
+        self._scheduler = SendScheduler(quic, send_budget, send_limit)
         self._tasks: set[asyncio.Task[None]] = set()
 
+        # 数据报先进入有界的收件箱 由一个常驻任务成批交给 handler
+        # 收件箱满时丢弃最旧的数据报 遥测与心跳只关心最新的状态
+        self._datagrams: collections.deque[bytes] = collections.deque(
+            maxlen=datagram_inbox
+        )
+        self._datagram_ready = asyncio.Event()
+        self._datagram_task: asyncio.Task[None] | None = None
+        self.dropped_datagrams = 0
+
     @property
     def session_id(self) -> int:
         return self._session_id
@@ -66,7 +85,12 @@ class WebTransportSession:
         finally:
             await self._finalize()
 
-    async def create_stream(self, bidirectional: bool = True) -> WebTransportStream:
+    async def create_stream(
+        self,
+        bidirectional: bool = True,
+        priority: StreamPriority = StreamPriority.NORMAL,
+        droppable: Callable[[bytes], bool] | None = None,
+    ) -> WebTransportStream:
         if self._closed:
             raise RuntimeError("Session is closed.")
         is_unidirectional = not bidirectional
@@ -79,12 +103,39 @@ class WebTransportSession:
             is_unidirectional=is_unidirectional,
             can_read=bidirectional,
             can_write=True,
-            send_stream_data=self._quic.send_stream_data,
+            send_stream_data=self._scheduler.send,
             transmit=self._transmit,
         )
+        self._scheduler.add(stream_id, priority, droppable)
         self._streams[stream_id] = stream
         return stream
 
+    def prioritize(self, stream: WebTransportStream, priority: StreamPriority) -> None:
+        """更改流的发送优先级 客户端打开的流默认为普通优先级"""
+        self._scheduler.add(stream.stream_id, priority)
+
+    def pump(self) -> None:
+        """在发送数据包之前给受预算限制的流补充数据"""
+        self._scheduler.pump()
+
+    def stats(self) -> ConnectionStats:
+        """读取所在连接的拥塞控制状态与本会话的发送积压"""
+        backlog = 0
+        for stream_id, stream in self._streams.items():
+            quic_stream = self._quic._streams.get(stream_id)
+            if stream.can_write and quic_stream is not None:
+                sender = quic_stream.sender
+                backlog += sender._buffer_stop - sender.highest_offset
+        # 调度器中留下的数据同样是尚未发出的积压
+        backlog += self._scheduler.held
+        loss = self._quic._loss
+        return ConnectionStats(
+            rtt=loss._rtt_smoothed,
+            congestion_window=loss.congestion_window,
+            bytes_in_flight=loss.bytes_in_flight,
+            send_backlog=backlog,
+        )
+
     def send_datagram(self, data: bytes) -> None:
         if self._closed:
             return
@@ -106,7 +157,7 @@ class WebTransportSession:
                 is_unidirectional=is_uni,
                 can_read=(not is_uni) or is_client,
                 can_write=(not is_uni) or (not is_client),
-                send_stream_data=self._quic.send_stream_data,
+                send_stream_data=self._scheduler.send,
                 transmit=self._transmit,
             )
             self._streams[stream_id] = stream
@@ -120,7 +171,21 @@ class WebTransportSession:
             stream.feed_data(event.data, event.stream_ended)
 
     def handle_datagram(self, event: DatagramReceived) -> None:
-        self._spawn_task(self._handler.on_datagram(event.data))
+        if self._closed:
+            return
+        # 对时请求当场应答 排队会让往返时延变大
+        reply = clock.answer(event.data)
+        if reply is not None:
+            self.send_datagram(reply)
+            return
+        inbox = self._datagrams
+        if len(inbox) == inbox.maxlen:
+            self.dropped_datagrams += 1
+        inbox.append(event.data)
+        self._datagram_ready.set()
+        if self._datagram_task is None:
+            # 不收数据报的会话不需要常驻任务
+            self._datagram_task = self._spawn_task(self._drain_datagrams())
 
     def handle_session_data(self, event: DataReceived) -> None:
         if event.stream_ended:
@@ -168,11 +233,31 @@ class WebTransportSession:
             )
         except Exception as exc:
             log.warning("WebTransport close handler error: %s", exc)
+        # 会话与 handler 互相引用 不拆开的话要等到完整的垃圾回收
+        # 才能释放所在的连接与 aioquic 中尚未确认的发送缓冲
+        self._handler.bind_context(None)
+        self._streams.clear()
+        self._scheduler.clear()
+        self._datagrams.clear()
+
+    async def _drain_datagrams(self) -> None:
+        inbox = self._datagrams
+        while True:
+            if not inbox:
+                self._datagram_ready.clear()
+                await self._datagram_ready.wait()
+            batch = list(inbox)
+            inbox.clear()
+            try:
+                await self._handler.on_datagrams(batch)
+            except Exception as exc:
+                log.warning("WebTransport datagram handler error: %s", exc)
 
-    def _spawn_task(self, coro: Coroutine[Any, Any, None]) -> None:
+    def _spawn_task(self, coro: Coroutine[Any, Any, None]) -> asyncio.Task[None]:
         task = asyncio.create_task(coro)
         self._tasks.add(task)
         task.add_done_callback(self._handle_task_done)
+        return task
 
     def _handle_task_done(self, task: asyncio.Task[None]) -> None:
         self._tasks.discard(task)
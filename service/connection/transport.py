@@ -0,0 +1,141 @@
+"""具名的 QUIC 传输参数组 可以作用于整个服务端或单个路由"""
+
+import logging
+from dataclasses import replace
+from typing import Any
+
+from aioquic.h3.connection import H3_ALPN
+from aioquic.quic.configuration import QuicConfiguration
+from aioquic.quic.congestion.base import create_congestion_control
+from aioquic.quic.connection import QuicConnection
+
+from service.connection.interface.dataclass import TransportProfile
+
+log = logging.getLogger(__name__)
+
+LIVE = TransportProfile(
+    name="live",
+    congestion_control="cubic",
+    initial_rtt=0.05,
+    idle_timeout=30.0,
+    max_data=4 * 1024 * 1024,
+    max_stream_data=1024 * 1024,
+    max_datagram_frame_size=65536,
+    send_budget=32 * 1024,
+    send_limit=1024 * 1024,
+)
+"""
+低延迟的直播 码率恒定 丢包后尽快重传 窗口能容下数秒的音频
+
+音频流在 QUIC 中的积压以 32KiB 为下限，调度器会放宽到至少两帧，
+生产中 24 位立体声 8192 帧一块的 48KiB 帧因此是 96KiB，控制消息最多排在两帧音频之后；
+跟不上码率时会话中最多留下 1MiB，更旧的音频帧被丢弃
+"""
+
+BULK = TransportProfile(
+    name="bulk",
+    congestion_control="cubic",
+    initial_rtt=0.1,
+    idle_timeout=120.0,
+    max_data=64 * 1024 * 1024,
+    max_stream_data=16 * 1024 * 1024,
+    max_datagram_frame_size=65536,
+)
+"""历史节目等大文件下载 窗口足够大"""
+
+CONTROL = TransportProfile(
+    name="control",
+    congestion_control="reno",
+    initial_rtt=0.1,
+    idle_timeout=300.0,
+    max_data=256 * 1024,
+    max_stream_data=64 * 1024,
+    max_datagram_frame_size=1500,
+)
+"""只传输控制消息的长连接 流量小 允许长时间空闲"""
+
+PROFILES: dict[str, TransportProfile] = {
+    profile.name: profile for profile in (LIVE, BULK, CONTROL)
+}
+"""按名称查找传输参数组"""
+
+
+def quic_configuration(
+    profile: TransportProfile,
+    is_client: bool,
+    **kwargs: Any,
+) -> QuicConfiguration:
+    """按传输参数组创建 HTTP/3 的 QUIC 配置 `kwargs` 会原样交给 `QuicConfiguration`"""
+    return configure(
+        QuicConfiguration(alpn_protocols=H3_ALPN, is_client=is_client, **kwargs),
+        profile,
+    )
+
+
+def configure(
+    configuration: QuicConfiguration,
+    profile: TransportProfile,
+) -> QuicConfiguration:
+    """返回用传输参数组覆盖后的 QUIC 配置副本 证书等其他配置保持不变"""
+    return replace(
+        configuration,
+        congestion_control_algorithm=profile.congestion_control,
+        initial_rtt=profile.initial_rtt,
+        idle_timeout=profile.idle_timeout,
+        max_data=profile.max_data,
+        max_stream_data=profile.max_stream_data,
+        max_datagram_frame_size=profile.max_datagram_frame_size,
+    )
+
+
+def apply_profile(
+    quic: QuicConnection,
+    profile: TransportProfile,
+    congestion: bool = True,
+) -> None:
+    """
+    把路由的传输参数组作用到已经建立的连接上
+
+    握手时通告给对方的窗口只能扩大不能缩小，所以窗口取两者中较大的一个；
+    空闲超时取两端通告值中较小的一个，因此只能缩短；数据报帧大小只能在握手时确定。
+    这些取舍与作用的先后无关，同一连接上的多个路由合在一起的结果总是相同。
+
+    拥塞控制算法属于整个连接，只在 `congestion` 时更换：
+    握手时采用服务端整体的参数组，连接上第一个被接受的会话的路由参数组可以更换一次，
+    之后的会话不再更换，由调用方保证只有第一个会话传入 `congestion`。
+    `aioquic` 没有提供建立连接之后调整参数的接口，这里直接修改连接的内部状态
+    """
+    quic._configuration = replace(
+        quic._configuration,
+        idle_timeout=min(quic._configuration.idle_timeout, profile.idle_timeout),
+    )
+
+    quic._local_max_data.value = max(quic._local_max_data.value, profile.max_data)
+    # 只影响之后打开的流
+    quic._local_max_stream_data_bidi_local = max(
+        quic._local_max_stream_data_bidi_local, profile.max_stream_data
+    )
+    quic._local_max_stream_data_bidi_remote = max(
+        quic._local_max_stream_data_bidi_remote, profile.max_stream_data
+    )
+    quic._local_max_stream_data_uni = max(
+        quic._local_max_stream_data_uni, profile.max_stream_data
+    )
+
+    loss = quic._loss
+    algorithm = quic._configuration.congestion_control_algorithm
+    if congestion and algorithm != profile.congestion_control:
+        # 换用新的拥塞控制算法 沿用在途字节数与当前窗口
+        previous = loss._cc
+        loss._cc = create_congestion_control(
+            profile.congestion_control,
+            max_datagram_size=quic._max_datagram_size,
+        )
+        loss._cc.bytes_in_flight = previous.bytes_in_flight
+        loss._cc.congestion_window = previous.congestion_window
+        loss._cc.ssthresh = previous.ssthresh
+        quic._configuration = replace(
+            quic._configuration,
+            congestion_control_algorithm=profile.congestion_control,
+        )
+    log.debug(f"连接已改用 {profile.name} 传输参数")
@@ -4,13 +4,24 @@ import asyncio
 import logging
 from typing import Optional
 
+from service.controller.bus import FakeI2CBus, I2CBus, LinuxI2CBus
 from service.controller.interface.dataclass import (
     CaptureChannel,
     CaptureConfig,
     CaptureDtype,
     CaptureSampleRate,
+    Failover,
+    SignalQuality,
+    StageMode,
+    StageStats,
+    TuneResult,
+    TunerStats,
+    WatchdogConfig,
 )
 from service.controller.fetch import FetchService
+from service.controller.pipeline import Pipeline
+from service.controller.source import CaptureSource, DeviceSource, SyntheticSource
+from service.controller.tuner import TunerChip, TunerController
 
 __all__ = [
     "FetchService",
@@ -18,13 +29,36 @@ __all__ = [
     "CaptureChannel",
     "CaptureDtype",
     "CaptureConfig",
+    "CaptureSource",
+    "DeviceSource",
+    "SyntheticSource",
+    "I2CBus",
+    "LinuxI2CBus",
+    "FakeI2CBus",
+    "TunerController",
+    "TunerChip",
+    "SignalQuality",
+    "TuneResult",
+    "TunerStats",
+    "WatchdogConfig",
+    "Failover",
+    "Pipeline",
+    "StageMode",
+    "StageStats",
 ]
 
 log = logging.getLogger(__name__)
 
 
-async def start_fetch_service(config: CaptureConfig) -> Optional[FetchService]:
-    """启动广播信号采集服务"""
-    fetch_service = FetchService(config=config)
+async def start_fetch_service(
+    config: CaptureConfig,
+    source: Optional[CaptureSource] = None,
+    standby: Optional[CaptureSource] = None,
+    watchdog: Optional[WatchdogConfig] = None,
+) -> Optional[FetchService]:
+    """启动广播信号采集服务 未指定采集源时使用声卡 `standby` 为可选的热备采集源"""
+    fetch_service = FetchService(
+        config=config, source=source, standby=standby, watchdog=watchdog
+    )
     asyncio.create_task(fetch_service.start())
     return fetch_service
@@ -0,0 +1,124 @@
+"""I2C 总线 可以是开发板上的 i2c-dev 也可以是用于测试的内存总线"""
+
+import errno
+import os
+import time
+from abc import ABC, abstractmethod
+
+
+class I2CBus(ABC):
+    """
+    I2C 总线模板
+
+    方法都是阻塞的，只会在调谐器控制服务的工作线程中调用，
+    读写均从 `register` 开始按芯片的地址自增规则连续传输
+    """
+
+    @abstractmethod
+    def read(self, address: int, register: int, length: int) -> bytes:
+        """从 `register` 开始读取 `length` 字节"""
+
+    @abstractmethod
+    def write(self, address: int, register: int, data: bytes) -> None:
+        """从 `register` 开始连续写入 `data`"""
+
+    def close(self) -> None:
+        """释放总线"""
+
+
+class LinuxI2CBus(I2CBus):
+    """通过 Linux i2c-dev 访问开发板上的 I2C 总线"""
+
+    I2C_SLAVE = 0x0703
+    """设置从机地址的 ioctl 请求号"""
+
+    def __init__(self, path: str = "/dev/i2c-1") -> None:
+        self.__fd = os.open(path, os.O_RDWR)
+        self.__address = -1
+
+    def read(self, address: int, register: int, length: int) -> bytes:
+        self.__select(address)
+        os.write(self.__fd, bytes([register]))
+        return os.read(self.__fd, length)
+
+    def write(self, address: int, register: int, data: bytes) -> None:
+        self.__select(address)
+        os.write(self.__fd, bytes([register]) + data)
+
+    def close(self) -> None:
+        os.close(self.__fd)
+
+    def __select(self, address: int) -> None:
+        if address != self.__address:
+            import fcntl
+
+            fcntl.ioctl(self.__fd, self.I2C_SLAVE, address)
+            self.__address = address
+
+
+class FakeI2CDevice:
+    """挂在内存总线上的模拟芯片 每个寄存器 `width` 字节 大端序"""
+
+    def __init__(self, registers: int, width: int = 1) -> None:
+        self.registers = [0] * registers
+        """寄存器的值"""
+
+        self.width = width
+        """每个寄存器的字节数"""
+
+    def read(self, register: int, length: int) -> bytes:
+        count = length // self.width
+        self.check(register, count)
+        return b"".join(
+            value.to_bytes(self.width, "big")
+            for value in self.registers[register : register + count]
+        )
+
+    def write(self, register: int, data: bytes) -> None:
+        count = len(data) // self.width
+        self.check(register, count)
+        for index in range(count):
+            chunk = data[index * self.width : (index + 1) * self.width]
+            self.registers[register + index] = int.from_bytes(chunk, "big")
+
+    def check(self, register: int, count: int) -> None:
+        if register < 0 or register + count > len(self.registers):
+            raise OSError(errno.EIO, f"寄存器 {register:#04x} 起的 {count} 个寄存器越界")
+
+
+class FakeI2CBus(I2CBus):
+    """
+    内存中的 I2C 总线
+
+    `latency` 模拟每次传输的固定开销，`byte_time` 模拟每字节的传输时间，
+    400kHz 快速模式下每字节约 22.5 微秒
+    """
+
+    def __init__(self, latency: float = 0.0, byte_time: float = 0.0) -> None:
+        self.__devices: dict[int, FakeI2CDevice] = dict()
+        self.__latency = latency
+        self.__byte_time = byte_time
+
+        self.transactions = 0
+        """总线传输次数"""
+
+    def attach(self, address: int, device: FakeI2CDevice) -> None:
+        self.__devices[address] = device
+
+    def read(self, address: int, register: int, length: int) -> bytes:
+        device = self.__transfer(address, length + 1)
+        return device.read(register, length)
+
+    def write(self, address: int, register: int, data: bytes) -> None:
+        device = self.__transfer(address, len(data) + 1)
+        device.write(register, data)
+
+    def __transfer(self, address: int, length: int) -> FakeI2CDevice:
+        self.transactions += 1
+        delay = self.__latency + length * self.__byte_time
+        if delay:
+            time.sleep(delay)
+        device = self.__devices.get(address)
+        if device is None:
+            raise OSError(errno.ENXIO, f"地址 {address:#04x} 上没有设备")
+        return device
@@ -0,0 +1,225 @@
+"""
+广播信号处理链 在分发前对每一帧只处理一次
+
+各环节按块处理并在块之间保存状态，一阶递推滤波按子块展开为矩阵乘法，
+整块一次计算完成，不需要逐个采样循环
+"""
+
+import math
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from service.controller import pcm
+from service.controller.interface.dataclass import CaptureConfig, DspConfig
+
+
+class OnePole:
+    """
+    一阶递推 `y[n] = a * y[n-1] + u[n]` 的块处理
+
+    把一块拆成长度为 `SUB` 的子块：子块内部的零状态响应是一个下三角矩阵乘法，
+    各子块末尾的状态又构成系数为 `a ** SUB` 的同类递推，再用一次矩阵乘法求出，
+    最后把每个子块之前的状态按 `a ** (k + 1)` 叠加回去
+    """
+
+    SUB = 32
+    """子块长度"""
+
+    def __init__(self, a: float) -> None:
+        index = np.arange(self.SUB)
+        self.__inner = self.__toeplitz(a, index)
+        """子块内部的零状态响应矩阵"""
+
+        self.__carry = a ** (index + 1.0)
+        """子块之前的状态在子块内各采样上的衰减"""
+
+        self.__a_sub = a**self.SUB
+        self.__outer: dict[int, tuple[np.ndarray, np.ndarray]] = dict()
+        """各子块数对应的子块间递推矩阵"""
+
+    def run(self, u: np.ndarray, state: np.ndarray) -> np.ndarray:
+        """处理形状为 (帧数, 声道数) 的一块 `state` 会被更新为最后一帧的输出"""
+        frames, channels = u.shape
+        if frames == 0:
+            return u
+        blocks = -(-frames // self.SUB)
+        padded = np.zeros((blocks * self.SUB, channels))
+        padded[:frames] = u
+
+        # (子块内位置, 子块 * 声道) 一次矩阵乘法求出所有子块的零状态响应
+        columns = padded.reshape(blocks, self.SUB, channels).transpose(1, 0, 2)
+        zero_state = (self.__inner @ columns.reshape(self.SUB, -1)).reshape(
+            self.SUB, blocks, channels
+        )
+
+        outer, decay = self.__outer_matrix(blocks)
+        ends = outer @ zero_state[-1] + decay[:, None] * state
+        before = np.empty_like(ends)
+        before[0] = state
+        before[1:] = ends[:-1]
+
+        output = zero_state + self.__carry[:, None, None] * before[None]
+        y = output.transpose(1, 0, 2).reshape(-1, channels)[:frames]
+        state[:] = y[-1]
+        return y
+
+    def __outer_matrix(self, blocks: int) -> tuple[np.ndarray, np.ndarray]:
+        if blocks not in self.__outer:
+            index = np.arange(blocks)
+            self.__outer[blocks] = (
+                self.__toeplitz(self.__a_sub, index),
+                self.__a_sub ** (index + 1.0),
+            )
+        return self.__outer[blocks]
+
+    @staticmethod
+    def __toeplitz(a: float, index: np.ndarray) -> np.ndarray:
+        lag = index[:, None] - index[None, :]
+        return np.where(lag >= 0, a ** np.maximum(lag, 0).astype(np.float64), 0.0)
+
+
+class DspStage(ABC):
+    """处理链中的一个环节 输入输出均为形状 (帧数, 声道数) 的 float64 数组"""
+
+    @abstractmethod
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """处理一块 并保存下一块需要的状态"""
+
+
+class HighPass(DspStage):
+    """一阶高通 去除直流偏置并削弱低频交流声"""
+
+    def __init__(self, cutoff: float, samplerate: int, channels: int) -> None:
+        rc = 1 / (2 * math.pi * cutoff)
+        self.__alpha = rc / (rc + 1 / samplerate)
+        self.__filter = OnePole(self.__alpha)
+        self.__last_input = np.zeros(channels)
+        self.__state = np.zeros(channels)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        # y[n] = α * y[n-1] + α * (x[n] - x[n-1])
+        difference = np.empty_like(samples)
+        difference[0] = samples[0] - self.__last_input
+        np.subtract(samples[1:], samples[:-1], out=difference[1:])
+        difference *= self.__alpha
+        self.__last_input = samples[-1].copy()
+        return self.__filter.run(difference, self.__state)
+
+
+class Deemphasis(DspStage):
+    """FM 去加重 时间常数为 `tau` 微秒的一阶低通"""
+
+    def __init__(self, tau: float, samplerate: int, channels: int) -> None:
+        self.__a = math.exp(-1 / (samplerate * tau * 1e-6))
+        self.__filter = OnePole(self.__a)
+        self.__state = np.zeros(channels)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        return self.__filter.run(samples * (1 - self.__a), self.__state)
+
+
+class Agc(DspStage):
+    """
+    把响度拉向目标值的自动增益
+
+    响度按 BS.1770 的声道能量求和估计，但未做 K 加权，只是近似的 LUFS；
+    低于 -70 LUFS 的静音块不参与估计，增益在块内线性过渡避免跳变
+    """
+
+    GATE = -70.0
+    """绝对门限 LUFS"""
+
+    def __init__(
+        self,
+        target: float,
+        max_gain_db: float,
+        window: float,
+        blocksize: int,
+        samplerate: int,
+    ) -> None:
+        self.__target = target
+        self.__max_gain_db = max_gain_db
+        self.__keep = math.exp(-blocksize / samplerate / window)
+        self.__energy: float | None = None
+        """平滑后的每块能量"""
+
+        self.gain = 1.0
+        """当前的线性增益"""
+
+    @property
+    def loudness(self) -> float:
+        """平滑后的输入响度 LUFS"""
+        if not self.__energy:
+            return -math.inf
+        return -0.691 + 10 * math.log10(self.__energy)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        energy = float(np.mean(samples * samples, axis=0).sum())
+        if energy > 0 and -0.691 + 10 * math.log10(energy) > self.GATE:
+            if self.__energy is None:
+                self.__energy = energy
+            else:
+                self.__energy = self.__keep * self.__energy + (1 - self.__keep) * energy
+
+        target = self.gain
+        if self.__energy is not None:
+            gain_db = self.__target - self.loudness
+            gain_db = max(-self.__max_gain_db, min(self.__max_gain_db, gain_db))
+            target = 10 ** (gain_db / 20)
+
+        frames = samples.shape[0]
+        ramp = self.gain + (target - self.gain) * np.arange(1, frames + 1) / frames
+        self.gain = target
+        return samples * ramp[:, None]
+
+
+class SoftLimiter(DspStage):
+    """超过 `threshold` 的部分用 tanh 压缩 输出始终不超过满幅"""
+
+    def __init__(self, threshold: float) -> None:
+        self.__threshold = threshold
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        threshold = self.__threshold
+        knee = 1 - threshold
+        magnitude = np.abs(samples)
+        over = magnitude > threshold
+        if not over.any():
+            return samples
+        compressed = threshold + knee * np.tanh((magnitude - threshold) / knee)
+        return np.where(over, np.copysign(compressed, samples), samples)
+
+
+class DspChain:
+    """按 `DspConfig` 组装的处理链 输入输出都是采集格式的 PCM 数据"""
+
+    def __init__(self, config: CaptureConfig, dsp: DspConfig) -> None:
+        self.__config = config
+        samplerate = config.samplerate.value
+        channels = config.channel.value
+
+        self.stages: list[DspStage] = []
+        if dsp.highpass is not None:
+            self.stages.append(HighPass(dsp.highpass, samplerate, channels))
+        if dsp.deemphasis is not None:
+            self.stages.append(Deemphasis(dsp.deemphasis, samplerate, channels))
+        if dsp.target_lufs is not None:
+            self.stages.append(
+                Agc(
+                    dsp.target_lufs,
+                    dsp.max_gain_db,
+                    dsp.agc_window,
+                    config.blocksize.value,
+                    samplerate,
+                )
+            )
+        if dsp.limiter is not None:
+            self.stages.append(SoftLimiter(dsp.limiter))
+
+    def process(self, frame: bytes) -> bytes:
+        config = self.__config
+        samples = pcm.decode(frame, config.dtype, config.channel.value).astype(np.float64)
+        for stage in self.stages:
+            samples = stage.process(samples)
+        return pcm.encode(samples, config.dtype)
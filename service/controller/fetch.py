@@ -1,12 +1,39 @@
 import asyncio
 import logging
+import threading
+import time
+
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional, Self
+
+from service.controller.interface.dataclass import (
+    CaptureConfig,
+    Failover,
+    SilenceConfig,
+    SilenceStats,
+    SilentBlock,
+    WatchdogConfig,
+)
+from service.controller.pipeline import Pipeline
+from service.controller.source import (
+    CaptureSource,
+    DeviceSource,
+    FrameCallback,
+    sample_width,
+    server_time,
+)
+
+if TYPE_CHECKING:
+    from service.controller.dsp import DspChain
+    from service.controller.rendition import RenditionSet
+    from service.controller.silence import SilenceDetector
 
-from sounddevice import RawInputStream
-from typing import Awaitable, Callable, Optional, Self
+log = logging.getLogger(__name__)
 
-from service.controller.interface.dataclass import CaptureConfig
+FormatListener = Callable[[CaptureConfig], Awaitable[None]]
+"""采集配置变化时通知订阅者 在该配置的第一帧之前调用"""
 
-log = logging.getLogger(__name__)
+SilenceListener = Callable[[int], Awaitable[None]]
+"""一帧静音被省略时通知订阅者 参数为省略的采样帧数"""
 
 
 class FetchService:
@@ -19,7 +46,13 @@ class FetchService:
             cls.__instance = super().__new__(cls)
         return cls.__instance
 
-    def __init__(self, config: Optional[CaptureConfig] = None) -> None:
+    def __init__(
+        self,
+        config: Optional[CaptureConfig] = None,
+        source: Optional[CaptureSource] = None,
+        standby: Optional[CaptureSource] = None,
+        watchdog: Optional[WatchdogConfig] = None,
+    ) -> None:
         # 防止单例重复初始化
         if hasattr(self, "_FetchService__config"):
             return
@@ -29,12 +62,32 @@ class FetchService:
         self.__config: CaptureConfig = config
         """广播信号采集配置"""
 
+        self.__source: CaptureSource = source or DeviceSource(config)
+        """广播信号采集源"""
+
+        self.__standby: Optional[CaptureSource] = standby
+        """与采集源同时运行的热备 产出的帧在切换之前都被丢弃"""
+
+        self.__watchdog: WatchdogConfig = watchdog or WatchdogConfig()
+        """采集看门狗配置"""
+
         self.__clients: dict[int, Callable[[bytes], Awaitable[None]]] = dict()
         """订阅服务的客户端们"""
 
+        self.__formats: dict[int, FormatListener] = dict()
+        """需要得知采集配置变化的客户端们"""
+
+        self.__silences: dict[int, SilenceListener] = dict()
+        """能够自己补齐静音的客户端们 其余客户端收到全零的帧"""
+
         maxsize: int = self.__config.maxsize
-        self.__queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=maxsize)
-        """广播信号采集客户端队列"""
+        self.__queue: asyncio.Queue[tuple[int, bytes | SilentBlock] | CaptureConfig] = (
+            asyncio.Queue(maxsize=maxsize)
+        )
+        """广播信号采集客户端队列 帧带着采集时刻 采集配置变化时会插入新的配置 静音帧替换为标记"""
+
+        self.__timestamp: int = 0
+        """正在分发的帧中第一个采样的采集时刻"""
 
         self.__running: Optional[bool] = None
         """服务是否启动"""
@@ -42,7 +95,7 @@ class FetchService:
         self.__event: Optional[asyncio.Event] = None
         """服务协程同步"""
 
-        self.__input: Optional[RawInputStream] = None
+        self.__input: Optional[CaptureSource] = None
         """输入源"""
 
         self.__task: Optional[asyncio.Task] = None
@@ -51,30 +104,141 @@ class FetchService:
         self.__loop: Optional[asyncio.AbstractEventLoop] = None
         """针对 `__callback` 的线程安全"""
 
+        self.__dsp: Optional["DspChain"] = None
+        """分发前的信号处理链 在采集线程中执行"""
+
+        self.__last_frame: float = 0.0
+        """最近一帧到达的时刻"""
+
+        self.__first_frame: Optional[asyncio.Future[float]] = None
+        """切换采集源后等待第一帧到达"""
+
+        self.__renditions: Optional["RenditionSet"] = None
+        """当前采集配置下的各个档位 所有会话共享"""
+
+        self.__silence_config: Optional[SilenceConfig] = None
+        """静音抑制配置 为空时静音也原样分发"""
+
+        self.__silence: Optional["SilenceDetector"] = None
+        """静音检测 在采集线程中执行"""
+
+        self.__silent_block: Optional[SilentBlock] = None
+        """代替一帧静音的标记 每种配置只创建一次"""
+
+        self.__zero_frame: bytes = b""
+        """交给不能自己补齐静音的客户端的全零帧 长度随静音标记变化"""
+
+        self.__silence_stats: SilenceStats = SilenceStats()
+        """静音抑制的累计效果"""
+
+        self.__silent_since: Optional[float] = None
+        """本段静音开始省略的时刻"""
+
+        self.__standby_frame: float = 0.0
+        """热备最近一帧到达的时刻"""
+
+        self.__switch_lock = asyncio.Lock()
+        """切换采集配置与接替故障采集源不能同时进行"""
+
+        self.__watch_task: Optional[asyncio.Task] = None
+        """看门狗任务"""
+
+        self.__recover_task: Optional[asyncio.Task] = None
+        """把故障的采集源恢复为热备的任务"""
+
+        self.__failovers: list[Failover] = []
+        """采集源故障的处理记录"""
+
+        self.__capture_thread: Optional[int] = None
+        """当前采集源产出帧的线程在操作系统中的编号"""
+
+        self.__captured: int = 0
+        """采集线程正在处理的帧的采集时刻 只在采集线程中读写"""
+
+        self.__pipeline = Pipeline()
+        """采集之后的处理流水线 处理链与静音检测之后交给事件循环分发"""
+        self.__pipeline.add("dsp", self.__apply_dsp)
+        self.__pipeline.add("silence", self.__detect_silence, after="dsp")
+        self.__pipeline.add(
+            "distribute", self.__enqueue, after="silence", depth=self.__queue.qsize
+        )
+
+    @property
+    def config(self) -> CaptureConfig:
+        return self.__config
+
+    @property
+    def source(self) -> CaptureSource:
+        """当前使用的采集源"""
+        return self.__source
+
+    @property
+    def timestamp(self) -> int:
+        """正在分发的帧中第一个采样的服务端采集时刻 单位微秒 只在订阅回调中有意义"""
+        return self.__timestamp
+
+    @property
+    def pipeline(self) -> Pipeline:
+        """
+        采集之后的处理流水线 内置的环节依次为 `dsp`、`silence` 与 `distribute`
+
+        分析、编码等需要处理后音频的环节接在 `dsp` 之后，`silence` 的输出中静音帧已被替换为标记
+        """
+        return self.__pipeline
+
+    @property
+    def capture_thread(self) -> Optional[int]:
+        """当前采集源产出帧的线程在操作系统中的编号 声卡的回调线程由 PortAudio 创建 收到第一帧后才知道"""
+        return self.__capture_thread
+
+    @property
+    def failovers(self) -> list[Failover]:
+        return self.__failovers
+
+    @property
+    def silence_stats(self) -> SilenceStats:
+        return self.__silence_stats
+
+    def suppress_silence(self, config: Optional[SilenceConfig]) -> None:
+        """开启或关闭静音抑制 切换采集配置后依然有效"""
+        self.__silence_config = config
+        self.__build_silence(self.__config)
+        log.info("已开启静音抑制" if config else "已关闭静音抑制")
+
+    @property
+    def renditions(self) -> "RenditionSet":
+        """当前采集配置下的各个档位 采集配置变化后重新创建"""
+        if self.__renditions is None or self.__renditions.config is not self.__config:
+            # 档位转换依赖 numpy 只在用到时导入
+            from service.controller.rendition import RenditionSet
+
+            self.__renditions = RenditionSet(self.__config)
+        return self.__renditions
+
     async def start(self) -> None:
         """初始化广播信号采集分发服务"""
         if self.__running:
             return
         self.__running = False
 
-        # sounddevice 非线程安全，需要获取进程锁
+        # 采集源在自己的线程中回调，需要借助事件循环保证线程安全
         self.__loop = asyncio.get_running_loop()
-        self.__input = RawInputStream(
-            blocksize=self.__config.blocksize.value,
-            channels=self.__config.channel.value,
-            device=self.__config.device,
-            dtype=self.__config.dtype.value,
-            samplerate=self.__config.samplerate.value,
-            callback=self.__callback,
-        )
+        self.__input = self.__source
         self.__event = asyncio.Event()
 
-        self.__input.start()
+        self.__dsp = self.__build_dsp(self.__config)
+        self.__build_silence(self.__config)
+        self.__last_frame = time.perf_counter()
+        self.__input.start(self.__bind(self.__input))
+        if self.__standby is not None:
+            self.__standby.start(self.__bind(self.__standby))
         log.info("广播信号采集服务已成功启动")
 
         self.__task = asyncio.create_task(self.__distribute())
         log.info("广播信号分发服务已成功启动")
 
+        self.__watch_task = asyncio.create_task(self.__watch())
+
         self.__running = True
 
         # 建立持续工作机制直至采集服务被结束
@@ -82,20 +246,66 @@ class FetchService:
             await self.__event.wait()
             log.info("广播信号采集服务已被终止")
 
+    async def reconfigure(
+        self,
+        config: CaptureConfig,
+        source: Optional[CaptureSource] = None,
+        timeout: float = 2.0,
+        standby: Optional[CaptureSource] = None,
+    ) -> float:
+        """
+        在不断开订阅者的情况下切换采集配置 返回切换造成的断档秒数
+
+        旧采集源的帧全部分发后，订阅者先收到新的配置再收到新采集源的帧；
+        新采集源在 `timeout` 秒内没有产出时恢复原来的配置并抛出 `TimeoutError`；
+        原来的热备不再适用于新配置，切换成功后改用 `standby`
+        """
+        source = source or DeviceSource(config)
+        if not self.__running or self.__loop is None:
+            self.__config, self.__source, self.__standby = config, source, standby
+            return 0.0
+
+        async with self.__switch_lock:
+            previous = (self.__config, self.__source)
+            previous_standby = await self.__drop_standby()
+            try:
+                gap = await self.__switch(config, source, timeout)
+            except Exception as exc:
+                log.warning(f"采集配置切换失败 恢复原来的配置 {exc}")
+                await self.__switch(*previous, timeout=timeout)
+                standby = previous_standby
+                raise
+            finally:
+                if standby is not None:
+                    self.__standby = standby
+                    standby.start(self.__bind(standby))
+            return gap
+
     def stop(self) -> None:
         """彻底结束广播信号采集分发服务"""
         self.__clients.clear()
+        self.__formats.clear()
+        self.__silences.clear()
         log.info("广播信号分发列表已被清空")
 
+        for task in (self.__watch_task, self.__recover_task):
+            if task:
+                task.cancel()
+        self.__watch_task = self.__recover_task = None
+
+        if self.__standby:
+            self.__standby.stop()
+
         if self.__input:
             self.__input.stop()
-            self.__input.close()
             self.__input = None
 
         if self.__task:
             self.__task.cancel()
             self.__task = None
 
+        self.__pipeline.close()
+
         if self.__event:
             self.__event.set()
             self.__event = None
@@ -103,35 +313,290 @@ class FetchService:
         if self.__running:
             self.__running = None
 
-    def __callback(self, indata: bytes, *_) -> None:
-        """客户端分发的对象"""
+    def __bind(self, source: CaptureSource) -> FrameCallback:
+        """只有当前的采集源产出的帧会被分发 热备与已被替换的采集源只记录时刻"""
+
+        def callback(indata: bytes) -> None:
+            if source is self.__input:
+                self.__callback(indata)
+            elif source is self.__standby:
+                self.__standby_frame = time.perf_counter()
+
+        return callback
+
+    def __callback(self, indata: bytes) -> None:
+        """采集线程中每一帧的入口"""
+        self.__last_frame = time.perf_counter()
+        self.__capture_thread = threading.get_native_id()
+        # 回调在一块采集完之后才发生 第一个采样要往前推一块的时长
+        config = self.__config
+        self.__captured = server_time() - config.blocksize.value * 1_000_000 // config.samplerate.value
+        self.__pipeline.process(indata)
+        if self.__loop:
+            first, self.__first_frame = self.__first_frame, None
+            if first is not None:
+                self.__loop.call_soon_threadsafe(self.__resolve, first, self.__last_frame)
+
+    def __apply_dsp(self, frame: bytes) -> bytes:
+        # 处理链对所有订阅者只执行一次
+        return self.__dsp.process(frame) if self.__dsp else frame
+
+    def __detect_silence(self, frame: bytes) -> bytes | SilentBlock:
+        silent_block = self.__silent_block
+        if self.__silence and silent_block and self.__silence.update(frame):
+            return silent_block
+        return frame
+
+    def __enqueue(self, frame: bytes | SilentBlock) -> None:
         if self.__loop:
-            self.__loop.call_soon_threadsafe(self.__queue.put_nowait, indata)
+            self.__loop.call_soon_threadsafe(self.__queue.put_nowait, (self.__captured, frame))
+
+    async def __switch(
+        self,
+        config: CaptureConfig,
+        source: CaptureSource,
+        timeout: float,
+    ) -> float:
+        assert self.__loop is not None
+        if self.__input:
+            # 停止后旧采集源已经排进事件循环的帧仍会先于新配置入队
+            # 沿用同一个采集源时只暂停交帧 不必重新打开
+            halt = self.__input.pause if self.__input is source else self.__input.stop
+            await asyncio.to_thread(halt)
+        last_frame = self.__last_frame
+
+        self.__config, self.__source = config, source
+        self.__dsp = self.__build_dsp(config)
+        self.__build_silence(config)
+        self.__loop.call_soon(self.__queue.put_nowait, config)
+
+        first = self.__loop.create_future()
+        self.__first_frame = first
+        self.__input = source
+        try:
+            source.start(self.__bind(source))
+            first_frame = await asyncio.wait_for(first, timeout)
+        except BaseException:
+            self.__first_frame = None
+            source.stop()
+            self.__input = None
+            raise
+
+        gap = first_frame - last_frame
+        log.info(f"采集配置已切换 断档 {gap * 1000:.0f}ms")
+        return gap
+
+    async def __watch(self) -> None:
+        """看门狗 采集源在限定时间内没有产出就切换到热备或重启"""
+        config = self.__watchdog
+        failures = 0
+        while True:
+            # 采集配置可能已经切换 每次都按当前的块时长计算
+            interval = self.__config.blocksize.value / self.__config.samplerate.value
+            stall = max(config.stall_timeout, interval * 3)
+            if failures:
+                await asyncio.sleep(min(config.backoff * 2 ** (failures - 1), config.max_backoff))
+            else:
+                await asyncio.sleep(stall / 4)
+            if self.__switch_lock.locked() or self.__input is None:
+                continue
+            stalled = time.perf_counter() - self.__last_frame
+            if stalled < stall:
+                failures = 0
+                continue
+            reason = f"采集源 {stalled * 1000:.0f}ms 没有产出"
+            try:
+                async with self.__switch_lock:
+                    await self.__failover(reason, stall)
+                failures = 0
+            except Exception as exc:
+                failures += 1
+                log.warning(f"采集源故障 {reason} 重启失败 第 {failures} 次 {exc}")
+
+    async def __failover(self, reason: str, stall: float) -> None:
+        """接替故障的采集源 热备仍在产出时直接切换 否则重启故障的采集源"""
+        assert self.__loop is not None
+        failed, standby = self.__input, self.__standby
+        assert failed is not None
+        last_frame = self.__last_frame
+        alive = (
+            standby is not None
+            and time.perf_counter() - self.__standby_frame < stall
+        )
+
+        first = self.__loop.create_future()
+        self.__first_frame = first
+        try:
+            if alive:
+                # 热备已经在产出 切换只需等待它的下一帧
+                assert standby is not None
+                self.__standby = None
+                self.__input = self.__source = standby
+            else:
+                # 卡住的设备可能停不下来 只等待有限的时间
+                try:
+                    await asyncio.wait_for(asyncio.to_thread(failed.stop), stall)
+                except TimeoutError:
+                    log.warning("故障的采集源没有及时停止")
+                failed.start(self.__bind(failed))
+            first_frame = await asyncio.wait_for(first, stall * 2)
+        finally:
+            self.__first_frame = None
+
+        gap = first_frame - last_frame
+        self.__failovers.append(Failover(reason=reason, standby=alive, gap=gap))
+        if alive:
+            log.warning(f"采集源故障 {reason} 已切换到热备 断档 {gap * 1000:.0f}ms")
+            self.__recover_task = asyncio.create_task(self.__recover(failed, stall))
+        else:
+            log.warning(f"采集源故障 {reason} 已重启采集源 断档 {gap * 1000:.0f}ms")
+
+    async def __recover(self, source: CaptureSource, stall: float) -> None:
+        """在后台重启故障的采集源 恢复产出后作为新的热备"""
+        config = self.__watchdog
+        delay = config.backoff
+        while self.__standby is None:
+            try:
+                await asyncio.wait_for(asyncio.to_thread(source.stop), stall)
+                started = time.perf_counter()
+                self.__standby = source
+                source.start(self.__bind(source))
+                await asyncio.sleep(stall)
+                if self.__standby_frame > started:
+                    log.info("故障的采集源已恢复 作为新的热备")
+                    return
+                raise TimeoutError("没有产出")
+            except Exception as exc:
+                self.__standby = None
+                log.warning(f"故障的采集源未能恢复 {delay:.0f}s 后重试 {exc}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, config.max_backoff)
+
+    async def __drop_standby(self) -> Optional[CaptureSource]:
+        """停止热备 返回被停止的热备"""
+        if self.__recover_task:
+            self.__recover_task.cancel()
+            self.__recover_task = None
+        standby, self.__standby = self.__standby, None
+        if standby is not None:
+            await asyncio.to_thread(standby.stop)
+        return standby
+
+    @staticmethod
+    def __resolve(first: asyncio.Future[float], arrived: float) -> None:
+        # 等待超时后 future 已被取消
+        if not first.done():
+            first.set_result(arrived)
+
+    @staticmethod
+    def __build_dsp(config: CaptureConfig) -> Optional["DspChain"]:
+        # 处理链依赖 numpy 只在启用时导入
+        if config.dsp is None:
+            return None
+        from service.controller.dsp import DspChain
+
+        return DspChain(config, config.dsp)
+
+    def __build_silence(self, config: CaptureConfig) -> None:
+        """按新的采集配置准备静音检测 静音检测依赖 numpy 只在启用时导入"""
+        self.__silent_block = SilentBlock(
+            frames=config.blocksize.value,
+            size=config.blocksize.value * config.channel.value * sample_width(config.dtype),
+        )
+        if self.__silence_config is None:
+            self.__silence = None
+            return
+        from service.controller.silence import SilenceDetector
+
+        self.__silence = SilenceDetector(config, self.__silence_config)
 
     async def __distribute(self) -> None:
         """采集广播信号后分发给客户端"""
         try:
             while self.__running:
-                audio_frame = await self.__queue.get()
-                if self.__clients:
-                    await asyncio.gather(
-                        *[
-                            broadcast_client(audio_frame)
-                            for broadcast_client in self.__clients.values()
-                        ],
-                        return_exceptions=True,
-                    )
+                match await self.__queue.get():
+                    case CaptureConfig() as config:
+                        await self.__announce(config)
+                    case (timestamp, SilentBlock() as block):
+                        self.__timestamp = timestamp
+                        await self.__suppress(block)
+                    case (timestamp, audio_frame):
+                        self.__timestamp = timestamp
+                        self.__resume()
+                        if self.__clients:
+                            await asyncio.gather(
+                                *[
+                                    broadcast_client(audio_frame)
+                                    for broadcast_client in self.__clients.values()
+                                ],
+                                return_exceptions=True,
+                            )
                 self.__queue.task_done()
         except asyncio.CancelledError:
             log.info("广播信号分发服务已被终止")
 
-    def subscribe(self, id: int, client: Callable[[bytes], Awaitable[None]]) -> None:
-        """让客户端订阅广播信号采集分发服务"""
+    async def __suppress(self, block: SilentBlock) -> None:
+        """分发一帧静音 能自己补齐静音的客户端只收到采样帧数"""
+        stats = self.__silence_stats
+        stats.frames += 1
+        stats.silent_frames += 1
+        stats.saved_bytes += block.size * len(self.__silences)
+        if self.__silent_since is None:
+            self.__silent_since = time.perf_counter()
+            log.info("广播信号进入静音 暂停发送音频数据")
+        if not self.__clients:
+            return
+        if len(self.__zero_frame) != block.size:
+            self.__zero_frame = bytes(block.size)
+        await asyncio.gather(
+            *[
+                self.__silences[id](block.frames)
+                if id in self.__silences
+                else broadcast_client(self.__zero_frame)
+                for id, broadcast_client in self.__clients.items()
+            ],
+            return_exceptions=True,
+        )
+
+    def __resume(self) -> None:
+        """统计一帧正常分发的音频 结束当前的静音段"""
+        self.__silence_stats.frames += 1
+        if self.__silent_since is not None:
+            elapsed = time.perf_counter() - self.__silent_since
+            self.__silent_since = None
+            saved = self.__silence_stats.saved_bytes / 1024 / 1024
+            log.info(f"静音结束 持续 {elapsed:.1f}s 累计少发送 {saved:.1f}MiB")
+
+    async def __announce(self, config: CaptureConfig) -> None:
+        """通知订阅者采集配置已经变化"""
+        await asyncio.gather(
+            *[listener(config) for listener in list(self.__formats.values())],
+            return_exceptions=True,
+        )
+
+    def subscribe(
+        self,
+        id: int,
+        client: Callable[[bytes], Awaitable[None]],
+        on_format: Optional[FormatListener] = None,
+        on_silence: Optional[SilenceListener] = None,
+    ) -> None:
+        """
+        让客户端订阅广播信号采集分发服务 `on_format` 会在采集配置变化时被调用
+
+        给出 `on_silence` 的客户端在静音时只收到省略的采样帧数，其余客户端收到全零的帧
+        """
         self.__clients[id] = client
+        if on_format is not None:
+            self.__formats[id] = on_format
+        if on_silence is not None:
+            self.__silences[id] = on_silence
         log.info(f"有新的客户端加入分发服务 目前共 {self.__clients.__len__()} 个")
 
     def unsubscribe(self, id: int) -> None:
         """让客户端取消订阅广播信号采集分发服务"""
+        self.__formats.pop(id, None)
+        self.__silences.pop(id, None)
         try:
             self.__clients.pop(id)
             log.info(f"有客户端退出分发服务 目前剩 {self.__clients.__len__()} 个")
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from enum import Enum
+from typing import Optional
 
 
 class CaptureSampleRate(Enum):
@@ -69,6 +70,127 @@ class CaptureBlockSize(Enum):
     """最小8192字节"""
 
 
+class Rendition(Enum):
+    """分发给客户端的广播信号档位 由高到低排列"""
+
+    FULL = 0
+    """与采集格式相同"""
+
+    PCM16 = 1
+    """降为 16 位深"""
+
+    MONO = 2
+    """降为 16 位深单声道"""
+
+    LOW = 3
+    """降为 16 位深单声道 并把采样率降到不低于 16000Hz"""
+
+
+class StageMode(Enum):
+    """流水线环节的执行位置"""
+
+    INLINE = "inline"
+    """在上游环节所在的线程中执行 从采集直接连过来时就是采集线程"""
+
+    THREAD = "thread"
+    """在线程池中执行 适合释放 GIL 的 numpy 运算或阻塞的读写"""
+
+    PROCESS = "process"
+    """在进程池中执行 处理函数与数据都要能序列化 不能在帧之间保存状态"""
+
+
+@dataclass(frozen=True)
+class DspConfig:
+    """广播信号处理链配置 设为 `None` 的环节不启用"""
+
+    highpass: Optional[float] = 40.0
+    """高通截止频率 用于去除直流偏置并削弱交流声 单位 Hz"""
+
+    deemphasis: Optional[float] = None
+    """FM 去加重时间常数 国内为 50 单位微秒 调谐器已经去加重时不要启用"""
+
+    target_lufs: Optional[float] = -16.0
+    """自动增益的目标响度"""
+
+    max_gain_db: float = 20.0
+    """自动增益最多放大或衰减的分贝数"""
+
+    agc_window: float = 3.0
+    """自动增益估计响度的时间常数 单位秒"""
+
+    limiter: Optional[float] = 0.9
+    """软限幅开始起作用的电平 满幅为 1"""
+
+
+@dataclass(frozen=True)
+class SilenceConfig:
+    """静音抑制配置 静音时只告诉客户端需要补多少个静音采样帧"""
+
+    threshold_db: float = -60.0
+    """一帧的均方根电平低于该值时视为静音 单位 dBFS"""
+
+    hangover: float = 0.5
+    """电平降到阈值以下后继续原样发送的秒数 避免切掉淡出与短暂停顿"""
+
+
+@dataclass(frozen=True)
+class WatchdogConfig:
+    """采集看门狗配置 采集源停止产出时切换到热备或重启采集源"""
+
+    stall_timeout: float = 0.5
+    """超过该秒数没有新的帧即视为采集源故障 不会短于三个块的时长"""
+
+    backoff: float = 1.0
+    """重启失败后再次尝试前等待的秒数 每次失败翻倍"""
+
+    max_backoff: float = 30.0
+    """重启等待的上限秒数"""
+
+
+@dataclass(frozen=True)
+class Failover:
+    """一次采集源故障的处理结果"""
+
+    reason: str
+    """判定为故障的原因"""
+
+    standby: bool
+    """是否切换到了热备 否则为重启原来的采集源"""
+
+    gap: float
+    """故障采集源的最后一帧到接替者第一帧之间的秒数"""
+
+
+@dataclass(frozen=True)
+class SilentBlock:
+    """分发队列中代替一帧静音的标记"""
+
+    frames: int
+    """被省略的采样帧数"""
+
+    size: int
+    """被省略的帧的字节数"""
+
+
+@dataclass
+class SilenceStats:
+    """静音抑制的累计效果"""
+
+    frames: int = 0
+    """经过检测的帧数"""
+
+    silent_frames: int = 0
+    """被替换为静音标记的帧数"""
+
+    saved_bytes: int = 0
+    """所有订阅者少发送的音频字节数"""
+
+    @property
+    def ratio(self) -> float:
+        """被替换的帧所占的比例"""
+        return self.silent_frames / self.frames if self.frames else 0.0
+
+
 @dataclass
 class CaptureConfig:
     """广播信号采集配置"""
@@ -90,3 +212,171 @@ class CaptureConfig:
 
     samplerate: CaptureSampleRate = CaptureSampleRate.R44100
     """采样率"""
+
+    dsp: Optional[DspConfig] = None
+    """分发前对广播信号的处理 为空时原样分发"""
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    """客户端收到的 PCM 数据格式 与格式帧的字段一一对应"""
+
+    samplerate: int
+    """采样率"""
+
+    channels: int
+    """声道数"""
+
+    bits: int
+    """位深"""
+
+    blocksize: int
+    """每块的采样帧数"""
+
+    @property
+    def bitrate(self) -> float:
+        """每秒的字节数"""
+        return self.samplerate * self.channels * self.bits / 8
+
+
+@dataclass(frozen=True)
+class SignalQuality:
+    """调谐器报告的当前频点信号质量"""
+
+    rssi: int
+    """接收信号强度"""
+
+    stereo: bool
+    """是否为立体声"""
+
+    station: Optional[bool]
+    """调谐器是否认为该频点有电台 例如 RDA5807M 的 FM_TRUE 芯片没有这一标志时为 `None`"""
+
+
+@dataclass(frozen=True)
+class TuneResult:
+    """一次调谐的结果"""
+
+    frequency: int
+    """调谐到的频率 单位 kHz"""
+
+    latency: float
+    """从写入频率到调谐器报告完成的秒数"""
+
+
+@dataclass
+class TunerStats:
+    """调谐器寄存器访问统计"""
+
+    bus_reads: int = 0
+    """经过总线的读取次数"""
+
+    cached_reads: int = 0
+    """由寄存器影子副本直接返回的读取次数"""
+
+    bus_writes: int = 0
+    """经过总线的写入次数 每次可以连续写入多个寄存器"""
+
+    registers_written: int = 0
+    """实际写入的寄存器数"""
+
+    skipped_writes: int = 0
+    """因与影子副本相同或被后续写入覆盖而省去的寄存器写入数"""
+
+
+@dataclass(frozen=True)
+class StationEntry:
+    """电台索引中的一个频点"""
+
+    frequency: int
+    """频率 单位 kHz"""
+
+    rssi: int
+    """扫描时测得的信号强度"""
+
+    stereo: bool
+    """扫描时是否为立体声"""
+
+    station: bool
+    """是否判定为有电台"""
+
+    scanned_at: float
+    """扫描时的 Unix 时间戳"""
+
+
+@dataclass(frozen=True)
+class ScanConfig:
+    """频段扫描的判定参数 时间单位均为秒"""
+
+    settle: float = 0.005
+    """调谐完成后等待信号稳定的时间"""
+
+    sample_interval: float = 0.005
+    """两次测量信号质量的间隔"""
+
+    max_dwell: float = 0.06
+    """单个频点最长的测量时间"""
+
+    empty_rssi: int = 8
+    """第一次测量低于该值时直接判定为空频点"""
+
+    station_rssi: int = 16
+    """不低于该值时判定为有电台 调谐器报告了是否有电台时还需要它认为有电台"""
+
+    confirm: int = 2
+    """连续多少次不低于 `station_rssi` 后提前结束测量"""
+
+    max_age: float = 7 * 24 * 3600
+    """电台索引中的频点多久以后需要重新扫描"""
+
+
+@dataclass(frozen=True)
+class ScanReport:
+    """一次频段扫描的统计"""
+
+    scanned: int
+    """实际扫描的频点数"""
+
+    fresh: int
+    """电台索引中仍未过期而跳过的频点数"""
+
+    empty: int
+    """第一次测量就判定为空而提前结束的频点数"""
+
+    stations: int
+    """本次扫描判定为有电台的频点数"""
+
+    elapsed: float
+    """扫描用时"""
+
+
+@dataclass(frozen=True)
+class StageStats:
+    """流水线中一个环节的运行统计"""
+
+    name: str
+    """环节名称"""
+
+    mode: StageMode
+    """执行位置"""
+
+    runs: int
+    """完成的帧数"""
+
+    mean: float
+    """每帧的平均耗时 单位秒 池中的环节只计执行的时间 不含排队与进程间传递数据"""
+
+    max: float
+    """每帧的最长耗时 单位秒"""
+
+    queue: int
+    """等待处理的帧数 在事件循环中继续处理的环节为分发队列的长度"""
+
+    max_queue: int
+    """等待处理的帧数的最大值"""
+
+    dropped: int = 0
+    """等待的帧数达到上限而没有处理的帧数"""
+
+    errors: int = 0
+    """处理出错的帧数"""
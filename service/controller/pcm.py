@@ -0,0 +1,60 @@
+"""广播信号 PCM 数据与浮点采样之间的转换"""
+
+import numpy as np
+
+from service.controller.interface.dataclass import CaptureDtype
+
+_SCALE: dict[CaptureDtype, float] = {
+    CaptureDtype.Bit16: 2.0**15,
+    CaptureDtype.Bit24: 2.0**31,
+    CaptureDtype.Bit32: 2.0**31,
+}
+"""整数采样映射到 [-1, 1) 区间的缩放系数 24 位采样会先左移 8 位对齐到 32 位"""
+
+
+def decode(data: bytes, dtype: CaptureDtype, channels: int) -> np.ndarray:
+    """把交错存放的 PCM 数据解码为形状为 (帧数, 声道数) 的 float32 数组"""
+    match dtype:
+        case CaptureDtype.Bit16:
+            ints = np.frombuffer(data, dtype="<i2")
+        case CaptureDtype.Bit24:
+            raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+            padded = np.zeros((raw.shape[0], 4), dtype=np.uint8)
+            padded[:, 1:] = raw
+            ints = padded.view("<i4").reshape(-1)
+        case CaptureDtype.Bit32:
+            ints = np.frombuffer(data, dtype="<i4")
+    samples = ints.astype(np.float32)
+    samples *= np.float32(1.0 / _SCALE[dtype])
+    return samples.reshape(-1, channels)
+
+
+def encode(samples: np.ndarray, dtype: CaptureDtype) -> bytes:
+    """把浮点采样编码回交错存放的 PCM 数据 超出 [-1, 1) 的部分会被削波"""
+    scale = _SCALE[dtype]
+    # float32 中 2**31 - 1 会舍入为 2**31 满幅的正采样转换后翻转为负 须在 float64 中削波
+    scaled = np.clip(samples.reshape(-1).astype(np.float64) * scale, -scale, scale - 1)
+    match dtype:
+        case CaptureDtype.Bit16:
+            return scaled.astype("<i2").tobytes()
+        case CaptureDtype.Bit24:
+            ints = (scaled.astype(np.int64) & ~0xFF).astype("<i4")
+            return ints.view(np.uint8).reshape(-1, 4)[:, 1:].tobytes()
+        case CaptureDtype.Bit32:
+            return scaled.astype("<i4").tobytes()
+
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    """把多声道采样平均为单声道"""
+    if samples.shape[1] == 1:
+        return samples
+    return samples.mean(axis=1, dtype=np.float32, keepdims=True)
+
+
+def decimate(samples: np.ndarray, factor: int) -> np.ndarray:
+    """以相邻采样取平均的方式按整数倍降低采样率"""
+    if factor <= 1:
+        return samples
+    frames = samples.shape[0] - samples.shape[0] % factor
+    grouped = samples[:frames].reshape(-1, factor, samples.shape[1])
+    return grouped.mean(axis=1, dtype=np.float32)
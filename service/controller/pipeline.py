@@ -0,0 +1,252 @@
+"""
+声明式的采集处理流水线
+
+环节组成以采集为根的树，每一帧在每个环节只处理一次，结果交给所有下游环节；
+内联环节在上游所在的线程中执行，线程池与进程池中的环节按帧的顺序逐帧执行，
+积压达到上限时丢弃新帧而不拖慢上游；各环节的耗时与积压自动记录
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from service.controller.interface.dataclass import StageMode, StageStats
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+log = logging.getLogger(__name__)
+
+StageFunc = Callable[[Any], Any]
+"""环节的处理函数 返回 `None` 时下游环节不处理这一帧"""
+
+SOURCE = "capture"
+"""流水线的根 即采集线程交给 `process` 的原始帧"""
+
+
+def _timed(func: StageFunc, value: Any) -> tuple[Any, float]:
+    """在池中执行并计时 放在模块顶层才能交给进程池"""
+    started = time.perf_counter()
+    return func(value), time.perf_counter() - started
+
+
+class _Stage:
+    """流水线中的一个环节及其统计"""
+
+    def __init__(
+        self,
+        name: str,
+        func: StageFunc,
+        mode: StageMode,
+        backlog: int,
+        depth: Optional[Callable[[], int]],
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.mode = mode
+        self.backlog = backlog
+        self.depth = depth
+        self.parent: Optional[_Stage] = None
+        self.children: list[_Stage] = []
+        """下游环节 修改时整体替换 处理帧的线程无需加锁就能遍历"""
+        self.pending: deque[Any] = deque()
+        """池中的环节正在处理时到达的帧"""
+        self.busy = False
+        self.runs = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.max_queue = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def queue(self) -> int:
+        return self.depth() if self.depth is not None else len(self.pending)
+
+    def record(self, elapsed: float) -> None:
+        self.runs += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.max_queue = max(self.max_queue, self.queue())
+
+    def stats(self) -> StageStats:
+        return StageStats(
+            name=self.name,
+            mode=self.mode,
+            runs=self.runs,
+            mean=self.total / self.runs if self.runs else 0.0,
+            max=self.max,
+            queue=self.queue(),
+            max_queue=self.max_queue,
+            dropped=self.dropped,
+            errors=self.errors,
+        )
+
+
+class Pipeline:
+    """
+    采集之后的处理流水线
+
+    每个环节只有一个上游，同一上游可以接多个下游，共用的前级对每一帧只处理一次；
+    池中的环节一次只处理一帧，保证有状态的处理按顺序看到每一帧，
+    它的下游内联环节在池的线程中接着执行
+    """
+
+    def __init__(self, threads: int = 2, processes: int = 1) -> None:
+        self.__root = _Stage(SOURCE, lambda value: value, StageMode.INLINE, 0, None)
+        self.__stages: dict[str, _Stage] = {SOURCE: self.__root}
+        self.__lock = threading.Lock()
+        """保护池中环节的积压与流水线结构"""
+        self.__threads = threads
+        self.__processes = processes
+        self.__thread_pool: Optional[ThreadPoolExecutor] = None
+        self.__process_pool: Optional["ProcessPoolExecutor"] = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__stages
+
+    def add(
+        self,
+        name: str,
+        func: StageFunc,
+        after: str = SOURCE,
+        mode: StageMode = StageMode.INLINE,
+        backlog: int = 4,
+        depth: Optional[Callable[[], int]] = None,
+    ) -> None:
+        """
+        在 `after` 之后接上一个环节
+
+        `backlog` 是池中的环节最多积压的帧数，`depth` 用于把交给其他队列继续处理的
+        环节的队列长度也记入统计，例如交给事件循环分发的环节
+        """
+        with self.__lock:
+            if name in self.__stages:
+                raise ValueError(f"流水线环节 {name} 已经存在")
+            parent = self.__stages.get(after)
+            if parent is None:
+                raise ValueError(f"流水线环节 {after} 不存在")
+            stage = _Stage(name, func, mode, backlog, depth)
+            stage.parent = parent
+            parent.children = [*parent.children, stage]
+            self.__stages[name] = stage
+
+    def remove(self, name: str) -> None:
+        """移除一个环节以及它的所有下游环节"""
+        with self.__lock:
+            stage = self.__stages.get(name)
+            if stage is None or stage.parent is None:
+                return
+            stage.parent.children = [child for child in stage.parent.children if child is not stage]
+            removed = [stage]
+            while removed:
+                current = removed.pop()
+                self.__stages.pop(current.name, None)
+                current.pending.clear()
+                removed.extend(current.children)
+
+    def process(self, frame: Any) -> None:
+        """在采集线程中处理一帧 池中的环节只是排队 不等它们完成"""
+        self.__feed(self.__root.children, frame)
+
+    def stats(self) -> list[StageStats]:
+        """按流水线结构先后排列的各环节统计"""
+        ordered: list[StageStats] = []
+        stack = list(reversed(self.__root.children))
+        while stack:
+            stage = stack.pop()
+            ordered.append(stage.stats())
+            stack.extend(reversed(stage.children))
+        return ordered
+
+    def close(self) -> None:
+        """结束线程池与进程池 尚未开始的帧被丢弃 之后再有池中的环节时重新创建"""
+        with self.__lock:
+            pools: list[Optional[Executor]] = [self.__thread_pool, self.__process_pool]
+            self.__thread_pool = self.__process_pool = None
+            for stage in self.__stages.values():
+                stage.pending.clear()
+                stage.busy = False
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def __feed(self, stages: list[_Stage], value: Any) -> None:
+        for stage in stages:
+            if stage.mode == StageMode.INLINE:
+                self.__run(stage, value)
+            else:
+                self.__submit(stage, value)
+
+    def __run(self, stage: _Stage, value: Any) -> None:
+        started = time.perf_counter()
+        try:
+            result = stage.func(value)
+        except Exception as exc:
+            stage.errors += 1
+            log.warning(f"流水线环节 {stage.name} 出错 {exc}")
+            return
+        stage.record(time.perf_counter() - started)
+        if result is not None and stage.children:
+            self.__feed(stage.children, result)
+
+    def __submit(self, stage: _Stage, value: Any) -> None:
+        with self.__lock:
+            if stage.busy:
+                if len(stage.pending) >= stage.backlog:
+                    stage.dropped += 1
+                    return
+                stage.pending.append(value)
+                stage.max_queue = max(stage.max_queue, len(stage.pending))
+                return
+            stage.busy = True
+            pool = self.__pool(stage.mode)
+        self.__start(stage, pool, value)
+
+    def __start(self, stage: _Stage, pool: Executor, value: Any) -> None:
+        try:
+            future = pool.submit(_timed, stage.func, value)
+        except RuntimeError:
+            # 池已经结束
+            with self.__lock:
+                stage.busy = False
+                stage.pending.clear()
+            return
+        future.add_done_callback(lambda done: self.__finish(stage, pool, done))
+
+    def __finish(self, stage: _Stage, pool: Executor, future: Future) -> None:
+        result = None
+        try:
+            result, elapsed = future.result()
+            stage.record(elapsed)
+        except Exception as exc:
+            if not future.cancelled():
+                stage.errors += 1
+                log.warning(f"流水线环节 {stage.name} 出错 {exc}")
+        if result is not None and stage.children:
+            self.__feed(stage.children, result)
+        with self.__lock:
+            if not stage.pending:
+                stage.busy = False
+                return
+            value = stage.pending.popleft()
+        self.__start(stage, pool, value)
+
+    def __pool(self, mode: StageMode) -> Executor:
+        if mode == StageMode.THREAD:
+            if self.__thread_pool is None:
+                self.__thread_pool = ThreadPoolExecutor(
+                    max_workers=self.__threads, thread_name_prefix="PipelineStage"
+                )
+            return self.__thread_pool
+        if self.__process_pool is None:
+            # 进程池依赖 multiprocessing 只在用到时导入
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            self.__process_pool = ProcessPoolExecutor(
+                max_workers=self.__processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.__process_pool
@@ -0,0 +1,121 @@
+"""RDA5807M 调谐器芯片驱动 使用随机访问地址 每个寄存器 16 位"""
+
+import asyncio
+import time
+
+from service.controller.bus import I2CBus
+from service.controller.interface.dataclass import SignalQuality
+from service.controller.tuner import TunerChip, TunerController
+
+ADDRESS = 0x11
+"""随机访问模式的 I2C 地址"""
+
+REGISTERS = 0x10
+
+# 02H 控制寄存器
+DHIZ = 1 << 15
+DMUTE = 1 << 14
+SEEK = 1 << 8
+NEW_METHOD = 1 << 2
+SOFT_RESET = 1 << 1
+ENABLE = 1 << 0
+
+# 03H 频道寄存器
+CHAN_SHIFT = 6
+TUNE = 1 << 4
+
+# 04H
+DE_50US = 1 << 11
+
+# 05H
+INT_MODE = 1 << 15
+SEEKTH_SHIFT = 8
+LNA_PORT_SHIFT = 6
+VOLUME_MASK = 0x000F
+
+# 0AH 状态寄存器
+STC = 1 << 14
+ST = 1 << 10
+READCHAN_MASK = 0x03FF
+
+# 0BH 信号寄存器
+RSSI_SHIFT = 9
+FM_TRUE = 1 << 8
+FM_READY = 1 << 7
+
+BAND_START = 87000
+BAND_END = 108000
+SPACING = 100
+"""87-108MHz 频段 100kHz 步进 单位 kHz"""
+
+
+class RDA5807M(TunerChip):
+    """RDA5807M 调谐器芯片"""
+
+    band = range(BAND_START, BAND_END + SPACING, SPACING)
+
+    def __init__(
+        self,
+        bus: I2CBus,
+        seek_threshold: int = 8,
+        poll_interval: float = 0.002,
+        timeout: float = 0.5,
+    ) -> None:
+        super().__init__(
+            TunerController(
+                bus,
+                ADDRESS,
+                registers=REGISTERS,
+                width=2,
+                volatile=range(0x0A, REGISTERS),
+                self_clearing={0x02: SOFT_RESET | SEEK, 0x03: TUNE},
+            )
+        )
+        self.__seek_threshold = seek_threshold
+        self.__poll_interval = poll_interval
+        self.__timeout = timeout
+
+    async def power_on(self, volume: int = 8) -> None:
+        # 02H 到 05H 合并为一次连续写入
+        self.controller.stage(
+            0x02,
+            [
+                DHIZ | DMUTE | NEW_METHOD | ENABLE,
+                0,
+                DE_50US,
+                INT_MODE
+                | self.__seek_threshold << SEEKTH_SHIFT
+                | 2 << LNA_PORT_SHIFT
+                | volume & VOLUME_MASK,
+            ],
+        )
+        await self.controller.flush()
+
+    async def _tune(self, frequency: int) -> None:
+        if not BAND_START <= frequency <= BAND_END or (frequency - BAND_START) % SPACING:
+            raise ValueError(f"{frequency}kHz 不在 87-108MHz 的 100kHz 频道上")
+        channel = (frequency - BAND_START) // SPACING
+        await self.controller.write(0x03, [channel << CHAN_SHIFT | TUNE], force=True)
+
+        deadline = time.monotonic() + self.__timeout
+        while True:
+            (status,) = await self.controller.read(0x0A)
+            if status & STC:
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"调谐到 {frequency}kHz 超时")
+            await asyncio.sleep(self.__poll_interval)
+
+    async def quality(self) -> SignalQuality:
+        status, signal = await self.controller.read(0x0A, 2)
+        return SignalQuality(
+            rssi=signal >> RSSI_SHIFT,
+            stereo=bool(status & ST),
+            station=bool(signal & FM_TRUE),
+        )
+
+    async def set_volume(self, volume: int) -> None:
+        await self.controller.update(0x05, VOLUME_MASK, volume)
+
+    async def set_mute(self, mute: bool) -> None:
+        await self.controller.update(0x02, DMUTE, 0 if mute else DMUTE)
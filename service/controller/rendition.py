@@ -0,0 +1,101 @@
+"""同一路广播信号的多个档位 供网络变差的客户端切换到更省流量的格式"""
+
+from typing import Optional
+
+import numpy as np
+
+from service.controller import pcm
+from service.controller.interface.dataclass import (
+    AudioFormat,
+    CaptureConfig,
+    CaptureDtype,
+    Rendition,
+)
+from service.controller.source import sample_width
+
+LOW_SAMPLERATE = 16000
+"""最低档位的采样率下限"""
+
+
+def _low_factor(samplerate: int, blocksize: int) -> int:
+    """最低档位的降采样倍数 取能整除块大小且不低于下限的最大倍数"""
+    for factor in (4, 2):
+        if samplerate // factor >= LOW_SAMPLERATE and blocksize % factor == 0:
+            return factor
+    return 1
+
+
+class RenditionSet:
+    """
+    一种采集配置下的全部档位
+
+    每一帧在每个用到的档位上只转换一次，结果由所有会话共享，
+    客户端切换档位不会带来额外的转换开销
+    """
+
+    def __init__(self, config: CaptureConfig) -> None:
+        self.config = config
+        """档位所基于的采集配置"""
+
+        samplerate = config.samplerate.value
+        channels = config.channel.value
+        blocksize = config.blocksize.value
+        factor = _low_factor(samplerate, blocksize)
+
+        self.__factors: dict[Rendition, int] = {
+            Rendition.FULL: 1,
+            Rendition.PCM16: 1,
+            Rendition.MONO: 1,
+            Rendition.LOW: factor,
+        }
+        self.__formats: dict[Rendition, AudioFormat] = {
+            Rendition.FULL: AudioFormat(
+                samplerate, channels, sample_width(config.dtype) * 8, blocksize
+            ),
+            Rendition.PCM16: AudioFormat(samplerate, channels, 16, blocksize),
+            Rendition.MONO: AudioFormat(samplerate, 1, 16, blocksize),
+            Rendition.LOW: AudioFormat(samplerate // factor, 1, 16, blocksize // factor),
+        }
+
+        self.levels: list[Rendition] = []
+        """格式互不相同的档位 由高到低排列"""
+        for level, audio_format in self.__formats.items():
+            if all(self.__formats[other] != audio_format for other in self.levels):
+                self.levels.append(level)
+
+        self.conversions: int = 0
+        """实际进行的转换次数"""
+
+        self.__source: Optional[bytes] = None
+        self.__samples: Optional[np.ndarray] = None
+        self.__cache: dict[Rendition, bytes] = {}
+
+    def format(self, level: Rendition) -> AudioFormat:
+        return self.__formats[level]
+
+    def bitrates(self) -> list[float]:
+        """各个档位每秒的字节数 与 `levels` 一一对应"""
+        return [self.__formats[level].bitrate for level in self.levels]
+
+    def encode(self, level: Rendition, frame: bytes) -> bytes:
+        """取得一帧在某个档位下的 PCM 数据"""
+        if level == Rendition.FULL:
+            return frame
+        if frame is not self.__source:
+            self.__source, self.__samples = frame, None
+            self.__cache.clear()
+
+        encoded = self.__cache.get(level)
+        if encoded is None:
+            if self.__samples is None:
+                self.__samples = pcm.decode(
+                    frame, self.config.dtype, self.config.channel.value
+                )
+            samples = self.__samples
+            if self.__formats[level].channels == 1:
+                samples = pcm.downmix(samples)
+            samples = pcm.decimate(samples, self.__factors[level])
+            encoded = pcm.encode(samples, CaptureDtype.Bit16)
+            self.__cache[level] = encoded
+            self.conversions += 1
+        return encoded
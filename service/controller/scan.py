@@ -0,0 +1,190 @@
+"""频段扫描 结果保存在按频率索引的电台索引中 再次扫描时只扫描过期的频点"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Iterable, Optional
+
+from service.controller.interface.dataclass import (
+    ScanConfig,
+    ScanReport,
+    SignalQuality,
+    StationEntry,
+)
+from service.controller.tuner import TunerChip
+
+log = logging.getLogger(__name__)
+
+
+class StationIndex:
+    """保存在磁盘上的电台索引 以频率 (kHz) 为键"""
+
+    def __init__(self, path: Path = Path("data/stations.json")) -> None:
+        self.__path = path
+        """索引文件路径"""
+
+        self.__entries: dict[int, StationEntry] = dict()
+        """频率对应的扫描结果"""
+
+        self.__lock = asyncio.Lock()
+        """保证同一时刻只有一次写盘"""
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, frequency: int) -> Optional[StationEntry]:
+        return self.__entries.get(frequency)
+
+    def record(self, entry: StationEntry) -> None:
+        self.__entries[entry.frequency] = entry
+
+    def is_fresh(self, frequency: int, max_age: float) -> bool:
+        """频点是否在 `max_age` 秒内扫描过"""
+        entry = self.__entries.get(frequency)
+        return entry is not None and time.time() - entry.scanned_at < max_age
+
+    def stations(self) -> list[StationEntry]:
+        """所有判定为有电台的频点 按频率排序"""
+        return sorted(
+            (entry for entry in self.__entries.values() if entry.station),
+            key=lambda entry: entry.frequency,
+        )
+
+    async def load(self) -> None:
+        self.__entries = await asyncio.to_thread(self.__read)
+
+    async def save(self) -> None:
+        async with self.__lock:
+            entries = list(self.__entries.values())
+            await asyncio.to_thread(self.__write, entries)
+
+    def __read(self) -> dict[int, StationEntry]:
+        try:
+            items = json.loads(self.__path.read_text())
+            return {item["frequency"]: StationEntry(**item) for item in items}
+        except FileNotFoundError:
+            return dict()
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            log.warning(f"电台索引 {self.__path} 读取失败 将重新扫描 {exc}")
+            return dict()
+
+    def __write(self, entries: list[StationEntry]) -> None:
+        self.__path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.__path.with_suffix(".tmp")
+        items = [asdict(entry) for entry in sorted(entries, key=lambda entry: entry.frequency)]
+        temporary.write_text(json.dumps(items, indent=1))
+        # 先写临时文件再替换 中途断电也不会留下半个索引
+        os.replace(temporary, self.__path)
+
+
+class BandScanner:
+    """
+    频段扫描
+
+    每个频点依次调谐、等待稳定、测量，测量次数随信号自适应：
+    第一次测量就接近底噪的频点立即跳过，连续几次判定为有电台的频点提前结束，
+    只有介于两者之间的频点才测满 `max_dwell`；
+    记录与写盘在后台进行，不会推迟下一个频点的调谐。
+
+    调谐与测量严格交替，无法让下一次调谐与本次测量重叠：
+    只有一个调谐器，测量的正是当前调谐到的频点，调谐到下一个频点就不再能测量本频点；
+    缩短扫描靠的是自适应的测量次数
+
+    判定有电台需要 RSSI 不低于 `station_rssi`，调谐器报告了是否有电台（RDA5807M 的 FM_TRUE）时
+    还需要它认为有电台，相邻电台泄漏过来或干扰造成的强信号不会被当作电台
+    """
+
+    def __init__(
+        self,
+        chip: TunerChip,
+        index: StationIndex,
+        config: ScanConfig = ScanConfig(),
+        save_every: int = 32,
+    ) -> None:
+        self.__chip = chip
+        self.__index = index
+        self.__config = config
+        self.__save_every = save_every
+
+    async def scan(
+        self,
+        frequencies: Optional[Iterable[int]] = None,
+        full: bool = False,
+    ) -> ScanReport:
+        """扫描频段 默认跳过索引中未过期的频点 `full` 时全部重新扫描"""
+        started = time.perf_counter()
+        candidates = list(self.__chip.band if frequencies is None else frequencies)
+        pending = [
+            frequency
+            for frequency in candidates
+            if full or not self.__index.is_fresh(frequency, self.__config.max_age)
+        ]
+        fresh = len(candidates) - len(pending)
+
+        empty = stations = 0
+        saving: set[asyncio.Task] = set()
+        for count, frequency in enumerate(pending, start=1):
+            entry, early_empty = await self.__measure(frequency)
+            self.__index.record(entry)
+            empty += early_empty
+            stations += entry.station
+            if count % self.__save_every == 0:
+                task = asyncio.create_task(self.__index.save())
+                saving.add(task)
+                task.add_done_callback(saving.discard)
+        await asyncio.gather(*saving)
+        if pending:
+            await self.__index.save()
+
+        report = ScanReport(
+            scanned=len(pending),
+            fresh=fresh,
+            empty=empty,
+            stations=stations,
+            elapsed=time.perf_counter() - started,
+        )
+        log.info(
+            f"频段扫描完成 扫描 {report.scanned} 个频点 跳过 {report.fresh} 个未过期频点 "
+            f"发现 {report.stations} 个电台 用时 {report.elapsed:.1f}s"
+        )
+        return report
+
+    async def __measure(self, frequency: int) -> tuple[StationEntry, bool]:
+        """调谐并自适应地测量一个频点 返回结果与是否提前判定为空"""
+        config = self.__config
+        await self.__chip.tune(frequency)
+        await asyncio.sleep(config.settle)
+
+        deadline = time.monotonic() + config.max_dwell
+        samples: list[SignalQuality] = []
+        streak = 0
+        while True:
+            quality = await self.__chip.quality()
+            samples.append(quality)
+            if len(samples) == 1 and quality.rssi < config.empty_rssi:
+                break
+            streak = streak + 1 if self.__is_station(quality) else 0
+            if streak >= config.confirm or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(config.sample_interval)
+
+        # 信号在测量期间逐渐稳定 以最后一次测量为准
+        last = samples[-1]
+        entry = StationEntry(
+            frequency=frequency,
+            rssi=last.rssi,
+            stereo=last.stereo,
+            station=self.__is_station(last),
+            scanned_at=time.time(),
+        )
+        return entry, len(samples) == 1 and last.rssi < config.empty_rssi
+
+    def __is_station(self, quality: SignalQuality) -> bool:
+        if quality.rssi < self.__config.station_rssi:
+            return False
+        # 芯片没有报告是否有电台时只能按 RSSI 判断
+        return quality.station is not False
@@ -0,0 +1,69 @@
+"""逐帧的静音检测 在采集线程中运行"""
+
+import math
+
+import numpy as np
+
+from service.controller.interface.dataclass import (
+    CaptureConfig,
+    CaptureDtype,
+    SilenceConfig,
+)
+from service.controller.source import sample_width
+
+_HIGH_OFFSET: dict[CaptureDtype, int] = {
+    CaptureDtype.Bit16: 0,
+    CaptureDtype.Bit24: 1,
+    CaptureDtype.Bit32: 2,
+}
+"""小端序采样中高 16 位所在的字节偏移"""
+
+
+class SilenceDetector:
+    """
+    按每帧的均方根电平判断静音
+
+    只读取每个采样的高 16 位，不拷贝也不解码整帧；
+    电平回到阈值以上时立即恢复发送，降到阈值以下时要经过拖尾时间才开始省略
+    """
+
+    def __init__(self, capture: CaptureConfig, config: SilenceConfig) -> None:
+        self.config = config
+        self.__width = sample_width(capture.dtype)
+        self.__offset = _HIGH_OFFSET[capture.dtype]
+
+        # 在 16 位刻度上比较均方值 省去开方
+        level = 32768.0 * 10 ** (config.threshold_db / 20)
+        self.__threshold = level * level
+
+        blocks_per_second = capture.samplerate.value / capture.blocksize.value
+        self.__hangover = math.ceil(config.hangover * blocks_per_second)
+        """电平降到阈值以下后仍然原样发送的帧数"""
+
+        self.__quiet = 0
+        """连续低于阈值的帧数"""
+
+        self.level: float = 0.0
+        """最近一帧的均方根电平 单位 dBFS"""
+
+    @property
+    def silent(self) -> bool:
+        return self.__quiet > self.__hangover
+
+    def update(self, frame: bytes) -> bool:
+        """检测一帧 返回该帧是否可以省略"""
+        samples = np.ndarray(
+            shape=(len(frame) // self.__width,),
+            dtype="<i2",
+            buffer=frame,
+            offset=self.__offset,
+            strides=(self.__width,),
+        ).astype(np.float32)
+        power = float(np.dot(samples, samples)) / max(len(samples), 1)
+        self.level = 10 * math.log10(power / 32768.0**2) if power else -math.inf
+
+        if power < self.__threshold:
+            self.__quiet += 1
+        else:
+            self.__quiet = 0
+        return self.silent
@@ -0,0 +1,159 @@
+"""广播信号采集源 可以是 I2S 声卡也可以是用于测试的合成信号"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+from service.controller.interface.dataclass import CaptureConfig, CaptureDtype
+
+FrameCallback = Callable[[bytes], None]
+"""采集源每产出一帧广播信号就在采集线程中调用一次"""
+
+
+def server_time() -> int:
+    """服务端时钟 单位微秒 帧的采集时刻与客户端对时都以它为准"""
+    return time.time_ns() // 1000
+
+
+class CaptureSource(ABC):
+    """广播信号采集源模板"""
+
+    @abstractmethod
+    def start(self, callback: FrameCallback) -> None:
+        """开始采集 每一帧都交给 `callback` 处理"""
+
+    @abstractmethod
+    def stop(self) -> None:
+        """结束采集 可以重复调用"""
+
+    def pause(self) -> None:
+        """
+        不再把帧交给 `start` 给出的回调 之后再次 `start` 时继续
+
+        分发服务切换配置但沿用同一个采集源时调用，默认直接结束采集；
+        重新打开代价高的采集源（例如需要重新连接的中继）可以只停止交帧
+        """
+        self.stop()
+
+    def __enter__(self) -> "CaptureSource":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+
+class DeviceSource(CaptureSource):
+    """通过 PortAudio 从声卡采集广播信号"""
+
+    def __init__(self, config: CaptureConfig) -> None:
+        self._config = config
+        self._stream = None
+
+    def start(self, callback: FrameCallback) -> None:
+        from sounddevice import RawInputStream
+
+        def forward(indata, *_) -> None:
+            # PortAudio 会复用 indata 的缓冲区 需要先拷贝出来
+            callback(bytes(indata))
+
+        self._stream = RawInputStream(
+            blocksize=self._config.blocksize.value,
+            channels=self._config.channel.value,
+            device=self._config.device,
+            dtype=self._config.dtype.value,
+            samplerate=self._config.samplerate.value,
+            callback=forward,
+        )
+        self._stream.start()
+
+    def stop(self) -> None:
+        if self._stream is None:
+            return
+        self._stream.stop()
+        self._stream.close()
+        self._stream = None
+
+
+class SyntheticSource(CaptureSource):
+    """
+    按真实速率产出锯齿波的合成采集源
+
+    每个采样的高 16 位等于该采样帧的序号对 65536 取模，
+    接收方只需检查相邻采样是否连续递增就能发现丢帧
+    """
+
+    PERIOD = 65536
+    """锯齿波的周期 以采样帧计"""
+
+    def __init__(self, config: CaptureConfig) -> None:
+        self._config = config
+        self._width = sample_width(config.dtype)
+        self._frame_bytes = (
+            config.blocksize.value * config.channel.value * self._width
+        )
+        self._interval = config.blocksize.value / config.samplerate.value
+
+        self._period = self._render_period()
+        """预先渲染的一个锯齿波周期 按需循环切片"""
+
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self, callback: FrameCallback) -> None:
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(callback,),
+            name="SyntheticSource",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopped.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _run(self, callback: FrameCallback) -> None:
+        offset = 0
+        period_bytes = len(self._period)
+        deadline = time.monotonic()
+        while not self._stopped.is_set():
+            deadline += self._interval
+            delay = deadline - time.monotonic()
+            if delay > 0 and self._stopped.wait(delay):
+                break
+
+            end = offset + self._frame_bytes
+            if end <= period_bytes:
+                frame = self._period[offset:end]
+            else:
+                frame = self._period[offset:] + self._period[: end - period_bytes]
+            offset = end % period_bytes
+            callback(frame)
+
+    def _render_period(self) -> bytes:
+        padding = bytes(self._width - 2)
+        channels = self._config.channel.value
+        return b"".join(
+            (padding + (index - 32768).to_bytes(2, "little", signed=True))
+            * channels
+            for index in range(self.PERIOD)
+        )
+
+
+def sample_width(dtype: CaptureDtype) -> int:
+    """单个采样所占的字节数"""
+    match dtype:
+        case CaptureDtype.Bit16:
+            return 2
+        case CaptureDtype.Bit24:
+            return 3
+        case CaptureDtype.Bit32:
+            return 4
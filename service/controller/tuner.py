@@ -0,0 +1,222 @@
+"""通过 I2C 控制调谐器芯片 总线传输都在独立的工作线程中进行"""
+
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Sequence
+
+from service.controller.bus import I2CBus
+from service.controller.interface.dataclass import SignalQuality, TuneResult, TunerStats
+
+log = logging.getLogger(__name__)
+
+
+class TunerController:
+    """
+    调谐器芯片的寄存器访问
+
+    保存一份寄存器的影子副本，重复读取直接由内存返回，
+    只有状态寄存器等 `volatile` 寄存器每次都经过总线；
+    写入先暂存，同一轮事件循环中的写入会合并，
+    与影子副本相同的写入被省去，相邻寄存器合并为一次连续写入
+    """
+
+    def __init__(
+        self,
+        bus: I2CBus,
+        address: int,
+        registers: int,
+        width: int = 1,
+        volatile: Iterable[int] = (),
+        self_clearing: Optional[dict[int, int]] = None,
+        max_burst: int = 16,
+    ) -> None:
+        self.__bus = bus
+        self.__address = address
+        self.__width = width
+        self.__max_burst = max_burst
+
+        self.__volatile = frozenset(volatile)
+        """芯片自己会改变的寄存器 不使用影子副本"""
+
+        self.__self_clearing = self_clearing or dict()
+        """写入后由芯片自动清零的位 影子副本中不保留"""
+
+        self.__shadow: list[Optional[int]] = [None] * registers
+        """寄存器的影子副本 `None` 表示还不知道芯片中的值"""
+
+        self.__pending: dict[int, int] = dict()
+        """暂存的写入 同一寄存器只保留最后一次"""
+
+        self.__forced: set[int] = set()
+        """即使与影子副本相同也要写入的寄存器"""
+
+        self.__flushing: Optional[asyncio.Task] = None
+        """等待合并写入的任务"""
+
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="i2c")
+        """执行总线传输的工作线程 单线程保证传输顺序"""
+
+        self.stats = TunerStats()
+
+    async def read(self, register: int, count: int = 1, fresh: bool = False) -> list[int]:
+        """读取连续的寄存器 能由影子副本满足时不经过总线"""
+        span = range(register, register + count)
+        if not fresh and self.__cached(span):
+            self.stats.cached_reads += 1
+            return [self.__shadow[index] for index in span]
+
+        # 先写出暂存的写入 保证读到的是写入之后的值
+        await self.flush()
+        data = await self.__run(
+            self.__bus.read, self.__address, register, count * self.__width
+        )
+        self.stats.bus_reads += 1
+        values = [
+            int.from_bytes(data[index * self.__width : (index + 1) * self.__width], "big")
+            for index in range(count)
+        ]
+        for index, value in zip(span, values):
+            self.__shadow[index] = value
+        return values
+
+    def stage(self, register: int, values: Sequence[int], force: bool = False) -> None:
+        """暂存连续寄存器的写入 需要 `flush()` 后才会写入芯片"""
+        for index, value in enumerate(values, start=register):
+            if index in self.__pending:
+                self.stats.skipped_writes += 1
+            self.__pending[index] = value
+            if force:
+                self.__forced.add(index)
+
+    async def write(self, register: int, values: Sequence[int], force: bool = False) -> None:
+        """写入连续的寄存器 同一轮事件循环中的其他写入会一起合并"""
+        self.stage(register, values, force)
+        if self.__flushing is None:
+            self.__flushing = asyncio.create_task(self.__deferred_flush())
+        await asyncio.shield(self.__flushing)
+
+    async def update(self, register: int, mask: int, value: int) -> None:
+        """只修改寄存器中 `mask` 覆盖的位"""
+        if register in self.__pending:
+            current = self.__pending[register]
+        else:
+            (current,) = await self.read(register)
+        await self.write(register, [(current & ~mask) | (value & mask)])
+
+    async def flush(self) -> None:
+        """把暂存的写入合并后写入芯片"""
+        pending, self.__pending = self.__pending, dict()
+        forced, self.__forced = self.__forced, set()
+        registers = []
+        for register in sorted(pending):
+            value = pending[register]
+            if register not in forced and self.__is_shadowed(register, value):
+                self.stats.skipped_writes += 1
+                continue
+            registers.append(register)
+
+        for start, count in self.__bursts(registers):
+            data = b"".join(
+                pending[index].to_bytes(self.__width, "big")
+                for index in range(start, start + count)
+            )
+            try:
+                await self.__run(self.__bus.write, self.__address, start, data)
+            except Exception:
+                for index in range(start, start + count):
+                    self.__shadow[index] = None
+                raise
+            self.stats.bus_writes += 1
+            self.stats.registers_written += count
+            for index in range(start, start + count):
+                clearing = self.__self_clearing.get(index, 0)
+                self.__shadow[index] = pending[index] & ~clearing
+
+    def invalidate(self) -> None:
+        """丢弃影子副本 例如芯片复位之后"""
+        self.__shadow = [None] * len(self.__shadow)
+
+    def close(self) -> None:
+        self.__executor.shutdown(wait=True)
+        self.__bus.close()
+
+    async def __run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, func, *args)
+
+    async def __deferred_flush(self) -> None:
+        # 让出一次事件循环 同一轮中的写入都会进入同一次合并
+        await asyncio.sleep(0)
+        self.__flushing = None
+        await self.flush()
+
+    def __cached(self, span: range) -> bool:
+        return all(
+            index not in self.__volatile
+            and index not in self.__pending
+            and self.__shadow[index] is not None
+            for index in span
+        )
+
+    def __is_shadowed(self, register: int, value: int) -> bool:
+        if register in self.__volatile:
+            return False
+        return self.__shadow[register] == value & ~self.__self_clearing.get(register, 0)
+
+    def __bursts(self, registers: list[int]) -> list[tuple[int, int]]:
+        """把升序的寄存器合并为 (起始寄存器, 个数) 的连续写入"""
+        bursts: list[tuple[int, int]] = []
+        for register in registers:
+            if bursts:
+                start, count = bursts[-1]
+                if start + count == register and count < self.__max_burst:
+                    bursts[-1] = (start, count + 1)
+                    continue
+            bursts.append((register, 1))
+        return bursts
+
+
+class TunerChip(ABC):
+    """调谐器芯片驱动模板 频率单位均为 kHz"""
+
+    band: range
+    """芯片支持的所有频道"""
+
+    def __init__(self, controller: TunerController) -> None:
+        self.controller = controller
+        """芯片的寄存器访问"""
+
+        self.__latencies: deque[float] = deque(maxlen=256)
+        """最近调谐的耗时"""
+
+    @property
+    def latencies(self) -> list[float]:
+        """最近若干次调谐的耗时 单位秒"""
+        return list(self.__latencies)
+
+    @abstractmethod
+    async def power_on(self) -> None:
+        """上电并写入初始配置"""
+
+    @abstractmethod
+    async def _tune(self, frequency: int) -> None:
+        """写入频率并等待芯片报告调谐完成"""
+
+    @abstractmethod
+    async def quality(self) -> SignalQuality:
+        """读取当前频点的信号质量"""
+
+    async def tune(self, frequency: int) -> TuneResult:
+        """调谐到 `frequency` 并记录耗时"""
+        started = time.perf_counter()
+        await self._tune(frequency)
+        latency = time.perf_counter() - started
+        self.__latencies.append(latency)
+        return TuneResult(frequency=frequency, latency=latency)
+
+    def close(self) -> None:
+        self.controller.close()
@@ -1 +1,11 @@
 """存放广播电台消息/服务器数据/提示词字段的 DAO 交互模块"""
+
+from service.database.cache import ReadCache
+from service.database.context import DatabaseContext
+from service.database.writer import WriteBehindQueue
+
+__all__ = [
+    "DatabaseContext",
+    "ReadCache",
+    "WriteBehindQueue",
+]
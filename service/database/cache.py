@@ -0,0 +1,81 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+class ReadCache:
+    """带过期时间的 LRU 读缓存 同一个键同时未命中时只会读取一次"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0) -> None:
+        self.__maxsize = maxsize
+        """最多缓存的条目数"""
+
+        self.__ttl = ttl
+        """条目的有效秒数"""
+
+        self.__entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        """键对应的过期时刻与值 按最近使用排序"""
+
+        self.__pending: dict[Hashable, asyncio.Future[Any]] = dict()
+        """正在读取的键"""
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    async def get(self, key: Hashable, loader: Loader) -> Any:
+        """读取缓存 未命中或已过期时通过 `loader` 读取并缓存"""
+        entry = self.__entries.get(key)
+        if entry is not None:
+            expire, value = entry
+            if expire > time.monotonic():
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.__entries[key]
+
+        self.misses += 1
+        pending = self.__pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        self.__pending[key] = future
+        try:
+            value = await loader()
+        except BaseException as exc:
+            future.set_exception(exc)
+            # 没有其他等待者时避免 "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            current = self.__pending.get(key) is future
+            if current:
+                del self.__pending[key]
+        future.set_result(value)
+        # 读取期间这个键被写入或失效时 读到的可能是旧值 不缓存
+        if current:
+            self.put(key, value)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        # 正在进行的读取不再缓存它的结果
+        self.__pending.pop(key, None)
+        self.__entries[key] = (time.monotonic() + self.__ttl, value)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.__maxsize:
+            self.__entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """让某个键或全部缓存失效 正在进行的读取不再缓存它的结果"""
+        if key is None:
+            self.__entries.clear()
+            self.__pending.clear()
+        else:
+            self.__entries.pop(key, None)
+            self.__pending.pop(key, None)
@@ -0,0 +1,88 @@
+import logging
+from typing import TYPE_CHECKING, Any, Optional
+
+from service.database.cache import ReadCache
+from service.database.writer import WriteBehindQueue
+
+if TYPE_CHECKING:
+    from service.plugin.model.database import DatabasePlugin
+
+log = logging.getLogger(__name__)
+
+
+class DatabaseContext:
+    """
+    交给数据库插件的上下文
+
+    数据库插件在 `setup()` 中调用 `attach()` 成为存储后端，
+    其他服务通过 `write()` 回写、通过 `read()` 读取缓存
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 256,
+        flush_interval: float = 0.5,
+        cache_size: int = 1024,
+        cache_ttl: float = 30.0,
+    ) -> None:
+        self.__plugin: Optional["DatabasePlugin"] = None
+        """作为存储后端的数据库插件"""
+
+        self.writer = WriteBehindQueue(
+            writer=self.__write_batch,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+        )
+        """异步回写队列"""
+
+        self.cache = ReadCache(maxsize=cache_size, ttl=cache_ttl)
+        """电台与设置的读缓存"""
+
+        self.__unflushed: dict[tuple[str, Any], dict[str, Any]] = dict()
+        """已回写但还没有写入数据库的带键的行 读取时优先于缓存与数据库"""
+
+    def attach(self, plugin: "DatabasePlugin") -> None:
+        """让数据库插件成为存储后端"""
+        if self.__plugin is not None:
+            log.warning(
+                f"数据库插件 {plugin.plugin_info.name} 替换了 {self.__plugin.plugin_info.name}"
+            )
+        self.__plugin = plugin
+        self.cache.invalidate()
+        self.writer.start()
+
+    def write(self, table: str, row: dict[str, Any]) -> None:
+        """回写一行 热点路径中调用也不会等待数据库 之后的 `read()` 立即能读到这一行"""
+        if not self.writer.put(table, row) or "key" not in row:
+            return
+        self.__unflushed[(table, row["key"])] = row
+        self.cache.invalidate((table, row["key"]))
+
+    async def read(self, table: str, key: str) -> Optional[dict[str, Any]]:
+        """按键读取一行 优先使用尚未写入数据库的行 其次是缓存"""
+        row = self.__unflushed.get((table, key))
+        if row is not None:
+            return row
+        return await self.cache.get((table, key), lambda: self.__read(table, key))
+
+    async def close(self) -> None:
+        """写完回写队列中的所有行后关闭数据库插件"""
+        await self.writer.close()
+        if self.__plugin is not None:
+            await self.__plugin.close()
+
+    async def __write_batch(self, table: str, rows: list[dict[str, Any]]) -> None:
+        if self.__plugin is None:
+            raise RuntimeError("没有可用的数据库插件")
+        try:
+            await self.__plugin.write_batch(table, rows)
+        finally:
+            # 写入失败的行也不再由内存提供 与数据库保持一致
+            for row in rows:
+                if "key" in row and self.__unflushed.get((table, row["key"])) is row:
+                    del self.__unflushed[(table, row["key"])]
+
+    async def __read(self, table: str, key: str) -> Optional[dict[str, Any]]:
+        if self.__plugin is None:
+            return None
+        return await self.__plugin.read(table, key)
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Optional
+
+log = logging.getLogger(__name__)
+
+BatchWriter = Callable[[str, list[dict[str, Any]]], Awaitable[None]]
+"""把同一张表的一批行在一个事务中写入"""
+
+
+class WriteBehindQueue:
+    """
+    异步回写队列
+
+    热点路径只把行放进队列，后台任务攒够 `batch_size` 行或等满
+    `flush_interval` 秒后按表分组，一张表一个事务批量写入
+    """
+
+    def __init__(
+        self,
+        writer: BatchWriter,
+        batch_size: int = 256,
+        flush_interval: float = 0.5,
+        maxsize: int = 65536,
+    ) -> None:
+        self.__writer = writer
+        self.__batch_size = batch_size
+        self.__flush_interval = flush_interval
+
+        self.__queue: asyncio.Queue[tuple[str, dict[str, Any]]] = asyncio.Queue(
+            maxsize=maxsize
+        )
+        """等待写入的行"""
+
+        self.__pending: list[tuple[str, dict[str, Any]]] = list()
+        """已从队列取出、正在攒批的行"""
+
+        self.__lock = asyncio.Lock()
+        """保证同一时刻只有一批行在写入"""
+
+        self.__task: Optional[asyncio.Task] = None
+        """后台写入任务"""
+
+        self.__closed = False
+        """关闭之后不再接受新的行"""
+
+        self.dropped = 0
+        """队列已满而丢弃的行数"""
+
+        self.written = 0
+        """已写入的行数"""
+
+    def start(self) -> None:
+        self.__closed = False
+        if self.__task is None:
+            self.__task = asyncio.create_task(self.__run())
+
+    def put(self, table: str, row: dict[str, Any]) -> bool:
+        """放入一行 不会等待写入 队列已满或已关闭而丢弃时返回 `False`"""
+        if self.__closed:
+            self.dropped += 1
+            log.warning(f"数据库回写队列已关闭 丢弃写入表 {table} 的一行")
+            return False
+        try:
+            self.__queue.put_nowait((table, row))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                log.warning(f"数据库回写队列已满 已丢弃 {self.dropped} 行")
+            return False
+        return True
+
+    async def flush(self) -> None:
+        """立刻写入队列中与正在攒批的所有行"""
+        async with self.__lock:
+            self.__pending.extend(self.__drain(self.__queue.qsize()))
+            while self.__pending:
+                batch = self.__pending[: self.__batch_size]
+                del self.__pending[: self.__batch_size]
+                await self.__write(batch)
+
+    async def close(self) -> None:
+        """
+        不再接受新的行 写完已放入的所有行后结束后台任务
+
+        正在写入的一批已经从攒批中取出，先等它与剩余的行写完再取消后台任务，
+        取消时后台任务只可能在等待新的行
+        """
+        self.__closed = True
+        await self.flush()
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+        await self.flush()
+
+    async def __run(self) -> None:
+        pending = self.__pending
+        while True:
+            pending.append(await self.__queue.get())
+            deadline = time.monotonic() + self.__flush_interval
+            while len(pending) < self.__batch_size:
+                pending.extend(self.__drain(self.__batch_size - len(pending)))
+                timeout = deadline - time.monotonic()
+                if len(pending) >= self.__batch_size or timeout <= 0:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(self.__queue.get(), timeout))
+                except TimeoutError:
+                    break
+            await self.flush()
+
+    def __drain(self, limit: int) -> list[tuple[str, dict[str, Any]]]:
+        rows = []
+        while len(rows) < limit and not self.__queue.empty():
+            rows.append(self.__queue.get_nowait())
+        return rows
+
+    async def __write(self, batch: list[tuple[str, dict[str, Any]]]) -> None:
+        tables: defaultdict[str, list[dict[str, Any]]] = defaultdict(list)
+        for table, row in batch:
+            tables[table].append(row)
+        for table, rows in tables.items():
+            try:
+                await self.__writer(table, rows)
+                self.written += len(rows)
+            except Exception as exc:
+                log.warning(f"数据库表 {table} 批量写入 {len(rows)} 行失败 {exc}")
@@ -0,0 +1,15 @@
+"""运行时诊断模块 在不重启服务的情况下按需检查内存等资源的占用 不阻塞事件循环的日志输出 以及线程在各个 CPU 上的放置"""
+
+from service.diagnostic.logqueue import LogQueue, RateLimitedQueueHandler, install_log_queue
+from service.diagnostic.memory import MemoryProfiler, install_memory_profiler
+from service.diagnostic.placement import ThreadPlacement, start_placement
+
+__all__ = [
+    "LogQueue",
+    "RateLimitedQueueHandler",
+    "install_log_queue",
+    "MemoryProfiler",
+    "install_memory_profiler",
+    "ThreadPlacement",
+    "start_placement",
+]
@@ -0,0 +1,193 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class SubsystemMemory:
+    """一个子系统分配且仍然存活的内存"""
+
+    name: str
+    """子系统名称 本项目之外的分配按所在的包命名 例如 `aioquic`"""
+
+    size: int
+    """存活的字节数"""
+
+    count: int
+    """存活的内存块数"""
+
+    growth: int = 0
+    """与上一次报告相比增加的字节数 第一次报告为 0"""
+
+
+@dataclass(frozen=True)
+class AllocationGrowth:
+    """与上一次报告相比增长最多的分配位置"""
+
+    location: str
+    """分配所在的文件与行号"""
+
+    size: int
+    """存活的字节数"""
+
+    growth: int
+    """增加的字节数"""
+
+    count: int
+    """存活的内存块数"""
+
+
+@dataclass(frozen=True)
+class SessionMemory:
+    """单个 WebTransport 会话持有的内存"""
+
+    session_id: int
+    """会话 ID 只在所在的 QUIC 连接内唯一"""
+
+    path: str
+    """会话访问的端点"""
+
+    client: str
+    """客户端的地址"""
+
+    closed: bool
+    """会话已经关闭 关闭后仍然存活说明有引用没有释放"""
+
+    streams: int
+    """会话登记的流数"""
+
+    tasks: int
+    """会话仍在运行的任务数"""
+
+    datagrams: int
+    """收件箱中等待处理的数据报数"""
+
+    owned: int
+    """会话、处理器与流等对象本身及其容器的字节数"""
+
+    send_buffer: int
+    """会话的流在 aioquic 中尚未被确认的发送缓冲 加上超出发送预算而留在会话中的数据 慢速的订阅者会让它不断变大"""
+
+    receive_buffer: int
+    """会话的流在 aioquic 中尚未交给应用的接收缓冲"""
+
+
+@dataclass(frozen=True)
+class MemoryReport:
+    """一次内存报告"""
+
+    traced: int
+    """tracemalloc 追踪到的存活字节数"""
+
+    overhead: int
+    """tracemalloc 自身占用的字节数"""
+
+    subsystems: list[SubsystemMemory]
+    """按存活字节数从多到少排列的各子系统"""
+
+    top: list[AllocationGrowth]
+    """与上一次报告相比增长最多的分配位置"""
+
+    sessions: list[SessionMemory]
+    """当前存活的所有会话"""
+
+    objects: dict[str, int] = field(default_factory=dict)
+    """本项目各个类存活的实例数"""
+
+    object_growth: dict[str, int] = field(default_factory=dict)
+    """与上一次报告相比实例数有变化的类"""
+
+    garbage: int = 0
+    """本次回收前无法到达的对象数 以及无法回收的对象数之和"""
+
+    elapsed: float = 0.0
+    """生成报告的用时 单位秒"""
+
+
+@dataclass(frozen=True)
+class LogQueueConfig:
+    """日志队列与限流的参数"""
+
+    interval: float = 5.0
+    """限流的周期 单位秒 也是汇总被省略日志的间隔"""
+
+    burst: int = 10
+    """同一位置的日志在一个周期内最多输出的条数"""
+
+    capacity: int = 4096
+    """队列最多容纳的记录数 后台线程跟不上时新的记录被丢弃"""
+
+
+@dataclass(frozen=True)
+class CpuPlacement:
+    """
+    一类线程可以运行的 CPU 与调度策略
+
+    采集线程与事件循环的各项为 `None` 时保持原样；
+    其余线程会继承创建者的设置 为 `None` 时恢复为进程启动时可用的 CPU、普通调度与 nice 0
+    """
+
+    cpus: Optional[frozenset[int]] = None
+    """可以运行的 CPU 编号 与进程启动时可用的 CPU 取交集"""
+
+    realtime: Optional[int] = None
+    """SCHED_FIFO 实时优先级 1 到 99 需要 CAP_SYS_NICE 没有权限时保持普通调度"""
+
+    nice: Optional[int] = None
+    """普通调度下的 nice 值 负值同样需要权限"""
+
+
+@dataclass(frozen=True)
+class PlacementConfig:
+    """采集线程、事件循环与各个工作线程的放置"""
+
+    capture: CpuPlacement = CpuPlacement()
+    """产出广播信号帧的采集线程 声卡时为 PortAudio 的回调线程"""
+
+    loop: CpuPlacement = CpuPlacement()
+    """运行事件循环的线程"""
+
+    pools: dict[str, CpuPlacement] = field(default_factory=dict)
+    """按名称前缀匹配的工作线程与子进程 例如 `AudioTap`、`ProgrammeSegmenter`、`sqlite`"""
+
+    other: CpuPlacement = CpuPlacement()
+    """其余线程 新线程会继承创建它的线程的 CPU 设置 需要把它们从事件循环的 CPU 上移开"""
+
+    interval: float = 5.0
+    """放置新出现的线程并采样 CPU 占用的间隔 单位秒"""
+
+    report: Optional[float] = 60.0
+    """输出各线程 CPU 占用的间隔 单位秒 `None` 表示不输出"""
+
+
+@dataclass(frozen=True)
+class ThreadUsage:
+    """一个线程在采样周期内的 CPU 占用"""
+
+    tid: int
+    """线程在操作系统中的编号"""
+
+    name: str
+    """线程名 不是 Python 创建的线程取内核中的名称"""
+
+    role: str
+    """放置时归入的类别 `capture`、`loop`、工作线程的名称前缀或 `other`"""
+
+    cpu: float
+    """占用一个 CPU 的比例"""
+
+    cpus: frozenset[int]
+    """当前可以运行的 CPU"""
+
+    processor: int
+    """最近一次运行所在的 CPU"""
+
+
+@dataclass(frozen=True)
+class PlacementReport:
+    """各线程在上一个采样周期内的 CPU 占用"""
+
+    threads: list[ThreadUsage]
+    """按 CPU 占用从高到低排列"""
+
+    elapsed: float
+    """采样周期 单位秒"""
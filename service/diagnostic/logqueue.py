@@ -0,0 +1,227 @@
+"""
+日志经队列交给后台线程输出
+
+事件循环线程上的日志调用只做限流判断并把记录放进队列，格式化与 rich 渲染都在后台线程中进行；
+同一位置的日志在一个周期内超出配额后不再入队，周期结束时汇总为一条
+"""
+
+import atexit
+import copy
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Optional
+
+from service.diagnostic.interface.dataclass import LogQueueConfig
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+"""让后台线程退出的标记"""
+
+
+class _Site:
+    """一个日志调用位置在当前周期内的计数"""
+
+    __slots__ = ("start", "count", "suppressed", "last")
+
+    def __init__(self, start: float) -> None:
+        self.start = start
+        self.count = 0
+        self.suppressed = 0
+        self.last: Optional[logging.LogRecord] = None
+        """本周期内最后一条被省略的记录"""
+
+
+class RateLimitedQueueHandler(logging.handlers.QueueHandler):
+    """
+    按调用位置限流的队列日志处理器
+
+    同一文件同一行的日志视为重复，即使每次的参数不同；
+    入队前只合并消息与参数，不做格式化，异常信息原样交给后台线程渲染
+    """
+
+    def __init__(self, records: queue.Queue, config: Optional[LogQueueConfig] = None) -> None:
+        super().__init__(records)
+        self.config = config or LogQueueConfig()
+        self.__sites: dict[tuple[str, int], _Site] = {}
+        self.suppressed = 0
+        """因限流被省略的记录数"""
+        self.dropped = 0
+        """队列已满而被丢弃的记录数"""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # `Handler.handle` 已经持有 self.lock 多个线程同时记录日志也是安全的
+        key = (record.pathname, record.lineno)
+        site = self.__sites.get(key)
+        if site is None:
+            site = self.__sites[key] = _Site(record.created)
+        elif record.created - site.start >= self.config.interval:
+            self.__summarize(site)
+            site.start = record.created
+            site.count = 0
+        site.count += 1
+        if site.count > self.config.burst:
+            site.suppressed += 1
+            site.last = record
+            self.suppressed += 1
+            return
+        super().emit(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 参数可能在之后被修改 入队前先合并 格式化留给后台线程
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def summarize(self, now: float) -> None:
+        """汇总已经结束的周期中被省略的日志 并忘掉不再活跃的位置"""
+        with self.lock:
+            for key, site in list(self.__sites.items()):
+                if now - site.start < self.config.interval:
+                    continue
+                if site.suppressed:
+                    self.__summarize(site)
+                del self.__sites[key]
+
+    def __summarize(self, site: _Site) -> None:
+        last = site.last
+        if last is None:
+            return
+        summary = logging.LogRecord(
+            last.name,
+            last.levelno,
+            last.pathname,
+            last.lineno,
+            f"同一位置的日志在 {self.config.interval:g}s 内另有 {site.suppressed} 条被省略 "
+            f"最后一条为 {last.getMessage()}",
+            None,
+            None,
+            last.funcName,
+        )
+        site.suppressed = 0
+        site.last = None
+        self.enqueue(summary)
+
+
+class LogQueue:
+    """
+    后台日志线程
+
+    从队列中取出记录交给真正输出的处理器，空闲或每过一个周期汇总一次被省略的日志；
+    队列满而丢弃的记录数同样定期报告
+    """
+
+    def __init__(
+        self,
+        handlers: list[logging.Handler],
+        config: Optional[LogQueueConfig] = None,
+    ) -> None:
+        self.config = config or LogQueueConfig()
+        self.__handlers = handlers
+        self.__queue: queue.Queue = queue.Queue(self.config.capacity)
+        self.handler = RateLimitedQueueHandler(self.__queue, self.config)
+        """挂在根日志记录器上的队列处理器"""
+        self.__worker: Optional[threading.Thread] = None
+        self.__reported = 0
+        """已经报告过的丢弃数"""
+        self.rendered = 0
+        """交给输出处理器的记录数"""
+
+    def start(self) -> None:
+        if self.__worker is not None:
+            return
+        self.__worker = threading.Thread(target=self.__run, name="LogQueue", daemon=True)
+        self.__worker.start()
+
+    def stop(self) -> None:
+        """输出队列中剩余的记录与汇总后结束后台线程 之后的日志直接由输出处理器输出"""
+        if self.__worker is None:
+            return
+        root = logging.getLogger()
+        if self.handler in root.handlers:
+            root.removeHandler(self.handler)
+            for handler in self.__handlers:
+                root.addHandler(handler)
+        try:
+            # 队列已满时等后台线程腾出位置
+            self.__queue.put(_STOP, timeout=5)
+        except queue.Full:
+            pass
+        self.__worker.join(timeout=5)
+        self.__worker = None
+        for handler in self.__handlers:
+            handler.flush()
+
+    def __run(self) -> None:
+        deadline = time.time() + self.config.interval
+        while True:
+            try:
+                record = self.__queue.get(timeout=max(deadline - time.time(), 0))
+            except queue.Empty:
+                record = None
+            if record is _STOP:
+                break
+            if record is not None:
+                self.__render(record)
+            if time.time() >= deadline:
+                self.__housekeep(time.time())
+                deadline = time.time() + self.config.interval
+        # 把结束前省略的日志也汇总出来
+        self.__housekeep(float("inf"))
+        while True:
+            try:
+                record = self.__queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not _STOP:
+                self.__render(record)
+
+    def __housekeep(self, now: float) -> None:
+        self.handler.summarize(now)
+        dropped = self.handler.dropped
+        if dropped > self.__reported:
+            self.__render(
+                log.makeRecord(
+                    log.name,
+                    logging.WARNING,
+                    __file__,
+                    0,
+                    f"日志队列已满 丢弃了 {dropped - self.__reported} 条日志",
+                    None,
+                    None,
+                )
+            )
+            self.__reported = dropped
+
+    def __render(self, record: logging.LogRecord) -> None:
+        self.rendered += 1
+        for handler in self.__handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def install_log_queue(
+    *handlers: logging.Handler,
+    config: Optional[LogQueueConfig] = None,
+) -> LogQueue:
+    """用队列处理器替换根日志记录器原有的处理器 原有的处理器改在后台线程中输出"""
+    root = logging.getLogger()
+    targets = list(handlers) or list(root.handlers)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    pipeline = LogQueue(targets, config)
+    root.addHandler(pipeline.handler)
+    pipeline.start()
+    # 进程退出前输出剩余的日志
+    atexit.register(pipeline.stop)
+    return pipeline
@@ -0,0 +1,427 @@
+"""
+按需开启的内存分配分析
+
+`tracemalloc` 记录每块内存分配时的调用栈，按栈中最近的一帧本项目代码归入子系统；
+`gc` 用来清点本项目各个类存活的实例数，以及每个会话持有的对象与 aioquic 缓冲
+"""
+
+import asyncio
+import collections
+import gc
+import logging
+import signal
+import sys
+import sysconfig
+import time
+import tracemalloc
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Optional
+
+from service.diagnostic.interface.dataclass import (
+    AllocationGrowth,
+    MemoryReport,
+    SessionMemory,
+    SubsystemMemory,
+)
+
+log = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parents[2]
+"""项目根目录"""
+
+SUBSYSTEMS: dict[str, str] = {
+    "service/connection": "connection",
+    "handler": "connection",
+    "service/controller": "controller",
+    "service/plugin": "plugin",
+    "plugin": "plugin",
+    "service/database": "database",
+    "service/robot": "robot",
+    "service/repository": "repository",
+    "service/diagnostic": "diagnostic",
+    "main.py": "main",
+}
+"""项目内的路径前缀对应的子系统 长的前缀优先"""
+
+_PACKAGES = ("service.", "handler.", "plugin.")
+"""清点实例数的类所在的包"""
+
+_STDLIB = Path(sysconfig.get_paths()["stdlib"]).resolve()
+
+_CONTAINERS = (dict, list, tuple, set, frozenset, collections.deque, asyncio.Queue)
+"""统计会话持有的内存时会继续深入的容器"""
+
+_DATA = (bytes, bytearray, memoryview, str, int, float)
+
+
+class MemoryProfiler:
+    """
+    按需开启的内存分配分析器
+
+    开启追踪之后的分配才会被记录，每次报告都与上一次比较，
+    长时间运行的服务可以隔一段时间报告一次，找出持续增长的子系统与分配位置
+    """
+
+    def __init__(self, frames: int = 8, top: int = 10) -> None:
+        self.__frames = frames
+        self.__top = top
+        self.__started = False
+        """追踪是由本分析器开启的 停止时才关闭 tracemalloc"""
+
+        self.__previous_lines: dict[tuple[str, int], int] = {}
+        self.__previous_subsystems: dict[str, int] = {}
+        self.__previous_objects: dict[str, int] = {}
+        self.__labels: dict[str, Optional[str]] = {}
+        self.__lock = asyncio.Lock()
+        self.last: Optional[MemoryReport] = None
+        """最近一次报告"""
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        """开始追踪内存分配 追踪期间每次分配都会变慢"""
+        if tracemalloc.is_tracing():
+            return
+        tracemalloc.start(self.__frames)
+        self.__started = True
+        log.info(f"已开始追踪内存分配 调用栈深度 {self.__frames}")
+
+    def stop(self) -> None:
+        """停止追踪并丢弃保存的快照"""
+        if self.__started:
+            tracemalloc.stop()
+            self.__started = False
+        self.__previous_lines = {}
+        self.__previous_subsystems = {}
+        self.__previous_objects = {}
+        log.info("已停止追踪内存分配")
+
+    async def report(self) -> MemoryReport:
+        """生成一次报告 只有读取会话在事件循环中进行 回收、快照与统计都在工作线程中进行"""
+        async with self.__lock:
+            begin = time.perf_counter()
+            # 先回收循环引用 只报告确实存活的会话
+            garbage = await asyncio.to_thread(collect_garbage)
+            # 会话的字典与缓冲只在事件循环中修改
+            sessions = session_memory()
+            snapshot = await asyncio.to_thread(tracemalloc.take_snapshot) if tracemalloc.is_tracing() else None
+            report = await asyncio.to_thread(self.__collect, snapshot, sessions, garbage)
+            self.last = report = replace(report, elapsed=time.perf_counter() - begin)
+            return report
+
+    def __collect(
+        self,
+        snapshot: Optional[tracemalloc.Snapshot],
+        sessions: list[SessionMemory],
+        garbage: int,
+    ) -> MemoryReport:
+        objects = count_objects()
+        object_growth = {
+            name: count - self.__previous_objects.get(name, 0)
+            for name, count in objects.items()
+            if count != self.__previous_objects.get(name, 0)
+        }
+        for name in self.__previous_objects.keys() - objects.keys():
+            object_growth[name] = -self.__previous_objects[name]
+        self.__previous_objects = objects
+
+        if snapshot is None:
+            return MemoryReport(
+                traced=0,
+                overhead=0,
+                subsystems=[],
+                top=[],
+                sessions=sessions,
+                objects=objects,
+                object_growth=object_growth,
+                garbage=garbage,
+            )
+
+        # 按调用栈合并之后再归类 相同调用栈的分配只需归类一次
+        sizes: dict[str, int] = collections.defaultdict(int)
+        counts: dict[str, int] = collections.defaultdict(int)
+        lines: dict[tuple[str, int], list[int]] = {}
+        for statistic in snapshot.statistics("traceback"):
+            # Traceback 中最早的一帧在前 归类时从最近的一帧找起
+            frames = tuple((frame.filename, frame.lineno) for frame in reversed(statistic.traceback))
+            size, count = statistic.size, statistic.count
+            name = self.__attribute(frames)
+            if name is None:
+                continue
+            sizes[name] += size
+            counts[name] += count
+            # 导入机制的帧不是有意义的分配位置
+            location = next((frame for frame in frames if self.__label(frame[0]) != ""), frames[0])
+            line = lines.setdefault(location, [0, 0])
+            line[0] += size
+            line[1] += count
+
+        previous = self.__previous_subsystems
+        subsystems = sorted(
+            (
+                SubsystemMemory(
+                    name=name,
+                    size=size,
+                    count=counts[name],
+                    growth=size - previous.get(name, 0) if previous else 0,
+                )
+                for name, size in sizes.items()
+            ),
+            key=lambda subsystem: subsystem.size,
+            reverse=True,
+        )
+
+        top: list[AllocationGrowth] = []
+        if self.__previous_lines:
+            growths = sorted(
+                (
+                    (size - self.__previous_lines.get(location, 0), location, size, count)
+                    for location, (size, count) in lines.items()
+                ),
+                reverse=True,
+            )
+            for growth, (filename, lineno), size, count in growths[: self.__top]:
+                if growth <= 0:
+                    break
+                top.append(
+                    AllocationGrowth(
+                        location=f"{self.__relative(filename)}:{lineno}",
+                        size=size,
+                        growth=growth,
+                        count=count,
+                    )
+                )
+
+        self.__previous_lines = {location: size for location, (size, _) in lines.items()}
+        self.__previous_subsystems = dict(sizes)
+        return MemoryReport(
+            traced=sum(sizes.values()),
+            overhead=tracemalloc.get_tracemalloc_memory(),
+            subsystems=subsystems,
+            top=top,
+            sessions=sessions,
+            objects=objects,
+            object_growth=object_growth,
+            garbage=garbage,
+        )
+
+    def __attribute(self, frames: tuple[tuple[str, int], ...]) -> Optional[str]:
+        """
+        调用栈中最近的一帧本项目代码所在的子系统 没有时取最近一帧所在的包
+
+        分析器自身的分配返回空 导入机制的帧跳过
+        """
+        outside: Optional[str] = None
+        # 最近的一帧在前
+        for filename, _ in frames:
+            label = self.__label(filename)
+            if label is None:
+                return None
+            if not label:
+                continue
+            if label.startswith("."):
+                outside = outside or label[1:]
+                continue
+            return label
+        return outside or "other"
+
+    def __label(self, filename: str) -> Optional[str]:
+        """
+        文件所属的子系统 本项目之外的包以 `.` 开头 结果按文件名缓存
+
+        分析器自身返回空 导入机制返回空字符串
+        """
+        try:
+            return self.__labels[filename]
+        except KeyError:
+            pass
+        path = Path(filename)
+        parts = path.parts
+        label: Optional[str]
+        if filename in (__file__, tracemalloc.__file__):
+            label = None
+        elif filename.startswith("<frozen importlib"):
+            label = ""
+        elif "site-packages" in parts:
+            label = "." + parts[parts.index("site-packages") + 1].split(".")[0]
+        elif path.is_relative_to(ROOT):
+            relative = path.relative_to(ROOT).as_posix()
+            label = next(
+                (
+                    name
+                    for prefix, name in sorted(SUBSYSTEMS.items(), key=lambda item: -len(item[0]))
+                    if relative == prefix or relative.startswith(prefix + "/")
+                ),
+                ".other",
+            )
+        elif path.is_relative_to(_STDLIB):
+            # 标准库合为一项 asyncio 单独列出便于看出积压的任务与回调
+            label = ".asyncio" if path.relative_to(_STDLIB).parts[0] == "asyncio" else ".stdlib"
+        else:
+            label = ".other"
+        self.__labels[filename] = label
+        return label
+
+    @staticmethod
+    def __relative(filename: str) -> str:
+        path = Path(filename)
+        if "site-packages" in path.parts:
+            return "/".join(path.parts[path.parts.index("site-packages") + 1 :])
+        return path.relative_to(ROOT).as_posix() if path.is_relative_to(ROOT) else filename
+
+
+def collect_garbage() -> int:
+    """回收循环引用 返回回收与无法回收的对象数"""
+    return gc.collect() + len(gc.garbage)
+
+
+def count_objects() -> dict[str, int]:
+    """本项目各个类存活的实例数 不含诊断模块自身"""
+    counts: dict[str, int] = collections.defaultdict(int)
+    for obj in gc.get_objects():
+        kind = type(obj)
+        module = kind.__dict__.get("__module__")
+        if isinstance(module, str) and module.startswith(_PACKAGES) and not module.startswith(__package__):
+            counts[f"{module}.{kind.__qualname__}"] += 1
+    return dict(counts)
+
+
+def session_memory() -> list[SessionMemory]:
+    """通过 `gc` 找出所有存活的会话 统计各自持有的对象与 aioquic 缓冲"""
+    from service.connection.handler import WebTransportHandler, WebTransportStream
+    from service.connection.session import WebTransportSession
+
+    sessions: list[SessionMemory] = []
+    owned_types = (WebTransportSession, WebTransportHandler, WebTransportStream)
+    for obj in gc.get_objects():
+        if not isinstance(obj, WebTransportSession):
+            continue
+        session: Any = obj
+        send_buffer = receive_buffer = 0
+        quic_streams = session._quic._streams
+        for stream_id in session._streams:
+            quic_stream = quic_streams.get(stream_id)
+            if quic_stream is not None:
+                send_buffer += len(quic_stream.sender._buffer)
+                receive_buffer += len(quic_stream.receiver._buffer)
+        # 超出发送预算而留在调度器中的数据同样是慢速订阅者造成的积压
+        send_buffer += session._scheduler.held
+        # 服务端共用一个 UDP 套接字 取不到对端地址时改用 QUIC 的当前路径
+        client = session._session_info.client
+        if client is None and session._quic._network_paths:
+            client = session._quic._network_paths[0].addr
+        # 连接与事件循环由所有会话共享 不计入单个会话
+        shared = {id(session._h3), id(session._quic), id(session._transmit)}
+        sessions.append(
+            SessionMemory(
+                session_id=session.session_id,
+                path=str(session._session_info.path),
+                client=_address(client),
+                closed=session._closed,
+                streams=len(session._streams),
+                tasks=len(session._tasks),
+                datagrams=len(session._datagrams),
+                owned=owned_size(session, owned_types, shared),
+                send_buffer=send_buffer,
+                receive_buffer=receive_buffer,
+            )
+        )
+    return sessions
+
+
+def _address(client: Optional[tuple[str, int] | str]) -> str:
+    if isinstance(client, tuple):
+        return f"{client[0]}:{client[1]}"
+    return client or "-"
+
+
+def owned_size(root: object, owned_types: tuple[type, ...], shared: set[int]) -> int:
+    """
+    从 `root` 出发统计其持有的对象的字节数
+
+    只深入容器与 `owned_types` 的实例，其他对象只计入自身的大小，
+    类、函数与模块不计入，避免经由事件循环把整个进程都算进来
+    """
+    seen = set(shared)
+    size = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, (type, type(sys), type(owned_size))):
+            continue
+        size += sys.getsizeof(obj)
+        if isinstance(obj, _DATA):
+            continue
+        if isinstance(obj, _CONTAINERS + owned_types):
+            stack.extend(gc.get_referents(obj))
+    return size
+
+
+def render(report: MemoryReport) -> str:
+    """把报告整理成便于阅读的多行文本"""
+    kib = 1024
+    lines = [
+        f"追踪到 {report.traced / kib:.0f}KiB 追踪自身占用 {report.overhead / kib:.0f}KiB "
+        f"无法到达的对象 {report.garbage} 个 用时 {report.elapsed * 1000:.0f}ms"
+    ]
+    for subsystem in report.subsystems:
+        lines.append(
+            f"  {subsystem.name:<12}{subsystem.size / kib:>10.1f}KiB{subsystem.growth / kib:>+10.1f}KiB"
+            f"{subsystem.count:>9} 块"
+        )
+    if report.top:
+        lines.append("增长最多的分配位置")
+        for growth in report.top:
+            lines.append(f"  {growth.growth / kib:>+9.1f}KiB {growth.location}")
+    if report.object_growth:
+        lines.append("实例数变化")
+        for name, change in sorted(report.object_growth.items(), key=lambda item: -abs(item[1]))[:10]:
+            lines.append(f"  {change:>+6} {name}（共 {report.objects.get(name, 0)} 个）")
+    lines.append(f"存活的会话 {len(report.sessions)} 个")
+    for session in sorted(report.sessions, key=lambda s: s.send_buffer + s.owned, reverse=True):
+        lines.append(
+            f"  {session.client:<22}#{session.session_id:<4}{session.path:<20}{'已关闭' if session.closed else '':<4}"
+            f"对象 {session.owned / kib:>7.1f}KiB 发送缓冲 {session.send_buffer / kib:>8.1f}KiB "
+            f"接收缓冲 {session.receive_buffer / kib:>6.1f}KiB 流 {session.streams} 任务 {session.tasks}"
+        )
+    return "\n".join(lines)
+
+
+def install_memory_profiler(
+    profiler: Optional[MemoryProfiler] = None,
+) -> Optional[MemoryProfiler]:
+    """
+    用信号在运行中控制内存分析 不支持的平台返回空
+
+    收到 `SIGUSR1` 时输出一份报告并与上一次比较，还没有追踪时先开始追踪，
+    此时的报告作为之后比较的基准；收到 `SIGUSR2` 时停止追踪
+    """
+    if not hasattr(signal, "SIGUSR1"):
+        log.warning("当前平台不支持 SIGUSR1 无法在运行中开启内存分析")
+        return None
+    profiler = profiler or MemoryProfiler()
+    loop = asyncio.get_running_loop()
+    pending: set[asyncio.Task[None]] = set()
+
+    async def report() -> None:
+        try:
+            log.info(f"内存报告\n{render(await profiler.report())}")
+        except Exception as exc:
+            log.warning(f"生成内存报告出错 {exc}")
+
+    def on_report() -> None:
+        if not profiler.tracing:
+            profiler.start()
+        task = loop.create_task(report())
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    loop.add_signal_handler(signal.SIGUSR1, on_report)
+    loop.add_signal_handler(signal.SIGUSR2, profiler.stop)
+    return profiler
@@ -0,0 +1,257 @@
+"""
+采集线程、事件循环与工作线程在各个 CPU 上的放置
+
+Linux 上按线程编号设置 CPU 亲和性与调度策略，工作线程与子进程按名称前缀匹配；
+每个采样周期从 `/proc/self/task` 读取各线程的 CPU 时间，用于按数据调整放置
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from service.diagnostic.interface.dataclass import (
+    CpuPlacement,
+    PlacementConfig,
+    PlacementReport,
+    ThreadUsage,
+)
+
+if TYPE_CHECKING:
+    from service.controller.fetch import FetchService
+
+log = logging.getLogger(__name__)
+
+TASKS = Path("/proc/self/task")
+"""本进程各线程的内核信息"""
+
+
+def read_task(tid: int) -> Optional[tuple[int, int]]:
+    """读取线程累计的 CPU 时间（时钟滴答）与最近运行所在的 CPU 线程已结束时返回空"""
+    try:
+        stat = (TASKS / str(tid) / "stat").read_text()
+    except OSError:
+        return None
+    # 线程名可能带空格与括号 从最后一个右括号之后开始按空格切分
+    fields = stat[stat.rindex(")") + 2 :].split()
+    return int(fields[11]) + int(fields[12]), int(fields[36])
+
+
+def task_name(tid: int) -> str:
+    try:
+        return (TASKS / str(tid) / "comm").read_text().strip()
+    except OSError:
+        return "?"
+
+
+class ThreadPlacement:
+    """
+    线程放置管理器
+
+    在事件循环中启动，每个周期把新出现的线程按类别放到配置的 CPU 上并按需输出 CPU 占用，
+    已放置的线程类别变化时（例如采集源切换后换了回调线程）重新放置；
+    权限不足时只记录一次警告，服务照常运行
+    """
+
+    def __init__(self, config: PlacementConfig, fetch: Optional["FetchService"] = None) -> None:
+        self.config = config
+        self.__fetch = fetch
+        self.__supported = hasattr(os, "sched_setaffinity") and TASKS.is_dir()
+        self.__available: frozenset[int] = (
+            frozenset(os.sched_getaffinity(0)) if self.__supported else frozenset()
+        )
+        """进程启动时可用的 CPU 事件循环线程被放置之后再读取就只剩它自己的 CPU"""
+        self.__loop_tid: Optional[int] = None
+        self.__placed: dict[int, str] = {}
+        """已放置的线程或子进程及其类别"""
+        self.__warned: set[str] = set()
+        self.__ticks = os.sysconf("SC_CLK_TCK") if self.__supported else 100
+        self.__previous: dict[int, int] = {}
+        self.__sampled = time.monotonic()
+        self.__task: Optional[asyncio.Task[None]] = None
+        self.last: Optional[PlacementReport] = None
+        """最近一次采样"""
+
+    @property
+    def available(self) -> frozenset[int]:
+        return self.__available
+
+    def start(self) -> None:
+        """把调用者所在的线程当作事件循环线程 立即放置一次并开始周期检查"""
+        if self.__task is not None:
+            return
+        if not self.__supported:
+            log.warning("当前平台不支持按线程设置 CPU 亲和性 不放置线程")
+            return
+        self.__loop_tid = threading.get_native_id()
+        self.apply()
+        self.sample()
+        self.__task = asyncio.create_task(self.__run())
+        log.info(f"线程放置已开启 可用的 CPU {sorted(self.__available)}")
+
+    def stop(self) -> None:
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+
+    def apply(self) -> None:
+        """放置新出现或类别变化的线程与子进程"""
+        if not self.__supported:
+            return
+        roles = self.__classify()
+        for tid, role in roles.items():
+            if self.__placed.get(tid) == role:
+                continue
+            self.__placed[tid] = role
+            self.__place(tid, role, self.__rule(role))
+        # 已经结束的线程与子进程不再记录
+        for tid in self.__placed.keys() - roles.keys():
+            del self.__placed[tid]
+
+    def sample(self) -> PlacementReport:
+        """读取各线程自上一次采样以来的 CPU 占用 开启时采样一次作为起点"""
+        now = time.monotonic()
+        elapsed = max(now - self.__sampled, 1e-6)
+        names = {thread.native_id: thread.name for thread in threading.enumerate()}
+        current: dict[int, int] = {}
+        threads: list[ThreadUsage] = []
+        for entry in TASKS.iterdir() if self.__supported else ():
+            tid = int(entry.name)
+            task = read_task(tid)
+            if task is None:
+                continue
+            total, processor = task
+            current[tid] = total
+            used = (total - self.__previous.get(tid, total)) / self.__ticks
+            try:
+                cpus = frozenset(os.sched_getaffinity(tid))
+            except OSError:
+                continue
+            threads.append(
+                ThreadUsage(
+                    tid=tid,
+                    name=names.get(tid) or task_name(tid),
+                    role=self.__placed.get(tid, "other"),
+                    cpu=used / elapsed,
+                    cpus=cpus,
+                    processor=processor,
+                )
+            )
+        self.__previous = current
+        self.__sampled = now
+        threads.sort(key=lambda usage: usage.cpu, reverse=True)
+        self.last = PlacementReport(threads=threads, elapsed=elapsed)
+        return self.last
+
+    async def __run(self) -> None:
+        reported = time.monotonic()
+        while True:
+            await asyncio.sleep(self.config.interval)
+            try:
+                self.apply()
+                # 采样周期就是两次报告之间 不输出报告时由调用者自己采样
+                if self.config.report is not None and time.monotonic() - reported >= self.config.report:
+                    reported = time.monotonic()
+                    log.info(f"各线程的 CPU 占用\n{render(self.sample())}")
+            except Exception as exc:
+                log.warning(f"线程放置出错 {exc}")
+
+    def __classify(self) -> dict[int, str]:
+        """本进程的线程与子进程各自归入的类别 以线程编号或进程号为键"""
+        prefixes = sorted(self.config.pools, key=len, reverse=True)
+
+        def pool(name: str) -> Optional[str]:
+            return next((prefix for prefix in prefixes if name.startswith(prefix)), None)
+
+        roles: dict[int, str] = {}
+        for entry in TASKS.iterdir():
+            roles[int(entry.name)] = "other"
+        for thread in threading.enumerate():
+            prefix = pool(thread.name)
+            if prefix is not None and thread.native_id in roles:
+                roles[thread.native_id] = prefix
+        for child in multiprocessing.active_children():
+            prefix = pool(child.name)
+            if prefix is not None and child.pid is not None:
+                roles[child.pid] = prefix
+        if self.__loop_tid is not None:
+            roles[self.__loop_tid] = "loop"
+        capture = self.__fetch.capture_thread if self.__fetch is not None else None
+        if capture is not None and capture in roles:
+            roles[capture] = "capture"
+        return roles
+
+    def __rule(self, role: str) -> CpuPlacement:
+        match role:
+            case "capture":
+                return self.config.capture
+            case "loop":
+                return self.config.loop
+            case "other":
+                return self.config.other
+        return self.config.pools[role]
+
+    def __place(self, tid: int, role: str, rule: CpuPlacement) -> None:
+        # 新线程继承创建者的 CPU 与 nice 值 工作线程大多由事件循环创建
+        # 除采集线程与事件循环外 没有配置的项恢复为进程启动时的 CPU 与 nice 0 而不是保持原样
+        inherited = role not in ("capture", "loop")
+        wanted = rule.cpus if rule.cpus is not None or not inherited else self.__available
+        nice = rule.nice if rule.nice is not None or not inherited else 0
+        try:
+            if wanted is not None:
+                cpus = wanted & self.__available
+                if cpus:
+                    os.sched_setaffinity(tid, cpus)
+                else:
+                    self.__warn(role, f"{role} 配置的 CPU {sorted(wanted)} 都不可用 保持原样")
+            if rule.realtime is not None:
+                try:
+                    os.sched_setscheduler(tid, os.SCHED_FIFO, os.sched_param(rule.realtime))
+                except PermissionError:
+                    self.__warn(f"{role}.realtime", f"没有权限把 {role} 设为实时调度 保持普通调度")
+            elif inherited and os.sched_getscheduler(tid) != os.SCHED_OTHER:
+                # 由实时调度的线程创建时同样继承了实时优先级
+                os.sched_setscheduler(tid, os.SCHED_OTHER, os.sched_param(0))
+            if nice is not None:
+                try:
+                    os.setpriority(os.PRIO_PROCESS, tid, nice)
+                except PermissionError:
+                    self.__warn(f"{role}.nice", f"没有权限把 {role} 的 nice 值设为 {nice}")
+            if role != "other":
+                log.info(f"{role} 线程 {tid} 已放置到 CPU {sorted(os.sched_getaffinity(tid))}")
+        except ProcessLookupError:
+            # 线程在放置前已经结束
+            pass
+        except OSError as exc:
+            self.__warn(role, f"放置 {role} 线程 {tid} 出错 {exc}")
+
+    def __warn(self, key: str, message: str) -> None:
+        if key in self.__warned:
+            return
+        self.__warned.add(key)
+        log.warning(message)
+
+
+def render(report: PlacementReport) -> str:
+    """把采样整理成便于阅读的多行文本"""
+    lines = [f"采样周期 {report.elapsed:.1f}s 合计 {sum(t.cpu for t in report.threads):.1%}"]
+    for usage in report.threads:
+        lines.append(
+            f"  {usage.tid:>7} {usage.name:<24}{usage.role:<20}{usage.cpu:>7.1%}  "
+            f"CPU {','.join(map(str, sorted(usage.cpus))):<10} 最近在 {usage.processor}"
+        )
+    return "\n".join(lines)
+
+
+def start_placement(
+    config: PlacementConfig,
+    fetch: Optional["FetchService"] = None,
+) -> ThreadPlacement:
+    """在事件循环线程中开启线程放置"""
+    placement = ThreadPlacement(config, fetch)
+    placement.start()
+    return placement
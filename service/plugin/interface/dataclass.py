@@ -1,5 +1,12 @@
 from dataclasses import dataclass
 
+from service.controller.interface.dataclass import (
+    CaptureChannel,
+    CaptureDtype,
+    CaptureSampleRate,
+)
+from service.plugin.interface.enum import PluginKind, TapMode
+
 
 @dataclass(frozen=True)
 class PluginInfo:
@@ -19,3 +26,54 @@ class PluginInfo:
 
     version: str
     """插件的版本"""
+
+
+@dataclass(frozen=True)
+class PluginEntry:
+    """插件清单中记录的单个插件 无需导入插件模块即可得知"""
+
+    folder: str
+    """插件所在的文件夹名"""
+
+    mtime: float
+    """插件 `plugin.py` 的修改时间 变化后需要重新导入确认"""
+
+    kind: PluginKind
+    """插件的种类"""
+
+    info: PluginInfo
+    """插件的信息"""
+
+    tap: bool = False
+    """插件是否声明了 `tap_info` 需要接收广播信号"""
+
+
+@dataclass(frozen=True)
+class TapInfo:
+    """插件希望以何种格式接收广播信号"""
+
+    samplerate: CaptureSampleRate = CaptureSampleRate.R16000
+    """采样率 需要能整除采集的采样率"""
+
+    channel: CaptureChannel = CaptureChannel.Mono
+    """声道模式"""
+
+    dtype: CaptureDtype = CaptureDtype.Bit16
+    """位数"""
+
+    mode: TapMode = TapMode.THREAD
+    """接收方式"""
+
+    slots: int = 8
+    """共享内存中可以积压的帧数 积压满后新的帧会被丢弃"""
+
+
+@dataclass(frozen=True)
+class TapStats:
+    """插件接收广播信号的统计"""
+
+    delivered: int
+    """已交给插件的帧数"""
+
+    dropped: int
+    """因插件处理不及而丢弃的帧数"""
@@ -0,0 +1,21 @@
+from enum import Enum
+
+
+class PluginKind(Enum):
+    """插件的种类"""
+
+    DATABASE = "database"
+    """数据库插件"""
+
+    ROBOT = "robot"
+    """智能体插件"""
+
+
+class TapMode(Enum):
+    """插件接收广播信号的方式"""
+
+    THREAD = "thread"
+    """在独立线程中接收 适合会释放 GIL 的工作"""
+
+    PROCESS = "process"
+    """在独立子进程中接收 适合纯 Python 的重计算 子进程中的插件由 `create_plugin()` 重新创建"""
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
+from typing import Any, Optional
 
-from service.plugin.interface.dataclass import PluginInfo
+from service.plugin.interface.dataclass import PluginInfo, TapInfo
 
 
 class DatabasePlugin(ABC):
@@ -9,10 +10,41 @@ class DatabasePlugin(ABC):
     plugin_info: PluginInfo
     """数据库插件的信息"""
 
+    tap_info: Optional[TapInfo] = None
+    """数据库插件接收广播信号的格式 不需要广播信号时为空"""
+
     @abstractmethod
     async def setup(self, context) -> None:
         """
         数据库插件初始化过程
 
-        可以在这里进行初始化数据库与连接数据库等操作
+        可以在这里进行初始化数据库与连接数据库等操作，
+        完成后调用 `context.attach(self)` 成为服务端的存储后端
+        """
+
+    @abstractmethod
+    async def write_batch(self, table: str, rows: list[dict[str, Any]]) -> None:
+        """
+        在一个事务中写入同一张表的多行
+
+        由回写队列攒批后调用，带有 `key` 的行按键覆盖
+        """
+
+    @abstractmethod
+    async def read(self, table: str, key: str) -> Optional[dict[str, Any]]:
+        """按键读取一行 不存在时返回 `None`"""
+
+    async def close(self) -> None:
+        """
+        数据库插件关闭过程
+
+        回写队列中的行全部写入之后由 `DatabaseContext.close()` 调用，
+        可以在这里关闭连接与工作线程
+        """
+
+    def on_tap(self, frame: bytes) -> None:
+        """
+        数据库插件收到一帧广播信号
+
+        在独立线程或子进程中调用，可以放心做耗时的计算
         """
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
+from typing import Optional
 
-from service.plugin.interface.dataclass import PluginInfo
+from service.plugin.interface.dataclass import PluginInfo, TapInfo
 
 
 class RobotPlugin(ABC):
@@ -9,6 +10,16 @@ class RobotPlugin(ABC):
     plugin_info: PluginInfo
     """智能体插件的信息"""
 
+    tap_info: Optional[TapInfo] = None
+    """智能体插件接收广播信号的格式 不需要广播信号时为空"""
+
     @abstractmethod
     async def setup(self, context) -> None:
         """智能体插件初始化过程"""
+
+    def on_tap(self, frame: bytes) -> None:
+        """
+        智能体插件收到一帧广播信号
+
+        在独立线程或子进程中调用，可以放心做耗时的计算
+        """
@@ -1,33 +1,265 @@
+import asyncio
+import json
+import logging
+from dataclasses import asdict
 from importlib.util import spec_from_file_location, module_from_spec
 from pathlib import Path
 from types import ModuleType
-from typing import Union
+from typing import TYPE_CHECKING, Any, Optional, Union
 
+from service.plugin.interface.dataclass import PluginEntry, PluginInfo, TapStats
+from service.plugin.interface.enum import PluginKind
 from service.plugin.model.database import DatabasePlugin
 from service.plugin.model.robot import RobotPlugin
+from service.plugin.tap import AudioTap
+
+if TYPE_CHECKING:
+    from service.controller import FetchService
 
 PluginModel = Union[DatabasePlugin, RobotPlugin]
 
+log = logging.getLogger(__name__)
+
 
 class PluginRegistry:
-    def __init__(self) -> None:
+    """
+    插件注册表
+
+    插件清单缓存在插件目录的 `.manifest.json` 中，清单有效时无需扫描目录，
+    插件模块也要等到第一次被使用时才会在工作线程中导入：
+    只有种类有对应上下文或声明了 `tap_info` 的插件会被初始化，
+    其余插件在有调用者 `get()` 之前不会被导入
+    """
+
+    MANIFEST = ".manifest.json"
+    """插件清单的文件名"""
+
+    def __init__(self, root: Path = Path("plugin")) -> None:
+        self.__root = root
+        """插件目录"""
+
+        self.__entries: dict[str, PluginEntry] = dict()
+        """插件名称对应的清单条目"""
+
         self.__plugins: dict[str, PluginModel] = dict()
+        """已经导入的插件"""
+
+        self.__loading: dict[str, asyncio.Task[PluginModel]] = dict()
+        """正在导入的插件 防止同一插件被重复导入"""
+
+        self.__broken: dict[str, float] = dict()
+        """导入失败的插件文件夹及其修改时间 修改后才会重试"""
+
+        self.__taps: dict[str, AudioTap] = dict()
+        """正在接收广播信号的插件"""
+
+    @property
+    def entries(self) -> dict[str, PluginEntry]:
+        return dict(self.__entries)
+
+    @property
+    def tap_stats(self) -> dict[str, TapStats]:
+        """各插件接收广播信号的统计 包含丢弃的帧数"""
+        return {name: tap.stats for name, tap in self.__taps.items()}
+
+    async def discover(self) -> None:
+        """根据插件清单得知有哪些插件 清单过期时才重新扫描插件目录"""
+        # 没有插件目录时不加载任何插件
+        if not self.__root.is_dir():
+            return
+
+        cached = await asyncio.to_thread(self.__read_manifest)
+        if cached is not None:
+            self.__entries = cached
+            log.info(f"已从插件清单得知 {len(cached)} 个插件")
+            return
 
-    def load(self) -> None:
-        for folder in Path("plugin").iterdir():
-            # 不处理根目录文件
-            if not folder.is_dir():
+        folders = await asyncio.to_thread(self.__scan)
+        results = await asyncio.gather(
+            *[asyncio.to_thread(self.__import, folder) for folder in folders],
+            return_exceptions=True,
+        )
+        entries: dict[str, PluginEntry] = dict()
+        self.__broken.clear()
+        for folder, result in zip(folders, results):
+            if isinstance(result, BaseException):
+                log.warning(f"插件 {folder} 导入失败 {result}")
+                module_path = self.__root / folder / "plugin.py"
+                self.__broken[folder] = module_path.stat().st_mtime
                 continue
-            # 只导入有 plugin.py 的文件夹
-            module_path = folder / "plugin.py"
-            if not module_path.exists():
+            entry = self.__describe(folder, result)
+            entries[entry.info.name] = entry
+            self.__plugins[entry.info.name] = result
+
+        self.__entries = entries
+        await asyncio.to_thread(self.__write_manifest)
+        log.info(f"已扫描插件目录并更新插件清单 共 {len(entries)} 个插件")
+
+    async def get(self, name: str) -> PluginModel:
+        """获取插件 第一次使用时才在工作线程中导入"""
+        if name in self.__plugins:
+            return self.__plugins[name]
+        if name not in self.__entries:
+            raise KeyError(f"插件 {name} 不存在")
+
+        task = self.__loading.get(name)
+        if task is None:
+            folder = self.__entries[name].folder
+            task = asyncio.create_task(asyncio.to_thread(self.__import, folder))
+            self.__loading[name] = task
+        try:
+            plugin = await task
+        finally:
+            self.__loading.pop(name, None)
+        self.__plugins[name] = plugin
+        return plugin
+
+    async def setup(
+        self,
+        contexts: Optional[dict[PluginKind, Any]] = None,
+        timeout: float = 10.0,
+    ) -> dict[str, bool]:
+        """
+        并发导入并初始化有使用者的插件 单个插件超时或出错不会影响其他插件
+
+        种类有对应上下文或需要接收广播信号的插件才有使用者，
+        导入与 `setup()` 共用同一个超时
+        """
+        contexts = contexts or dict()
+        names = [
+            name
+            for name, entry in self.__entries.items()
+            if entry.kind in contexts or entry.tap
+        ]
+        results = await asyncio.gather(
+            *[
+                self.__setup_one(name, contexts.get(self.__entries[name].kind), timeout)
+                for name in names
+            ]
+        )
+        return dict(zip(names, results))
+
+    async def start_taps(self, fetch: "FetchService") -> None:
+        """让声明了 `tap_info` 的插件开始在事件循环之外接收广播信号"""
+        for name, entry in self.__entries.items():
+            # 清单中记录了是否声明 tap_info 不接收广播信号的插件无需导入
+            if name in self.__taps or not entry.tap:
+                continue
+            try:
+                plugin = await self.get(name)
+                if plugin.tap_info is None:
+                    continue
+                tap = AudioTap(
+                    plugin=plugin,
+                    module_path=self.__root / entry.folder / "plugin.py",
+                    config=fetch.config,
+                )
+                tap.start()
+            except Exception as exc:
+                log.warning(f"插件 {name} 无法接收广播信号 {exc}")
                 continue
+            fetch.subscribe(id(tap), tap.push, on_format=tap.reformat)
+            self.__taps[name] = tap
+
+    def stop_taps(self, fetch: "FetchService") -> None:
+        """停止所有插件接收广播信号"""
+        for tap in self.__taps.values():
+            fetch.unsubscribe(id(tap))
+            tap.stop()
+        self.__taps.clear()
+
+    async def __setup_one(self, name: str, context: Any, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self.__prepare(name, context), timeout=timeout)
+        except TimeoutError:
+            log.warning(f"插件 {name} 初始化超过 {timeout} 秒 已放弃")
+            return False
+        except Exception as exc:
+            log.warning(f"插件 {name} 初始化出错 {exc}")
+            return False
+        log.info(f"插件 {name} 已完成初始化")
+        return True
+
+    async def __prepare(self, name: str, context: Any) -> None:
+        plugin = await self.get(name)
+        await plugin.setup(context)
+
+    def __scan(self) -> list[str]:
+        # 只导入有 plugin.py 的文件夹
+        return sorted(
+            folder.name
+            for folder in self.__root.iterdir()
+            if folder.is_dir() and (folder / "plugin.py").exists()
+        )
+
+    def __import(self, folder: str) -> PluginModel:
+        module_path = self.__root / folder / "plugin.py"
+        spec = spec_from_file_location(folder, module_path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"无法导入 {module_path}")
+        moudle: ModuleType = module_from_spec(spec)
+        spec.loader.exec_module(moudle)
+        return moudle.create_plugin()
+
+    def __describe(self, folder: str, plugin: PluginModel) -> PluginEntry:
+        if isinstance(plugin, DatabasePlugin):
+            kind = PluginKind.DATABASE
+        elif isinstance(plugin, RobotPlugin):
+            kind = PluginKind.ROBOT
+        else:
+            raise TypeError(f"插件 {folder} 的类型无法识别")
+        return PluginEntry(
+            folder=folder,
+            mtime=(self.__root / folder / "plugin.py").stat().st_mtime,
+            kind=kind,
+            info=plugin.plugin_info,
+            tap=plugin.tap_info is not None,
+        )
+
+    def __read_manifest(self) -> Optional[dict[str, PluginEntry]]:
+        """读取插件清单 目录或任一插件有变动时视为过期"""
+        manifest_path = self.__root / self.MANIFEST
+        try:
+            # 清单写入之后插件目录中增删文件夹会让目录比清单更新
+            if self.__root.stat().st_mtime > manifest_path.stat().st_mtime:
+                return None
+            manifest = json.loads(manifest_path.read_text())
+            entries: dict[str, PluginEntry] = dict()
+            for item in manifest["plugins"]:
+                entry = PluginEntry(
+                    folder=item["folder"],
+                    mtime=item["mtime"],
+                    kind=PluginKind(item["kind"]),
+                    info=PluginInfo(**item["info"]),
+                    tap=item["tap"],
+                )
+                module_path = self.__root / entry.folder / "plugin.py"
+                if module_path.stat().st_mtime != entry.mtime:
+                    return None
+                entries[entry.info.name] = entry
+            for folder, mtime in manifest["broken"].items():
+                if (self.__root / folder / "plugin.py").stat().st_mtime != mtime:
+                    return None
+            self.__broken = manifest["broken"]
+            return entries
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
 
-            # 分配导入插件
-            spec = spec_from_file_location(folder.name, module_path)
-            if spec:
-                moudle: ModuleType = module_from_spec(spec)
-                if spec.loader:
-                    spec.loader.exec_module(moudle)
-                plugin: PluginModel = moudle.create_plugin()
-                self.__plugins[plugin.plugin_info.name] = plugin
+    def __write_manifest(self) -> None:
+        manifest_path = self.__root / self.MANIFEST
+        plugins = [
+            {
+                "folder": entry.folder,
+                "mtime": entry.mtime,
+                "kind": entry.kind.value,
+                "info": asdict(entry.info),
+                "tap": entry.tap,
+            }
+            for entry in self.__entries.values()
+        ]
+        manifest = {"plugins": plugins, "broken": self.__broken}
+        try:
+            # 目录的修改时间与清单自身比较 只需写入一次
+            manifest_path.write_text(json.dumps(manifest, indent=2))
+        except OSError as exc:
+            log.warning(f"插件清单写入失败 {exc}")
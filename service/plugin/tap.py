@@ -0,0 +1,319 @@
+"""把广播信号通过共享内存交给插件 插件的计算不会占用事件循环"""
+
+import logging
+import multiprocessing
+import struct
+import threading
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from service.controller.interface.dataclass import CaptureConfig
+from service.controller.source import sample_width
+from service.plugin.interface.dataclass import TapInfo, TapStats
+from service.plugin.interface.enum import TapMode
+
+log = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<QQQ")
+"""共享内存头部 依次为写入序号、读取序号、丢弃帧数"""
+
+_LENGTH = struct.Struct("<I")
+"""每个槽位开头记录的帧长度"""
+
+_context = multiprocessing.get_context("spawn")
+
+
+class TapChannel:
+    """
+    单生产者单消费者的共享内存环形队列
+
+    写入方只修改写入序号与丢弃计数，读取方只修改读取序号，
+    两者之间用信号量通知，写满时直接丢弃新帧而不会阻塞写入方
+    """
+
+    def __init__(
+        self,
+        slots: int,
+        slot_size: int,
+        name: Optional[str] = None,
+        semaphore: Any = None,
+    ) -> None:
+        self._slots = slots
+        self._slot_size = slot_size
+        self._stride = _LENGTH.size + slot_size
+        self._owner = name is None
+        self._shm = SharedMemory(
+            name=name,
+            create=self._owner,
+            size=_HEADER.size + slots * self._stride,
+            track=self._owner,
+        )
+        if self._owner:
+            _HEADER.pack_into(self._shm.buf, 0, 0, 0, 0)
+        self._semaphore = semaphore or _context.Semaphore(0)
+        self._write_seq = 0
+        self._read_seq = 0
+
+    def __reduce__(self):
+        # 子进程按名称重新打开同一块共享内存
+        return (
+            TapChannel,
+            (self._slots, self._slot_size, self._shm.name, self._semaphore),
+        )
+
+    @property
+    def dropped(self) -> int:
+        return _HEADER.unpack_from(self._shm.buf, 0)[2]
+
+    @property
+    def delivered(self) -> int:
+        return _HEADER.unpack_from(self._shm.buf, 0)[1]
+
+    def put(self, frame: bytes) -> bool:
+        """写入一帧 队列已满或帧过大时丢弃并返回 `False`"""
+        _, read_seq, dropped = _HEADER.unpack_from(self._shm.buf, 0)
+        if self._write_seq - read_seq >= self._slots or len(frame) > self._slot_size:
+            struct.pack_into("<Q", self._shm.buf, 16, dropped + 1)
+            return False
+
+        offset = _HEADER.size + (self._write_seq % self._slots) * self._stride
+        _LENGTH.pack_into(self._shm.buf, offset, len(frame))
+        start = offset + _LENGTH.size
+        self._shm.buf[start : start + len(frame)] = frame
+        self._write_seq += 1
+        struct.pack_into("<Q", self._shm.buf, 0, self._write_seq)
+        self._semaphore.release()
+        return True
+
+    def get(self, timeout: float) -> Optional[bytes]:
+        """读取一帧 超时或被 `wake` 唤醒时返回 `None`"""
+        if not self._semaphore.acquire(timeout=timeout):
+            return None
+        if self._read_seq >= _HEADER.unpack_from(self._shm.buf, 0)[0]:
+            return None
+        offset = _HEADER.size + (self._read_seq % self._slots) * self._stride
+        (length,) = _LENGTH.unpack_from(self._shm.buf, offset)
+        start = offset + _LENGTH.size
+        frame = bytes(self._shm.buf[start : start + length])
+        self._read_seq += 1
+        struct.pack_into("<Q", self._shm.buf, 8, self._read_seq)
+        return frame
+
+    def wake(self) -> None:
+        """让等待中的读取方立即返回 用于停止时不必等到读取超时"""
+        self._semaphore.release()
+
+    def close(self) -> None:
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _convert(config: CaptureConfig, tap_info: TapInfo) -> Callable[[bytes], bytes]:
+    """构造把采集格式转换为插件所需格式的函数"""
+    same_format = (
+        config.samplerate == tap_info.samplerate
+        and config.channel == tap_info.channel
+        and config.dtype == tap_info.dtype
+    )
+    if same_format:
+        return lambda frame: frame
+
+    from service.controller import pcm
+
+    factor = config.samplerate.value // tap_info.samplerate.value
+    channels = config.channel.value
+
+    def convert(frame: bytes) -> bytes:
+        samples = pcm.decode(frame, config.dtype, channels)
+        if tap_info.channel.value == 1:
+            samples = pcm.downmix(samples)
+        return pcm.encode(pcm.decimate(samples, factor), tap_info.dtype)
+
+    return convert
+
+
+def _consume(
+    channel: TapChannel,
+    plugin: Any,
+    config: CaptureConfig,
+    stop: Any,
+) -> None:
+    """在独立线程或子进程中把广播信号交给插件"""
+    convert = _convert(config, plugin.tap_info)
+    while not stop.is_set():
+        frame = channel.get(timeout=0.5)
+        if frame is None:
+            continue
+        try:
+            plugin.on_tap(convert(frame))
+        except Exception as exc:
+            log.warning(f"插件 {plugin.plugin_info.name} 处理广播信号出错 {exc}")
+
+
+def _consume_in_process(
+    channel: TapChannel,
+    module_path: str,
+    config: CaptureConfig,
+    stop: Any,
+) -> None:
+    """子进程入口 插件在子进程中重新创建"""
+    from importlib.util import module_from_spec, spec_from_file_location
+
+    spec = spec_from_file_location(Path(module_path).parent.name, module_path)
+    assert spec and spec.loader
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    try:
+        _consume(channel, module.create_plugin(), config, stop)
+    finally:
+        channel.close()
+
+
+def _release(worker: threading.Thread, channel: TapChannel) -> None:
+    """等待接收线程退出后释放共享内存"""
+    worker.join()
+    channel.close()
+
+
+class AudioTap:
+    """单个插件的广播信号接收端"""
+
+    def __init__(self, plugin: Any, module_path: Path, config: CaptureConfig) -> None:
+        self._check(plugin.tap_info, config)
+        self._plugin = plugin
+        self._module_path = module_path
+        self._config = config
+        self._channel: Optional[TapChannel] = None
+        self._stop: Any = None
+        self._worker: Optional[threading.Thread | multiprocessing.process.BaseProcess] = None
+
+    @staticmethod
+    def _check(tap_info: TapInfo, config: CaptureConfig) -> None:
+        if config.samplerate.value % tap_info.samplerate.value:
+            raise ValueError(
+                f"{tap_info.samplerate.value}Hz 无法由 {config.samplerate.value}Hz 整数倍降采样得到"
+            )
+        if tap_info.channel.value > config.channel.value:
+            raise ValueError("插件需要的声道数多于采集的声道数")
+
+    @property
+    def name(self) -> str:
+        return self._plugin.plugin_info.name
+
+    @property
+    def stats(self) -> TapStats:
+        if self._channel is None:
+            return TapStats(delivered=0, dropped=0)
+        return TapStats(
+            delivered=self._channel.delivered,
+            dropped=self._channel.dropped,
+        )
+
+    def start(self) -> None:
+        tap_info: TapInfo = self._plugin.tap_info
+        frame_bytes = (
+            self._config.blocksize.value
+            * self._config.channel.value
+            * sample_width(self._config.dtype)
+        )
+        self._channel = TapChannel(slots=tap_info.slots, slot_size=frame_bytes)
+        match tap_info.mode:
+            case TapMode.THREAD:
+                self._stop = threading.Event()
+                self._worker = threading.Thread(
+                    target=_consume,
+                    args=(self._channel, self._plugin, self._config, self._stop),
+                    name=f"AudioTap-{self.name}",
+                    daemon=True,
+                )
+            case TapMode.PROCESS:
+                self._stop = _context.Event()
+                self._worker = _context.Process(
+                    target=_consume_in_process,
+                    args=(self._channel, str(self._module_path), self._config, self._stop),
+                    name=f"AudioTap-{self.name}",
+                    daemon=True,
+                )
+        self._worker.start()
+        where = "线程" if tap_info.mode == TapMode.THREAD else "子进程"
+        log.info(f"插件 {self.name} 开始在独立{where}中接收广播信号")
+
+    async def reformat(self, config: CaptureConfig) -> None:
+        """
+        采集配置变化后按新的格式重新开始接收 新格式无法转换时停止接收
+
+        在分发服务中调用，新的接收端立即开始，旧的接收端在后台线程中等待插件退出，
+        插件手头的计算不会推迟其他订阅者收到新格式的帧
+        """
+        retired = self._detach()
+        try:
+            self._check(self._plugin.tap_info, config)
+        except ValueError as exc:
+            log.warning(f"插件 {self.name} 无法接收新的广播信号格式 {exc}")
+        else:
+            self._config = config
+            self.start()
+        if retired is not None:
+            threading.Thread(
+                target=self._retire,
+                args=retired,
+                name=f"AudioTap-{self.name}-retire",
+                daemon=True,
+            ).start()
+
+    async def push(self, frame: bytes) -> None:
+        """分发服务的订阅回调 只做一次内存拷贝"""
+        if self._channel is not None:
+            self._channel.put(frame)
+
+    def stop(self) -> None:
+        """
+        停止接收广播信号
+
+        插件没有及时结束时，子进程被终止；线程无法终止，共享内存留到它处理完手头的帧
+        退出之后再释放，以免线程访问已经释放的内存
+        """
+        retired = self._detach()
+        if retired is not None:
+            self._retire(*retired)
+
+    def _detach(
+        self,
+    ) -> Optional[tuple[threading.Thread | multiprocessing.process.BaseProcess, TapChannel]]:
+        """通知当前的接收端停止并交出它 等待中的接收端立即醒来"""
+        if self._worker is None or self._channel is None:
+            return None
+        worker, channel = self._worker, self._channel
+        self._worker = self._channel = None
+        self._stop.set()
+        channel.wake()
+        return worker, channel
+
+    def _retire(
+        self,
+        worker: threading.Thread | multiprocessing.process.BaseProcess,
+        channel: TapChannel,
+    ) -> None:
+        """等待已通知停止的接收端退出并释放它的共享内存"""
+        worker.join(timeout=2)
+        stats = TapStats(delivered=channel.delivered, dropped=channel.dropped)
+        log.info(
+            f"插件 {self.name} 停止接收广播信号 共收到 {stats.delivered} 帧 丢弃 {stats.dropped} 帧"
+        )
+        if not worker.is_alive():
+            channel.close()
+        elif isinstance(worker, threading.Thread):
+            log.warning(f"插件 {self.name} 没有及时停止 共享内存在它的线程退出后释放")
+            threading.Thread(
+                target=_release,
+                args=(worker, channel),
+                name=f"AudioTap-{self.name}-release",
+                daemon=True,
+            ).start()
+        else:
+            log.warning(f"插件 {self.name} 没有及时停止 终止它的子进程")
+            worker.terminate()
+            worker.join()
+            channel.close()
@@ -1 +1,31 @@
 """利用 AI 实时分析节目消息的模块 简单的分析通过 VAD 复杂的分析交给 LLM"""
+
+import logging
+from typing import Callable, Optional
+
+from service.controller.fetch import FetchService
+from service.robot.classifier import SegmentClassifier
+from service.robot.interface.dataclass import ClassifierConfig, Segment
+from service.robot.interface.enum import SegmentLabel
+from service.robot.segmenter import ProgrammeSegmenter
+
+__all__ = [
+    "SegmentClassifier",
+    "ProgrammeSegmenter",
+    "ClassifierConfig",
+    "Segment",
+    "SegmentLabel",
+]
+
+log = logging.getLogger(__name__)
+
+
+def start_segment_service(
+    fetch: FetchService,
+    config: Optional[ClassifierConfig] = None,
+    on_segment: Optional[Callable[[Segment], None]] = None,
+) -> ProgrammeSegmenter:
+    """启动节目分段服务 之后只需把感兴趣的片段交给代价更高的分析"""
+    segmenter = ProgrammeSegmenter(fetch, config=config, on_segment=on_segment)
+    segmenter.start()
+    return segmenter
@@ -0,0 +1,158 @@
+"""按块增量地把节目分为人声、音乐与静音"""
+
+import math
+from typing import Optional
+
+import numpy as np
+
+from service.robot.interface.dataclass import ClassifierConfig, Segment
+from service.robot.interface.enum import SegmentLabel
+
+
+class SegmentClassifier:
+    """
+    增量的节目片段分类器
+
+    每收到一块单声道采样，就把凑满的短窗整理成矩阵，一次算出所有短窗的
+    能量、过零率、频谱质心与归一化频谱之差，不足一个短窗的尾巴留到下一块；
+    凑满一个判决周期后按低能量比例、高过零率比例、质心起伏与频谱变化判决一次，
+    新的类别连续出现 `hold` 次才确认边界，边界落在它第一次出现的判决周期开头
+    """
+
+    def __init__(self, samplerate: int, config: Optional[ClassifierConfig] = None) -> None:
+        self.config = config or ClassifierConfig()
+        self.samplerate = samplerate
+        self.__window = max(round(samplerate * self.config.window), 2)
+        self.__per_decision = max(round(self.config.decision / self.config.window), 2)
+        self.__taper = np.hanning(self.__window).astype(np.float32)
+        self.__bins = np.fft.rfftfreq(self.__window, 1 / samplerate).astype(np.float32)
+
+        self.__tail = np.zeros(0, dtype=np.float32)
+        """不足一个短窗的采样"""
+
+        self.__spectrum: Optional[np.ndarray] = None
+        """上一个短窗的归一化频谱 用于计算跨块的频谱之差"""
+
+        self.__energy: list[np.ndarray] = []
+        self.__zcr: list[np.ndarray] = []
+        self.__centroid: list[np.ndarray] = []
+        self.__flux: list[np.ndarray] = []
+        self.__pending_windows = 0
+        self.__decisions = 0
+        """已经完成的判决次数"""
+
+        self.__label: Optional[SegmentLabel] = None
+        self.__start = 0.0
+        self.__candidate: Optional[SegmentLabel] = None
+        self.__candidate_start = 0.0
+        self.__candidate_count = 0
+
+    @property
+    def position(self) -> float:
+        """已经判决到的时刻 单位秒"""
+        return self.__decisions * self.__per_decision * self.__window / self.samplerate
+
+    @property
+    def current(self) -> Optional[Segment]:
+        """正在进行的片段 结束时刻为目前判决到的时刻"""
+        if self.__label is None:
+            return None
+        return Segment(self.__label, self.__start, self.position)
+
+    def feed(self, samples: np.ndarray) -> list[Segment]:
+        """送入一块 [-1, 1) 的单声道采样 返回其间确认结束的片段"""
+        samples = np.concatenate((self.__tail, samples.reshape(-1).astype(np.float32, copy=False)))
+        count = len(samples) // self.__window
+        self.__tail = samples[count * self.__window :]
+        if count:
+            self.__extract(samples[: count * self.__window].reshape(count, self.__window))
+
+        finished: list[Segment] = []
+        while self.__pending_windows >= self.__per_decision:
+            segment = self.__decide()
+            if segment is not None:
+                finished.append(segment)
+        return finished
+
+    def flush(self) -> Optional[Segment]:
+        """结束正在进行的片段 之后的采样重新开始计时"""
+        segment = self.current
+        self.__label = self.__candidate = None
+        self.__candidate_count = 0
+        self.__start = self.position
+        return segment
+
+    def __extract(self, windows: np.ndarray) -> None:
+        energy = np.einsum("ij,ij->i", windows, windows) / self.__window
+        signs = np.signbit(windows)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self.__window
+
+        magnitude = np.abs(np.fft.rfft(windows * self.__taper, axis=1))
+        total = magnitude.sum(axis=1, keepdims=True)
+        spectrum = magnitude / np.maximum(total, 1e-12)
+        centroid = spectrum @ self.__bins
+        previous = spectrum[:1] if self.__spectrum is None else self.__spectrum
+        stacked = np.concatenate((previous, spectrum))
+        flux = np.sqrt(np.square(np.diff(stacked, axis=0)).sum(axis=1))
+        self.__spectrum = spectrum[-1:]
+
+        self.__energy.append(energy)
+        self.__zcr.append(zcr)
+        self.__centroid.append(centroid)
+        self.__flux.append(flux)
+        self.__pending_windows += len(energy)
+
+    def __take(self, features: list[np.ndarray]) -> np.ndarray:
+        """取出一个判决周期的特征 剩下的留给下一次"""
+        joined = np.concatenate(features)
+        features[:] = [joined[self.__per_decision :]]
+        return joined[: self.__per_decision]
+
+    def __classify(
+        self, energy: np.ndarray, zcr: np.ndarray, centroid: np.ndarray, flux: np.ndarray
+    ) -> SegmentLabel:
+        config = self.config
+        mean_energy = float(energy.mean())
+        level = 10 * math.log10(mean_energy) if mean_energy > 0 else -math.inf
+        if level < config.silence_db:
+            return SegmentLabel.SILENCE
+        low_energy = float(np.mean(energy < 0.5 * mean_energy))
+        zero_crossing = float(np.mean(zcr > 1.5 * zcr.mean()))
+        # 只看有声的短窗 停顿处的质心由底噪决定
+        voiced = centroid[energy >= 0.5 * mean_energy]
+        variation = float(voiced.std() / max(float(voiced.mean()), 1.0))
+        votes = (
+            (low_energy > config.low_energy)
+            + (zero_crossing > config.zero_crossing)
+            + (variation > config.centroid)
+            + (float(flux.mean()) > config.flux)
+        )
+        return SegmentLabel.SPEECH if votes >= 2 else SegmentLabel.MUSIC
+
+    def __decide(self) -> Optional[Segment]:
+        label = self.__classify(
+            self.__take(self.__energy),
+            self.__take(self.__zcr),
+            self.__take(self.__centroid),
+            self.__take(self.__flux),
+        )
+        self.__pending_windows -= self.__per_decision
+        begin = self.position
+        self.__decisions += 1
+
+        if self.__label is None:
+            self.__label, self.__start = label, begin
+            return None
+        if label == self.__label:
+            self.__candidate, self.__candidate_count = None, 0
+            return None
+        if label != self.__candidate:
+            self.__candidate, self.__candidate_start, self.__candidate_count = label, begin, 0
+        self.__candidate_count += 1
+        if self.__candidate_count < self.config.hold:
+            return None
+
+        finished = Segment(self.__label, self.__start, self.__candidate_start)
+        self.__label, self.__start = label, self.__candidate_start
+        self.__candidate, self.__candidate_count = None, 0
+        return finished
@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+
+from service.robot.interface.enum import SegmentLabel
+
+
+@dataclass(frozen=True)
+class ClassifierConfig:
+    """
+    节目片段分类的参数
+
+    特征在短窗上计算，每个判决周期统计一次，
+    判决周期内四项人声特征中至少两项超过阈值时判为人声
+    """
+
+    window: float = 0.02
+    """计算特征的短窗长度 单位秒"""
+
+    decision: float = 1.0
+    """判决周期 单位秒"""
+
+    hold: int = 2
+    """新的类别要连续出现的判决次数 之后才确认片段边界"""
+
+    silence_db: float = -50.0
+    """判决周期内平均电平低于该值时判为静音 单位 dBFS"""
+
+    low_energy: float = 0.3
+    """短窗能量低于平均能量一半的比例 人声的停顿让它偏高"""
+
+    zero_crossing: float = 0.1
+    """过零率高于平均过零率 1.5 倍的短窗比例 人声的清音让它偏高"""
+
+    centroid: float = 0.2
+    """有声短窗频谱质心的变异系数 元音与辅音交替让它偏高"""
+
+    flux: float = 0.3
+    """相邻短窗归一化频谱之差的平均值 人声的音节变化让它偏高"""
+
+
+@dataclass(frozen=True)
+class Segment:
+    """一段类别相同的节目"""
+
+    label: SegmentLabel
+    """片段的类别"""
+
+    start: float
+    """片段开始的时刻 以分类器收到的第一个采样为零点 单位秒"""
+
+    end: float
+    """片段结束的时刻 单位秒"""
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
@@ -0,0 +1,14 @@
+from enum import Enum
+
+
+class SegmentLabel(Enum):
+    """节目片段的类别"""
+
+    SPEECH = "speech"
+    """人声 包括播报、访谈与热线"""
+
+    MUSIC = "music"
+    """音乐 包括歌曲与背景音乐"""
+
+    SILENCE = "silence"
+    """静音或接近底噪"""
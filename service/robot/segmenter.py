@@ -0,0 +1,133 @@
+"""持续收听广播 把节目切分为人声、音乐与静音片段"""
+
+import asyncio
+import logging
+import queue
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+from service.controller import pcm
+from service.controller.fetch import FetchService
+from service.controller.interface.dataclass import CaptureConfig
+from service.robot.classifier import SegmentClassifier
+from service.robot.interface.dataclass import ClassifierConfig, Segment
+from service.robot.interface.enum import SegmentLabel
+
+log = logging.getLogger(__name__)
+
+ANALYSIS_RATE = 16000
+"""分类前降采样的目标采样率 只能整数倍降采样时取不低于它的最近值"""
+
+
+class ProgrammeSegmenter:
+    """
+    订阅分发服务的节目分段器
+
+    订阅回调只把帧放进队列，解码、降采样与分类都在独立线程中进行，
+    线程处理不过来时丢弃新帧而不是拖慢分发；确认的片段回到事件循环交给 `on_segment`
+    """
+
+    def __init__(
+        self,
+        fetch: FetchService,
+        config: Optional[ClassifierConfig] = None,
+        on_segment: Optional[Callable[[Segment], None]] = None,
+        history: int = 64,
+        backlog: int = 32,
+    ) -> None:
+        self.__fetch = fetch
+        self.__config = config
+        self.__on_segment = on_segment
+        self.__backlog = backlog
+        self.__queue: queue.SimpleQueue[bytes | CaptureConfig | None] = queue.SimpleQueue()
+        self.__worker: Optional[threading.Thread] = None
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__current: Optional[SegmentLabel] = None
+        self.segments: deque[Segment] = deque(maxlen=history)
+        """最近确认的片段"""
+        self.dropped = 0
+        """线程处理不过来而丢弃的帧数"""
+
+    @property
+    def current(self) -> Optional[SegmentLabel]:
+        """正在进行的片段的类别"""
+        return self.__current
+
+    def start(self) -> None:
+        if self.__worker is not None:
+            return
+        self.__loop = asyncio.get_running_loop()
+        self.__queue.put(self.__fetch.config)
+        self.__worker = threading.Thread(
+            target=self.__run, name="ProgrammeSegmenter", daemon=True
+        )
+        self.__worker.start()
+        self.__fetch.subscribe(id(self), self.__push, on_format=self.__reformat)
+        log.info("节目分段开始")
+
+    def stop(self) -> None:
+        if self.__worker is None:
+            return
+        self.__fetch.unsubscribe(id(self))
+        self.__queue.put(None)
+        self.__worker.join(timeout=2)
+        self.__worker = None
+        log.info(f"节目分段停止 共确认 {len(self.segments)} 个片段 丢弃 {self.dropped} 帧")
+
+    async def __push(self, frame: bytes) -> None:
+        if self.__queue.qsize() >= self.__backlog:
+            self.dropped += 1
+            return
+        self.__queue.put(frame)
+
+    async def __reformat(self, config: CaptureConfig) -> None:
+        # 与音频帧走同一个队列 保证新配置在它的第一帧之前生效
+        self.__queue.put(config)
+
+    def __run(self) -> None:
+        config: Optional[CaptureConfig] = None
+        classifier: Optional[SegmentClassifier] = None
+        factor = 1
+        offset = 0.0
+        """此前各采集配置下累计的时长 片段时刻在配置切换后保持连续"""
+        while (item := self.__queue.get()) is not None:
+            if isinstance(item, CaptureConfig):
+                if classifier is not None:
+                    self.__emit(classifier.flush(), offset)
+                    offset += classifier.position
+                config = item
+                factor = max(config.samplerate.value // ANALYSIS_RATE, 1)
+                classifier = SegmentClassifier(config.samplerate.value // factor, self.__config)
+                continue
+            assert config is not None and classifier is not None
+            samples = pcm.decode(item, config.dtype, config.channel.value)
+            samples = pcm.decimate(pcm.downmix(samples), factor)
+            for segment in classifier.feed(samples):
+                self.__emit(segment, offset)
+            current = classifier.current
+            self.__current = current.label if current else None
+        if classifier is not None:
+            self.__emit(classifier.flush(), offset)
+
+    def __emit(self, segment: Optional[Segment], offset: float) -> None:
+        if segment is None or segment.duration <= 0 or self.__loop is None:
+            return
+        shifted = Segment(segment.label, segment.start + offset, segment.end + offset)
+        try:
+            self.__loop.call_soon_threadsafe(self.__deliver, shifted)
+        except RuntimeError:
+            # 事件循环已经关闭
+            pass
+
+    def __deliver(self, segment: Segment) -> None:
+        self.segments.append(segment)
+        log.info(
+            f"节目片段 {segment.label.value} "
+            f"{segment.start:.1f}s - {segment.end:.1f}s 共 {segment.duration:.1f}s"
+        )
+        if self.__on_segment is not None:
+            try:
+                self.__on_segment(segment)
+            except Exception as exc:
+                log.warning(f"处理节目片段出错 {exc}")
@@ -0,0 +1,359 @@
+"""Benchmarks for the WebTransport connection layer."""
+
+import asyncio
+import ssl
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aioquic.h3.connection import H3_ALPN
+from aioquic.h3.events import DataReceived, DatagramReceived
+from aioquic.quic.configuration import QuicConfiguration
+from aioquic.quic.connection import QuicConnection
+from aioquic.quic.events import HandshakeCompleted
+from yarl import URL
+
+TEST_DIR = Path(__file__).resolve().parents[1]
+if str(TEST_DIR) not in sys.path:
+    sys.path.insert(0, str(TEST_DIR))
+
+from test_load_broadcast import generate_certificate  # noqa: E402
+
+from handler.broadcast import BroadcastHandler  # noqa: E402
+from service.connection.handler import WebTransportHandler, WebTransportStream  # noqa: E402
+from service.connection.interface.dataclass import HeaderInfo, SessionInfo  # noqa: E402
+from service.connection.interface.enum import ControlMethod, RpcKind, StreamPriority  # noqa: E402
+from service.connection.rpc import RpcChannel, RpcClient, RpcReader, encode_message  # noqa: E402
+from service.connection.router import WebTransportRouter  # noqa: E402
+from service.connection.schedule import SendScheduler  # noqa: E402
+from service.connection.session import WebTransportSession  # noqa: E402
+from service.controller import CaptureConfig, FetchService, SyntheticSource  # noqa: E402
+
+CLIENT_ADDR = ("127.0.0.1", 50000)
+SERVER_ADDR = ("127.0.0.1", 58908)
+
+CONNECT_HEADERS = [
+    (b":method", b"CONNECT"),
+    (b":protocol", b"webtransport"),
+    (b":scheme", b"https"),
+    (b":authority", b"wthomec4.dns.army:58908"),
+    (b":path", b"/broadcast?station=1"),
+    (b":origin", b"https://wthomec4.dns.army:8080"),
+    (b"sec-webtransport-http3-draft02", b"1"),
+    (b"user-agent", b"Mozilla/5.0 (X11; Linux aarch64) Chrome/140.0"),
+]
+
+GET_HEADERS = [
+    (b":method", b"GET"),
+    (b":scheme", b"https"),
+    (b":authority", b"wthomec4.dns.army:58908"),
+    (b":path", b"/index.html"),
+    (b"accept-encoding", b"gzip, deflate, br, zstd"),
+    (b"if-none-match", b'"87206b7a631286a30a84c08ca193d5b6e7de395d"'),
+]
+
+
+def quic_pair() -> tuple[QuicConnection, QuicConnection]:
+    """Handshake a client and server QuicConnection entirely in memory."""
+    with tempfile.TemporaryDirectory() as workdir:
+        cert_path, key_path = generate_certificate(Path(workdir))
+        server_configuration = QuicConfiguration(
+            alpn_protocols=H3_ALPN,
+            is_client=False,
+            max_datagram_frame_size=65536,
+        )
+        server_configuration.load_cert_chain(cert_path, key_path)
+
+    client = QuicConnection(
+        configuration=QuicConfiguration(
+            alpn_protocols=H3_ALPN,
+            is_client=True,
+            verify_mode=ssl.CERT_NONE,
+            max_datagram_frame_size=65536,
+        )
+    )
+    server = QuicConnection(
+        configuration=server_configuration,
+        original_destination_connection_id=client.original_destination_connection_id,
+    )
+    client.connect(SERVER_ADDR, now=time.monotonic())
+
+    completed = False
+    while not completed:
+        exchange(client, server, drain=False)
+        while (event := client.next_event()) is not None:
+            completed |= isinstance(event, HandshakeCompleted)
+    exchange(client, server)
+    return client, server
+
+
+def exchange(client: QuicConnection, server: QuicConnection, drain: bool = True) -> None:
+    """Deliver datagrams in both directions until the link is idle."""
+    for _ in range(8):
+        moved = False
+        for data, _ in client.datagrams_to_send(now=time.monotonic()):
+            server.receive_datagram(data, CLIENT_ADDR, now=time.monotonic())
+            moved = True
+        for data, _ in server.datagrams_to_send(now=time.monotonic()):
+            client.receive_datagram(data, SERVER_ADDR, now=time.monotonic())
+            moved = True
+        if not moved:
+            break
+    if not drain:
+        return
+    while client.next_event() is not None:
+        pass
+    while server.next_event() is not None:
+        pass
+
+
+class StubH3:
+    """Just enough of H3Connection for a session to run without a network."""
+
+    def __init__(self) -> None:
+        self._next_stream_id = 3
+
+    def send_headers(self, stream_id: int, headers, end_stream: bool = False) -> None:
+        pass
+
+    def send_data(self, stream_id: int, data: bytes, end_stream: bool) -> None:
+        pass
+
+    def send_datagram(self, stream_id: int, data: bytes) -> None:
+        pass
+
+    def create_webtransport_stream(self, session_id: int, is_unidirectional: bool = False) -> int:
+        self._next_stream_id += 4
+        return self._next_stream_id
+
+
+class StubQuic:
+    def send_stream_data(self, stream_id: int, data: bytes, end_stream: bool = False) -> None:
+        pass
+
+
+def bench_header_parse():
+    return {
+        "connect": lambda: HeaderInfo.from_header(CONNECT_HEADERS),
+        "get": lambda: HeaderInfo.from_header(GET_HEADERS),
+    }
+
+
+def bench_router_route():
+    app = WebTransportRouter()
+    for path in ("/broadcast", "/control", "/archive", "/metadata"):
+        app.add_route(path, BroadcastHandler)
+    return {
+        "hit": lambda: app.route("/broadcast"),
+        "miss": lambda: app.route("/missing"),
+    }
+
+
+def bench_stream_write():
+    client, server = quic_pair()
+    cases = {}
+    for size in (4096, 49152):
+        stream = WebTransportStream(
+            server.get_next_available_stream_id(is_unidirectional=True),
+            is_unidirectional=True,
+            can_read=False,
+            can_write=True,
+            send_stream_data=server.send_stream_data,
+            transmit=lambda: exchange(client, server),
+        )
+        payload = bytes(size)
+        loop = asyncio.new_event_loop()
+        cases[str(size)] = (
+            lambda stream=stream, payload=payload, loop=loop: loop.run_until_complete(
+                stream.write(payload)
+            )
+        )
+    return cases
+
+
+def bench_stream_schedule():
+    """One 4KiB audio write through the scheduler, with and without a send budget."""
+    cases = {}
+    for name, budget in (("unlimited", None), ("budgeted", 32 * 1024)):
+        client, server = quic_pair()
+        scheduler = SendScheduler(server, budget)
+
+        def transmit(scheduler=scheduler, client=client, server=server) -> None:
+            scheduler.pump()
+            exchange(client, server)
+
+        stream = WebTransportStream(
+            server.get_next_available_stream_id(is_unidirectional=True),
+            is_unidirectional=True,
+            can_read=False,
+            can_write=True,
+            send_stream_data=scheduler.send,
+            transmit=transmit,
+        )
+        scheduler.add(stream.stream_id, StreamPriority.LOW)
+        payload = bytes(4096)
+        loop = asyncio.new_event_loop()
+        cases[name] = (
+            lambda stream=stream, payload=payload, loop=loop: loop.run_until_complete(
+                stream.write(payload)
+            )
+        )
+    return cases
+
+
+def bench_session_lifecycle():
+    config = CaptureConfig(device=0)
+    FetchService(config=config, source=SyntheticSource(config))
+    h3, quic = StubH3(), StubQuic()
+    session_info = SessionInfo(stream_id=0, path=URL("/broadcast"), client=CLIENT_ADDR)
+    loop = asyncio.new_event_loop()
+
+    async def lifecycle() -> None:
+        session = WebTransportSession(
+            h3=h3,
+            quic=quic,
+            session_id=0,
+            session_info=session_info,
+            handler=BroadcastHandler(session_id=0, session_info=session_info),
+            transmit=lambda: None,
+        )
+        task = asyncio.create_task(session.run())
+        await asyncio.sleep(0)
+        session.handle_session_data(DataReceived(data=b"", stream_id=0, stream_ended=True))
+        await task
+
+    return {"broadcast": lambda: loop.run_until_complete(lifecycle())}
+
+
+class CountingHandler(WebTransportHandler):
+    """Counts datagrams one at a time through the per-datagram hook."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.count = 0
+
+    async def on_datagram(self, data: bytes) -> None:
+        self.count += 1
+
+
+class BatchCountingHandler(CountingHandler):
+    """Counts datagrams a batch at a time."""
+
+    async def on_datagrams(self, datagrams: list[bytes]) -> None:
+        self.count += len(datagrams)
+
+
+def bench_datagram_dispatch():
+    """A burst of 256 datagrams handled to completion; datagrams per second is 256e9 / ns."""
+    burst = 256
+    h3, quic = StubH3(), StubQuic()
+    session_info = SessionInfo(stream_id=0, path=URL("/telemetry"), client=CLIENT_ADDR)
+    events = [DatagramReceived(data=bytes(32), stream_id=0) for _ in range(burst)]
+    loop = asyncio.new_event_loop()
+
+    def open_session(handler: CountingHandler) -> WebTransportSession:
+        return WebTransportSession(
+            h3=h3,
+            quic=quic,
+            session_id=0,
+            session_info=session_info,
+            handler=handler,
+            transmit=lambda: None,
+        )
+
+    # Before: one task, done callback and set entry per datagram.
+    spawn_handler = CountingHandler(session_id=0, session_info=session_info)
+    tasks: set[asyncio.Task[None]] = set()
+
+    async def spawn() -> None:
+        for event in events:
+            task = asyncio.create_task(spawn_handler.on_datagram(event.data))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        while tasks:
+            await asyncio.sleep(0)
+
+    # After: the session's inbox and consumer, including opening and closing the session.
+    def inbox(handler: CountingHandler):
+        async def dispatch() -> None:
+            session = open_session(handler)
+            task = asyncio.create_task(session.run())
+            target = handler.count + burst
+            for event in events:
+                session.handle_datagram(event)
+            while handler.count < target:
+                await asyncio.sleep(0)
+            session.handle_session_data(DataReceived(data=b"", stream_id=0, stream_ended=True))
+            await task
+
+        return lambda: loop.run_until_complete(dispatch())
+
+    return {
+        "spawn": lambda: loop.run_until_complete(spawn()),
+        "inbox": inbox(CountingHandler(session_id=0, session_info=session_info)),
+        "inbox_batch": inbox(BatchCountingHandler(session_id=0, session_info=session_info)),
+    }
+
+
+def bench_rpc():
+    """
+    256 control stream requests answered in memory without QUIC, including opening and
+    closing the channel; divide by 256 for the cost of one message.
+
+    ``roundtrip`` waits for every reply before the next request; ``pipelined`` and ``spawn``
+    keep all 256 in flight. ``spawn`` answers every request in its own task, the way the
+    session dispatched datagrams before the inbox.
+    """
+    burst = 256
+    payload = bytes(16)
+    loop = asyncio.new_event_loop()
+
+    async def channel(stream: WebTransportStream) -> None:
+        rpc = RpcChannel(stream)
+        rpc.register(ControlMethod.PING, lambda data: data)
+        await rpc.serve()
+
+    async def spawn(stream: WebTransportStream) -> None:
+        reader = RpcReader()
+        tasks: set[asyncio.Task[None]] = set()
+
+        async def answer(method: int, correlation: int, data: bytes) -> None:
+            await stream.write(encode_message(RpcKind.RESPONSE, method, correlation, data))
+
+        while data := await stream.read():
+            for _, method, correlation, data in reader.feed(data):
+                task = asyncio.create_task(answer(method, correlation, data))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        while tasks:
+            await asyncio.sleep(0)
+
+    def case(serve, pipelined: bool):
+        async def run() -> None:
+            client: RpcClient
+            stream = WebTransportStream(
+                0,
+                is_unidirectional=False,
+                can_read=True,
+                can_write=True,
+                send_stream_data=lambda _stream_id, data, _end: client.feed(data),
+                transmit=lambda: None,
+            )
+            client = RpcClient(lambda data: stream.feed_data(data, False))
+            task = asyncio.create_task(serve(stream))
+            if pipelined:
+                await asyncio.gather(*[client.call(ControlMethod.PING, payload) for _ in range(burst)])
+            else:
+                for _ in range(burst):
+                    await client.call(ControlMethod.PING, payload)
+            stream.close()
+            await task
+
+        return lambda: loop.run_until_complete(run())
+
+    return {
+        "roundtrip": case(channel, pipelined=False),
+        "pipelined": case(channel, pipelined=True),
+        "spawn": case(spawn, pipelined=True),
+    }
@@ -0,0 +1,158 @@
+"""Benchmarks for capture distribution and PCM conversion."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+from service.controller import CaptureConfig, FetchService, Pipeline, SyntheticSource
+from service.controller import pcm
+from service.controller.interface.dataclass import (
+    CaptureBlockSize,
+    CaptureChannel,
+    CaptureDtype,
+    CaptureSampleRate,
+    Rendition,
+    SilenceConfig,
+)
+from service.controller.rendition import RenditionSet
+from service.controller.silence import SilenceDetector
+from service.controller.source import sample_width
+
+# The in-memory tuner chip lives next to the tests.
+TEST_DIR = Path(__file__).resolve().parents[1]
+if str(TEST_DIR) not in sys.path:
+    sys.path.insert(0, str(TEST_DIR))
+
+
+def bench_fanout():
+    config = CaptureConfig(device=0)
+    fetch = FetchService(config=config, source=SyntheticSource(config))
+    queue: asyncio.Queue[tuple[int, bytes]] = fetch._FetchService__queue
+    frame = bytes(config.blocksize.value * config.channel.value * 2)
+    loop = asyncio.new_event_loop()
+
+    async def sink(_: bytes) -> None:
+        pass
+
+    async def one_frame() -> None:
+        # 分发队列中的帧带有采集时刻
+        queue.put_nowait((0, frame))
+        await queue.join()
+
+    def start() -> None:
+        fetch._FetchService__running = True
+        loop.create_task(fetch._FetchService__distribute())
+
+    loop.call_soon(start)
+    loop.run_until_complete(asyncio.sleep(0))
+
+    cases = {}
+    for count in (1, 10, 100, 1000):
+
+        def run(count: int = count) -> None:
+            subscribers = fetch._FetchService__clients
+            if len(subscribers) != count:
+                subscribers.clear()
+                for index in range(count):
+                    subscribers[index] = sink
+            loop.run_until_complete(one_frame())
+
+        cases[str(count)] = run
+    return cases
+
+
+def bench_pcm():
+    cases = {}
+    frames = CaptureBlockSize.B8192.value
+    for dtype in CaptureDtype:
+        data = bytes(range(256)) * (frames * 2 * sample_width(dtype) // 256)
+        samples = pcm.decode(data, dtype, 2)
+        cases[f"decode-{dtype.value}"] = lambda data=data, dtype=dtype: pcm.decode(data, dtype, 2)
+        cases[f"encode-{dtype.value}"] = lambda samples=samples, dtype=dtype: pcm.encode(samples, dtype)
+    cases["downmix"] = lambda: pcm.downmix(samples)
+    cases["decimate-3"] = lambda: pcm.decimate(samples, 3)
+    return cases
+
+
+def bench_pipeline():
+    frame = bytes(CaptureBlockSize.B2048.value * 2 * 3)
+
+    def dsp(data: bytes) -> bytes:
+        return data
+
+    def silence(data: bytes) -> bytes:
+        return data
+
+    def distribute(_: bytes) -> None:
+        pass
+
+    # The three built-in stages FetchService runs on the capture thread, as plain calls and as a pipeline.
+    pipeline = Pipeline()
+    pipeline.add("dsp", dsp)
+    pipeline.add("silence", silence, after="dsp")
+    pipeline.add("distribute", distribute, after="silence")
+    return {
+        "direct": lambda: distribute(silence(dsp(frame))),
+        "stages": lambda: pipeline.process(frame),
+    }
+
+
+def bench_rendition():
+    config = CaptureConfig(
+        device=0,
+        blocksize=CaptureBlockSize.B2048,
+        channel=CaptureChannel.Stereo,
+        dtype=CaptureDtype.Bit24,
+        samplerate=CaptureSampleRate.R48000,
+    )
+    renditions = RenditionSet(config)
+    data = bytes(range(256)) * (config.blocksize.value * 2 * 3 // 256)
+    cases = {}
+    for level in renditions.levels[1:]:
+        # 每次都是新的一帧 计入完整的转换开销
+        cases[level.name.lower()] = lambda level=level: renditions.encode(
+            level, bytes(bytearray(data))
+        )
+    cases["shared"] = lambda: renditions.encode(Rendition.MONO, data)
+    return cases
+
+
+def bench_silence():
+    cases = {}
+    for dtype in CaptureDtype:
+        config = CaptureConfig(
+            device=0,
+            blocksize=CaptureBlockSize.B2048,
+            channel=CaptureChannel.Stereo,
+            dtype=dtype,
+        )
+        detector = SilenceDetector(config, SilenceConfig())
+        data = bytes(range(256)) * (2048 * 2 * sample_width(dtype) // 256)
+        cases[dtype.value] = lambda detector=detector, data=data: detector.update(data)
+    return cases
+
+
+def bench_tuner():
+    from service.controller import FakeI2CBus
+    from service.controller.rda5807m import ADDRESS, RDA5807M
+    from simulated_tuner import FakeRDA5807M
+
+    bus = FakeI2CBus()
+    bus.attach(ADDRESS, FakeRDA5807M(tune_time=0))
+    chip = RDA5807M(bus, poll_interval=0)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(chip.power_on())
+    controller = chip.controller
+    volumes = iter(range(1 << 30))
+
+    async def burst() -> None:
+        # 四个相邻寄存器合并为一次传输
+        controller.stage(0x02, [0xC005, 0, 0x0800, 0x8880 | next(volumes) & 0x0F])
+        await controller.flush()
+
+    return {
+        "read-cached": lambda: loop.run_until_complete(controller.read(0x02, 4)),
+        "read-bus": lambda: loop.run_until_complete(controller.read(0x02, 4, fresh=True)),
+        "write-burst-4": lambda: loop.run_until_complete(burst()),
+        "tune": lambda: loop.run_until_complete(chip.tune(101700)),
+    }
@@ -0,0 +1,69 @@
+"""Benchmarks for database write-behind batching and the read cache."""
+
+import asyncio
+import atexit
+import tempfile
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+
+from service.database import DatabaseContext
+
+ROWS = 256
+"""Rows written per operation, so batched and unbatched cases compare directly."""
+
+PLUGIN = Path(__file__).resolve().parents[2] / "plugin" / "sqlite" / "plugin.py"
+
+
+def sqlite_plugin(path: Path):
+    spec = spec_from_file_location("sqlite_plugin", PLUGIN)
+    assert spec and spec.loader
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.SQLitePlugin(path)
+
+
+def bench_write():
+    """Write 256 log rows; ns/op / 256 gives the cost per row (writes/sec = 256e9 / ns)."""
+    workdir = tempfile.mkdtemp(prefix="bench-database-")
+    plugin = sqlite_plugin(Path(workdir) / "bench.sqlite3")
+    context = DatabaseContext(batch_size=ROWS, flush_interval=60)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(plugin.setup(context))
+    atexit.register(lambda: loop.run_until_complete(context.close()))
+    rows = [{"session": index, "event": "connect"} for index in range(ROWS)]
+
+    async def unbatched() -> None:
+        # 每行一个事务 相当于没有回写队列时的写法
+        for row in rows:
+            await plugin.write_batch("bench_log", [row])
+
+    async def batched() -> None:
+        for row in rows:
+            context.write("bench_log", row)
+        await context.writer.flush()
+
+    return {
+        f"unbatched-{ROWS}rows": lambda: loop.run_until_complete(unbatched()),
+        f"batched-{ROWS}rows": lambda: loop.run_until_complete(batched()),
+    }
+
+
+def bench_read():
+    workdir = tempfile.mkdtemp(prefix="bench-database-")
+    plugin = sqlite_plugin(Path(workdir) / "bench.sqlite3")
+    context = DatabaseContext()
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(plugin.setup(context))
+    atexit.register(lambda: loop.run_until_complete(context.close()))
+    loop.run_until_complete(plugin.write_batch("station", [{"key": "FM101.7", "name": "bench"}]))
+
+    async def cached() -> None:
+        await context.read("station", "FM101.7")
+
+    async def uncached() -> None:
+        await plugin.read("station", "FM101.7")
+
+    return {
+        "cached": lambda: loop.run_until_complete(cached()),
+        "uncached": lambda: loop.run_until_complete(uncached()),
+    }
@@ -0,0 +1,39 @@
+"""Cost on the calling thread of one log line, rendered by rich directly or through the log queue."""
+
+import logging
+import os
+
+from rich.console import Console
+from rich.logging import RichHandler
+
+from service.diagnostic import LogQueue
+from service.diagnostic.interface.dataclass import LogQueueConfig
+
+
+def rich_handler() -> RichHandler:
+    console = Console(file=open(os.devnull, "w"), force_terminal=True, width=120)
+    handler = RichHandler(console=console, log_time_format="[%H:%M:%S]")
+    handler.setFormatter(logging.Formatter("%(name)s: %(message)s"))
+    return handler
+
+
+def bench_log_call():
+    """One `log.info` like FetchService.subscribe writes."""
+    cases = {}
+    for name, burst in (("rich", None), ("queued", 1 << 62), ("suppressed", 0)):
+        logger = logging.getLogger(f"bench.{name}")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        if burst is None:
+            logger.addHandler(rich_handler())
+        else:
+            # Records past a full queue are dropped; this times the calling thread only.
+            pipeline = LogQueue([rich_handler()], LogQueueConfig(burst=burst))
+            pipeline.start()
+            logger.addHandler(pipeline.handler)
+
+        def call(logger=logger) -> None:
+            logger.info(f"有新的客户端加入分发服务 目前共 {1000} 个")
+
+        cases[name] = call
+    return cases
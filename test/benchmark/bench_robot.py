@@ -0,0 +1,40 @@
+"""CPU cost per capture block of the programme segment classifier."""
+
+import numpy as np
+
+from service.controller import CaptureChannel, CaptureConfig, CaptureDtype, CaptureSampleRate
+from service.controller import pcm
+from service.controller.interface.dataclass import CaptureBlockSize
+from service.robot import SegmentClassifier
+from service.robot.segmenter import ANALYSIS_RATE
+
+
+def test_block(config: CaptureConfig) -> bytes:
+    """One block of noisy programme, encoded like capture."""
+    frames = config.blocksize.value
+    rng = np.random.default_rng(0)
+    samples = 0.2 * rng.standard_normal((frames, config.channel.value))
+    return pcm.encode(samples.astype(np.float32), config.dtype)
+
+
+def bench_segment():
+    """Decode, downmix, decimate and classify one block, like the segmenter thread does."""
+    cases = {}
+    for blocksize in (CaptureBlockSize.B1024, CaptureBlockSize.B8192):
+        config = CaptureConfig(
+            device=0,
+            blocksize=blocksize,
+            channel=CaptureChannel.Stereo,
+            dtype=CaptureDtype.Bit16,
+            samplerate=CaptureSampleRate.R48000,
+        )
+        factor = config.samplerate.value // ANALYSIS_RATE
+        classifier = SegmentClassifier(config.samplerate.value // factor)
+        block = test_block(config)
+
+        def segment(config=config, classifier=classifier, block=block, factor=factor):
+            samples = pcm.decode(block, config.dtype, config.channel.value)
+            classifier.feed(pcm.decimate(pcm.downmix(samples), factor))
+
+        cases[str(blocksize.value)] = segment
+    return cases
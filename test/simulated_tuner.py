@@ -0,0 +1,123 @@
+"""没有硬件时测试调谐器用的内存中的 RDA5807M 与模拟的广播频段"""
+
+import math
+import random
+import time
+from typing import Callable, Iterable, Optional
+
+from service.controller.bus import FakeI2CDevice
+from service.controller.rda5807m import (
+    BAND_START,
+    CHAN_SHIFT,
+    FM_READY,
+    FM_TRUE,
+    REGISTERS,
+    RSSI_SHIFT,
+    SEEKTH_SHIFT,
+    SPACING,
+    ST,
+    STC,
+    TUNE,
+)
+
+
+SignalModel = Callable[[int, float], int]
+"""根据频率 (kHz) 与调谐完成后经过的秒数给出 RSSI"""
+
+
+class FakeRDA5807M(FakeI2CDevice):
+    """
+    内存中的 RDA5807M
+
+    写入 TUNE 位后经过 `tune_time` 秒才报告调谐完成，
+    RSSI 由 `signal` 给出，超过搜台阈值时报告有电台；
+    `interference` 中的频点信号再强也不置 FM_TRUE
+    """
+
+    def __init__(
+        self,
+        tune_time: float = 0.01,
+        signal: Optional[SignalModel] = None,
+        interference: Iterable[int] = (),
+    ) -> None:
+        super().__init__(REGISTERS, width=2)
+        self.registers[0x00] = 0x5804
+        self.__tune_time = tune_time
+        self.__signal = signal or (lambda frequency, settled: 10)
+        self.__interference = frozenset(interference)
+        """有强信号但不是电台的频点"""
+        self.__complete = 0.0
+        """调谐完成的时刻"""
+
+        self.tunes = 0
+        """收到的调谐次数"""
+
+    @property
+    def frequency(self) -> int:
+        channel = self.registers[0x03] >> CHAN_SHIFT
+        return BAND_START + channel * SPACING
+
+    def write(self, register: int, data: bytes) -> None:
+        super().write(register, data)
+        count = len(data) // self.width
+        if register <= 0x03 < register + count and self.registers[0x03] & TUNE:
+            self.registers[0x03] &= ~TUNE
+            self.registers[0x0A] &= ~STC
+            self.__complete = time.monotonic() + self.__tune_time
+            self.tunes += 1
+
+    def read(self, register: int, length: int) -> bytes:
+        self.__update_status()
+        return super().read(register, length)
+
+    def __update_status(self) -> None:
+        now = time.monotonic()
+        if now < self.__complete:
+            return
+        rssi = max(0, min(127, self.__signal(self.frequency, now - self.__complete)))
+        threshold = (self.registers[0x05] >> SEEKTH_SHIFT) & 0x0F
+        station = rssi >= threshold and self.frequency not in self.__interference
+        channel = self.registers[0x03] >> CHAN_SHIFT
+        self.registers[0x0A] = STC | (ST if station and rssi >= 2 * threshold else 0) | channel
+        self.registers[0x0B] = rssi << RSSI_SHIFT | (FM_TRUE if station else 0) | FM_READY
+
+
+class SimulatedBand:
+    """
+    带有若干电台的模拟频段
+
+    电台会向相邻频道泄漏较弱的信号，调谐完成后 RSSI 按时间常数 `tau`
+    从底噪逐渐升到稳定值，每次测量还会叠加少量抖动
+    """
+
+    def __init__(
+        self,
+        stations: Optional[dict[int, int]] = None,
+        noise: int = 4,
+        tau: float = 0.004,
+        seed: int = 0,
+        band: range = range(87000, 108100, 100),
+    ) -> None:
+        self.__random = random.Random(seed)
+        if stations is None:
+            frequencies = self.__random.sample(list(band), k=len(band) // 10)
+            stations = {frequency: self.__random.randint(18, 60) for frequency in frequencies}
+        self.stations = stations
+        """电台频率 (kHz) 对应的稳定 RSSI"""
+
+        self.__noise = noise
+        self.__tau = tau
+        self.__spacing = band.step
+
+    def level(self, frequency: int) -> int:
+        """频点稳定后的 RSSI 不含抖动"""
+        level = self.stations.get(frequency, 0)
+        for offset in (-self.__spacing, self.__spacing):
+            level = max(level, self.stations.get(frequency + offset, 0) // 4)
+        return max(self.__noise, level)
+
+    def __call__(self, frequency: int, settled: float) -> int:
+        target = self.level(frequency)
+        ramp = 1 - math.exp(-settled / self.__tau)
+        jitter = self.__random.randint(-1, 1)
+        return round(self.__noise + (target - self.__noise) * ramp) + jitter
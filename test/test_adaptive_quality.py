@@ -0,0 +1,293 @@
+import argparse
+import asyncio
+import collections
+import logging
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from aioquic.asyncio import connect
+from aioquic.asyncio.server import serve
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from test_load_broadcast import HOST, client_configuration, generate_certificate  # noqa: E402
+from handler.broadcast import BroadcastHandler  # noqa: E402
+from service.connection.client import WebTransportClientProtocol  # noqa: E402
+from service.connection.framing import FrameReader, decode_format  # noqa: E402
+from service.connection.interface.enum import FrameType  # noqa: E402
+from service.connection.protocol import WebTransportProtocol  # noqa: E402
+from service.connection.router import WebTransportRouter  # noqa: E402
+from service.connection.transport import LIVE, quic_configuration  # noqa: E402
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+    SyntheticSource,
+    start_fetch_service,
+)
+from service.controller.interface.dataclass import CaptureBlockSize  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CONFIG = CaptureConfig(
+    device=0,
+    blocksize=CaptureBlockSize.B2048,
+    channel=CaptureChannel.Stereo,
+    dtype=CaptureDtype.Bit24,
+    samplerate=CaptureSampleRate.R48000,
+)
+
+
+class FixedBroadcastHandler(BroadcastHandler):
+    """Baseline: always sends the capture format."""
+
+    async def _adapt(self) -> None:
+        return
+
+
+class ThrottledProxy(asyncio.DatagramProtocol):
+    """UDP proxy whose server-to-client direction is a drop-tail bottleneck of `rate` bytes/s."""
+
+    def __init__(self, target: tuple[str, int], queue_bytes: int) -> None:
+        self._target = target
+        self._queue_bytes = queue_bytes
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._client: Optional[tuple[str, int]] = None
+        self._queue: collections.deque[bytes] = collections.deque()
+        self._queued = 0
+        self._next_send = 0.0
+        self._draining = False
+        self.rate: Optional[float] = None
+        self.dropped = 0
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        assert isinstance(transport, asyncio.DatagramTransport)
+        self._transport = transport
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        # Packets still queued at the bottleneck are discarded with the proxy.
+        self._transport = None
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        assert self._transport is not None
+        if addr != self._target:
+            self._client = addr
+            self._transport.sendto(data, self._target)
+            return
+        if self._client is None:
+            return
+        if self.rate is None and not self._queue:
+            self._transport.sendto(data, self._client)
+            return
+        if self._queued + len(data) > self._queue_bytes:
+            self.dropped += 1
+            return
+        self._queue.append(data)
+        self._queued += len(data)
+        if not self._draining:
+            self._draining = True
+            self._drain()
+
+    def _drain(self) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        while self._queue and self._next_send <= now:
+            data = self._queue.popleft()
+            self._queued -= len(data)
+            if self._transport is not None and self._client is not None:
+                self._transport.sendto(data, self._client)
+            self._next_send = max(self._next_send, now) + (len(data) / self.rate if self.rate else 0)
+        if self._queue:
+            loop.call_at(self._next_send, self._drain)
+        else:
+            self._draining = False
+
+
+@dataclass
+class Listener:
+    """Tracks the rendition timeline and delivered audio of one session."""
+
+    started: float = field(default_factory=time.perf_counter)
+    reader: FrameReader = field(default_factory=FrameReader)
+    bytes_per_second: float = 0.0
+    timeline: list[tuple[float, int, int, int]] = field(default_factory=list)
+    audio_seconds: float = 0.0
+    frames: int = 0
+
+    def feed(self, _stream_id: int, data: bytes, _ended: bool) -> None:
+        for frame_type, payload in self.reader.feed(data):
+            if frame_type == FrameType.FORMAT:
+                samplerate, channels, bits, _ = decode_format(payload)
+                self.bytes_per_second = samplerate * channels * bits / 8
+                self.timeline.append((time.perf_counter() - self.started, samplerate, channels, bits))
+            elif frame_type == FrameType.AUDIO and self.bytes_per_second:
+                self.audio_seconds += len(payload) / self.bytes_per_second
+                self.frames += 1
+
+    def rendition_at(self, moment: float) -> tuple[int, int, int]:
+        current = self.timeline[0][1:]
+        for at, *fmt in self.timeline:
+            if at > moment:
+                break
+            current = tuple(fmt)
+        return current  # type: ignore[return-value]
+
+
+async def listen(port: int, listener: Listener, stop: asyncio.Event) -> None:
+    async with connect(
+        HOST,
+        port,
+        configuration=client_configuration(),
+        create_protocol=WebTransportClientProtocol,
+    ) as client:
+        assert isinstance(client, WebTransportClientProtocol)
+        client.on_stream_data = listener.feed
+        await client.open_session(authority=f"localhost:{port}", path="/broadcast")
+        await stop.wait()
+        client.close_session()
+
+
+def describe(fmt: tuple[int, int, int]) -> str:
+    samplerate, channels, bits = fmt
+    return f"{samplerate}Hz/{channels}ch/{bits}bit ({samplerate * channels * bits / 8 / 1024:.0f}KiB/s)"
+
+
+async def scenario(args: argparse.Namespace, handler: type[BroadcastHandler], port: int, cert: Path, key: Path) -> dict:
+    loop = asyncio.get_running_loop()
+    app = WebTransportRouter()
+    app.add_route("/broadcast", handler, profile=LIVE)
+    configuration = quic_configuration(LIVE, is_client=False)
+    configuration.load_cert_chain(cert, key)
+    server = await serve(
+        host=HOST,
+        port=port,
+        configuration=configuration,
+        create_protocol=lambda *a, **kw: WebTransportProtocol(*a, app=app, **kw),
+    )
+
+    proxies: list[ThrottledProxy] = []
+    transports = []
+    for index in range(args.sessions):
+        transport, proxy = await loop.create_datagram_endpoint(
+            lambda: ThrottledProxy((HOST, port), args.queue * 1024),
+            local_addr=(HOST, port + 1 + index),
+        )
+        proxies.append(proxy)
+        transports.append(transport)
+
+    stop = asyncio.Event()
+    throttled = [Listener() for _ in proxies]
+    clean = Listener()
+    tasks = [asyncio.create_task(listen(port + 1 + i, lst, stop)) for i, lst in enumerate(throttled)]
+    tasks.append(asyncio.create_task(listen(port, clean, stop)))
+
+    phases = [("open", None, args.warmup), ("throttled", args.rate * 1024, args.throttle), ("recovered", None, args.recover)]
+    marks = []
+    for name, rate, seconds in phases:
+        for proxy in proxies:
+            proxy.rate = rate
+        begin = time.perf_counter()
+        delivered = [lst.audio_seconds for lst in throttled]
+        await asyncio.sleep(seconds)
+        elapsed = time.perf_counter() - begin
+        ratio = min((lst.audio_seconds - d) / elapsed for lst, d in zip(throttled, delivered))
+        marks.append((name, begin - throttled[0].started + seconds, ratio))
+
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # Let the server see the sessions close before tearing down the transports.
+    await asyncio.sleep(0.5)
+    for transport in transports:
+        transport.close()
+    server.close()
+    await asyncio.sleep(0.1)
+
+    from service.controller import FetchService
+
+    renditions = FetchService().renditions
+    return {
+        "marks": marks,
+        "throttled": throttled,
+        "clean": clean,
+        "dropped": sum(proxy.dropped for proxy in proxies),
+        "conversions": renditions.conversions,
+        "levels": len(renditions.levels),
+    }
+
+
+async def run(args: argparse.Namespace) -> int:
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        cert, key = generate_certificate(Path(workdir))
+        fetch = await start_fetch_service(config=CONFIG, source=SyntheticSource(CONFIG))
+        assert fetch is not None
+        await asyncio.sleep(0.2)
+        print(
+            f"{args.sessions} throttled session(s) + 1 clean session, capture {describe((48000, 2, 24))}, "
+            f"bottleneck {args.rate}KiB/s for {args.throttle:.0f}s"
+        )
+        for label, handler in (("fixed", FixedBroadcastHandler), ("adaptive", BroadcastHandler)):
+            conversions_before = fetch.renditions.conversions
+            result = await scenario(args, handler, args.port, cert, key)
+            print(f"\n[{label}]")
+            for name, at, ratio in result["marks"]:
+                fmt = result["throttled"][0].rendition_at(at)
+                print(f"  {name:<10} worst real-time ratio {ratio:5.2f}  rendition at end {describe(fmt)}")
+            print(f"  bottleneck drops {result['dropped']}, rendition switches {len(result['throttled'][0].timeline) - 1}")
+
+            if label == "adaptive":
+                conversions = result["conversions"] - conversions_before
+                frames = result["clean"].frames
+                print(
+                    f"  conversions {conversions} for {frames} frames "
+                    f"({conversions / max(frames, 1):.2f} per frame across {args.sessions + 1} sessions)"
+                )
+                end_throttled = result["throttled"][0].rendition_at(result["marks"][1][1])
+                end_recovered = result["throttled"][0].rendition_at(result["marks"][2][1])
+                if end_throttled[0] * end_throttled[1] * end_throttled[2] / 8 > args.rate * 1024:
+                    print("FAIL: did not step down below the bottleneck rate")
+                    failed = True
+                if end_recovered != (48000, 2, 24):
+                    print("FAIL: did not step back up to the capture format")
+                    failed = True
+                if result["marks"][1][2] < 0.9:
+                    print("FAIL: throttled session fell behind real time")
+                    failed = True
+                if conversions > frames * (result["levels"] - 1):
+                    print("FAIL: renditions were converted per session")
+                    failed = True
+                if result["clean"].rendition_at(1e9) != (48000, 2, 24):
+                    print("FAIL: clean session was downgraded")
+                    failed = True
+        fetch.stop()
+    print("\nadaptive quality ok" if not failed else "")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Throttle broadcast sessions and check that they step down and back up in quality."
+    )
+    parser.add_argument("--sessions", type=int, default=3, help="Throttled sessions, each behind its own proxy.")
+    parser.add_argument("--rate", type=int, default=150, help="Bottleneck rate in KiB/s.")
+    parser.add_argument("--queue", type=int, default=64, help="Bottleneck queue size in KiB.")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Seconds before the bottleneck is applied.")
+    parser.add_argument("--throttle", type=float, default=10.0, help="Seconds the bottleneck stays on.")
+    parser.add_argument("--recover", type=float, default=15.0, help="Seconds after the bottleneck is lifted.")
+    parser.add_argument("--port", type=int, default=58970, help="Server port; proxies use the following ports.")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+import threading
+import time
+from importlib.util import module_from_spec, spec_from_file_location
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import numpy as np
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from service.controller import CaptureChannel, CaptureConfig, CaptureDtype, CaptureSampleRate  # noqa: E402
+from service.controller import pcm  # noqa: E402
+from service.controller.interface.dataclass import CaptureBlockSize  # noqa: E402
+from service.plugin.interface.dataclass import PluginInfo, TapInfo  # noqa: E402
+from service.plugin.tap import AudioTap, TapChannel  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CONFIG = CaptureConfig(
+    device=0,
+    blocksize=CaptureBlockSize.B1024,
+    channel=CaptureChannel.Stereo,
+    dtype=CaptureDtype.Bit16,
+    samplerate=CaptureSampleRate.R48000,
+)
+
+PROCESS_PLUGIN = '''
+from pathlib import Path
+
+from service.plugin.interface.dataclass import PluginInfo, TapInfo
+from service.plugin.interface.enum import TapMode
+
+
+class CountingPlugin:
+    plugin_info = PluginInfo(name="counting", description="", author="", license="MIT", version="0")
+    tap_info = TapInfo(mode=TapMode.PROCESS)
+
+    def on_tap(self, frame: bytes) -> None:
+        with open(Path(__file__).with_name("frames.log"), "a") as log:
+            log.write(f"{len(frame)}\\n")
+
+
+def create_plugin():
+    return CountingPlugin()
+'''
+
+
+class RecordingPlugin:
+    """Keeps every frame; `gate` lets the test stall it."""
+
+    plugin_info = PluginInfo(name="recording", description="", author="", license="MIT", version="0")
+
+    def __init__(self, tap_info: TapInfo) -> None:
+        self.tap_info = tap_info
+        self.frames: list[bytes] = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.busy = threading.Event()
+
+    def on_tap(self, frame: bytes) -> None:
+        self.busy.set()
+        self.gate.wait()
+        self.frames.append(frame)
+
+
+def frame(index: int) -> bytes:
+    """A stereo frame whose samples all carry its index."""
+    return np.full(CONFIG.blocksize.value * 2, index, dtype="<i2").tobytes()
+
+
+def wait_until(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def check_channel() -> bool:
+    """Frames come out in order across many ring wraps; a full ring drops and counts new frames."""
+    failed = False
+    channel = TapChannel(slots=4, slot_size=64)
+    try:
+        for index in range(50):
+            payload = bytes([index]) * (1 + index % 64)
+            if not channel.put(payload) or channel.get(timeout=1) != payload:
+                print(f"FAIL: frame {index} did not survive the ring")
+                failed = True
+                break
+        if channel.delivered != 50 or channel.dropped:
+            print(f"FAIL: {channel.delivered} delivered and {channel.dropped} dropped after 50 frames")
+            failed = True
+
+        accepted = [channel.put(bytes([index]) * 8) for index in range(6)]
+        oversize = channel.put(bytes(65))
+        if accepted != [True] * 4 + [False] * 2 or oversize or channel.dropped != 3:
+            print(f"FAIL: a full ring accepted {accepted}, oversize {oversize}, dropped {channel.dropped}")
+            failed = True
+        drained = [channel.get(timeout=1) for _ in range(4)]
+        if drained != [bytes([index]) * 8 for index in range(4)] or channel.get(timeout=0.05) is not None:
+            print("FAIL: the ring did not hand back the first four frames in order")
+            failed = True
+        channel.wake()
+        started = time.monotonic()
+        if channel.get(timeout=1) is not None or time.monotonic() - started > 0.1:
+            print("FAIL: a woken reader did not return at once without a frame")
+            failed = True
+    finally:
+        channel.close()
+    print("tap channel: wraparound and drop counter ok" if not failed else "")
+    return not failed
+
+
+def check_thread_tap(args: argparse.Namespace) -> bool:
+    """A thread tap converts and delivers every frame, counts drops while stalled, and stops safely."""
+    failed = False
+    plugin = RecordingPlugin(TapInfo(samplerate=CaptureSampleRate.R16000, channel=CaptureChannel.Mono, slots=4))
+    tap = AudioTap(plugin, Path(__file__), CONFIG)
+    tap.start()
+    loop = asyncio.new_event_loop()
+    for index in range(args.frames):
+        loop.run_until_complete(tap.push(frame(index)))
+        time.sleep(0.002)
+    if not wait_until(lambda: len(plugin.frames) == args.frames):
+        print(f"FAIL: the plugin got {len(plugin.frames)} of {args.frames} frames")
+        failed = True
+    expected = [pcm.encode(pcm.downmix(pcm.decimate(pcm.decode(frame(i), CONFIG.dtype, 2), 3)), CaptureDtype.Bit16)
+                for i in range(args.frames)]
+    if plugin.frames != expected:
+        print("FAIL: converted frames do not match 16kHz mono")
+        failed = True
+
+    # Stall the plugin: one frame in its hands, four in the ring, the rest dropped.
+    plugin.gate.clear()
+    plugin.busy.clear()
+    loop.run_until_complete(tap.push(frame(0)))
+    plugin.busy.wait(2)
+    for index in range(10):
+        loop.run_until_complete(tap.push(frame(index)))
+    stats = tap.stats
+    print(f"stalled plugin: delivered {stats.delivered}, dropped {stats.dropped}")
+    if stats.dropped != 6:
+        print("FAIL: a stalled plugin should drop all but the ring's four slots")
+        failed = True
+
+    # Stop while the plugin is still busy; the worker must not see released memory.
+    errors: list[BaseException] = []
+    threading.excepthook = lambda hook: errors.append(hook.exc_value)
+    name = tap._channel._shm.name  # type: ignore[union-attr]
+    started = time.monotonic()
+    tap.stop()
+    print(f"stop with a busy plugin returned after {time.monotonic() - started:.1f}s")
+    try:
+        SharedMemory(name=name, track=False).close()
+    except FileNotFoundError:
+        print("FAIL: the shared memory was released while the plugin thread was still running")
+        failed = True
+    plugin.gate.set()
+    released = wait_until(lambda: not any(t.name.startswith("AudioTap-recording") for t in threading.enumerate()))
+    try:
+        SharedMemory(name=name, track=False).close()
+        print("FAIL: the shared memory outlived the plugin thread")
+        failed = True
+    except FileNotFoundError:
+        pass
+    if not released or errors:
+        print(f"FAIL: the plugin thread did not exit cleanly {errors}")
+        failed = True
+    threading.excepthook = threading.__excepthook__
+    loop.close()
+    print("thread tap ok" if not failed else "")
+    return not failed
+
+
+def check_reformat(args: argparse.Namespace) -> bool:
+    """A format change runs inside distribution; it must not wait for the old worker, even a busy one."""
+    failed = False
+    plugin = RecordingPlugin(TapInfo(slots=4))
+    tap = AudioTap(plugin, Path(__file__), CONFIG)
+    tap.start()
+    loop = asyncio.new_event_loop()
+    blocked: list[float] = []
+    for busy in (False, True):
+        if busy:
+            plugin.gate.clear()
+            plugin.busy.clear()
+            loop.run_until_complete(tap.push(frame(0)))
+            plugin.busy.wait(2)
+        else:
+            # Let the idle worker settle into its wait for the next frame.
+            time.sleep(0.1)
+        started = time.monotonic()
+        loop.run_until_complete(tap.reformat(CONFIG))
+        blocked.append(time.monotonic() - started)
+    plugin.gate.set()
+    plugin.frames.clear()
+    for index in range(args.frames):
+        loop.run_until_complete(tap.push(frame(index)))
+        time.sleep(0.002)
+    delivered = wait_until(lambda: len(plugin.frames) >= args.frames)
+    tap.stop()
+    loop.close()
+    print(f"reformat blocked {blocked[0] * 1000:.1f}ms with an idle plugin, {blocked[1] * 1000:.1f}ms with a busy one")
+    if max(blocked) > args.reformat:
+        print(f"FAIL: reformat blocked the caller for more than {args.reformat * 1000:.0f}ms")
+        failed = True
+    if not delivered:
+        print(f"FAIL: after reformat the plugin got {len(plugin.frames)} of {args.frames} frames")
+        failed = True
+    return not failed
+
+
+def check_process_tap(args: argparse.Namespace, workdir: Path) -> bool:
+    """A process tap re-creates the plugin from its module and receives every frame."""
+    module = workdir / "counting" / "plugin.py"
+    module.parent.mkdir()
+    module.write_text(PROCESS_PLUGIN)
+    spec = spec_from_file_location("counting", module)
+    assert spec and spec.loader
+    loaded = module_from_spec(spec)
+    spec.loader.exec_module(loaded)
+    tap = AudioTap(loaded.create_plugin(), module, CONFIG)
+    tap.start()
+    received = module.with_name("frames.log")
+    loop = asyncio.new_event_loop()
+    # The child process takes a moment to start; the ring holds what arrives meanwhile.
+    time.sleep(1.5)
+    for index in range(args.frames):
+        loop.run_until_complete(tap.push(frame(index)))
+        time.sleep(0.005)
+    done = wait_until(lambda: received.exists() and len(received.read_text().split()) == args.frames)
+    tap.stop()
+    loop.close()
+    lines = received.read_text().split() if received.exists() else []
+    expected = str(CONFIG.blocksize.value // 3 * 2)
+    if not done or set(lines) != {expected}:
+        print(f"FAIL: the process plugin got {len(lines)} of {args.frames} frames")
+        return False
+    print(f"process tap: {len(lines)} frames of {expected} bytes ok")
+    return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Check the shared-memory tap ring, thread and process taps, drops, reformat and a stop with a busy plugin."
+    )
+    parser.add_argument("--frames", type=int, default=100, help="Frames pushed to each tap.")
+    parser.add_argument("--reformat", type=float, default=0.05, help="Seconds reformat may block the caller.")
+    args = parser.parse_args()
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    ok = check_channel()
+    ok = check_thread_tap(args) and ok
+    ok = check_reformat(args) and ok
+    with tempfile.TemporaryDirectory(prefix="audio-tap-") as workdir:
+        ok = check_process_tap(args, Path(workdir)) and ok
+    print("audio tap ok" if ok else "")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
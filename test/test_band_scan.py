@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+from pathlib import Path
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from service.controller import FakeI2CBus  # noqa: E402
+from service.controller.interface.dataclass import ScanConfig, ScanReport  # noqa: E402
+from service.controller.rda5807m import ADDRESS, RDA5807M  # noqa: E402
+from service.controller.scan import BandScanner, StationIndex  # noqa: E402
+from simulated_tuner import FakeRDA5807M, SimulatedBand  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+
+def simulated_chip(band: SimulatedBand, latency: float, interference: frozenset[int] = frozenset()) -> RDA5807M:
+    """Interference channels carry a strong signal, but the chip does not set FM_TRUE on them."""
+
+    def signal(frequency: int, settled: float) -> int:
+        return 40 if frequency in interference else band(frequency, settled)
+
+    bus = FakeI2CBus(latency=latency, byte_time=9 / 400_000)
+    bus.attach(ADDRESS, FakeRDA5807M(tune_time=0.01, signal=signal, interference=interference))
+    return RDA5807M(bus)
+
+
+async def scan_once(
+    band: SimulatedBand,
+    index_path: Path,
+    config: ScanConfig,
+    latency: float,
+    full: bool = False,
+    interference: frozenset[int] = frozenset(),
+) -> tuple[ScanReport, StationIndex]:
+    chip = simulated_chip(band, latency, interference)
+    try:
+        await chip.power_on()
+        index = StationIndex(index_path)
+        await index.load()
+        report = await BandScanner(chip, index, config).scan(full=full)
+        return report, index
+    finally:
+        chip.close()
+
+
+def describe(label: str, report: ScanReport, index: StationIndex, band: SimulatedBand) -> None:
+    found = {entry.frequency for entry in index.stations()}
+    truth = set(band.stations)
+    print(
+        f"{label:<10} scanned {report.scanned:>3}  fresh {report.fresh:>3}  "
+        f"early-empty {report.empty:>3}  elapsed {report.elapsed:>6.2f}s  "
+        f"found {len(found & truth)}/{len(truth)}  false {len(found - truth)}"
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    band = SimulatedBand(seed=args.seed)
+    adaptive = ScanConfig()
+    # 固定测量时间 每个频点都测满 max_dwell
+    fixed = ScanConfig(empty_rssi=0, confirm=1 << 30)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        report, index = await scan_once(band, Path(workdir) / "fixed.json", fixed, args.latency)
+        describe("fixed", report, index, band)
+
+        path = Path(workdir) / "stations.json"
+        report, index = await scan_once(band, path, adaptive, args.latency)
+        describe("adaptive", report, index, band)
+
+        # 重启后再次扫描 索引未过期的频点全部跳过
+        report, index = await scan_once(band, path, adaptive, args.latency)
+        describe("rescan", report, index, band)
+        assert report.scanned == 0 and len(index) == len(range(87000, 108100, 100))
+
+        # 干扰频点信号很强但芯片不置 FM_TRUE 不能算作电台
+        occupied = {frequency + offset for frequency in band.stations for offset in (-100, 0, 100)}
+        interference = frozenset(sorted(set(range(87000, 108100, 100)) - occupied)[::20])
+        report, index = await scan_once(
+            band, Path(workdir) / "interference.json", adaptive, args.latency, interference=interference
+        )
+        describe("interfered", report, index, band)
+        found = {entry.frequency for entry in index.stations()}
+        assert not found & interference, f"interference taken for stations: {sorted(found & interference)}"
+        assert set(band.stations) <= found
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Scan a simulated FM band with fixed and adaptive dwell.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed for the simulated station layout (default: 0)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0002,
+        help="Fake bus per-transaction overhead in seconds (default: 0.0002)",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    asyncio.run(run(build_arg_parser().parse_args()))
@@ -0,0 +1,193 @@
+import argparse
+import datetime
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+from typing import Callable
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+log = logging.getLogger(__name__)
+
+BENCH_DIR = Path(__file__).resolve().parent / "benchmark"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+Benchmark = Callable[[], None]
+
+
+def discover(pattern: str | None) -> dict[str, Benchmark]:
+    """Collect benchmarks from every ``bench_*`` function in test/benchmark/bench_*.py.
+
+    Each ``bench_*`` function does its own setup and returns a mapping of
+    case name to a zero-argument callable that performs one operation.
+    """
+    cases: dict[str, Benchmark] = {}
+    for path in sorted(BENCH_DIR.glob("bench_*.py")):
+        spec = spec_from_file_location(path.stem, path)
+        if spec is None or spec.loader is None:
+            continue
+        module = module_from_spec(spec)
+        spec.loader.exec_module(module)
+        for attr in sorted(vars(module)):
+            factory = getattr(module, attr)
+            if not attr.startswith("bench_") or not callable(factory):
+                continue
+            prefix = f"{path.stem.removeprefix('bench_')}.{attr.removeprefix('bench_')}"
+            if pattern and pattern not in prefix:
+                continue
+            for case, func in factory().items():
+                name = f"{prefix}[{case}]" if case else prefix
+                if pattern and pattern not in name:
+                    continue
+                cases[name] = func
+    return cases
+
+
+def measure(func: Benchmark, min_time: float, repeat: int) -> dict[str, float]:
+    """Time ``func`` with an auto-calibrated loop count, like ``timeit``."""
+    func()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeat or number >= 1 << 24:
+            break
+        number *= 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number * 1e9)
+    return {
+        "median_ns": statistics.median(samples),
+        "min_ns": min(samples),
+        "loops": number,
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    results: dict[str, dict[str, float]] = {}
+    for name, func in discover(args.filter).items():
+        results[name] = measure(func, args.min_time, args.repeat)
+        print(f"{name:<48} {results[name]['median_ns']:>14,.0f} ns/op")
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "node": platform.node(),
+        },
+        "results": results,
+    }
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"saved {len(results)} results to {args.save}")
+    return report
+
+
+def compare(args: argparse.Namespace) -> int:
+    baseline = json.loads(Path(args.baseline).read_text())["results"]
+    if args.current:
+        current = json.loads(Path(args.current).read_text())["results"]
+    else:
+        current = run(args)["results"]
+
+    regressions = 0
+    print(f"\n{'benchmark':<48} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(current):
+        if name not in baseline:
+            print(f"{name:<48} {'-':>12} {current[name]['median_ns']:>12,.0f} {'new':>8}")
+            continue
+        before = baseline[name]["median_ns"]
+        after = current[name]["median_ns"]
+        change = after / before - 1
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{name:<48} {before:>12,.0f} {after:>12,.0f} {change:>+8.1%}{flag}")
+
+    if regressions:
+        print(f"\n{regressions} benchmark(s) slower than baseline by more than {args.threshold:.0%}")
+        return 1
+    print("\nno regressions")
+    return 0
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Hot path microbenchmarks with JSON baselines.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_options(command: argparse.ArgumentParser) -> None:
+        command.add_argument(
+            "-k",
+            "--filter",
+            help="Only run benchmarks whose name contains this string",
+        )
+        command.add_argument(
+            "--min-time",
+            type=float,
+            default=1.0,
+            help="Approximate seconds spent per benchmark (default: 1.0)",
+        )
+        command.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Timed repetitions per benchmark (default: 5)",
+        )
+
+    run_parser = commands.add_parser("run", help="Run benchmarks")
+    add_run_options(run_parser)
+    run_parser.add_argument(
+        "--save",
+        nargs="?",
+        const=str(DEFAULT_BASELINE),
+        help=f"Write results as JSON (default path: {DEFAULT_BASELINE.relative_to(ROOT)})",
+    )
+
+    compare_parser = commands.add_parser(
+        "compare",
+        help="Compare against a baseline, exit 1 on regressions",
+    )
+    add_run_options(compare_parser)
+    compare_parser.add_argument(
+        "--baseline",
+        default=str(DEFAULT_BASELINE),
+        help=f"Baseline JSON (default: {DEFAULT_BASELINE.relative_to(ROOT)})",
+    )
+    compare_parser.add_argument(
+        "--current",
+        help="Compare an existing results JSON instead of running now",
+    )
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.15,
+        help="Allowed slowdown before flagging, as a fraction (default: 0.15)",
+    )
+    compare_parser.set_defaults(save=None)
+    return parser
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    args = build_arg_parser().parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
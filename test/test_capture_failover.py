@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+    FetchService,
+    SyntheticSource,
+    WatchdogConfig,
+    start_fetch_service,
+)
+from service.controller.interface.dataclass import CaptureBlockSize  # noqa: E402
+from service.controller.source import FrameCallback  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CONFIG = CaptureConfig(
+    device=0,
+    blocksize=CaptureBlockSize.B1024,
+    channel=CaptureChannel.Stereo,
+    dtype=CaptureDtype.Bit16,
+    samplerate=CaptureSampleRate.R48000,
+)
+
+
+class FaultySource(SyntheticSource):
+    """Synthetic source with injectable faults; a restart clears them."""
+
+    def __init__(self, config: CaptureConfig, name: str, broken_starts: int = 0) -> None:
+        super().__init__(config)
+        self.name = name
+        self._stalled = False
+        self._crash = False
+        self._broken_starts = broken_starts
+        self.starts = 0
+
+    def stall(self) -> None:
+        """Keep the capture thread alive but stop calling back, like a hung device."""
+        self._stalled = True
+
+    def crash(self) -> None:
+        """Make the capture thread die with an exception."""
+        self._crash = True
+
+    def start(self, callback: FrameCallback) -> None:
+        self.starts += 1
+        if self._broken_starts:
+            self._broken_starts -= 1
+            raise RuntimeError(f"{self.name} failed to open")
+        self._stalled = self._crash = False
+        super().start(lambda frame: self._deliver(callback, frame))
+
+    def _deliver(self, callback: FrameCallback, frame: bytes) -> None:
+        if self._crash:
+            raise RuntimeError(f"{self.name} crashed")
+        if not self._stalled:
+            callback(frame)
+
+
+class Subscriber:
+    """Measures the longest pause between frames delivered to one subscriber."""
+
+    def __init__(self) -> None:
+        self.frames = 0
+        self.formats = 0
+        self.last: Optional[float] = None
+        self.longest = 0.0
+
+    async def push(self, _frame: bytes) -> None:
+        now = time.perf_counter()
+        if self.last is not None:
+            self.longest = max(self.longest, now - self.last)
+        self.last = now
+        self.frames += 1
+
+    async def reformat(self, _config: CaptureConfig) -> None:
+        self.formats += 1
+
+    def reset(self) -> None:
+        self.longest = 0.0
+
+
+async def wait_failovers(fetch: FetchService, count: int, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while len(fetch.failovers) < count:
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+async def run(args: argparse.Namespace) -> int:
+    watchdog = WatchdogConfig(stall_timeout=args.stall, backoff=0.2)
+    primary = FaultySource(CONFIG, "primary")
+    standby = FaultySource(CONFIG, "standby")
+    fetch = await start_fetch_service(config=CONFIG, source=primary, standby=standby, watchdog=watchdog)
+    assert fetch is not None
+    subscribers = [Subscriber() for _ in range(args.subscribers)]
+    for index, subscriber in enumerate(subscribers):
+        fetch.subscribe(index, subscriber.push, on_format=subscriber.reformat)
+    await asyncio.sleep(0.5)
+
+    interval = CONFIG.blocksize.value / CONFIG.samplerate.value
+    # Detection takes up to the stall timeout plus one watchdog tick, then one frame to hand over.
+    budget = args.stall * 1.25 + interval * 2 + 0.05
+    rows = []
+
+    async def inject(name: str, fault, expect_standby: bool, settle: float = 1.0) -> None:
+        for subscriber in subscribers:
+            subscriber.reset()
+        count = len(fetch.failovers) + 1
+        fault()
+        handled = await wait_failovers(fetch, count, timeout=args.stall * 20)
+        await asyncio.sleep(settle)
+        failover = fetch.failovers[-1] if handled else None
+        rows.append((name, failover, expect_standby, max(s.longest for s in subscribers)))
+
+    await inject("stall, hot standby", primary.stall, expect_standby=True)
+    # The stalled primary has been restarted in the background as the new standby.
+    await inject("crash, hot standby", standby.crash, expect_standby=True)
+
+    lone = FaultySource(CONFIG, "lone")
+    await fetch.reconfigure(CONFIG, lone)
+    await asyncio.sleep(0.5)
+    await inject("stall, restart", lone.stall, expect_standby=False)
+
+    flaky = FaultySource(CONFIG, "flaky")
+    await fetch.reconfigure(CONFIG, flaky)
+    await asyncio.sleep(0.5)
+
+    def break_and_stall() -> None:
+        flaky._broken_starts = 2
+        flaky.stall()
+
+    await inject("stall, flaky restart", break_and_stall, expect_standby=False, settle=0.5)
+
+    attached = sum(subscriber.frames > 0 for subscriber in subscribers)
+    frames_before = [subscriber.frames for subscriber in subscribers]
+    await asyncio.sleep(0.5)
+    flowing = all(s.frames > before for s, before in zip(subscribers, frames_before))
+    fetch.stop()
+
+    print(f"{args.subscribers} subscribers, {interval * 1000:.1f}ms blocks, stall timeout {args.stall * 1000:.0f}ms")
+    print(f"{'fault':<22}{'action':>10}{'failover ms':>13}{'longest pause ms':>18}")
+    failed = False
+    for name, failover, expect_standby, longest in rows:
+        if failover is None:
+            print(f"{name:<22}{'none':>10}")
+            print(f"FAIL: {name} was not detected")
+            failed = True
+            continue
+        action = "standby" if failover.standby else "restart"
+        print(f"{name:<22}{action:>10}{failover.gap * 1000:>13.1f}{longest * 1000:>18.1f}")
+        if failover.standby != expect_standby:
+            print(f"FAIL: {name} expected {'standby' if expect_standby else 'restart'}")
+            failed = True
+        if name != "stall, flaky restart" and failover.gap > budget:
+            print(f"FAIL: {name} took longer than {budget * 1000:.0f}ms")
+            failed = True
+    print(f"flaky source opened {flaky.starts} times")
+    if not flowing or attached != len(subscribers):
+        print("FAIL: subscribers stopped receiving frames")
+        failed = True
+    print("capture failover ok" if not failed else "")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Inject stalls and crashes into synthetic capture sources and time the failover."
+    )
+    parser.add_argument("--subscribers", type=int, default=4, help="Subscribers attached throughout.")
+    parser.add_argument("--stall", type=float, default=0.25, help="Watchdog stall timeout in seconds.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from aioquic.asyncio import connect
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from test_load_broadcast import (  # noqa: E402
+    HOST,
+    client_configuration,
+    generate_certificate,
+    run_server,
+)
+from test_transport_profiles import LossyProxy  # noqa: E402
+from service.connection.client import WebTransportClientProtocol  # noqa: E402
+from service.connection.clock import ClockSync, decode_pong, encode_ping  # noqa: E402
+from service.connection.framing import FrameReader, decode_timestamp  # noqa: E402
+from service.connection.interface.enum import FrameType  # noqa: E402
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+)
+from service.controller.interface.dataclass import CaptureBlockSize  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CONFIG = CaptureConfig(
+    device=0,
+    blocksize=CaptureBlockSize.B1024,
+    channel=CaptureChannel.Stereo,
+    dtype=CaptureDtype.Bit16,
+    samplerate=CaptureSampleRate.R48000,
+)
+
+
+@dataclass
+class Room:
+    """One simulated player whose wall clock is off by `skew` microseconds."""
+
+    name: str
+    skew: int
+    delay: float = 0.0
+    """one-way network delay added by a proxy, in seconds"""
+    clock: ClockSync = field(default_factory=ClockSync)
+    reader: FrameReader = field(default_factory=FrameReader)
+    pending: Optional[int] = None
+    frames: int = 0
+    unstamped: int = 0
+    pongs: int = 0
+    arrivals: dict[int, int] = field(default_factory=dict)
+    """capture timestamp -> local arrival time of the frame, in microseconds"""
+
+    def now(self) -> int:
+        return time.time_ns() // 1000 + self.skew
+
+    def on_datagram(self, data: bytes) -> None:
+        sample = decode_pong(data, self.now())
+        if sample is not None:
+            self.pongs += 1
+            self.clock.update(sample)
+
+    def feed(self, _stream_id: int, data: bytes, _ended: bool) -> None:
+        arrived = self.now()
+        for frame_type, payload in self.reader.feed(data):
+            if frame_type == FrameType.TIMESTAMP:
+                self.pending = decode_timestamp(payload)
+            elif frame_type in (FrameType.AUDIO, FrameType.SILENCE):
+                self.frames += 1
+                if self.pending is None:
+                    self.unstamped += 1
+                else:
+                    self.arrivals[self.pending] = arrived
+                self.pending = None
+
+    def play_at(self, captured: int, latency: int) -> Optional[float]:
+        """True wall-clock time at which this room would play the frame, in microseconds."""
+        local = self.clock.to_local(captured)
+        return None if local is None else local + latency - self.skew
+
+
+async def listen(port: int, room: Room, pings: int, stop: asyncio.Event) -> None:
+    async with connect(
+        HOST,
+        port,
+        configuration=client_configuration(),
+        create_protocol=WebTransportClientProtocol,
+    ) as client:
+        assert isinstance(client, WebTransportClientProtocol)
+        client.on_stream_data = room.feed
+        client.on_datagram = room.on_datagram
+        await client.open_session(authority=f"localhost:{port}", path="/broadcast")
+        # Same schedule as the web client: a quick burst, then periodic refreshes.
+        for index in range(pings):
+            client.send_datagram(encode_ping(room.now()))
+            await asyncio.sleep(0.2 if index < 5 else 1.0)
+        await stop.wait()
+        client.close_session()
+
+
+async def run(args: argparse.Namespace) -> int:
+    loop = asyncio.get_running_loop()
+    rooms = [
+        Room("local", skew=0),
+        Room("ahead 2.5s", skew=2_500_000),
+        Room("behind 40ms", skew=-40_000),
+        Room(f"+{args.delay:.0f}ms link", skew=750_000, delay=args.delay / 1000),
+    ]
+    proxies = []
+    ports = []
+    for index, room in enumerate(rooms):
+        if not room.delay:
+            ports.append(args.port)
+            continue
+        proxy_port = args.port + 1 + index
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: LossyProxy((HOST, args.port), 0.0, room.delay, seed=index),
+            local_addr=(HOST, proxy_port),
+        )
+        proxies.append(transport)
+        ports.append(proxy_port)
+
+    stop = asyncio.Event()
+    tasks = [
+        asyncio.create_task(listen(port, room, args.pings, stop))
+        for port, room in zip(ports, rooms)
+    ]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    for transport in proxies:
+        transport.close()
+
+    latency = int(args.latency * 1000)
+    interval = CONFIG.blocksize.value * 1_000_000 / CONFIG.samplerate.value
+    print(f"{len(rooms)} rooms, {args.duration:.0f}s, playback {args.latency:.0f}ms after capture")
+    print(
+        f"{'room':<16}{'skew ms':>10}{'error ms':>10}{'rtt ms':>9}{'pongs':>7}"
+        f"{'frames':>8}{'min lead ms':>13}"
+    )
+    failed = False
+    for room in rooms:
+        best = room.clock.best
+        if best is None:
+            print(f"{room.name:<16}{room.skew / 1000:>10.1f}{'-':>10}")
+            print(f"FAIL: {room.name} got no clock replies")
+            failed = True
+            continue
+        # Server and rooms share the host clock, so the true offset is exactly -skew.
+        error = best.offset + room.skew
+        # Lead: how long before its scheduled play time each frame arrived.
+        leads = [
+            room.clock.to_local(captured) + latency - arrived
+            for captured, arrived in room.arrivals.items()
+        ]
+        print(
+            f"{room.name:<16}{room.skew / 1000:>10.1f}{error / 1000:>10.2f}{best.rtt / 1000:>9.2f}"
+            f"{room.pongs:>7}{room.frames:>8}{min(leads) / 1000:>13.1f}"
+        )
+        if abs(error) > best.rtt / 2 + args.tolerance * 1000:
+            print(f"FAIL: {room.name} offset error exceeds half the round trip")
+            failed = True
+        if room.unstamped:
+            print(f"FAIL: {room.name} received {room.unstamped} frames without a capture timestamp")
+            failed = True
+        if min(leads) < 0:
+            print(f"FAIL: {room.name} received frames after their play time")
+            failed = True
+
+    # Frames every room received, and the spread of their true play times across rooms.
+    common = set.intersection(*(set(room.arrivals) for room in rooms))
+    spreads = []
+    for captured in common:
+        times = [room.play_at(captured, latency) for room in rooms]
+        if None not in times:
+            spreads.append((max(times) - min(times)) / 1000)
+    steps = [b - a for a, b in zip(sorted(common), sorted(common)[1:])]
+    print(
+        f"play-time spread   median {statistics.median(spreads):.2f}ms  max {max(spreads):.2f}ms  "
+        f"({len(spreads)} frames)"
+    )
+    print(f"timestamp step     median {statistics.median(steps) / 1000:.2f}ms  (block {interval / 1000:.2f}ms)")
+    if max(spreads) > args.tolerance:
+        print(f"FAIL: rooms would play the same frame more than {args.tolerance}ms apart")
+        failed = True
+    if abs(statistics.median(steps) - interval) > interval * 0.1:
+        print("FAIL: capture timestamps do not advance with the block interval")
+        failed = True
+    print("clock sync ok" if not failed else "")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Sync several skewed clients to the server clock and compare their play times."
+    )
+    parser.add_argument("--duration", type=float, default=6.0, help="Seconds to listen.")
+    parser.add_argument("--pings", type=int, default=8, help="Clock pings sent by each client.")
+    parser.add_argument("--delay", type=float, default=30.0, help="One-way delay of the proxied room in ms.")
+    parser.add_argument("--latency", type=float, default=400.0, help="Playback delay after capture in ms.")
+    parser.add_argument("--tolerance", type=float, default=5.0, help="Allowed play-time spread in ms.")
+    parser.add_argument("--port", type=int, default=58940, help="Server port; proxies use the next ones.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as workdir:
+        cert, key = generate_certificate(Path(workdir))
+        server = context.Process(target=run_server, args=(CONFIG, args.port, cert, key), daemon=True)
+        server.start()
+        time.sleep(1.5)
+        try:
+            return asyncio.run(run(args))
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
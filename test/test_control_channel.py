@@ -0,0 +1,336 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aioquic.asyncio import connect
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from test_load_broadcast import (  # noqa: E402
+    HOST,
+    client_configuration,
+    generate_certificate,
+    run_server,
+)
+from handler.broadcast import AUTO_LEVEL, LEVEL, STATS, TUNE  # noqa: E402
+from service.connection.client import WebTransportClientProtocol  # noqa: E402
+from service.connection.framing import FrameReader, decode_format  # noqa: E402
+from service.connection.handler import WebTransportStream  # noqa: E402
+from service.connection.interface.enum import ControlMethod, FrameType  # noqa: E402
+from service.connection.rpc import RpcChannel, RpcClient  # noqa: E402
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+)
+from service.controller.interface.dataclass import CaptureBlockSize  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CONFIG = CaptureConfig(
+    device=0,
+    blocksize=CaptureBlockSize.B1024,
+    channel=CaptureChannel.Stereo,
+    dtype=CaptureDtype.Bit16,
+    samplerate=CaptureSampleRate.R48000,
+)
+
+
+class Listener:
+    """Splits the session's streams into the broadcast stream and the control stream."""
+
+    def __init__(self, client: WebTransportClientProtocol) -> None:
+        self.control = client.create_stream()
+        self.rpc = RpcClient(
+            lambda data: client.send_stream_data(self.control, data),
+            on_notify=self.on_notify,
+        )
+        self.reader = FrameReader()
+        self.formats: list[bytes] = []
+        """FORMAT frame payloads seen on the broadcast stream"""
+        self.notices: list[bytes] = []
+        """FORMAT notification payloads seen on the control stream"""
+        self.audio_bytes = 0
+
+    def on_notify(self, method: int, payload: bytes) -> None:
+        if method == ControlMethod.FORMAT:
+            self.notices.append(payload)
+
+    def feed(self, stream_id: int, data: bytes, _ended: bool) -> None:
+        if stream_id == self.control:
+            self.rpc.feed(data)
+            return
+        for frame_type, payload in self.reader.feed(data):
+            if frame_type == FrameType.FORMAT:
+                self.formats.append(payload)
+            elif frame_type == FrameType.AUDIO:
+                self.audio_bytes += len(payload)
+
+
+async def expect_error(future: asyncio.Future, needle: str) -> bool:
+    try:
+        await future
+    except RuntimeError as exc:
+        return needle in str(exc)
+    return False
+
+
+async def check_head_of_line() -> bool:
+    """In memory: a slow TUNE does not hold back the requests pipelined behind it."""
+    client: RpcClient
+    stream = WebTransportStream(
+        0,
+        is_unidirectional=False,
+        can_read=True,
+        can_write=True,
+        send_stream_data=lambda _stream_id, data, _end: client.feed(data),
+        transmit=lambda: None,
+    )
+    client = RpcClient(lambda data: stream.feed_data(data, False))
+    channel = RpcChannel(stream)
+    release = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def tune(payload: bytes) -> bytes:
+        try:
+            await release.wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return payload
+
+    channel.register(ControlMethod.TUNE, tune)
+    channel.register(ControlMethod.PING, lambda payload: payload)
+    serving = asyncio.create_task(channel.serve())
+
+    failed = False
+    tuned = client.call(ControlMethod.TUNE, TUNE.pack(97_400))
+    pings = [client.call(ControlMethod.PING, bytes([index])) for index in range(8)]
+    try:
+        await asyncio.wait_for(asyncio.gather(*pings), 1)
+    except asyncio.TimeoutError:
+        print("FAIL: PINGs pipelined behind a slow TUNE waited for it")
+        failed = True
+    if tuned.done():
+        print("FAIL: the TUNE was answered before it finished")
+        failed = True
+    release.set()
+    if await asyncio.wait_for(tuned, 1) != TUNE.pack(97_400):
+        print("FAIL: the TUNE reply lost its payload")
+        failed = True
+
+    # Closing the control stream cancels a request still in progress.
+    release.clear()
+    abandoned = client.call(ControlMethod.TUNE, TUNE.pack(88_000))
+    await asyncio.sleep(0.05)
+    stream.close()
+    try:
+        await asyncio.wait_for(serving, 1)
+    except asyncio.TimeoutError:
+        print("FAIL: the channel kept waiting for a TUNE after its stream closed")
+        failed = True
+    await asyncio.sleep(0)
+    if not cancelled.is_set():
+        print("FAIL: a TUNE in progress outlived its control stream")
+        failed = True
+    client.close()
+    if not isinstance(abandoned.exception(), ConnectionError):
+        print("FAIL: the abandoned TUNE did not fail when the client closed")
+        failed = True
+    print("head of line: PINGs answered while a TUNE was in progress" if not failed else "")
+    return not failed
+
+
+async def check_half_close(args: argparse.Namespace) -> bool:
+    """A client that ends its side of the control stream after its last requests still gets every reply."""
+    failed = False
+    # In memory: a TUNE still in progress when the client half-closes is answered once it finishes.
+    client: RpcClient
+    stream = WebTransportStream(
+        0,
+        is_unidirectional=False,
+        can_read=True,
+        can_write=True,
+        send_stream_data=lambda _stream_id, data, _end: client.feed(data),
+        transmit=lambda: None,
+    )
+    client = RpcClient(lambda data: stream.feed_data(data, True))
+    channel = RpcChannel(stream)
+    release = asyncio.Event()
+
+    async def tune(payload: bytes) -> bytes:
+        await release.wait()
+        return payload
+
+    channel.register(ControlMethod.TUNE, tune)
+    channel.register(ControlMethod.PING, lambda payload: payload)
+    serving = asyncio.create_task(channel.serve())
+    tuned = client.call(ControlMethod.TUNE, TUNE.pack(97_400))
+    pinged = client.call(ControlMethod.PING, b"last")
+    await asyncio.sleep(0.05)
+    release.set()
+    await asyncio.wait({tuned, pinged, serving}, timeout=1)
+    serving.cancel()
+    if not pinged.done() or pinged.exception() or pinged.result() != b"last":
+        print("FAIL: a PING sent with the end of the stream was not answered")
+        failed = True
+    if not tuned.done() or tuned.exception() or tuned.result() != TUNE.pack(97_400):
+        print("FAIL: a TUNE in progress when the client half-closed was not answered")
+        failed = True
+
+    # Over QUIC: the requests and the FIN arrive together on a new session's control stream.
+    async with connect(
+        HOST,
+        args.port,
+        configuration=client_configuration(),
+        create_protocol=WebTransportClientProtocol,
+    ) as quic:
+        assert isinstance(quic, WebTransportClientProtocol)
+        await quic.open_session(authority=f"localhost:{args.port}", path="/broadcast")
+        control = quic.create_stream()
+        rpc = RpcClient(lambda data: quic.send_stream_data(control, data, end_stream=True))
+        quic.on_stream_data = lambda stream_id, data, _ended: rpc.feed(data) if stream_id == control else None
+        replies = [rpc.call(ControlMethod.PING, b"ping"), rpc.call(ControlMethod.STATS)]
+        try:
+            await asyncio.wait_for(asyncio.gather(*replies), 2)
+        except asyncio.TimeoutError:
+            print("FAIL: requests sent with end_stream=True were not answered over QUIC")
+            failed = True
+        quic.close_session()
+    print("half close: requests sent with the end of the stream were answered" if not failed else "")
+    return not failed
+
+
+async def run(args: argparse.Namespace) -> int:
+    failed = not await check_head_of_line()
+    failed = not await check_half_close(args) or failed
+    async with connect(
+        HOST,
+        args.port,
+        configuration=client_configuration(),
+        create_protocol=WebTransportClientProtocol,
+    ) as client:
+        assert isinstance(client, WebTransportClientProtocol)
+        await client.open_session(authority=f"localhost:{args.port}", path="/broadcast")
+        listener = Listener(client)
+        client.on_stream_data = listener.feed
+        rpc = listener.rpc
+        payload = bytes(16)
+
+        # Sequential round trips while the broadcast stream keeps flowing.
+        rtts = []
+        for _ in range(args.pings):
+            started = time.perf_counter()
+            if await rpc.call(ControlMethod.PING, payload) != payload:
+                print("FAIL: PING did not echo its payload")
+                failed = True
+            rtts.append((time.perf_counter() - started) * 1000)
+        rtts.sort()
+        p99 = rtts[int(len(rtts) * 0.99) - 1]
+        print(f"round trip   median {statistics.median(rtts):.2f}ms  p99 {p99:.2f}ms  ({args.pings} pings)")
+
+        # Pipelined: a window of requests in flight, answers matched by correlation id.
+        started = time.perf_counter()
+        answered = 0
+        for offset in range(0, args.messages, args.window):
+            count = min(args.window, args.messages - offset)
+            tokens = [index.to_bytes(4, "little") for index in range(offset, offset + count)]
+            replies = await asyncio.gather(*[rpc.call(ControlMethod.PING, token) for token in tokens])
+            answered += sum(reply == token for reply, token in zip(replies, tokens))
+        elapsed = time.perf_counter() - started
+        rate = args.messages / elapsed
+        print(f"pipelined    {rate:,.0f} msg/s  (window {args.window}, {args.messages} messages)")
+        if answered != args.messages:
+            print(f"FAIL: {args.messages - answered} replies did not match their request")
+            failed = True
+
+        rtt, window, in_flight, backlog, level, pinned = STATS.unpack(await rpc.call(ControlMethod.STATS))
+        print(
+            f"stats        rtt {rtt / 1000:.2f}ms  cwnd {window}  in flight {in_flight}  "
+            f"backlog {backlog}  level {level}  pinned {pinned}"
+        )
+
+        # Pin the mono level: the reply, the notification and the next FORMAT frame agree.
+        pinned_format = await rpc.call(ControlMethod.LEVEL, LEVEL.pack(1))
+        await asyncio.sleep(0.3)
+        print(f"pinned level 1: {decode_format(pinned_format)}")
+        if pinned_format not in listener.notices or listener.formats[-1] != pinned_format:
+            print("FAIL: pinning a level was not announced on both streams")
+            failed = True
+        if not STATS.unpack(await rpc.call(ControlMethod.STATS))[5]:
+            print("FAIL: STATS does not report the pinned level")
+            failed = True
+        await rpc.call(ControlMethod.LEVEL, LEVEL.pack(AUTO_LEVEL))
+        if STATS.unpack(await rpc.call(ControlMethod.STATS))[5]:
+            print("FAIL: the level stayed pinned after asking for automatic selection")
+            failed = True
+
+        checks = [
+            (rpc.call(ControlMethod.LEVEL, LEVEL.pack(9)), "档位 9 不存在"),
+            (rpc.call(ControlMethod.TUNE, TUNE.pack(97_400)), "调谐器"),
+            (rpc.call(77), "未知的方法"),
+        ]
+        for future, needle in checks:
+            if not await expect_error(future, needle):
+                print(f"FAIL: expected an error mentioning {needle}")
+                failed = True
+        # The channel keeps serving after errors.
+        if await rpc.call(ControlMethod.PING, b"ok") != b"ok":
+            print("FAIL: the control stream stopped answering after an error")
+            failed = True
+
+        if statistics.median(rtts) > args.rtt:
+            print(f"FAIL: median round trip above {args.rtt}ms")
+            failed = True
+        if rate < args.rate:
+            print(f"FAIL: fewer than {args.rate:,.0f} pipelined messages per second")
+            failed = True
+        if not listener.audio_bytes:
+            print("FAIL: the broadcast stream stalled while the control stream was busy")
+            failed = True
+        client.close_session()
+
+    print("control channel ok" if not failed else "")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Exercise the binary control stream next to a live broadcast stream."
+    )
+    parser.add_argument("--pings", type=int, default=200, help="Sequential round trips to time.")
+    parser.add_argument("--messages", type=int, default=20000, help="Pipelined requests to send.")
+    parser.add_argument("--window", type=int, default=256, help="Requests in flight at once.")
+    parser.add_argument("--rtt", type=float, default=10.0, help="Allowed median round trip in ms.")
+    parser.add_argument("--rate", type=float, default=2000.0, help="Minimum pipelined messages per second.")
+    parser.add_argument("--port", type=int, default=58950, help="Server port.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as workdir:
+        cert, key = generate_certificate(Path(workdir))
+        server = context.Process(target=run_server, args=(CONFIG, args.port, cert, key), daemon=True)
+        server.start()
+        time.sleep(1.5)
+        try:
+            return asyncio.run(run(args))
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
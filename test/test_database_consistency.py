@@ -0,0 +1,157 @@
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+from typing import Any
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from service.database import DatabaseContext  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+PLUGIN = ROOT / "plugin" / "sqlite" / "plugin.py"
+
+
+def slow_sqlite(path: Path, write_delay: float, read_delay: float):
+    """The SQLite plugin with every batch write and read taking at least the given time."""
+    spec = spec_from_file_location("sqlite_plugin", PLUGIN)
+    assert spec and spec.loader
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    class SlowSQLitePlugin(module.SQLitePlugin):
+        def __init__(self) -> None:
+            super().__init__(path)
+            self.batches = 0
+            self.closed = False
+
+        async def write_batch(self, table: str, rows: list[dict[str, Any]]) -> None:
+            await asyncio.sleep(write_delay)
+            await super().write_batch(table, rows)
+            self.batches += 1
+
+        async def read(self, table: str, key: str):
+            await asyncio.sleep(read_delay)
+            return await super().read(table, key)
+
+        async def close(self) -> None:
+            await super().close()
+            self.closed = True
+
+    return SlowSQLitePlugin()
+
+
+async def read_your_writes(args: argparse.Namespace, workdir: Path) -> bool:
+    """A read right after a write sees the new row, before and after the flush."""
+    plugin = slow_sqlite(workdir / "consistency.sqlite3", args.delay, args.delay)
+    context = DatabaseContext(flush_interval=args.delay * 4, cache_ttl=60)
+    await plugin.setup(context)
+    failed = False
+
+    # The old row is in the database and in the cache.
+    await plugin.write_batch("station", [{"key": "FM101.7", "name": "old"}])
+    await context.read("station", "FM101.7")
+    context.write("station", {"key": "FM101.7", "name": "new"})
+    row = await context.read("station", "FM101.7")
+    if row is None or row["name"] != "new":
+        print(f"FAIL: a read before the flush returned {row}")
+        failed = True
+
+    # A read that started before a write must not cache what it read.
+    context.cache.invalidate()
+    reading = asyncio.create_task(context.read("station", "FM101.7"))
+    await asyncio.sleep(args.delay / 2)
+    context.write("station", {"key": "FM101.7", "name": "newer"})
+    await reading
+    await context.writer.flush()
+    row = await context.read("station", "FM101.7")
+    if row is None or row["name"] != "newer":
+        print(f"FAIL: a read racing a write left {row} in the cache")
+        failed = True
+
+    # Many writes to one key in a burst: every read sees the latest.
+    for index in range(args.rows):
+        context.write("station", {"key": "FM101.7", "name": f"burst-{index}"})
+        if index % 50 == 0:
+            row = await context.read("station", "FM101.7")
+            if row is None or row["name"] != f"burst-{index}":
+                print(f"FAIL: read {row} right after writing burst-{index}")
+                failed = True
+                break
+    await context.close()
+    reopened = slow_sqlite(workdir / "consistency.sqlite3", 0, 0)
+    await reopened.setup(None)
+    stored = await reopened.read("station", "FM101.7")
+    if stored is None or stored["name"] != f"burst-{args.rows - 1}":
+        print(f"FAIL: the database holds {stored} after close")
+        failed = True
+    await reopened.close()
+    print(f"read-your-writes: cache hits {context.cache.hits} misses {context.cache.misses}")
+    return not failed
+
+
+async def close_durability(args: argparse.Namespace, workdir: Path) -> bool:
+    """Closing while a batch is being written keeps that batch and everything queued after it."""
+    plugin = slow_sqlite(workdir / "durability.sqlite3", args.delay, 0)
+    context = DatabaseContext(batch_size=args.batch, flush_interval=0.01)
+    await plugin.setup(context)
+    failed = False
+
+    for index in range(args.rows):
+        context.write("event", {"key": f"event-{index}", "index": index})
+    # The background task is now in the middle of writing its first batch.
+    await asyncio.sleep(args.delay / 2)
+    await context.close()
+    context.write("event", {"key": "late", "index": -1})
+    if not plugin.closed:
+        print("FAIL: closing the context left the plugin's connection open")
+        failed = True
+
+    reopened = slow_sqlite(workdir / "durability.sqlite3", 0, 0)
+    await reopened.setup(None)
+    missing = [
+        index for index in range(args.rows) if await reopened.read("event", f"event-{index}") is None
+    ]
+    late = await reopened.read("event", "late")
+    await reopened.close()
+    print(
+        f"close durability: {args.rows - len(missing)}/{args.rows} rows stored in {plugin.batches} batches, "
+        f"{context.writer.dropped} dropped after close"
+    )
+    if missing:
+        print(f"FAIL: {len(missing)} rows were lost on close, first {missing[:5]}")
+        failed = True
+    if late is not None or context.writer.dropped != 1:
+        print("FAIL: a write after close was accepted")
+        failed = True
+    return not failed
+
+
+async def run(args: argparse.Namespace) -> int:
+    logging.basicConfig(level="ERROR", format="%(name)s: %(message)s")
+    with tempfile.TemporaryDirectory(prefix="database-consistency-") as workdir:
+        ok = await read_your_writes(args, Path(workdir))
+        ok = await close_durability(args, Path(workdir)) and ok
+    print("database consistency ok" if ok else "")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Check read-your-writes through the write-behind queue and that close keeps every queued row."
+    )
+    parser.add_argument("--rows", type=int, default=1000, help="Rows written in the burst and before close.")
+    parser.add_argument("--batch", type=int, default=100, help="Rows per batch written to SQLite.")
+    parser.add_argument("--delay", type=float, default=0.1, help="Seconds each slowed batch write and read take.")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
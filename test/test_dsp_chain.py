@@ -0,0 +1,144 @@
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from service.controller import CaptureChannel, CaptureConfig, CaptureDtype, CaptureSampleRate  # noqa: E402
+from service.controller import pcm  # noqa: E402
+from service.controller.dsp import DspChain, OnePole  # noqa: E402
+from service.controller.interface.dataclass import CaptureBlockSize, DspConfig  # noqa: E402
+
+
+def check_one_pole() -> None:
+    """The block-vectorised recursion must match a plain sample loop across blocks."""
+    rng = np.random.default_rng(1)
+    for a in (0.5, 0.99, 0.9995):
+        recursion = OnePole(a)
+        state = np.zeros(2)
+        expected = np.zeros(2)
+        for frames in (8192, 1000, 33, 1):
+            u = rng.standard_normal((frames, 2))
+            y = recursion.run(u, state)
+            reference = np.empty_like(u)
+            for index in range(frames):
+                expected = a * expected + u[index]
+                reference[index] = expected
+            error = np.max(np.abs(y - reference))
+            assert error < 1e-9, f"a={a} frames={frames} error={error}"
+    print("one-pole recursion matches the scalar reference")
+
+
+def check_full_scale() -> None:
+    """Full-scale samples survive encode and decode in both directions for every sample format."""
+    for dtype in CaptureDtype:
+        samples = np.array([[1.0, -1.0], [0.5, -0.5]], dtype=np.float32)
+        with np.errstate(all="raise"):
+            decoded = pcm.decode(pcm.encode(samples, dtype), dtype, 2)
+            assert decoded[0, 0] > 0.999 and decoded[0, 1] == -1.0, f"{dtype.value}: {decoded[0]}"
+            assert np.allclose(decoded[1], samples[1]), f"{dtype.value}: {decoded[1]}"
+            # The largest integer sample decodes to exactly 1.0 in float32 and must encode back unchanged.
+            width = {CaptureDtype.Bit16: 2, CaptureDtype.Bit24: 3, CaptureDtype.Bit32: 4}[dtype]
+            extremes = (2 ** (8 * width - 1) - 1).to_bytes(width, "little", signed=True)
+            extremes += (-(2 ** (8 * width - 1))).to_bytes(width, "little", signed=True)
+            again = pcm.encode(pcm.decode(extremes, dtype, 2), dtype)
+            assert again == extremes, f"{dtype.value}: {extremes.hex()} became {again.hex()}"
+    print("full-scale samples round-trip for every sample format")
+
+
+def programme(config: CaptureConfig, seconds: float) -> list[bytes]:
+    """Noise programme with a DC offset, 50Hz hum and a 20dB loudness jump halfway."""
+    rate = config.samplerate.value
+    frames = config.blocksize.value
+    rng = np.random.default_rng(0)
+    blocks = []
+    for index in range(int(seconds * rate / frames)):
+        t = (np.arange(frames) + index * frames) / rate
+        level = 0.02 if index * frames < seconds * rate / 2 else 0.2
+        mono = level * rng.standard_normal(frames) + 0.05 * np.sin(2 * np.pi * 50 * t) + 0.1
+        samples = np.repeat(mono[:, None], config.channel.value, axis=1)
+        blocks.append(pcm.encode(samples.astype(np.float32), config.dtype))
+    return blocks
+
+
+def lufs(samples: np.ndarray) -> float:
+    return -0.691 + 10 * math.log10(float(np.mean(samples * samples, axis=0).sum()))
+
+
+def check_chain(args: argparse.Namespace) -> None:
+    config = CaptureConfig(
+        device=0,
+        blocksize=CaptureBlockSize.B8192,
+        channel=CaptureChannel.Stereo,
+        dtype=CaptureDtype.Bit24,
+        samplerate=CaptureSampleRate.R48000,
+    )
+    dsp = DspConfig(target_lufs=args.target)
+    chain = DspChain(config, dsp)
+    outputs = [
+        pcm.decode(chain.process(block), config.dtype, config.channel.value)
+        for block in programme(config, args.seconds)
+    ]
+    tail = np.concatenate(outputs[-len(outputs) // 6 :])
+    dc = float(np.abs(tail.mean(axis=0)).max())
+    loudness = lufs(tail)
+    peak = float(np.abs(np.concatenate(outputs)).max())
+    print(f"dc after high-pass {dc:.5f}  loudness {loudness:.1f} LUFS (target {args.target})  peak {peak:.3f}")
+    assert dc < 0.005
+    assert abs(loudness - args.target) < 1.5
+    assert peak <= 1.0
+
+
+def report_cpu() -> None:
+    """CPU time per block as a share of the block's real-time duration."""
+    print(f"\n{'samplerate':>10} {'per block':>10} {'realtime':>9}")
+    for samplerate in CaptureSampleRate:
+        config = CaptureConfig(
+            device=0,
+            blocksize=CaptureBlockSize.B8192,
+            channel=CaptureChannel.Stereo,
+            dtype=CaptureDtype.Bit24,
+            samplerate=samplerate,
+        )
+        chain = DspChain(config, DspConfig(deemphasis=50.0))
+        blocks = programme(config, 2)
+        started = time.process_time()
+        for block in blocks:
+            chain.process(block)
+        per_block = (time.process_time() - started) / len(blocks)
+        duration = config.blocksize.value / samplerate.value
+        print(f"{samplerate.value:>10} {per_block * 1000:>8.2f}ms {per_block / duration:>8.1%}")
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Check the broadcast DSP chain and report its CPU cost per block.",
+    )
+    parser.add_argument(
+        "--target",
+        type=float,
+        default=-16.0,
+        help="AGC target loudness in LUFS (default: -16)",
+    )
+    parser.add_argument(
+        "--seconds",
+        type=float,
+        default=20.0,
+        help="Length of the synthetic programme (default: 20)",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    check_one_pole()
+    check_full_scale()
+    check_chain(args)
+    report_cpu()
@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from aioquic.asyncio import connect
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from test_load_broadcast import (  # noqa: E402
+    HOST,
+    client_configuration,
+    generate_certificate,
+    server_configuration,
+)
+from service.connection import start_webtransport_service  # noqa: E402
+from service.connection.client import WebTransportClientProtocol  # noqa: E402
+from service.connection.framing import FrameReader, decode_format  # noqa: E402
+from service.connection.interface.enum import FrameType  # noqa: E402
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+    SyntheticSource,
+    start_fetch_service,
+)
+from service.controller.interface.dataclass import CaptureBlockSize  # noqa: E402
+from service.controller.source import sample_width  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CONFIGS = [
+    CaptureConfig(
+        device=0,
+        blocksize=CaptureBlockSize.B2048,
+        channel=CaptureChannel.Stereo,
+        dtype=CaptureDtype.Bit16,
+        samplerate=CaptureSampleRate.R48000,
+    ),
+    CaptureConfig(
+        device=0,
+        blocksize=CaptureBlockSize.B1024,
+        channel=CaptureChannel.Mono,
+        dtype=CaptureDtype.Bit24,
+        samplerate=CaptureSampleRate.R22050,
+    ),
+    CaptureConfig(
+        device=0,
+        blocksize=CaptureBlockSize.B4096,
+        channel=CaptureChannel.Stereo,
+        dtype=CaptureDtype.Bit32,
+        samplerate=CaptureSampleRate.R96000,
+    ),
+]
+
+
+@dataclass
+class Listener:
+    """Tracks formats and audio frames seen by one client session."""
+
+    reader: FrameReader = field(default_factory=FrameReader)
+    formats: list[tuple[int, int, int, int]] = field(default_factory=list)
+    frame_bytes: int = 0
+    last_audio: float = 0.0
+    gaps: list[float] = field(default_factory=list)
+    mismatched: int = 0
+    switched: bool = False
+    closed: bool = False
+
+    def feed(self, _stream_id: int, data: bytes, _ended: bool) -> None:
+        now = time.perf_counter()
+        for frame_type, payload in self.reader.feed(data):
+            if frame_type == FrameType.FORMAT:
+                samplerate, channels, bits, blocksize = decode_format(payload)
+                self.formats.append((samplerate, channels, bits, blocksize))
+                self.frame_bytes = blocksize * channels * bits // 8
+                self.switched = len(self.formats) > 1
+            elif frame_type == FrameType.AUDIO:
+                if len(payload) != self.frame_bytes:
+                    self.mismatched += 1
+                if self.switched:
+                    # Client-side gap: last audio in the old format to first in the new.
+                    self.gaps.append(now - self.last_audio)
+                    self.switched = False
+                self.last_audio = now
+
+
+async def listen(port: int, listener: Listener, ready: asyncio.Event, stop: asyncio.Event) -> None:
+    async with connect(
+        HOST,
+        port,
+        configuration=client_configuration(),
+        create_protocol=WebTransportClientProtocol,
+    ) as client:
+        assert isinstance(client, WebTransportClientProtocol)
+        client.on_stream_data = listener.feed
+        # Pin the capture format so only reconfiguration produces format frames.
+        await client.open_session(authority=f"localhost:{port}", path="/broadcast?adapt=0")
+        ready.set()
+        closed = asyncio.create_task(client.wait_session_closed())
+        done, _ = await asyncio.wait(
+            [closed, asyncio.create_task(stop.wait())],
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        listener.closed = closed in done
+        client.close_session()
+
+
+async def run(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory() as workdir:
+        cert_path, key_path = generate_certificate(Path(workdir))
+        fetch = await start_fetch_service(config=CONFIGS[0], source=SyntheticSource(CONFIGS[0]))
+        server = await start_webtransport_service(
+            configuration=server_configuration(cert_path, key_path),
+            host=HOST,
+            port=args.port,
+        )
+        assert fetch is not None and server is not None
+
+        stop = asyncio.Event()
+        listeners = [Listener() for _ in range(args.sessions)]
+        tasks = []
+        for listener in listeners:
+            ready = asyncio.Event()
+            tasks.append(asyncio.create_task(listen(args.port, listener, ready, stop)))
+            await asyncio.wait_for(ready.wait(), timeout=10)
+        await asyncio.sleep(0.5)
+
+        server_gaps = []
+        for index in range(1, args.switches + 1):
+            config = CONFIGS[index % len(CONFIGS)]
+            server_gaps.append(await fetch.reconfigure(config, source=SyntheticSource(config)))
+            await asyncio.sleep(args.hold)
+
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Let the server finish closing the sessions before tearing down capture.
+        await asyncio.sleep(0.2)
+        server.close()
+        fetch.stop()
+
+    client_gaps = [gap for listener in listeners for gap in listener.gaps]
+    print(f"{args.switches} switches with {args.sessions} sessions attached")
+    print(
+        f"server gap   median {statistics.median(server_gaps) * 1000:6.1f}ms  "
+        f"max {max(server_gaps) * 1000:6.1f}ms"
+    )
+    print(
+        f"client gap   median {statistics.median(client_gaps) * 1000:6.1f}ms  "
+        f"max {max(client_gaps) * 1000:6.1f}ms"
+    )
+
+    failures = []
+    for number, listener in enumerate(listeners):
+        if listener.closed:
+            failures.append(f"session {number} was closed during a switch")
+        if len(listener.formats) != args.switches + 1:
+            failures.append(f"session {number} saw {len(listener.formats)} format frames")
+        if listener.mismatched:
+            failures.append(f"session {number} got {listener.mismatched} frames in the wrong format")
+    if max(client_gaps) > args.max_gap:
+        failures.append(f"client gap exceeded {args.max_gap * 1000:.0f}ms")
+    if failures:
+        print("\n".join(failures))
+        return 1
+    print("all sessions stayed attached and followed every format change")
+    return 0
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Swap the capture config under live /broadcast sessions and measure the gap.",
+    )
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        default=5,
+        help="Concurrent client sessions (default: 5)",
+    )
+    parser.add_argument(
+        "--switches",
+        type=int,
+        default=6,
+        help="Number of config switches (default: 6)",
+    )
+    parser.add_argument(
+        "--hold",
+        type=float,
+        default=0.5,
+        help="Seconds to stay on each config (default: 0.5)",
+    )
+    parser.add_argument(
+        "--max-gap",
+        type=float,
+        default=0.25,
+        help="Largest acceptable client-side gap in seconds (default: 0.25)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=58997,
+        help="Local server port (default: 58997)",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+    sys.exit(asyncio.run(run(build_arg_parser().parse_args())))
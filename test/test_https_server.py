@@ -36,7 +36,7 @@ class HtmlOnlyHandler(SimpleHTTPRequestHandler):
 
 def build_arg_parser(project_root: Path) -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
-        description="HTTPS server for test/web HTML files.",
+        description="HTTPS server for web/ HTML files.",
     )
     parser.add_argument(
         "--host",
@@ -51,8 +51,8 @@ def build_arg_parser(project_root: Path) -> argparse.ArgumentParser:
     )
     parser.add_argument(
         "--web-root",
-        default=str(project_root / "test" / "web"),
-        help="HTML root directory (default: test/web)",
+        default=str(project_root / "web"),
+        help="HTML root directory (default: web)",
     )
     parser.add_argument(
         "--cert",
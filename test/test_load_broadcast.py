@@ -0,0 +1,429 @@
+import argparse
+import asyncio
+import datetime
+import logging
+import multiprocessing
+import os
+import ssl
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from pathlib import Path
+
+from aioquic.asyncio import connect
+from aioquic.h3.connection import H3_ALPN
+from aioquic.quic.configuration import QuicConfiguration
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from service.connection.client import WebTransportClientProtocol  # noqa: E402
+from service.connection.framing import FrameReader  # noqa: E402
+from service.connection.interface.enum import FrameType  # noqa: E402
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+    SyntheticSource,
+)
+from service.controller.interface.dataclass import CaptureBlockSize  # noqa: E402
+from service.controller.source import sample_width  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+HOST = "127.0.0.1"
+
+
+def generate_certificate(directory: Path) -> tuple[Path, Path]:
+    """Create a throwaway self-signed certificate for localhost."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(
+            x509.SubjectAlternativeName(
+                [x509.DNSName("localhost"), x509.DNSName(HOST)]
+            ),
+            critical=False,
+        )
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = directory / "localhost.cer"
+    key_path = directory / "localhost.key"
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    return cert_path, key_path
+
+
+def client_configuration() -> QuicConfiguration:
+    return QuicConfiguration(
+        alpn_protocols=H3_ALPN,
+        is_client=True,
+        verify_mode=ssl.CERT_NONE,
+        max_datagram_frame_size=65536,
+    )
+
+
+def server_configuration(cert_path: Path, key_path: Path) -> QuicConfiguration:
+    configuration = QuicConfiguration(
+        alpn_protocols=H3_ALPN,
+        is_client=False,
+        max_datagram_frame_size=65536,
+    )
+    configuration.load_cert_chain(cert_path, key_path)
+    return configuration
+
+
+def run_server(config: CaptureConfig, port: int, cert_path: Path, key_path: Path) -> None:
+    """Server process: synthetic capture feeding the real broadcast route."""
+    logging.basicConfig(level="WARNING", format="server %(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+
+    from service.connection import start_webtransport_service
+    from service.controller import start_fetch_service
+
+    async def serve() -> None:
+        await start_fetch_service(config=config, source=SyntheticSource(config))
+        await start_webtransport_service(
+            configuration=server_configuration(cert_path, key_path),
+            host=HOST,
+            port=port,
+        )
+        await asyncio.Future()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+class ProcessSampler:
+    """Read CPU time and resident memory of a process from /proc."""
+
+    def __init__(self, pid: int) -> None:
+        self._pid = pid
+        self._ticks = os.sysconf("SC_CLK_TCK")
+        self._last_cpu = self._cpu_seconds()
+        self._last_wall = time.monotonic()
+
+    def _cpu_seconds(self) -> float:
+        stat = Path(f"/proc/{self._pid}/stat").read_text()
+        fields = stat[stat.rindex(")") + 2 :].split()
+        return (int(fields[11]) + int(fields[12])) / self._ticks
+
+    def rss_mib(self) -> float:
+        for line in Path(f"/proc/{self._pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+        return 0.0
+
+    def cpu_percent(self) -> float:
+        cpu, wall = self._cpu_seconds(), time.monotonic()
+        percent = (cpu - self._last_cpu) / max(wall - self._last_wall, 1e-9) * 100
+        self._last_cpu, self._last_wall = cpu, wall
+        return percent
+
+
+@dataclass
+class SessionProbe:
+    """Counts audio bytes and checks sawtooth continuity of one broadcast session."""
+
+    width: int
+    channels: int
+    bytes: int = 0
+    gaps: int = 0
+    lost_samples: int = 0
+    _readers: dict[int, FrameReader] = field(default_factory=dict)
+    _offsets: dict[int, int] = field(default_factory=dict)
+    _anchor: dict[int, int] = field(default_factory=dict)
+
+    def feed(self, stream_id: int, data: bytes, _ended: bool) -> None:
+        reader = self._readers.setdefault(stream_id, FrameReader())
+        for frame_type, payload in reader.feed(data):
+            if frame_type == FrameType.AUDIO:
+                self.check(stream_id, payload)
+
+    def check(self, stream_id: int, payload: bytes) -> None:
+        offset = self._offsets.get(stream_id, 0)
+        self._offsets[stream_id] = offset + len(payload)
+        self.bytes += len(payload)
+
+        # Audio frames hold whole sample frames; check only the first sample
+        # of each one, which is cheap enough for hundreds of sessions.
+        frame_bytes = self.width * self.channels
+        if len(payload) < self.width:
+            return
+        start = self.width - 2
+        value = int.from_bytes(payload[start : start + 2], "little", signed=True)
+        frame = offset // frame_bytes
+
+        anchor = self._anchor.get(stream_id)
+        if anchor is not None:
+            missing = (value - anchor - frame) % SyntheticSource.PERIOD
+            if missing:
+                self.gaps += 1
+                self.lost_samples += missing
+        self._anchor[stream_id] = value - frame
+
+    def take_bytes(self) -> int:
+        taken, self.bytes = self.bytes, 0
+        return taken
+
+
+async def open_listener(port: int, probe: SessionProbe, ready: asyncio.Event, stop: asyncio.Event) -> None:
+    async with connect(
+        HOST,
+        port,
+        configuration=client_configuration(),
+        create_protocol=WebTransportClientProtocol,
+    ) as client:
+        assert isinstance(client, WebTransportClientProtocol)
+        client.on_stream_data = probe.feed
+        await client.open_session(authority=f"localhost:{port}", path="/broadcast")
+        ready.set()
+        await stop.wait()
+        client.close_session()
+
+
+async def serve_listeners(port: int, width: int, channels: int, timeout: float, pipe: Connection) -> None:
+    """Client process: open listeners and report their counters on request from the ramp."""
+    stop = asyncio.Event()
+    probes: list[SessionProbe] = []
+    tasks: list[asyncio.Task] = []
+    while True:
+        command, value = await asyncio.to_thread(pipe.recv)
+        if command == "open":
+            # Open one at a time; a session the server does not accept in time ends the step.
+            for _ in range(value):
+                probe = SessionProbe(width=width, channels=channels)
+                ready = asyncio.Event()
+                task = asyncio.create_task(open_listener(port, probe, ready, stop))
+                try:
+                    await asyncio.wait_for(ready.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    task.cancel()
+                    break
+                probes.append(probe)
+                tasks.append(task)
+            pipe.send(len(probes))
+        elif command == "reset":
+            for probe in probes:
+                probe.take_bytes()
+                probe.gaps = probe.lost_samples = 0
+            pipe.send(None)
+        elif command == "report":
+            pipe.send([(probe.take_bytes(), probe.gaps, probe.lost_samples) for probe in probes])
+        else:
+            stop.set()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            pipe.send(None)
+            return
+
+
+def run_clients(port: int, width: int, channels: int, timeout: float, pipe: Connection) -> None:
+    logging.basicConfig(level="WARNING", format="client %(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+    try:
+        asyncio.run(serve_listeners(port, width, channels, timeout, pipe))
+    except KeyboardInterrupt:
+        pass
+
+
+def ask(pipes: list[Connection], commands: list[tuple[str, int]], timeout: float) -> list:
+    """Send one command to each client process and wait for every answer."""
+    for pipe, command in zip(pipes, commands):
+        pipe.send(command)
+    answers = []
+    for pipe in pipes:
+        if not pipe.poll(timeout):
+            raise TimeoutError("a client process did not answer")
+        answers.append(pipe.recv())
+    return answers
+
+
+def ramp(args: argparse.Namespace, config: CaptureConfig, server_pid: int) -> int:
+    """
+    Step through the session counts, spreading listeners over several client processes.
+
+    Client CPU is reported next to the server's: a client process near 100%, or server and
+    clients together using every CPU, means the load generator limits the delivery rate.
+    """
+    width = sample_width(config.dtype)
+    expected_rate = config.samplerate.value * config.channel.value * width
+    sampler = ProcessSampler(server_pid)
+    context = multiprocessing.get_context("spawn")
+    pipes: list[Connection] = []
+    clients = []
+    for index in range(args.clients):
+        ours, theirs = context.Pipe()
+        client = context.Process(
+            target=run_clients,
+            args=(args.port, width, config.channel.value, args.open_timeout, theirs),
+            name=f"LoadClient-{index}",
+            daemon=True,
+        )
+        client.start()
+        pipes.append(ours)
+        clients.append(client)
+    client_samplers = [ProcessSampler(client.pid) for client in clients]
+    # Generous: a client opens its share of a step one session at a time.
+    answer_timeout = args.open_timeout * max(args.sessions) + 30
+
+    print(
+        f"{'sessions':>8} {'total MiB/s':>12} {'min rate':>9} {'mean rate':>10} "
+        f"{'gaps':>6} {'lost':>9} {'cpu %':>7} {'rss MiB':>8} {'client %':>9} {'busiest %':>10}"
+    )
+    failed = False
+    opened = [0] * args.clients
+    try:
+        for target in args.sessions:
+            shares = [target // args.clients + (index < target % args.clients) for index in range(args.clients)]
+            commands = [("open", max(share - have, 0)) for share, have in zip(shares, opened)]
+            opened = ask(pipes, commands, answer_timeout)
+            if sum(opened) < target:
+                print(f"{target:>8} FAIL: the server accepted {sum(opened)} of {target} sessions within {args.open_timeout:g}s each")
+                failed = True
+                break
+
+            ask(pipes, [("reset", 0)] * args.clients, answer_timeout)
+            sampler.cpu_percent()
+            for client_sampler in client_samplers:
+                client_sampler.cpu_percent()
+            time.sleep(args.duration)
+
+            reports = [row for rows in ask(pipes, [("report", 0)] * args.clients, answer_timeout) for row in rows]
+            cpu = sampler.cpu_percent()
+            client_cpu = [client_sampler.cpu_percent() for client_sampler in client_samplers]
+            received = [count for count, _, _ in reports]
+            rates = [count / args.duration / expected_rate for count in received]
+            print(
+                f"{target:>8} {sum(received) / args.duration / 2**20:>12.2f} "
+                f"{min(rates):>9.3f} {sum(rates) / len(rates):>10.3f} "
+                f"{sum(gaps for _, gaps, _ in reports):>6} {sum(lost for _, _, lost in reports):>9} "
+                f"{cpu:>7.1f} {sampler.rss_mib():>8.1f} {sum(client_cpu):>9.1f} {max(client_cpu):>10.1f}"
+            )
+            if max(client_cpu) > 90:
+                print(f"{'':>8} note: a client process is saturated; this step measures the load generator")
+            elif cpu + sum(client_cpu) > len(os.sched_getaffinity(0)) * 90:
+                print(f"{'':>8} note: server and clients use every CPU of this machine; the clients compete with the server")
+        ask(pipes, [("stop", 0)] * args.clients, answer_timeout)
+    except TimeoutError as exc:
+        print(f"FAIL: {exc}")
+        failed = True
+    finally:
+        for client in clients:
+            client.terminate()
+            client.join()
+    return 1 if failed else 0
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Ramp concurrent /broadcast sessions against a local synthetic server.",
+    )
+    parser.add_argument(
+        "--sessions",
+        type=lambda value: [int(step) for step in value.split(",")],
+        default=[1, 10, 25, 50, 100],
+        help="Comma separated session counts to ramp through (default: 1,10,25,50,100)",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=5.0,
+        help="Seconds to measure at each step (default: 5)",
+    )
+    parser.add_argument(
+        "--clients",
+        type=int,
+        default=4,
+        help="Client processes the listeners are spread over (default: 4)",
+    )
+    parser.add_argument(
+        "--open-timeout",
+        type=float,
+        default=30.0,
+        help="Seconds a session may take to be accepted before its step fails (default: 30)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=58999,
+        help="Local server port (default: 58999)",
+    )
+    parser.add_argument(
+        "--samplerate",
+        type=int,
+        default=48000,
+        choices=[rate.value for rate in CaptureSampleRate],
+        help="Synthetic source sample rate (default: 48000)",
+    )
+    parser.add_argument(
+        "--dtype",
+        default="int16",
+        choices=[dtype.value for dtype in CaptureDtype],
+        help="Synthetic source sample format (default: int16)",
+    )
+    parser.add_argument(
+        "--blocksize",
+        type=int,
+        default=2048,
+        choices=[size.value for size in CaptureBlockSize],
+        help="Synthetic source block size (default: 2048)",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format="%(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("WARNING")
+    args = build_arg_parser().parse_args()
+
+    config = CaptureConfig(
+        device=0,
+        blocksize=CaptureBlockSize(args.blocksize),
+        channel=CaptureChannel.Stereo,
+        dtype=CaptureDtype(args.dtype),
+        samplerate=CaptureSampleRate(args.samplerate),
+    )
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cert_path, key_path = generate_certificate(Path(workdir))
+        server = multiprocessing.get_context("spawn").Process(
+            target=run_server,
+            args=(config, args.port, cert_path, key_path),
+            daemon=True,
+        )
+        server.start()
+        time.sleep(1.5)
+        code = 0
+        try:
+            code = ramp(args, config, server.pid)
+        except KeyboardInterrupt:
+            log.info("stopping...")
+        finally:
+            server.terminate()
+            server.join()
+    sys.exit(code)
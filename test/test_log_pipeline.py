@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.logging import RichHandler
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from service.controller import CaptureConfig, FetchService, SyntheticSource  # noqa: E402
+from service.diagnostic import install_log_queue  # noqa: E402
+from service.diagnostic.interface.dataclass import LogQueueConfig  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+
+def rich_handler(sink) -> RichHandler:
+    """The handler main.py installs, rendering to a terminal-like sink."""
+    console = Console(file=sink, force_terminal=True, width=120)
+    handler = RichHandler(console=console, log_time_format="[%H:%M:%S]", rich_tracebacks=True)
+    handler.setFormatter(logging.Formatter("%(name)s: %(message)s"))
+    return handler
+
+
+async def watch(stalls: list[float], stop: asyncio.Event, tick: float) -> None:
+    """Record how late each short sleep wakes up."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(tick)
+        stalls.append((loop.time() - started - tick) * 1000)
+
+
+async def burst(args: argparse.Namespace, fetch: FetchService) -> float:
+    """Sessions connect in batches per loop iteration, stay briefly, then leave."""
+
+    async def push(_data: bytes) -> None:
+        return
+
+    started = time.perf_counter()
+    for index in range(args.sessions):
+        fetch.subscribe(index, push)
+        if index % args.batch == args.batch - 1:
+            await asyncio.sleep(0)
+    await asyncio.sleep(0.2)
+    for index in range(args.sessions):
+        fetch.unsubscribe(index)
+        if index % args.batch == args.batch - 1:
+            await asyncio.sleep(0)
+    return time.perf_counter() - started
+
+
+async def scenario(args: argparse.Namespace, queued: bool) -> dict:
+    root = logging.getLogger()
+    previous = list(root.handlers)
+    for handler in previous:
+        root.removeHandler(handler)
+    sink = open(os.devnull, "w")
+    handler = rich_handler(sink)
+    pipeline = None
+    if queued:
+        pipeline = install_log_queue(handler, config=LogQueueConfig(interval=args.interval, burst=args.burst))
+    else:
+        root.addHandler(handler)
+
+    # Only the subscription bookkeeping and its log lines run; capture stays off.
+    config = CaptureConfig(device=0)
+    fetch = FetchService(config=config, source=SyntheticSource(config))
+    stalls: list[float] = []
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch(stalls, stop, args.tick / 1000))
+    await asyncio.sleep(0.1)
+    cpu = time.process_time()
+    elapsed = await burst(args, fetch)
+    cpu = time.process_time() - cpu
+    await asyncio.sleep(0.1)
+    stop.set()
+    await watcher
+
+    result = {"elapsed": elapsed, "cpu": cpu, "stalls": sorted(stalls), "rendered": args.sessions * 2}
+    if pipeline is not None:
+        pipeline.stop()
+        result["rendered"] = pipeline.rendered
+        result["suppressed"] = pipeline.handler.suppressed
+        result["dropped"] = pipeline.handler.dropped
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in previous:
+        root.addHandler(handler)
+    sink.close()
+    return result
+
+
+def report(label: str, result: dict) -> float:
+    """输出事件循环停顿的分布 返回 p99"""
+    stalls = result["stalls"]
+    p99 = stalls[max(int(len(stalls) * 0.99) - 1, 0)]
+    print(
+        f"{label:<8} loop stall median {statistics.median(stalls):6.2f}ms  p99 {p99:6.2f}ms  "
+        f"max {stalls[-1]:6.2f}ms  burst {result['elapsed'] * 1000:6.0f}ms  "
+        f"cpu {result['cpu'] * 1000:6.0f}ms  lines rendered {result['rendered']}"
+    )
+    return p99
+
+
+async def run(args: argparse.Namespace) -> int:
+    logging.basicConfig(level="INFO", format="%(name)s: %(message)s")
+    print(f"{args.sessions} sessions connect and leave, {args.batch} per loop iteration")
+    direct = await scenario(args, queued=False)
+    before = report("direct", direct)
+    runs = []
+    for _ in range(args.runs):
+        runs.append(await scenario(args, queued=True))
+        after = report("queued", runs[-1])
+    queued = runs[-1]
+    print(f"suppressed {queued['suppressed']}  dropped {queued['dropped']}")
+
+    failed = False
+    if after * args.speedup > before:
+        print(f"FAIL: the log queue did not cut the p99 loop stall by {args.speedup}x")
+        failed = True
+    if after > args.stall:
+        print(f"FAIL: the p99 loop stall is above {args.stall}ms")
+        failed = True
+    # A stall as long as a capture block is an audible drop; bound the max of a typical run and of the worst.
+    maxima = [result["stalls"][-1] for result in runs]
+    if statistics.median(maxima) > args.stall:
+        print(f"FAIL: the max loop stall of a typical queued run is above {args.stall}ms")
+        failed = True
+    if max(maxima) > args.worst:
+        print(f"FAIL: the worst loop stall over {args.runs} queued runs is above {args.worst}ms")
+        failed = True
+    # Two call sites, each shows its burst plus a summary of the rest.
+    expected = 2 * (args.burst + 1)
+    if queued["rendered"] > expected + 2 or not queued["suppressed"]:
+        print(f"FAIL: {queued['rendered']} lines rendered, repeats were not summarized")
+        failed = True
+    if queued["rendered"] + queued["suppressed"] - 2 != direct["rendered"] - queued["dropped"]:
+        print("FAIL: some log records were neither rendered nor counted as suppressed")
+        failed = True
+    print("log pipeline ok" if not failed else "")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Measure event loop stalls while a connect burst logs through rich, directly and queued."
+    )
+    parser.add_argument("--sessions", type=int, default=1000, help="Sessions in the burst.")
+    parser.add_argument("--batch", type=int, default=20, help="Sessions connecting per loop iteration.")
+    parser.add_argument("--tick", type=float, default=2.0, help="Stall probe interval in ms.")
+    parser.add_argument("--interval", type=float, default=5.0, help="Rate limit period in seconds.")
+    parser.add_argument("--burst", type=int, default=10, help="Lines per call site and period.")
+    parser.add_argument("--speedup", type=float, default=3.0, help="Required cut of the p99 stall.")
+    parser.add_argument("--stall", type=float, default=20.0, help="Allowed p99 and median max stall in ms when queued.")
+    parser.add_argument("--worst", type=float, default=40.0, help="Allowed max stall in ms over all queued runs.")
+    parser.add_argument("--runs", type=int, default=3, help="Queued runs whose max stalls are checked.")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
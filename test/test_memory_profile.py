@@ -0,0 +1,256 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+from aioquic.asyncio import connect
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from test_load_broadcast import (  # noqa: E402
+    HOST,
+    client_configuration,
+    generate_certificate,
+    server_configuration,
+)
+from test_transport_profiles import LossyProxy  # noqa: E402
+from service.connection.client import WebTransportClientProtocol  # noqa: E402
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+    SyntheticSource,
+)
+from service.controller.interface.dataclass import CaptureBlockSize  # noqa: E402
+from service.controller.source import sample_width  # noqa: E402
+from service.diagnostic.interface.dataclass import MemoryReport  # noqa: E402
+from service.diagnostic.memory import render  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CONFIG = CaptureConfig(
+    device=0,
+    blocksize=CaptureBlockSize.B8192,
+    channel=CaptureChannel.Stereo,
+    dtype=CaptureDtype.Bit16,
+    samplerate=CaptureSampleRate.R48000,
+)
+
+SESSION = "service.connection.session.WebTransportSession"
+
+
+def run_server(port: int, cert: Path, key: Path, frames: int, reports) -> None:
+    """Server process with the profiler installed; forwards its reports and tracing state."""
+    logging.basicConfig(level="WARNING", format="server %(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+
+    from service.connection import start_webtransport_service
+    from service.controller import start_fetch_service
+    from service.diagnostic import MemoryProfiler, install_memory_profiler
+
+    async def serve() -> None:
+        await start_fetch_service(config=CONFIG, source=SyntheticSource(CONFIG))
+        await start_webtransport_service(
+            configuration=server_configuration(cert, key), host=HOST, port=port
+        )
+        profiler = install_memory_profiler(MemoryProfiler(frames=frames))
+        assert profiler is not None
+        reports.put(("ready", None))
+        last, tracing = None, False
+        while True:
+            await asyncio.sleep(0.05)
+            if profiler.tracing != tracing:
+                tracing = profiler.tracing
+                reports.put(("tracing", tracing))
+            if profiler.last is not last:
+                last = profiler.last
+                reports.put(("report", last))
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+class Blackhole(LossyProxy):
+    """Proxy that can stop forwarding the server's packets, like a client that went silent."""
+
+    def __init__(self, target: tuple[str, int]) -> None:
+        super().__init__(target, loss=0.0, delay=0.0, seed=0)
+        self.blocked = False
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        if self.blocked and addr == self._target:
+            return
+        super().datagram_received(data, addr)
+
+
+async def listen(port: int, stop: asyncio.Event, ready: asyncio.Event) -> None:
+    async with connect(
+        HOST,
+        port,
+        configuration=client_configuration(),
+        create_protocol=WebTransportClientProtocol,
+    ) as client:
+        assert isinstance(client, WebTransportClientProtocol)
+        client.on_stream_data = lambda *_: None
+        await client.open_session(authority=f"localhost:{port}", path="/broadcast")
+        ready.set()
+        await stop.wait()
+        client.close_session()
+
+
+async def open_sessions(ports: list[int], stop: asyncio.Event) -> list[asyncio.Task]:
+    tasks = []
+    for port in ports:
+        ready = asyncio.Event()
+        tasks.append(asyncio.create_task(listen(port, stop, ready)))
+        await asyncio.wait_for(ready.wait(), timeout=10)
+    return tasks
+
+
+async def receive(reports, kind: str):
+    while True:
+        received, value = await asyncio.to_thread(reports.get, timeout=60)
+        if received == kind:
+            return value
+
+
+async def signal_report(pid: int, reports) -> MemoryReport:
+    """Ask for a report the way an operator would, with `kill -USR1`."""
+    os.kill(pid, signal.SIGUSR1)
+    return await receive(reports, "report")
+
+
+def subsystem(report: MemoryReport, name: str) -> tuple[int, int]:
+    """(live bytes, growth) of one subsystem; zero when it has no live allocations."""
+    for entry in report.subsystems:
+        if entry.name == name:
+            return entry.size, entry.growth
+    return 0, 0
+
+
+async def run(args: argparse.Namespace, pid: int, reports) -> int:
+    loop = asyncio.get_running_loop()
+    await receive(reports, "ready")
+    failed = False
+    baseline = await signal_report(pid, reports)
+    print(f"baseline report took {baseline.elapsed * 1000:.0f}ms")
+
+    # A slow subscriber: its packets stop arriving, so its frames pile up in aioquic.
+    transport, blackhole = await loop.create_datagram_endpoint(
+        lambda: Blackhole((HOST, args.port)), local_addr=(HOST, args.port + 1)
+    )
+    stop = asyncio.Event()
+    tasks = await open_sessions([args.port] * args.sessions + [args.port + 1], stop)
+    await asyncio.sleep(1.0)
+    blackhole.blocked = True
+    await asyncio.sleep(args.stall)
+    loaded = await signal_report(pid, reports)
+    print(f"\n{args.sessions} sessions and one stalled subscriber after {args.stall:.0f}s")
+    print(render(loaded))
+
+    live = [session for session in loaded.sessions if not session.closed]
+    buffers = sorted(session.send_buffer for session in live)
+    stalled, others = buffers[-1], buffers[:-1]
+    # Adaptive quality may step the stalled session down, so only expect a quarter of full rate.
+    expected = CONFIG.samplerate.value * CONFIG.channel.value * sample_width(CONFIG.dtype) * args.stall / 4
+    if len(live) != args.sessions + 1:
+        print(f"FAIL: report lists {len(live)} live sessions, expected {args.sessions + 1}")
+        failed = True
+    if stalled < expected or stalled < 10 * max(statistics.median(others), 1):
+        print("FAIL: the stalled subscriber's send buffer does not stand out")
+        failed = True
+    if subsystem(loaded, "connection")[1] <= 0 or subsystem(loaded, "aioquic")[1] <= 0:
+        print("FAIL: session growth was not attributed to connection and aioquic")
+        failed = True
+    if loaded.object_growth.get(SESSION, 0) != args.sessions + 1:
+        print("FAIL: gc did not count the new sessions")
+        failed = True
+
+    blackhole.blocked = False
+    stop.set()
+    await asyncio.gather(*tasks)
+    # Let the proxy forward the client's CONNECTION_CLOSE before it goes away.
+    await asyncio.sleep(0.5)
+    transport.close()
+
+    # Churn: sessions come and go; live memory should settle instead of creeping.
+    sizes = []
+    for _ in range(args.rounds):
+        stop = asyncio.Event()
+        tasks = await open_sessions([args.port] * args.sessions, stop)
+        await asyncio.sleep(0.5)
+        stop.set()
+        await asyncio.gather(*tasks)
+        # Give the server time to notice the closed connections.
+        await asyncio.sleep(2.0)
+        report = await signal_report(pid, reports)
+        sizes.append(subsystem(report, "connection")[0] + subsystem(report, "aioquic")[0])
+    settled = report
+    print(f"\nafter {args.rounds} rounds of {args.sessions} sessions opening and closing")
+    print(render(settled))
+    creep = sizes[-1] - sizes[1]
+    print(f"\nconnection + aioquic live bytes per round: {', '.join(f'{s / 1024:.0f}KiB' for s in sizes)}")
+    if settled.sessions:
+        print(f"FAIL: {len(settled.sessions)} sessions still alive after every client closed")
+        failed = True
+    if creep > args.creep * 1024:
+        print(f"FAIL: live memory kept growing by {creep / 1024:.0f}KiB across rounds")
+        failed = True
+
+    os.kill(pid, signal.SIGUSR2)
+    if await receive(reports, "tracing"):
+        print("FAIL: SIGUSR2 did not stop tracing")
+        failed = True
+
+    print(
+        f"\nreport cost: median {statistics.median([baseline.elapsed, loaded.elapsed, settled.elapsed]) * 1000:.0f}ms, "
+        f"tracemalloc overhead {settled.overhead / 1024 / 1024:.1f}MiB"
+    )
+    print("memory profile ok" if not failed else "")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Trigger the memory profiler with signals while sessions stall and churn."
+    )
+    parser.add_argument("--sessions", type=int, default=2, help="Healthy sessions per round.")
+    parser.add_argument("--stall", type=float, default=3.0, help="Seconds the slow subscriber stays silent.")
+    parser.add_argument("--rounds", type=int, default=4, help="Rounds of sessions opening and closing.")
+    parser.add_argument("--creep", type=float, default=64.0, help="Allowed growth after the first round, in KiB.")
+    parser.add_argument("--frames", type=int, default=8, help="Traceback depth recorded by tracemalloc.")
+    parser.add_argument("--port", type=int, default=58930, help="Server port; the proxy uses the next one.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+    context = multiprocessing.get_context("spawn")
+    reports = context.Queue()
+    with tempfile.TemporaryDirectory() as workdir:
+        cert, key = generate_certificate(Path(workdir))
+        server = context.Process(
+            target=run_server, args=(args.port, cert, key, args.frames, reports), daemon=True
+        )
+        server.start()
+        try:
+            assert server.pid is not None
+            return asyncio.run(run(args, server.pid, reports))
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
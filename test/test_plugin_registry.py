@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+    FetchService,
+    SyntheticSource,
+    start_fetch_service,
+)
+from service.controller.interface.dataclass import CaptureBlockSize  # noqa: E402
+from service.plugin.interface.enum import PluginKind  # noqa: E402
+from service.plugin.registry import PluginRegistry  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CONFIG = CaptureConfig(
+    device=0,
+    blocksize=CaptureBlockSize.B1024,
+    channel=CaptureChannel.Stereo,
+    dtype=CaptureDtype.Bit16,
+    samplerate=CaptureSampleRate.R48000,
+)
+
+PLUGIN = '''
+import time
+from pathlib import Path
+
+{imports}
+from service.plugin.interface.dataclass import PluginInfo, TapInfo
+from service.plugin.model.database import DatabasePlugin
+from service.plugin.model.robot import RobotPlugin
+
+with open(Path(__file__).parents[2] / "imports.log", "a") as log:
+    log.write("{name}\\n")
+time.sleep({delay})
+
+
+class Plugin({base}):
+    plugin_info = PluginInfo(name="{name}", description="", author="", license="MIT", version="0")
+    tap_info = {tap}
+
+    async def setup(self, context) -> None:
+        self.context = context
+
+    async def write_batch(self, table, rows) -> None:
+        pass
+
+    async def read(self, table, key):
+        return None
+
+
+def create_plugin():
+    return Plugin()
+'''
+
+
+def write_plugin(root: Path, name: str, base: str, tap: bool = False, delay: float = 0, imports: str = "") -> None:
+    folder = root / name
+    folder.mkdir()
+    (folder / "plugin.py").write_text(
+        PLUGIN.format(name=name, base=base, tap="TapInfo()" if tap else "None", delay=delay, imports=imports)
+    )
+
+
+def imported(workdir: Path) -> list[str]:
+    log_path = workdir / "imports.log"
+    names = log_path.read_text().split() if log_path.exists() else []
+    log_path.unlink(missing_ok=True)
+    return sorted(names)
+
+
+async def run(args: argparse.Namespace) -> int:
+    logging.basicConfig(level="ERROR", format="%(name)s: %(message)s")
+    failed = False
+
+    def expect(label: str, condition: bool) -> None:
+        nonlocal failed
+        print(f"{'ok  ' if condition else 'FAIL'} {label}")
+        failed = failed or not condition
+
+    with tempfile.TemporaryDirectory(prefix="plugin-registry-") as tmp:
+        workdir = Path(tmp)
+        root = workdir / "plugin"
+        root.mkdir()
+        # The unused plugin pulls in a module of its own, as plugins with heavy dependencies do.
+        (workdir / "heavy_unused.py").write_text("")
+        sys.path.insert(0, str(workdir))
+        write_plugin(root, "store", "DatabasePlugin")
+        write_plugin(root, "listener", "RobotPlugin", tap=True)
+        write_plugin(root, "unused", "RobotPlugin", imports="import heavy_unused  # noqa: F401")
+        write_plugin(root, "slow", "DatabasePlugin", delay=args.slow)
+
+        # A cold start has to import every plugin to describe it, then writes the manifest.
+        cold = PluginRegistry(root)
+        await cold.discover()
+        expect("a cold start scans every plugin", imported(workdir) == ["listener", "slow", "store", "unused"])
+        expect("the manifest lists every plugin", sorted(cold.entries) == ["listener", "slow", "store", "unused"])
+        sys.modules.pop("heavy_unused", None)
+
+        # A warm start trusts the manifest; only plugins with a user are imported.
+        fetch = await start_fetch_service(config=CONFIG, source=SyntheticSource(CONFIG))
+        assert isinstance(fetch, FetchService)
+        warm = PluginRegistry(root)
+        await warm.discover()
+        expect("a valid manifest imports nothing", imported(workdir) == [])
+        started = time.monotonic()
+        results = await warm.setup({PluginKind.DATABASE: object()}, timeout=args.timeout)
+        elapsed = time.monotonic() - started
+        await warm.start_taps(fetch)
+        print(f"setup took {elapsed:.2f}s with a {args.timeout}s timeout and a {args.slow}s import: {results}")
+        expect("plugins with a context or a tap are set up", results == {"store": True, "listener": True, "slow": False})
+        expect("a slow import is cut off by the setup timeout", elapsed < args.slow * 0.75)
+        expect("the tap plugin receives the broadcast", list(warm.tap_stats) == ["listener"])
+        expect("only used plugins are imported", imported(workdir) == ["listener", "slow", "store"])
+        expect("the unused plugin's module is not in sys.modules", "heavy_unused" not in sys.modules)
+        warm.stop_taps(fetch)
+        fetch.stop()
+
+        await warm.get("unused")
+        expect("a real caller still gets the unused plugin", "heavy_unused" in sys.modules)
+        imported(workdir)
+
+        # A new plugin folder makes the manifest stale.
+        write_plugin(root, "late", "RobotPlugin")
+        rescanned = PluginRegistry(root)
+        await rescanned.discover()
+        expect("a new plugin folder is found", "late" in rescanned.entries)
+        sys.path.remove(str(workdir))
+        # Let the abandoned slow import finish before its folder goes away.
+        await asyncio.sleep(args.slow)
+
+    print("plugin registry ok" if not failed else "")
+    return 0 if not failed else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Check that a cached plugin manifest only imports plugins that are used, under the setup timeout."
+    )
+    parser.add_argument("--slow", type=float, default=2.0, help="Seconds the slow plugin takes to import.")
+    parser.add_argument("--timeout", type=float, default=0.5, help="Setup timeout per plugin in seconds.")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
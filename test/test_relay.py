@@ -0,0 +1,275 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from aioquic.asyncio import connect
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from test_load_broadcast import (  # noqa: E402
+    HOST,
+    ProcessSampler,
+    SessionProbe,
+    client_configuration,
+    generate_certificate,
+    server_configuration,
+)
+from service.connection.client import WebTransportClientProtocol  # noqa: E402
+from service.connection.framing import FrameReader, decode_format  # noqa: E402
+from service.connection.interface.enum import FrameType  # noqa: E402
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+    SyntheticSource,
+)
+from service.controller.interface.dataclass import CaptureBlockSize  # noqa: E402
+from service.controller.source import sample_width  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CONFIG = CaptureConfig(
+    device=0,
+    blocksize=CaptureBlockSize.B2048,
+    channel=CaptureChannel.Stereo,
+    dtype=CaptureDtype.Bit24,
+    samplerate=CaptureSampleRate.R48000,
+)
+
+SWITCHED = CaptureConfig(
+    device=0,
+    blocksize=CaptureBlockSize.B1024,
+    channel=CaptureChannel.Stereo,
+    dtype=CaptureDtype.Bit16,
+    samplerate=CaptureSampleRate.R44100,
+)
+
+
+def run_upstream(port: int, cert: Path, key: Path, switch) -> None:
+    """Upstream process: synthetic capture that switches format when `switch` is set."""
+    logging.basicConfig(level="WARNING", format="upstream %(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+
+    from service.connection import start_webtransport_service
+    from service.controller import start_fetch_service
+
+    async def serve() -> None:
+        fetch = await start_fetch_service(config=CONFIG, source=SyntheticSource(CONFIG))
+        assert fetch is not None
+        await start_webtransport_service(
+            configuration=server_configuration(cert, key),
+            host=HOST,
+            port=port,
+        )
+        await asyncio.to_thread(switch.wait)
+        await fetch.reconfigure(SWITCHED, SyntheticSource(SWITCHED))
+        await asyncio.Future()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def run_relay(upstream: int, port: int, cert: Path, key: Path, connects) -> None:
+    """Relay process: listens to the upstream and re-serves the broadcast route; reports its upstream connects."""
+    logging.basicConfig(level="WARNING", format="relay %(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+
+    from service.connection import start_webtransport_service
+    from service.connection.relay import start_relay_service
+
+    async def serve() -> None:
+        fetch = await start_relay_service(
+            f"https://{HOST}:{upstream}/broadcast",
+            configuration=client_configuration(),
+        )
+        assert fetch is not None
+        await start_webtransport_service(
+            configuration=server_configuration(cert, key),
+            host=HOST,
+            port=port,
+        )
+        while True:
+            connects.value = getattr(fetch.source, "connects", -1)
+            await asyncio.sleep(0.1)
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+@dataclass
+class Listener:
+    """Records when each audio frame arrives, keyed by its first sawtooth value."""
+
+    probe: SessionProbe
+    reader: FrameReader = field(default_factory=FrameReader)
+    width: int = sample_width(CONFIG.dtype)
+    arrivals: dict[int, float] = field(default_factory=dict)
+    formats: list[int] = field(default_factory=list)
+    latencies: list[tuple[float, float]] = field(default_factory=list)
+    """(direct arrival, relay delay) of each matched frame"""
+    reference: "Listener | None" = None
+
+    def feed(self, stream_id: int, data: bytes, _ended: bool) -> None:
+        now = time.perf_counter()
+        for frame_type, payload in self.reader.feed(data):
+            if frame_type == FrameType.FORMAT:
+                samplerate, _, bits, _ = decode_format(payload)
+                self.formats.append(samplerate)
+                self.width = bits // 8
+                self.probe = SessionProbe(width=self.width, channels=self.probe.channels)
+            elif frame_type == FrameType.AUDIO:
+                self.probe.check(stream_id, payload)
+                start = self.width - 2
+                value = int.from_bytes(payload[start : start + 2], "little", signed=True)
+                self.arrivals[value] = now
+                if self.reference is not None:
+                    # The sawtooth repeats every 1.4s, far longer than any relay delay.
+                    direct = self.reference.arrivals.get(value)
+                    if direct is not None and abs(now - direct) < 0.5:
+                        self.latencies.append((direct, now - direct))
+
+
+async def listen(port: int, listener: Listener, ready: asyncio.Event, stop: asyncio.Event) -> None:
+    async with connect(
+        HOST,
+        port,
+        configuration=client_configuration(),
+        create_protocol=WebTransportClientProtocol,
+    ) as client:
+        assert isinstance(client, WebTransportClientProtocol)
+        client.on_stream_data = listener.feed
+        await client.open_session(authority=f"localhost:{port}", path="/broadcast")
+        ready.set()
+        await stop.wait()
+        client.close_session()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def run(args: argparse.Namespace, upstream_pid: int, relay_pid: int, switch, connects) -> int:
+    channels = CONFIG.channel.value
+    width = sample_width(CONFIG.dtype)
+    stop = asyncio.Event()
+    direct = Listener(SessionProbe(width=width, channels=channels))
+    relayed = [
+        Listener(SessionProbe(width=width, channels=channels), reference=direct)
+        for _ in range(args.sessions)
+    ]
+    tasks = []
+    for port, listener in [(args.port, direct)] + [(args.port + 1, lst) for lst in relayed]:
+        ready = asyncio.Event()
+        tasks.append(asyncio.create_task(listen(port, listener, ready, stop)))
+        await asyncio.wait_for(ready.wait(), timeout=10)
+    await asyncio.sleep(1.0)
+
+    upstream, relay = ProcessSampler(upstream_pid), ProcessSampler(relay_pid)
+    for listener in relayed:
+        listener.latencies.clear()
+        listener.probe.gaps = listener.probe.lost_samples = 0
+    before = [listener.probe.bytes for listener in relayed]
+    await asyncio.sleep(args.duration)
+    expected = CONFIG.samplerate.value * channels * width * args.duration
+    rates = [(listener.probe.bytes - b) / expected for listener, b in zip(relayed, before)]
+    latencies = [delay * 1000 for listener in relayed for _, delay in listener.latencies]
+    # The earliest relayed copy of each frame isolates the hop from the relay's fan-out.
+    earliest: dict[float, float] = {}
+    for listener in relayed:
+        for frame, delay in listener.latencies:
+            earliest[frame] = min(earliest.get(frame, delay), delay)
+    hops = [delay * 1000 for delay in earliest.values()]
+    gaps = sum(listener.probe.gaps for listener in relayed)
+    print(f"1 direct session + {args.sessions} sessions through the relay, {args.duration:.0f}s")
+    for label, values in (("relay hop", hops), ("all sessions", latencies)):
+        print(
+            f"{label:<20} median {statistics.median(values):6.2f}ms  "
+            f"p95 {percentile(values, 0.95):6.2f}ms  max {max(values):6.2f}ms  ({len(values)} frames)"
+        )
+    print(f"relayed sessions     min rate {min(rates):.3f}  gaps {gaps}")
+    print(f"cpu                  upstream {upstream.cpu_percent():5.1f}%  relay {relay.cpu_percent():5.1f}%")
+
+    # The upstream switches format; the relay must follow without dropping its listeners.
+    switch.set()
+    await asyncio.sleep(2.0)
+    followed = sum(listener.formats[-1] == SWITCHED.samplerate.value for listener in relayed)
+    before = [listener.probe.bytes for listener in relayed]
+    await asyncio.sleep(2.0)
+    resumed = min(listener.probe.bytes - b for listener, b in zip(relayed, before))
+    print(
+        f"upstream format change: {followed}/{len(relayed)} relayed sessions followed, "
+        f"audio resumed {resumed > 0}, relay connected upstream {connects.value} time(s)"
+    )
+
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    failed = False
+    if min(rates) < 0.98 or gaps:
+        print("FAIL: relayed sessions did not keep up with the upstream")
+        failed = True
+    if statistics.median(hops) > args.budget:
+        print(f"FAIL: median relay hop latency above {args.budget}ms")
+        failed = True
+    if followed != len(relayed) or resumed <= 0:
+        print("FAIL: relay did not follow the upstream format change")
+        failed = True
+    if connects.value != 1:
+        print("FAIL: the relay reconnected to the upstream instead of keeping its connection")
+        failed = True
+    print("relay ok" if not failed else "")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Run an upstream and a relay server and measure the latency the relay adds."
+    )
+    parser.add_argument("--sessions", type=int, default=8, help="Sessions served by the relay.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to measure.")
+    parser.add_argument("--budget", type=float, default=20.0, help="Allowed median relay hop latency in ms.")
+    parser.add_argument("--port", type=int, default=58950, help="Upstream port; the relay uses the next one.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+
+    context = multiprocessing.get_context("spawn")
+    switch = context.Event()
+    connects = context.Value("i", 0)
+    with tempfile.TemporaryDirectory() as workdir:
+        cert, key = generate_certificate(Path(workdir))
+        upstream = context.Process(target=run_upstream, args=(args.port, cert, key, switch), daemon=True)
+        upstream.start()
+        time.sleep(1.5)
+        relay = context.Process(target=run_relay, args=(args.port, args.port + 1, cert, key, connects), daemon=True)
+        relay.start()
+        time.sleep(1.5)
+        try:
+            assert upstream.pid is not None and relay.pid is not None
+            return asyncio.run(run(args, upstream.pid, relay.pid, switch, connects))
+        finally:
+            relay.terminate()
+            upstream.terminate()
+            relay.join()
+            upstream.join()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
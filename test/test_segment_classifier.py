@@ -0,0 +1,255 @@
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+    FetchService,
+    SyntheticSource,
+    start_fetch_service,
+)
+from service.controller import pcm  # noqa: E402
+from service.controller.interface.dataclass import CaptureBlockSize  # noqa: E402
+from service.robot import ProgrammeSegmenter, Segment, SegmentClassifier, SegmentLabel  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+SAMPLERATE = 48000
+
+PROGRAMME = [
+    (SegmentLabel.SILENCE, 3.0),
+    (SegmentLabel.SPEECH, 8.0),
+    (SegmentLabel.MUSIC, 10.0),
+    (SegmentLabel.SPEECH, 6.0),
+    (SegmentLabel.SILENCE, 4.0),
+    (SegmentLabel.MUSIC, 8.0),
+    (SegmentLabel.SPEECH, 7.0),
+]
+"""Synthetic programme: label and length in seconds."""
+
+FORMANTS = [
+    (700, 1220, 2600),
+    (300, 2300, 3000),
+    (500, 1000, 2500),
+    (400, 1900, 2600),
+    (350, 800, 2300),
+]
+"""First three formants of a few vowels, in Hz."""
+
+
+def resonate(signal: np.ndarray, frequency: float, bandwidth: float, rate: int) -> np.ndarray:
+    """Two-pole resonator, applied in the frequency domain to stay vectorized."""
+    radius = np.exp(-np.pi * bandwidth / rate)
+    theta = 2 * np.pi * frequency / rate
+    spectrum = np.fft.rfft(signal)
+    z = np.exp(-1j * np.fft.rfftfreq(len(signal), 1 / rate) * 2 * np.pi / rate)
+    response = (1 - radius) / (1 - 2 * radius * np.cos(theta) * z + radius**2 * z**2)
+    return np.fft.irfft(spectrum * response, len(signal))
+
+
+def speech(seconds: float, rate: int, rng: np.random.Generator) -> np.ndarray:
+    """Syllables of voiced vowels with fricative onsets, separated by short pauses."""
+    out = np.zeros(int(seconds * rate))
+    position = 0
+    while position < len(out):
+        syllable = int(rng.uniform(0.15, 0.3) * rate)
+        pitch = rng.uniform(100, 220)
+        t = np.arange(syllable) / rate
+        # Glottal pulses: a sawtooth rich in harmonics with a falling pitch.
+        phase = np.cumsum(pitch * (1 - 0.2 * t / t[-1])) / rate
+        voiced = (phase % 1.0) - 0.5
+        for index, frequency in enumerate(rng.choice(FORMANTS)):
+            voiced = voiced + resonate(voiced, frequency, 80 + 40 * index, rate) * (0.5**index)
+        fricative = int(rng.uniform(0.03, 0.08) * rate)
+        noise = np.diff(rng.normal(0, 1, fricative + 1)) * 0.2
+        envelope = np.sin(np.pi * np.arange(syllable) / syllable) ** 2
+        syllable_audio = np.concatenate((noise, voiced * envelope))
+        pause = int(rng.uniform(0.05, 0.25) * rate)
+        end = min(position + len(syllable_audio), len(out))
+        out[position:end] = syllable_audio[: end - position]
+        position = end + pause
+    out = out / max(np.abs(out).max(), 1e-9) * 0.5
+    # Studio and receiver noise stays audible in the pauses.
+    return out + rng.normal(0, 10 ** (-60 / 20), len(out))
+
+
+def music(seconds: float, rate: int, rng: np.random.Generator) -> np.ndarray:
+    """Sustained chords with harmonics and vibrato, changing every couple of seconds."""
+    out = np.zeros(int(seconds * rate))
+    chord = int(2.0 * rate)
+    for start in range(0, len(out), chord):
+        t = np.arange(min(chord, len(out) - start)) / rate
+        root = 110 * 2 ** (rng.integers(0, 12) / 12)
+        block = np.zeros(len(t))
+        for ratio in (1.0, 1.26, 1.5, 2.0):
+            vibrato = 1 + 0.004 * np.sin(2 * np.pi * 5.5 * t)
+            for harmonic in range(1, 6):
+                block += np.sin(2 * np.pi * root * ratio * harmonic * vibrato * t) / harmonic**1.5
+        # Soft attack at each chord change, otherwise a steady level.
+        block *= np.minimum(1.0, t / 0.05)
+        out[start : start + len(t)] = block
+    out += rng.normal(0, 0.01, len(out))
+    return out / max(np.abs(out).max(), 1e-9) * 0.5
+
+
+def silence(seconds: float, rate: int, rng: np.random.Generator) -> np.ndarray:
+    """Receiver noise floor at about -70 dBFS."""
+    return rng.normal(0, 10 ** (-70 / 20), int(seconds * rate))
+
+
+GENERATORS = {
+    SegmentLabel.SPEECH: speech,
+    SegmentLabel.MUSIC: music,
+    SegmentLabel.SILENCE: silence,
+}
+
+
+def programme(rate: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.concatenate(
+        [GENERATORS[label](seconds, rate, rng) for label, seconds in PROGRAMME]
+    ).astype(np.float32)
+
+
+def truth() -> list[Segment]:
+    segments, start = [], 0.0
+    for label, seconds in PROGRAMME:
+        segments.append(Segment(label, start, start + seconds))
+        start += seconds
+    return segments
+
+
+def agreement(found: list[Segment], expected: list[Segment]) -> float:
+    """Fraction of the programme whose label matches the ground truth."""
+    matched = sum(
+        max(0.0, min(a.end, b.end) - max(a.start, b.start))
+        for a in found
+        for b in expected
+        if a.label == b.label
+    )
+    return matched / expected[-1].end
+
+
+def boundary_errors(found: list[Segment], expected: list[Segment]) -> list[float]:
+    """Distance from every true boundary to the nearest detected one."""
+    detected = [segment.start for segment in found[1:]]
+    return [
+        min((abs(boundary - segment.start) for boundary in detected), default=np.inf)
+        for segment in expected[1:]
+    ]
+
+
+def offline(args: argparse.Namespace) -> bool:
+    """Feed the programme block by block, the way the segmenter thread does."""
+    audio = programme(SAMPLERATE, args.seed)
+    factor = SAMPLERATE // 16000
+    classifier = SegmentClassifier(SAMPLERATE // factor)
+    found: list[Segment] = []
+    started = time.process_time()
+    for start in range(0, len(audio), args.blocksize):
+        block = audio[start : start + args.blocksize].reshape(-1, 1)
+        found += classifier.feed(pcm.decimate(block, factor))
+    last = classifier.flush()
+    if last is not None:
+        found.append(last)
+    cpu = time.process_time() - started
+
+    expected = truth()
+    duration = expected[-1].end
+    print(f"programme of {duration:.0f}s, block {args.blocksize} frames at {SAMPLERATE}Hz")
+    print(f"{'label':<10}{'start':>8}{'end':>8}")
+    for segment in found:
+        print(f"{segment.label.value:<10}{segment.start:>8.1f}{segment.end:>8.1f}")
+    accuracy = agreement(found, expected)
+    errors = boundary_errors(found, expected)
+    print(
+        f"agreement {accuracy:.1%}  boundary error max {max(errors):.2f}s  "
+        f"cpu {cpu * 1000:.0f}ms ({cpu / duration:.2%} of realtime)"
+    )
+
+    failed = False
+    if accuracy < args.accuracy:
+        print(f"FAIL: labels agree with the programme for less than {args.accuracy:.0%}")
+        failed = True
+    if max(errors) > args.boundary:
+        print(f"FAIL: a boundary was missed by more than {args.boundary}s")
+        failed = True
+    if len(found) > len(expected) + 2:
+        print(f"FAIL: {len(found)} segments for a programme of {len(expected)}")
+        failed = True
+    if cpu / duration > args.budget:
+        print(f"FAIL: classification costs more than {args.budget:.0%} of realtime")
+        failed = True
+    return not failed
+
+
+async def live(args: argparse.Namespace) -> bool:
+    """Run the segmenter on the real FetchService for a few seconds of a steady tone."""
+    config = CaptureConfig(
+        device=0,
+        blocksize=CaptureBlockSize.B1024,
+        channel=CaptureChannel.Stereo,
+        dtype=CaptureDtype.Bit16,
+        samplerate=CaptureSampleRate.R48000,
+    )
+    fetch = await start_fetch_service(config=config, source=SyntheticSource(config))
+    assert isinstance(fetch, FetchService)
+    segments: list[Segment] = []
+    segmenter = ProgrammeSegmenter(fetch, on_segment=segments.append)
+    segmenter.start()
+    await asyncio.sleep(args.live)
+    current = segmenter.current
+    segmenter.stop()
+    # The final segment is delivered through the loop after the thread ends.
+    await asyncio.sleep(0.1)
+    fetch.stop()
+
+    print(f"\nlive: {args.live:.0f}s of the synthetic source, current label {current}, dropped {segmenter.dropped}")
+    failed = False
+    if current is None or not segments:
+        print("FAIL: the segmenter produced no label from FetchService output")
+        failed = True
+    elif abs(segments[-1].end - args.live) > 1.5:
+        print(f"FAIL: segments cover {segments[-1].end:.1f}s of {args.live:.0f}s")
+        failed = True
+    if segmenter.dropped:
+        print("FAIL: the segmenter thread could not keep up with realtime")
+        failed = True
+    return not failed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Classify a synthetic programme into speech, music and silence segments."
+    )
+    parser.add_argument("--blocksize", type=int, default=1024, help="Capture frames per block.")
+    parser.add_argument("--seed", type=int, default=7, help="Seed of the synthetic programme.")
+    parser.add_argument("--accuracy", type=float, default=0.9, help="Minimum label agreement.")
+    parser.add_argument("--boundary", type=float, default=1.5, help="Allowed boundary error in seconds.")
+    parser.add_argument("--budget", type=float, default=0.02, help="Allowed CPU share of realtime.")
+    parser.add_argument("--live", type=float, default=4.0, help="Seconds to run on FetchService; 0 skips.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    ok = offline(args)
+    if args.live:
+        ok = asyncio.run(live(args)) and ok
+    print("segment classifier ok" if ok else "")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from aioquic.asyncio import connect
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from test_load_broadcast import (  # noqa: E402
+    HOST,
+    ProcessSampler,
+    client_configuration,
+    generate_certificate,
+    server_configuration,
+)
+from service.connection.client import WebTransportClientProtocol  # noqa: E402
+from service.connection.framing import FrameReader, decode_format, decode_silence  # noqa: E402
+from service.connection.interface.enum import FrameType  # noqa: E402
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+    CaptureSource,
+)
+from service.controller.interface.dataclass import CaptureBlockSize, SilenceConfig  # noqa: E402
+from service.controller.source import FrameCallback, sample_width  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CONFIG = CaptureConfig(
+    device=0,
+    blocksize=CaptureBlockSize.B2048,
+    channel=CaptureChannel.Stereo,
+    dtype=CaptureDtype.Bit24,
+    samplerate=CaptureSampleRate.R48000,
+)
+
+
+class ProgrammeSource(CaptureSource):
+    """Alternates `loud` seconds of programme noise with `quiet` seconds of near-silence."""
+
+    def __init__(self, config: CaptureConfig, loud: float, quiet: float, started) -> None:
+        self._config = config
+        self._loud = loud
+        self._quiet = quiet
+        self._started = started
+        self._interval = config.blocksize.value / config.samplerate.value
+        self._frames = {
+            True: [self._render(-20.0, seed) for seed in range(8)],
+            False: [self._render(-80.0, seed) for seed in range(8)],
+        }
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def _render(self, level_db: float, seed: int) -> bytes:
+        config = self._config
+        width = sample_width(config.dtype)
+        count = config.blocksize.value * config.channel.value
+        noise = np.random.default_rng(seed).standard_normal(count) * 10 ** (level_db / 20)
+        ints = (np.clip(noise, -1, 1 - 2**-31) * 2**31).astype("<i4")
+        return ints.view(np.uint8).reshape(-1, 4)[:, 4 - width :].tobytes()
+
+    def start(self, callback: FrameCallback) -> None:
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, callback: FrameCallback) -> None:
+        start = time.monotonic()
+        self._started.value = time.time()
+        index = 0
+        while not self._stopped.is_set():
+            index += 1
+            deadline = start + index * self._interval
+            delay = deadline - time.monotonic()
+            if delay > 0 and self._stopped.wait(delay):
+                break
+            position = (index * self._interval) % (self._loud + self._quiet)
+            frames = self._frames[position < self._loud]
+            callback(frames[index % len(frames)])
+
+
+def run_server(silence: bool, port: int, cert: Path, key: Path, loud: float, quiet: float, started) -> None:
+    logging.basicConfig(level="WARNING", format="server %(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+
+    from service.connection import start_webtransport_service
+    from service.controller import start_fetch_service
+
+    async def serve() -> None:
+        fetch = await start_fetch_service(
+            config=CONFIG, source=ProgrammeSource(CONFIG, loud, quiet, started)
+        )
+        assert fetch is not None
+        if silence:
+            fetch.suppress_silence(SilenceConfig())
+        await start_webtransport_service(
+            configuration=server_configuration(cert, key),
+            host=HOST,
+            port=port,
+        )
+        await asyncio.Future()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+@dataclass
+class Listener:
+    """Counts stream bytes and delivered samples of one session."""
+
+    reader: FrameReader = field(default_factory=FrameReader)
+    frame_bytes: int = 0
+    stream_bytes: int = 0
+    samples: int = 0
+    silence_frames: int = 0
+
+    def feed(self, _stream_id: int, data: bytes, _ended: bool) -> None:
+        self.stream_bytes += len(data)
+        for frame_type, payload in self.reader.feed(data):
+            if frame_type == FrameType.FORMAT:
+                _, channels, bits, _ = decode_format(payload)
+                self.frame_bytes = channels * bits // 8
+            elif frame_type == FrameType.AUDIO and self.frame_bytes:
+                self.samples += len(payload) // self.frame_bytes
+            elif frame_type == FrameType.SILENCE:
+                self.samples += decode_silence(payload)
+                self.silence_frames += 1
+
+
+async def listen(port: int, listener: Listener, stop: asyncio.Event) -> None:
+    async with connect(
+        HOST,
+        port,
+        configuration=client_configuration(),
+        create_protocol=WebTransportClientProtocol,
+    ) as client:
+        assert isinstance(client, WebTransportClientProtocol)
+        client.on_stream_data = listener.feed
+        await client.open_session(authority=f"localhost:{port}", path="/broadcast")
+        await stop.wait()
+        client.close_session()
+
+
+async def measure(args: argparse.Namespace, silence: bool, cert: Path, key: Path) -> dict:
+    context = multiprocessing.get_context("spawn")
+    started = context.Value("d", 0.0)
+    server = context.Process(
+        target=run_server,
+        args=(silence, args.port, cert, key, args.loud, args.quiet, started),
+        daemon=True,
+    )
+    server.start()
+    try:
+        while not started.value:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.5)
+        assert server.pid is not None
+        sampler = ProcessSampler(server.pid)
+
+        stop = asyncio.Event()
+        listeners = [Listener() for _ in range(args.sessions)]
+        tasks = [asyncio.create_task(listen(args.port, listener, stop)) for listener in listeners]
+        await asyncio.sleep(1.0)
+
+        cycle = args.loud + args.quiet
+        margin = 0.75
+        windows: dict[bool, list[tuple[float, float]]] = {True: [], False: []}
+        begin = time.monotonic()
+        first_samples = sum(listener.samples for listener in listeners)
+        sampler.cpu_percent()
+        while time.monotonic() - begin < args.duration:
+            before = sum(listener.stream_bytes for listener in listeners)
+            window_start = time.time()
+            await asyncio.sleep(0.5)
+            cpu = sampler.cpu_percent()
+            rate = (sum(listener.stream_bytes for listener in listeners) - before) / 0.5 / args.sessions
+            # Classify the window by the programme schedule, skipping transitions and hangover.
+            start = (window_start - started.value) % cycle
+            end = start + 0.5
+            if margin <= start and end <= args.loud:
+                windows[True].append((rate, cpu))
+            elif args.loud + margin <= start and end <= cycle:
+                windows[False].append((rate, cpu))
+        elapsed = time.monotonic() - begin
+        delivered = (sum(listener.samples for listener in listeners) - first_samples) / args.sessions
+
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        server.terminate()
+        server.join()
+
+    def summary(points: list[tuple[float, float]]) -> tuple[float, float]:
+        if not points:
+            return 0.0, 0.0
+        return statistics.mean(p[0] for p in points), statistics.mean(p[1] for p in points)
+
+    return {
+        "programme": summary(windows[True]),
+        "quiet": summary(windows[False]),
+        "realtime": delivered / elapsed / CONFIG.samplerate.value,
+        "silence_frames": sum(listener.silence_frames for listener in listeners),
+    }
+
+
+async def run(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory() as workdir:
+        cert, key = generate_certificate(Path(workdir))
+        print(
+            f"{args.sessions} sessions, {args.loud:.0f}s programme / {args.quiet:.0f}s quiet, "
+            f"{args.duration:.0f}s per mode"
+        )
+        print(
+            f"{'mode':<12}{'prog KiB/s':>12}{'quiet KiB/s':>13}{'prog cpu%':>11}"
+            f"{'quiet cpu%':>12}{'realtime':>10}{'markers':>9}"
+        )
+        results = {}
+        for silence in (False, True):
+            result = await measure(args, silence, cert, key)
+            results[silence] = result
+            (prog_rate, prog_cpu), (quiet_rate, quiet_cpu) = result["programme"], result["quiet"]
+            print(
+                f"{'suppressed' if silence else 'full':<12}{prog_rate / 1024:>12.1f}{quiet_rate / 1024:>13.2f}"
+                f"{prog_cpu:>11.1f}{quiet_cpu:>12.1f}{result['realtime']:>10.3f}{result['silence_frames']:>9}"
+            )
+
+    full, suppressed = results[False], results[True]
+    saved_bandwidth = 1 - suppressed["quiet"][0] / max(full["quiet"][0], 1e-9)
+    saved_cpu = 1 - suppressed["quiet"][1] / max(full["quiet"][1], 1e-9)
+    print(f"\nquiet periods: {saved_bandwidth:.1%} less bandwidth, {saved_cpu:.0%} less server CPU")
+
+    failed = False
+    if saved_bandwidth < 0.95:
+        print("FAIL: quiet-period bandwidth did not drop below 5%")
+        failed = True
+    if abs(suppressed["realtime"] - 1) > 0.05:
+        print("FAIL: silence markers did not keep the client clock in real time")
+        failed = True
+    if suppressed["programme"][0] < full["programme"][0] * 0.95:
+        print("FAIL: programme audio was suppressed")
+        failed = True
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare bandwidth and server CPU with and without silence suppression."
+    )
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent broadcast sessions.")
+    parser.add_argument("--loud", type=float, default=3.0, help="Seconds of programme per cycle.")
+    parser.add_argument("--quiet", type=float, default=4.0, help="Seconds of near-silence per cycle.")
+    parser.add_argument("--duration", type=float, default=21.0, help="Seconds measured per mode.")
+    parser.add_argument("--port", type=int, default=58960, help="Server port.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
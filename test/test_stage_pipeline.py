@@ -0,0 +1,226 @@
+import argparse
+import asyncio
+import logging
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+    FetchService,
+    Pipeline,
+    StageMode,
+    SyntheticSource,
+    start_fetch_service,
+)
+from service.controller.interface.dataclass import CaptureBlockSize, StageStats  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CONFIG = CaptureConfig(
+    device=0,
+    blocksize=CaptureBlockSize.B1024,
+    channel=CaptureChannel.Stereo,
+    dtype=CaptureDtype.Bit16,
+    samplerate=CaptureSampleRate.R48000,
+)
+
+
+def print_stats(stats: list[StageStats]) -> None:
+    for stage in stats:
+        print(
+            f"  {stage.name:<12}{stage.mode.name:<8} runs {stage.runs:>5}  mean {stage.mean * 1000:7.3f}ms  "
+            f"max {stage.max * 1000:7.3f}ms  queue {stage.queue:>3}/{stage.max_queue:<3} "
+            f"dropped {stage.dropped:>4}  errors {stage.errors}"
+        )
+
+
+async def settle(pipeline: Pipeline, frames: int, names: tuple[str, ...], timeout: float) -> dict[str, StageStats]:
+    """Wait until every pooled stage has run or dropped each frame."""
+    deadline = time.monotonic() + timeout
+    while True:
+        stats = {stage.name: stage for stage in pipeline.stats()}
+        if all(stats[name].runs + stats[name].dropped + stats[name].errors >= frames for name in names):
+            return stats
+        if time.monotonic() > deadline:
+            return stats
+        await asyncio.sleep(0.05)
+
+
+async def standalone(args: argparse.Namespace) -> bool:
+    """A shared gain feeds a thread, an inline and a process branch; each runs once per frame."""
+    pipeline = Pipeline(threads=2, processes=1)
+    gained: list[int] = []
+    spectrum_order: list[int] = []
+    peaks: list[float] = []
+    sizes: list[int] = []
+
+    def gain(frame: np.ndarray) -> np.ndarray:
+        gained.append(int(frame[0]))
+        return frame * 2
+
+    def spectrum(frame: np.ndarray) -> np.ndarray:
+        spectrum_order.append(int(frame[0]) // 2)
+        return np.abs(np.fft.rfft(frame))
+
+    def broken(frame: np.ndarray) -> None:
+        if int(frame[0]) // 2 % 10 == 9:
+            raise ValueError("every tenth frame")
+
+    pipeline.add("gain", gain)
+    pipeline.add("spectrum", spectrum, after="gain", mode=StageMode.THREAD, backlog=args.frames)
+    pipeline.add("bin", lambda magnitude: int(np.argmax(magnitude[1:])) + 1, after="spectrum")
+    pipeline.add("peak", lambda frame: peaks.append(float(np.abs(frame[1:]).max())), after="gain")
+    pipeline.add("broken", broken, after="gain")
+    # zlib.compress is picklable, the process pool gets it by name.
+    pipeline.add("compress", zlib.compress, after="gain", mode=StageMode.PROCESS, backlog=args.frames)
+    pipeline.add("size", lambda packed: sizes.append(len(packed)), after="compress")
+
+    failed = False
+    for name, after in (("gain", "capture"), ("extra", "missing")):
+        try:
+            pipeline.add(name, gain, after=after)
+            print(f"FAIL: adding {name} after {after} was accepted")
+            failed = True
+        except ValueError:
+            pass
+
+    # The failing stage is expected; keep its warnings out of the report.
+    logging.getLogger("service.controller.pipeline").setLevel(logging.ERROR)
+    rng = np.random.default_rng(0)
+    started = time.perf_counter()
+    for index in range(args.frames):
+        frame = rng.standard_normal(CONFIG.blocksize.value).astype(np.float32)
+        frame[0] = index
+        pipeline.process(frame)
+        await asyncio.sleep(args.interval / 1000)
+    feeding = time.perf_counter() - started
+    stats = await settle(pipeline, args.frames, ("spectrum", "compress"), timeout=30)
+    print(f"{args.frames} frames fed in {feeding:.2f}s")
+    print_stats(list(stats.values()))
+    order = [stage.name for stage in pipeline.stats()]
+    pipeline.remove("spectrum")
+    remaining = [stage.name for stage in pipeline.stats()]
+    pipeline.close()
+    logging.getLogger("service.controller.pipeline").setLevel(logging.NOTSET)
+
+    if gained != list(range(args.frames)):
+        print(f"FAIL: the shared gain ran {len(gained)} times for {args.frames} frames")
+        failed = True
+    for name in ("gain", "spectrum", "bin", "peak", "compress", "size"):
+        if stats[name].runs != args.frames:
+            print(f"FAIL: {name} ran {stats[name].runs} times for {args.frames} frames")
+            failed = True
+        if stats[name].mean <= 0:
+            print(f"FAIL: {name} has no timing")
+            failed = True
+    if spectrum_order != list(range(args.frames)):
+        print("FAIL: the thread stage saw frames out of order")
+        failed = True
+    if len(sizes) != args.frames or len(peaks) != args.frames:
+        print("FAIL: a downstream stage missed frames")
+        failed = True
+    if stats["broken"].errors != args.frames // 10 or stats["broken"].runs != args.frames - args.frames // 10:
+        print(f"FAIL: the failing stage counted {stats['broken'].errors} errors")
+        failed = True
+    if stats["compress"].max_queue == 0:
+        print("FAIL: the process stage never reported a backlog while its pool started")
+        failed = True
+    if order != ["gain", "spectrum", "bin", "peak", "broken", "compress", "size"]:
+        print(f"FAIL: stats are not in pipeline order {order}")
+        failed = True
+    if "spectrum" in remaining or "bin" in remaining or "bin" in pipeline:
+        print("FAIL: removing a stage left its downstream stages behind")
+        failed = True
+    return not failed
+
+
+async def integrated(args: argparse.Namespace) -> bool:
+    """A slow analysis branch in FetchService drops frames while subscribers get every one."""
+    fetch = await start_fetch_service(config=CONFIG, source=SyntheticSource(CONFIG))
+    assert isinstance(fetch, FetchService)
+    interval = CONFIG.blocksize.value / CONFIG.samplerate.value
+    analysed: list[int] = []
+
+    def analyse(frame: bytes) -> None:
+        analysed.append(int.from_bytes(frame[:2], "little"))
+        time.sleep(interval * args.slowdown)
+
+    fetch.pipeline.add("analyse", analyse, after="dsp", mode=StageMode.THREAD, backlog=2)
+
+    received: list[int] = []
+
+    async def client(frame: bytes) -> None:
+        samples = np.frombuffer(frame, dtype="<u2")
+        received.append(int(samples[0]))
+        received.append(int(samples[-1]))
+
+    fetch.subscribe(0, client)
+    await asyncio.sleep(args.duration)
+    fetch.unsubscribe(0)
+    stats = {stage.name: stage for stage in fetch.pipeline.stats()}
+    fetch.stop()
+    print(f"FetchService for {args.duration:.1f}s, analysis {args.slowdown:g}x slower than real time")
+    print_stats(list(stats.values()))
+
+    failed = False
+    expected = args.duration / interval
+    frames = len(received) // 2
+    if frames < expected * 0.9:
+        print(f"FAIL: the subscriber got {frames} frames of about {expected:.0f}")
+        failed = True
+    # Each frame's first sample continues the previous frame's last one.
+    gaps = sum(
+        1 for last, first in zip(received[1::2], received[2::2]) if first != (last + 1) % 65536
+    )
+    if gaps:
+        print(f"FAIL: the subscriber saw {gaps} gaps")
+        failed = True
+    if not stats["analyse"].dropped:
+        print("FAIL: the slow branch did not drop frames")
+        failed = True
+    # The sawtooth wraps every 65536 samples; a later frame is less than half a period ahead.
+    if any(not 0 < (after - before) % 65536 < 32768 for before, after in zip(analysed, analysed[1:])):
+        print("FAIL: the slow branch saw frames out of order")
+        failed = True
+    if stats["distribute"].runs < frames or stats["dsp"].runs != stats["distribute"].runs:
+        print("FAIL: distribution skipped frames the capture thread produced")
+        failed = True
+    if stats["distribute"].mean > interval / 10:
+        print(f"FAIL: distributing a frame takes {stats['distribute'].mean * 1000:.2f}ms on the capture thread")
+        failed = True
+    return not failed
+
+
+async def run(args: argparse.Namespace) -> int:
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    ok = await standalone(args)
+    ok = await integrated(args) and ok
+    print("stage pipeline ok" if ok else "")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Run a branching stage pipeline standalone and inside FetchService, and check its per-stage stats."
+    )
+    parser.add_argument("--frames", type=int, default=200, help="Frames fed to the standalone pipeline.")
+    parser.add_argument("--interval", type=float, default=2.0, help="Milliseconds between standalone frames.")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds FetchService captures.")
+    parser.add_argument("--slowdown", type=float, default=3.0, help="How much slower than real time the analysis is.")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
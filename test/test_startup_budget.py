@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from test_load_broadcast import generate_certificate  # noqa: E402
+
+DEFAULT_BUDGET = Path(__file__).resolve().parent / "benchmark" / "startup_budget.json"
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+READY_LINE = re.compile(r"服务已就绪 启动用时 (\d+)ms")
+
+READY_SNIPPET = """
+import asyncio
+import main
+from aioquic.h3.connection import H3_ALPN
+from aioquic.quic.configuration import QuicConfiguration
+from service.controller import SyntheticSource
+
+configuration = QuicConfiguration(alpn_protocols=H3_ALPN, is_client=False)
+configuration.load_cert_chain({cert!r}, {key!r})
+asyncio.run(
+    main.main(
+        host="127.0.0.1",
+        port={port},
+        configuration=configuration,
+        source=SyntheticSource(main.capture_config()),
+    )
+)
+"""
+
+
+def import_times(modules: list[str]) -> dict[str, tuple[int, int, int]]:
+    """Return {module: (self_us, cumulative_us, depth)} from ``-X importtime``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, tuple[int, int, int]] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return times
+
+
+def time_to_ready(port: int, timeout: float) -> tuple[float, float, list[str]]:
+    """Start main's critical path on localhost and wait for the ready log line.
+
+    Returns the time main reports, the wall-clock time including interpreter
+    start, and the modules imported before the service became ready.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        cert_path, key_path = generate_certificate(Path(workdir))
+        snippet = READY_SNIPPET.format(cert=str(cert_path), key=str(key_path), port=port)
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-X", "importtime", "-c", snippet],
+            cwd=ROOT,
+            stderr=subprocess.PIPE,
+            text=True,
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+        )
+        imported: list[str] = []
+        try:
+            assert process.stderr is not None
+            deadline = started + timeout
+            while time.perf_counter() < deadline:
+                line = process.stderr.readline()
+                if not line:
+                    break
+                match = IMPORT_LINE.match(line.rstrip("\n"))
+                if match:
+                    imported.append(match.group(4))
+                    continue
+                ready = READY_LINE.search(line)
+                if ready:
+                    wall = (time.perf_counter() - started) * 1000
+                    return float(ready.group(1)), wall, imported
+            raise TimeoutError("service did not report ready in time")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def check(args: argparse.Namespace) -> int:
+    budget = json.loads(Path(args.budget).read_text())
+    failures: list[str] = []
+
+    times = import_times(list(budget["import_ms"]))
+    print(f"{'module':<48} {'self ms':>8} {'cumulative ms':>14}")
+    slowest = sorted(times.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_us, cumulative_us, depth) in slowest[: args.top]:
+        print(f"{'  ' * depth + name:<48} {self_us / 1000:>8.1f} {cumulative_us / 1000:>14.1f}")
+
+    print()
+    for module, limit in budget["import_ms"].items():
+        spent = times.get(module, (0, 0, 0))[1] / 1000
+        status = "ok"
+        if spent > limit * args.scale:
+            status = "OVER BUDGET"
+            failures.append(f"import {module} took {spent:.1f}ms")
+        print(f"import {module:<41} {spent:>8.1f} ms / {limit * args.scale:>7.1f} ms  {status}")
+
+    reported, wall, imported = time_to_ready(args.port, args.timeout)
+    for label, spent, limit in (
+        ("ready (main)", reported, budget["ready_ms"]),
+        ("ready (wall clock)", wall, budget["ready_wall_ms"]),
+    ):
+        status = "ok"
+        if spent > limit * args.scale:
+            status = "OVER BUDGET"
+            failures.append(f"{label} took {spent:.0f}ms")
+        print(f"{label:<48} {spent:>8.0f} ms / {limit * args.scale:>7.0f} ms  {status}")
+
+    early = sorted(
+        {name for name in imported if name.split(".")[0] in budget["deferred_modules"]}
+    )
+    if early:
+        failures.append(f"imported before ready: {', '.join(early)}")
+        print(f"deferred modules imported before ready: {', '.join(early)}")
+
+    if failures:
+        print("\nstartup budget exceeded:\n  " + "\n  ".join(failures))
+        return 1
+    print("\nstartup within budget")
+    return 0
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Measure per-module import time and time-to-ready against a budget.",
+    )
+    parser.add_argument(
+        "--budget",
+        default=str(DEFAULT_BUDGET),
+        help=f"Budget JSON (default: {DEFAULT_BUDGET.relative_to(ROOT)})",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiply every budget, e.g. 4 on the RK3308B (default: 1.0)",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="Number of slowest imports to list (default: 20)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=58998,
+        help="Local port for the time-to-ready check (default: 58998)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=30.0,
+        help="Seconds to wait for the service to become ready (default: 30)",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(check(build_arg_parser().parse_args()))
@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import gzip
+import logging
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from aioquic.asyncio import connect
+from aioquic.asyncio.protocol import QuicConnectionProtocol
+from aioquic.h3.connection import H3Connection
+from aioquic.h3.events import DataReceived, HeadersReceived
+from aioquic.quic.events import QuicEvent
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from test_load_broadcast import (  # noqa: E402
+    HOST,
+    client_configuration,
+    generate_certificate,
+    server_configuration,
+)
+from service.connection import start_webtransport_service  # noqa: E402
+from service.connection.asset import StaticAssetCache  # noqa: E402
+from service.connection.interface.dataclass import StaticAsset  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+PAGE = ("<!doctype html><title>outdoor aerial</title>" + "<p>broadcast</p>" * 200).encode()
+
+
+class Response:
+    def __init__(self) -> None:
+        self.headers: dict[str, str] = {}
+        self.body = b""
+        self.done: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+
+
+class HeadAwareH3Connection(H3Connection):
+    """aioquic does not know which requests were HEAD; their content-length describes a body that never comes."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.head_streams: set[int] = set()
+
+    def _check_content_length(self, stream) -> None:
+        if stream.stream_id not in self.head_streams:
+            super()._check_content_length(stream)
+
+
+class HttpClientProtocol(QuicConnectionProtocol):
+    """Plain HTTP/3 requests on one connection."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._h3 = HeadAwareH3Connection(self._quic)
+        self._responses: dict[int, Response] = {}
+
+    async def request(self, method: str, path: str, headers: Optional[dict[str, str]] = None) -> Response:
+        stream_id = self._quic.get_next_available_stream_id()
+        response = self._responses[stream_id] = Response()
+        if method == "HEAD":
+            self._h3.head_streams.add(stream_id)
+        self._h3.send_headers(
+            stream_id=stream_id,
+            headers=[
+                (b":method", method.encode()),
+                (b":scheme", b"https"),
+                (b":authority", HOST.encode()),
+                (b":path", path.encode()),
+                *[(name.encode(), value.encode()) for name, value in (headers or {}).items()],
+            ],
+            end_stream=True,
+        )
+        self.transmit()
+        await asyncio.wait_for(response.done, 5)
+        return response
+
+    def quic_event_received(self, event: QuicEvent) -> None:
+        for h3_event in self._h3.handle_event(event):
+            response = self._responses.get(getattr(h3_event, "stream_id", -1))
+            if response is None:
+                continue
+            if isinstance(h3_event, HeadersReceived):
+                response.headers = {name.decode(): value.decode() for name, value in h3_event.headers}
+            elif isinstance(h3_event, DataReceived):
+                response.body += h3_event.data
+            if h3_event.stream_ended and not response.done.done():
+                response.done.set_result(None)
+
+
+def check_negotiation() -> bool:
+    """q-values in accept-encoding pick the variant; q=0 refuses one."""
+    asset = StaticAsset(path="/", content_type="text/html", etag='"x"', variants={"identity": b"a", "gzip": b"b"})
+    cases = {
+        None: "identity",
+        "gzip": "gzip",
+        "gzip, deflate, br": "gzip",
+        "gzip;q=0": "identity",
+        "gzip;q=0, identity": "identity",
+        "gzip;q=0.5, identity;q=0.8": "identity",
+        "identity;q=0.5, gzip;q=0.5": "gzip",
+        "br": "identity",
+        "*": "gzip",
+        "*;q=0, identity": "identity",
+        "*;q=0.3, gzip;q=0": "identity",
+        "GZIP; Q=1.0": "gzip",
+    }
+    failed = False
+    for header, expected in cases.items():
+        chosen = StaticAssetCache.negotiate(asset, header)
+        if chosen != expected:
+            print(f"FAIL: accept-encoding {header!r} chose {chosen} instead of {expected}")
+            failed = True
+    return not failed
+
+
+async def check_server(args: argparse.Namespace, workdir: Path) -> bool:
+    web_root = workdir / "web"
+    (web_root / "js").mkdir(parents=True)
+    (web_root / "index.html").write_bytes(PAGE)
+    (web_root / "js" / "tiny.js").write_bytes(b"1")
+    cert_path, key_path = generate_certificate(workdir)
+
+    server = await start_webtransport_service(
+        configuration=server_configuration(cert_path, key_path), host=HOST, port=args.port, web_root=web_root
+    )
+    assert server is not None
+    failed = False
+
+    def expect(label: str, condition: bool) -> None:
+        nonlocal failed
+        print(f"{'ok  ' if condition else 'FAIL'} {label}")
+        failed = failed or not condition
+
+    try:
+        async with connect(
+            HOST, args.port, configuration=client_configuration(), create_protocol=HttpClientProtocol
+        ) as client:
+            assert isinstance(client, HttpClientProtocol)
+            plain = await client.request("GET", "/")
+            expect("GET / serves index.html", plain.headers.get(":status") == "200" and plain.body == PAGE)
+            expect("plain GET is not encoded", "content-encoding" not in plain.headers)
+            expect("content-type is html", plain.headers.get("content-type", "").startswith("text/html"))
+            etag = plain.headers.get("etag", "")
+
+            zipped = await client.request("GET", "/index.html", {"accept-encoding": "gzip, br"})
+            expect(
+                "gzip is negotiated and decodes to the page",
+                zipped.headers.get("content-encoding") == "gzip" and gzip.decompress(zipped.body) == PAGE,
+            )
+            expect("content-length matches the encoded body", zipped.headers.get("content-length") == str(len(zipped.body)))
+
+            refused = await client.request("GET", "/", {"accept-encoding": "gzip;q=0"})
+            expect("gzip;q=0 gets the identity body", refused.body == PAGE and "content-encoding" not in refused.headers)
+
+            head = await client.request("HEAD", "/", {"accept-encoding": "gzip"})
+            expect(
+                "HEAD has headers and no body",
+                head.headers.get(":status") == "200" and head.body == b"" and head.headers.get("content-length") == str(len(zipped.body)),
+            )
+
+            cached = await client.request("GET", "/", {"if-none-match": etag})
+            expect("matching ETag gets 304 without a body", cached.headers.get(":status") == "304" and cached.body == b"")
+            weak = await client.request("GET", "/", {"if-none-match": f'"other", W/{etag}'})
+            expect("weak ETag in a list also gets 304", weak.headers.get(":status") == "304")
+            stale = await client.request("GET", "/", {"if-none-match": '"other"'})
+            expect("stale ETag gets the page", stale.headers.get(":status") == "200" and stale.body == PAGE)
+
+            tiny = await client.request("GET", "/js/tiny.js", {"accept-encoding": "gzip"})
+            expect("small files are sent uncompressed", tiny.body == b"1" and "content-encoding" not in tiny.headers)
+            missing = await client.request("GET", "/missing.html")
+            expect("unknown path gets 404", missing.headers.get(":status") == "404")
+    finally:
+        server.close()
+
+    # A missing web root only disables the web client.
+    server = await start_webtransport_service(
+        configuration=server_configuration(cert_path, key_path),
+        host=HOST,
+        port=args.port,
+        web_root=workdir / "absent",
+    )
+    expect("a missing web root still starts the server", server is not None)
+    if server is not None:
+        async with connect(
+            HOST, args.port, configuration=client_configuration(), create_protocol=HttpClientProtocol
+        ) as client:
+            assert isinstance(client, HttpClientProtocol)
+            missing = await client.request("GET", "/")
+            expect("without a web root every path gets 404", missing.headers.get(":status") == "404")
+        server.close()
+    return not failed
+
+
+async def run(args: argparse.Namespace) -> int:
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+    ok = check_negotiation()
+    with tempfile.TemporaryDirectory(prefix="static-assets-") as workdir:
+        ok = await check_server(args, Path(workdir)) and ok
+    print("static assets ok" if ok else "")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Serve a web root over HTTP/3 and check GET/HEAD, ETag revalidation and encoding negotiation."
+    )
+    parser.add_argument("--port", type=int, default=59000, help="Server port.")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
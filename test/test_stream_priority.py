@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+
+from aioquic.asyncio import connect
+from aioquic.asyncio.server import serve
+from aioquic.quic.events import StreamDataReceived
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from test_adaptive_quality import ThrottledProxy  # noqa: E402
+from test_load_broadcast import HOST, client_configuration, generate_certificate  # noqa: E402
+from benchmark.bench_connection import exchange, quic_pair  # noqa: E402
+from handler.broadcast import BroadcastHandler  # noqa: E402
+from service.connection.client import WebTransportClientProtocol  # noqa: E402
+from service.connection.framing import (  # noqa: E402
+    FrameReader,
+    decode_timestamp,
+    droppable,
+    encode_audio,
+    encode_format,
+)
+from service.connection.interface.dataclass import TransportProfile  # noqa: E402
+from service.connection.interface.enum import ControlMethod, FrameType, StreamPriority  # noqa: E402
+from service.connection.protocol import WebTransportProtocol  # noqa: E402
+from service.connection.router import WebTransportRouter  # noqa: E402
+from service.connection.rpc import RpcClient  # noqa: E402
+from service.connection.schedule import SendScheduler  # noqa: E402
+from service.connection.transport import LIVE, quic_configuration  # noqa: E402
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+    SyntheticSource,
+    start_fetch_service,
+)
+from service.controller.interface.dataclass import AudioFormat, CaptureBlockSize  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CONFIG = CaptureConfig(
+    device=0,
+    blocksize=CaptureBlockSize.B1024,
+    channel=CaptureChannel.Stereo,
+    dtype=CaptureDtype.Bit16,
+    samplerate=CaptureSampleRate.R48000,
+)
+"""187.5KiB/s of audio, more than the bottleneck lets through."""
+
+PRODUCTION = AudioFormat(samplerate=48000, channels=2, bits=24, blocksize=8192)
+"""The capture format in production: 48KiB frames, larger than the LIVE send budget."""
+
+
+class Listener:
+    """Splits the session's streams into the broadcast stream and the control stream."""
+
+    def __init__(self, client: WebTransportClientProtocol) -> None:
+        self.control = client.create_stream()
+        self.rpc = RpcClient(lambda data: client.send_stream_data(self.control, data))
+        self.reader = FrameReader()
+        self.audio_bytes = 0
+
+    def feed(self, stream_id: int, data: bytes, _ended: bool) -> None:
+        if stream_id == self.control:
+            self.rpc.feed(data)
+            return
+        for frame_type, payload in self.reader.feed(data):
+            if frame_type == FrameType.AUDIO:
+                self.audio_bytes += len(payload)
+
+
+async def scenario(args: argparse.Namespace, profile: TransportProfile, cert: Path, key: Path) -> dict:
+    loop = asyncio.get_running_loop()
+    app = WebTransportRouter()
+    app.add_route("/broadcast", BroadcastHandler, profile=profile)
+    configuration = quic_configuration(profile, is_client=False)
+    configuration.load_cert_chain(cert, key)
+    server = await serve(
+        host=HOST,
+        port=args.port,
+        configuration=configuration,
+        create_protocol=lambda *a, **kw: WebTransportProtocol(*a, app=app, **kw),
+    )
+    transport, proxy = await loop.create_datagram_endpoint(
+        lambda: ThrottledProxy((HOST, args.port), args.queue * 1024),
+        local_addr=(HOST, args.port + 1),
+    )
+    proxy.rate = args.rate * 1024
+
+    rtts: list[float] = []
+    lost = 0
+    async with connect(
+        HOST,
+        args.port + 1,
+        configuration=client_configuration(),
+        create_protocol=WebTransportClientProtocol,
+    ) as client:
+        assert isinstance(client, WebTransportClientProtocol)
+        # Fixed quality: the audio keeps the bottleneck saturated for the whole run.
+        await client.open_session(authority=f"localhost:{args.port}", path="/broadcast?adapt=0")
+        listener = Listener(client)
+        client.on_stream_data = listener.feed
+        await asyncio.sleep(args.warmup)
+
+        started = time.perf_counter()
+        audio_before = listener.audio_bytes
+        while time.perf_counter() - started < args.duration:
+            sent = time.perf_counter()
+            try:
+                await asyncio.wait_for(listener.rpc.call(ControlMethod.PING, b"ping"), args.timeout)
+                rtts.append((time.perf_counter() - sent) * 1000)
+            except asyncio.TimeoutError:
+                lost += 1
+            await asyncio.sleep(args.interval)
+        goodput = (listener.audio_bytes - audio_before) / (time.perf_counter() - started)
+        listener.rpc.close()
+        client.close_session()
+
+    await asyncio.sleep(0.3)
+    transport.close()
+    server.close()
+    await asyncio.sleep(0.1)
+    return {"rtts": rtts, "lost": lost, "goodput": goodput, "dropped": proxy.dropped}
+
+
+def check_scheduler(args: argparse.Namespace) -> bool:
+    """Production frames through the LIVE budget with nothing acknowledged, then delivered."""
+    client, server = quic_pair()
+    scheduler = SendScheduler(server, LIVE.send_budget, args.limit * 1024)
+    stream_id = server.get_next_available_stream_id(is_unidirectional=True)
+    scheduler.add(stream_id, StreamPriority.LOW, droppable)
+    size = PRODUCTION.blocksize * PRODUCTION.channels * PRODUCTION.bits // 8
+    writes = [encode_format(PRODUCTION)]
+    for index in range(args.frames):
+        if index == args.frames // 2:
+            writes.append(encode_format(replace(PRODUCTION, bits=16)))
+        writes.append(encode_audio(bytes(size), timestamp=index))
+
+    failed = False
+    largest_held = 0
+    for data in writes:
+        scheduler.send(stream_id, data)
+        largest_held = max(largest_held, scheduler.held)
+    total = sum(len(data) for data in writes)
+    in_quic = total - scheduler.held - scheduler.dropped
+    print(
+        f"{args.frames} frames of {size // 1024}KiB unacknowledged: {in_quic // 1024}KiB in QUIC, "
+        f"at most {largest_held // 1024}KiB held, {scheduler.dropped // 1024}KiB dropped"
+    )
+    if in_quic < len(writes[0]) + 2 * len(writes[1]):
+        print("FAIL: the send budget does not let two production frames into QUIC")
+        failed = True
+    if largest_held > args.limit * 1024 or not scheduler.dropped:
+        print(f"FAIL: held data was not capped at {args.limit}KiB")
+        failed = True
+
+    # Now let the acknowledgements flow and read everything the client gets.
+    reader = FrameReader()
+    received: list[tuple[int, bytes]] = []
+    for _ in range(1000):
+        scheduler.pump()
+        exchange(client, server, drain=False)
+        moved = False
+        while (event := client.next_event()) is not None:
+            if isinstance(event, StreamDataReceived) and event.stream_id == stream_id:
+                received += reader.feed(event.data)
+                moved = True
+        if not scheduler.held and not moved:
+            break
+    formats = [payload for frame_type, payload in received if frame_type == FrameType.FORMAT]
+    stamps = [decode_timestamp(payload) for frame_type, payload in received if frame_type == FrameType.TIMESTAMP]
+    audio = sum(1 for frame_type, _ in received if frame_type == FrameType.AUDIO)
+    print(f"client got {len(formats)} format frames and {audio} of {args.frames} audio frames")
+    if len(formats) != 2:
+        print("FAIL: a format frame was dropped")
+        failed = True
+    if stamps != sorted(stamps) or not stamps or stamps[-1] != args.frames - 1 or audio != len(stamps):
+        print("FAIL: the delivered audio frames are out of order or incomplete")
+        failed = True
+    if audio * size + scheduler.dropped < args.frames * size:
+        print("FAIL: frames went missing beyond those dropped")
+        failed = True
+    return not failed
+
+
+def report(label: str, result: dict) -> float:
+    rtts = sorted(result["rtts"]) or [float("inf")]
+    median = statistics.median(rtts)
+    p90 = rtts[max(int(len(rtts) * 0.9) - 1, 0)]
+    print(
+        f"{label:<12} control rtt median {median:7.1f}ms  p90 {p90:7.1f}ms  "
+        f"timeouts {result['lost']}  audio {result['goodput'] / 1024:.0f}KiB/s  "
+        f"bottleneck drops {result['dropped']}"
+    )
+    return median
+
+
+async def run(args: argparse.Namespace) -> int:
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+    scheduled = check_scheduler(args)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cert, key = generate_certificate(Path(workdir))
+        fetch = await start_fetch_service(config=CONFIG, source=SyntheticSource(CONFIG))
+        assert fetch is not None
+        await asyncio.sleep(0.2)
+        print(
+            f"audio 187KiB/s through a {args.rate}KiB/s bottleneck with a {args.queue}KiB queue, "
+            f"a PING every {args.interval * 1000:.0f}ms for {args.duration:.0f}s"
+        )
+        unlimited = await scenario(args, replace(LIVE, send_budget=None), cert, key)
+        budgeted = await scenario(args, replace(LIVE, send_budget=args.budget * 1024), cert, key)
+        fetch.stop()
+
+    before = report("no budget", unlimited)
+    after = report(f"{args.budget}KiB budget", budgeted)
+    failed = not scheduled
+    if not budgeted["rtts"]:
+        print("FAIL: no PING was answered with the send budget")
+        failed = True
+    elif after * args.speedup > before:
+        print(f"FAIL: the send budget did not cut the median control round trip by {args.speedup}x")
+        failed = True
+    if budgeted["goodput"] < args.rate * 1024 * 0.7:
+        print("FAIL: the send budget left the bottleneck underused")
+        failed = True
+    print("stream priority ok" if not failed else "")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Time control round trips while the broadcast stream saturates a bottleneck."
+    )
+    parser.add_argument("--rate", type=int, default=128, help="Bottleneck rate in KiB/s.")
+    parser.add_argument("--queue", type=int, default=256, help="Bottleneck queue size in KiB.")
+    parser.add_argument("--budget", type=int, default=LIVE.send_budget // 1024, help="Send budget in KiB.")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Seconds to saturate before timing.")
+    parser.add_argument("--duration", type=float, default=8.0, help="Seconds of PINGs per case.")
+    parser.add_argument("--interval", type=float, default=0.1, help="Pause between PINGs in seconds.")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Seconds before a PING counts as lost.")
+    parser.add_argument("--speedup", type=float, default=2.0, help="Required cut of the median round trip.")
+    parser.add_argument("--frames", type=int, default=40, help="Production frames written without acknowledgements.")
+    parser.add_argument("--limit", type=int, default=256, help="Held bytes limit in KiB for the scheduler check.")
+    parser.add_argument("--port", type=int, default=58980, help="Server port; the proxy uses the next one.")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
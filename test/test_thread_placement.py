@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from service.controller import (  # noqa: E402
+    CaptureChannel,
+    CaptureConfig,
+    CaptureDtype,
+    CaptureSampleRate,
+    FetchService,
+    SyntheticSource,
+    start_fetch_service,
+)
+from service.controller.interface.dataclass import CaptureBlockSize  # noqa: E402
+from service.diagnostic import start_placement  # noqa: E402
+from service.diagnostic.interface.dataclass import CpuPlacement, PlacementConfig  # noqa: E402
+from service.diagnostic.placement import render  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CONFIG = CaptureConfig(
+    device=0,
+    blocksize=CaptureBlockSize.B1024,
+    channel=CaptureChannel.Stereo,
+    dtype=CaptureDtype.Bit16,
+    samplerate=CaptureSampleRate.R48000,
+)
+
+
+def busy(duty: float, stop: threading.Event, spent: list[float]) -> None:
+    """Burn `duty` of a CPU in 10ms periods; record the thread's own CPU time and final nice value."""
+    begin = time.thread_time()
+    while not stop.is_set():
+        until = time.perf_counter() + 0.01 * duty
+        while time.perf_counter() < until:
+            pass
+        time.sleep(0.01 * (1 - duty))
+    spent.append(time.thread_time() - begin)
+    spent.append(os.getpriority(os.PRIO_PROCESS, 0))
+
+
+def probe(stop: threading.Event, seen: list) -> None:
+    """Idle until stopped; record the nice value and CPU set the thread ends up with."""
+    stop.wait()
+    seen.append(os.getpriority(os.PRIO_PROCESS, 0))
+    seen.append(frozenset(os.sched_getaffinity(0)))
+
+
+async def run(args: argparse.Namespace) -> int:
+    logging.basicConfig(level="INFO", format="%(name)s: %(message)s")
+    available = sorted(os.sched_getaffinity(0))
+    first, last = frozenset(available[:1]), frozenset(available[-1:])
+    config = PlacementConfig(
+        capture=CpuPlacement(cpus=last, realtime=args.realtime),
+        loop=CpuPlacement(cpus=first, nice=args.loop_nice),
+        pools={"Busy": CpuPlacement(cpus=frozenset(available), nice=5)},
+        other=CpuPlacement(cpus=last),
+        interval=args.interval,
+        report=None,
+    )
+    print(f"available CPUs {available}: capture and other threads on {sorted(last)}, loop on {sorted(first)}")
+
+    fetch = await start_fetch_service(config=CONFIG, source=SyntheticSource(CONFIG))
+    assert isinstance(fetch, FetchService)
+    placement = start_placement(config, fetch)
+
+    stop = threading.Event()
+    spent: list[float] = []
+    worker = threading.Thread(target=busy, args=(args.duty, stop, spent), name="Busy-0", daemon=True)
+    worker.start()
+    # A thread the loop starts after placement inherits the loop's nice value and CPU set until it is placed.
+    seen: list = []
+    other = threading.Thread(target=probe, args=(stop, seen), name="Probe-0", daemon=True)
+    other.start()
+    loop_nice = os.getpriority(os.PRIO_PROCESS, 0)
+
+    # Let a sampling period see the worker and the capture thread before measuring.
+    await asyncio.sleep(args.interval * 2)
+    placement.sample()
+    await asyncio.sleep(args.duration)
+    report = placement.sample()
+    stop.set()
+    worker.join()
+    other.join()
+    capture = fetch.capture_thread
+    fetch.stop()
+    placement.stop()
+
+    print(render(report))
+    roles = {usage.role: usage for usage in report.threads}
+    failed = False
+    for role in ("capture", "loop", "Busy"):
+        if role not in roles:
+            print(f"FAIL: no thread was placed as {role}")
+            failed = True
+    if failed:
+        return 1
+    if roles["capture"].tid != capture or roles["capture"].cpus != last:
+        print("FAIL: the capture thread was not pinned to its CPU set")
+        failed = True
+    if roles["loop"].tid != threading.get_native_id() or roles["loop"].cpus != first:
+        print("FAIL: the event loop thread was not pinned to its CPU set")
+        failed = True
+    if spent[1] != 5:
+        print(f"FAIL: the worker pool runs at nice {spent[1]:.0f} instead of 5")
+        failed = True
+    print(f"loop at nice {loop_nice}; Probe-0 started from it ends at nice {seen[0]} on CPUs {sorted(seen[1])}")
+    if seen[0] != 0 or seen[1] != last:
+        print("FAIL: a thread started from the loop kept the loop's nice value or CPU set")
+        failed = True
+    # The report covers the measuring window only; the worker's own clock covers its whole life.
+    expected = args.duty
+    measured = roles["Busy"].cpu
+    print(f"Busy-0: {measured:.1%} of a CPU reported, {expected:.0%} duty cycle, {spent[0]:.2f}s thread time")
+    if abs(measured - expected) > args.tolerance:
+        print(f"FAIL: the reported CPU share is off by more than {args.tolerance:.0%}")
+        failed = True
+    print("thread placement ok" if not failed else "")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Pin the capture thread, the event loop and a worker pool, and check the per-thread CPU report."
+    )
+    parser.add_argument("--duty", type=float, default=0.3, help="CPU share the busy worker burns.")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds of the measured window.")
+    parser.add_argument("--interval", type=float, default=0.5, help="Placement and sampling period in seconds.")
+    parser.add_argument("--realtime", type=int, default=10, help="SCHED_FIFO priority asked for the capture thread.")
+    parser.add_argument("--loop-nice", type=int, default=-5, help="Nice value asked for the event loop thread.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed error of the reported CPU share.")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
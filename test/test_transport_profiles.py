@@ -0,0 +1,271 @@
+import argparse
+import asyncio
+import logging
+import random
+import ssl
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aioquic.asyncio import connect
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from test_load_broadcast import HOST, generate_certificate  # noqa: E402
+from service.connection.client import WebTransportClientProtocol  # noqa: E402
+from service.connection.handler import WebTransportHandler  # noqa: E402
+from service.connection.interface.dataclass import TransportProfile  # noqa: E402
+from service.connection.protocol import WebTransportProtocol  # noqa: E402
+from service.connection.router import WebTransportRouter  # noqa: E402
+from service.connection.transport import CONTROL, LIVE, PROFILES, quic_configuration  # noqa: E402
+
+from aioquic.asyncio.server import serve  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CHUNK = 16 * 1024
+
+DEFAULT = TransportProfile(
+    name="default",
+    congestion_control="reno",
+    initial_rtt=0.1,
+    idle_timeout=60.0,
+    max_data=1024 * 1024,
+    max_stream_data=1024 * 1024,
+    max_datagram_frame_size=65536,
+)
+"""aioquic's own defaults (plus datagrams, which WebTransport needs) as a baseline."""
+
+CANDIDATES = {DEFAULT.name: DEFAULT, **PROFILES}
+
+
+class TransferHandler(WebTransportHandler):
+    """Pushes `size` bytes on one unidirectional stream as soon as the session opens."""
+
+    async def on_session_ready(self) -> None:
+        size: int = self.route_params["size"]
+        stream = await self.create_stream(bidirectional=False)
+        for offset in range(0, size, CHUNK):
+            await stream.write(b"\x00" * min(CHUNK, size - offset), end_stream=offset + CHUNK >= size)
+
+
+class LossyProxy(asyncio.DatagramProtocol):
+    """Forwards UDP datagrams between one client and the server, dropping and delaying them."""
+
+    def __init__(self, target: tuple[str, int], loss: float, delay: float, seed: int) -> None:
+        self._target = target
+        self._loss = loss
+        self._delay = delay
+        self._random = random.Random(seed)
+        self._transport: asyncio.DatagramTransport | None = None
+        self._client: tuple[str, int] | None = None
+        self.dropped = 0
+        self.forwarded = 0
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        assert isinstance(transport, asyncio.DatagramTransport)
+        self._transport = transport
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        if addr != self._target:
+            self._client = addr
+            destination = self._target
+        elif self._client is not None:
+            destination = self._client
+        else:
+            return
+        if self._random.random() < self._loss:
+            self.dropped += 1
+            return
+        self.forwarded += 1
+        asyncio.get_running_loop().call_later(self._delay, self._send, data, destination)
+
+    def _send(self, data: bytes, destination: tuple[str, int]) -> None:
+        if self._transport is not None and not self._transport.is_closing():
+            self._transport.sendto(data, destination)
+
+
+async def measure(
+    profile: TransportProfile,
+    port: int,
+    proxy_port: int,
+    cert_path: Path,
+    key_path: Path,
+    args: argparse.Namespace,
+    seed: int,
+) -> tuple[float, float, float]:
+    """Return (startup seconds, steady-state MiB/s, loss seen) for one transfer."""
+    loop = asyncio.get_running_loop()
+    size = args.size * 1024 * 1024
+
+    app = WebTransportRouter()
+    route_profile = None if profile is DEFAULT else profile
+    app.add_route("/transfer", TransferHandler, profile=route_profile, size=size)
+    configuration = quic_configuration(profile, is_client=False)
+    configuration.load_cert_chain(cert_path, key_path)
+    server = await serve(
+        host=HOST,
+        port=port,
+        configuration=configuration,
+        create_protocol=lambda *a, **kw: WebTransportProtocol(*a, app=app, **kw),
+    )
+    transport, proxy = await loop.create_datagram_endpoint(
+        lambda: LossyProxy((HOST, port), args.loss, args.delay / 1000, seed),
+        local_addr=(HOST, proxy_port),
+    )
+
+    received = 0
+    marks: dict[str, float] = {}
+    finished = asyncio.Event()
+
+    def on_data(_stream_id: int, data: bytes, ended: bool) -> None:
+        nonlocal received
+        received += len(data)
+        # Skip slow start: steady state runs from 10% to the end of the transfer.
+        if "warm" not in marks and received >= size // 10:
+            marks["warm"], marks["warm_bytes"] = time.perf_counter(), received
+        if ended or received >= size:
+            marks["end"] = time.perf_counter()
+            finished.set()
+
+    try:
+        started = time.perf_counter()
+        async with connect(
+            HOST,
+            proxy_port,
+            configuration=quic_configuration(profile, is_client=True, verify_mode=ssl.CERT_NONE),
+            create_protocol=WebTransportClientProtocol,
+        ) as client:
+            assert isinstance(client, WebTransportClientProtocol)
+            client.on_stream_data = on_data
+            await client.open_session(authority=f"localhost:{port}", path="/transfer")
+            startup = time.perf_counter() - started
+            await asyncio.wait_for(finished.wait(), timeout=args.timeout)
+            client.close_session()
+    finally:
+        transport.close()
+        server.close()
+        # Let the transports release their sockets before the next round binds.
+        await asyncio.sleep(0.05)
+
+    seconds = max(marks["end"] - marks["warm"], 1e-9)
+    throughput = (size - marks["warm_bytes"]) / seconds / 1024 / 1024
+    loss = proxy.dropped / max(proxy.dropped + proxy.forwarded, 1)
+    return startup, throughput, loss
+
+
+class IdleHandler(WebTransportHandler):
+    """Accepts the session and does nothing."""
+
+
+async def check_precedence(args: argparse.Namespace, cert_path: Path, key_path: Path) -> bool:
+    """The first session on a connection picks its congestion control; later routes never change it."""
+    app = WebTransportRouter()
+    app.add_route("/live", IdleHandler, profile=LIVE)
+    app.add_route("/control", IdleHandler, profile=CONTROL)
+    app.add_route("/plain", IdleHandler)
+    configuration = quic_configuration(DEFAULT, is_client=False)
+    configuration.load_cert_chain(cert_path, key_path)
+    protocols: list[WebTransportProtocol] = []
+
+    def create_protocol(*a, **kw) -> WebTransportProtocol:
+        protocols.append(WebTransportProtocol(*a, app=app, **kw))
+        return protocols[-1]
+
+    server = await serve(host=HOST, port=args.port, configuration=configuration, create_protocol=create_protocol)
+    # Sessions are opened one after another; each closes before the next opens.
+    cases = {("live", "control"): "cubic", ("plain", "live"): "reno", ("control", "live", "plain"): "reno"}
+    failed = False
+    try:
+        for paths, expected in cases.items():
+            async with connect(
+                HOST,
+                args.port,
+                configuration=quic_configuration(DEFAULT, is_client=True, verify_mode=ssl.CERT_NONE),
+                create_protocol=WebTransportClientProtocol,
+            ) as client:
+                assert isinstance(client, WebTransportClientProtocol)
+                chosen = []
+                for path in paths:
+                    # The client helper holds one session; open the next one on the same connection by hand.
+                    client._session_id = None
+                    client._ready = asyncio.get_running_loop().create_future()
+                    await client.open_session(authority=f"localhost:{args.port}", path=f"/{path}")
+                    await asyncio.sleep(0.05)
+                    chosen.append(protocols[-1]._quic._configuration.congestion_control_algorithm)
+                    client._closed.clear()
+                    client.close_session()
+                    await asyncio.sleep(0.1)
+                print(f"sessions {' then '.join(paths)}: congestion control {' -> '.join(chosen)}")
+                if set(chosen) != {expected}:
+                    print(f"FAIL: a later route changed the connection's congestion control from {expected}")
+                    failed = True
+    finally:
+        server.close()
+        await asyncio.sleep(0.05)
+    return not failed
+
+
+async def run(args: argparse.Namespace) -> int:
+    names = args.profiles or list(CANDIDATES)
+    failed = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        cert_path, key_path = generate_certificate(Path(workdir))
+        if not await check_precedence(args, cert_path, key_path):
+            failed += 1
+        print(
+            f"loss {args.loss:.1%} one-way delay {args.delay:.0f}ms "
+            f"transfer {args.size}MiB x {args.rounds} rounds"
+        )
+        print(f"{'profile':<10}{'cc':<8}{'startup ms':>12}{'MiB/s':>10}{'dropped':>10}")
+        for name in names:
+            profile = CANDIDATES[name]
+            startups, throughputs, losses = [], [], []
+            for index in range(args.rounds):
+                try:
+                    startup, throughput, loss = await measure(
+                        profile, args.port, args.port + 1, cert_path, key_path, args, seed=index
+                    )
+                except (asyncio.TimeoutError, ConnectionError) as exc:
+                    print(f"{name:<10}round {index} failed: {exc!r}")
+                    failed += 1
+                    continue
+                startups.append(startup * 1000)
+                throughputs.append(throughput)
+                losses.append(loss)
+            if not startups:
+                continue
+            print(
+                f"{name:<10}{profile.congestion_control:<8}"
+                f"{statistics.median(startups):>12.1f}"
+                f"{statistics.median(throughputs):>10.2f}"
+                f"{statistics.mean(losses):>10.1%}"
+            )
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare startup latency and throughput of QUIC transport profiles under loss."
+    )
+    parser.add_argument("--profiles", nargs="*", choices=list(CANDIDATES), help="Profiles to compare (default: all).")
+    parser.add_argument("--loss", type=float, default=0.02, help="Packet loss probability in each direction.")
+    parser.add_argument("--delay", type=float, default=10.0, help="One-way delay added by the proxy in milliseconds.")
+    parser.add_argument("--size", type=int, default=8, help="Bytes transferred per round in MiB.")
+    parser.add_argument("--rounds", type=int, default=3, help="Transfers per profile; medians are reported.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds allowed for one transfer.")
+    parser.add_argument("--port", type=int, default=58990, help="Server port; the proxy uses port + 1.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level="WARNING", format="%(name)s: %(message)s")
+    logging.getLogger("quic").setLevel("ERROR")
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
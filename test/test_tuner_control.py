@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path when running this file directly.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from service.controller import FakeI2CBus, I2CBus, LinuxI2CBus  # noqa: E402
+from service.controller.rda5807m import ADDRESS, RDA5807M  # noqa: E402
+from simulated_tuner import FakeRDA5807M  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(args: argparse.Namespace) -> None:
+    device = None
+    bus: I2CBus
+    if args.device:
+        bus = LinuxI2CBus(args.device)
+    else:
+        # 400kHz 快速模式 每字节 9 个时钟
+        bus = FakeI2CBus(latency=args.latency, byte_time=9 / 400_000)
+        device = FakeRDA5807M(tune_time=args.tune_time)
+        bus.attach(ADDRESS, device)
+
+    chip = RDA5807M(bus)
+    stats = chip.controller.stats
+    try:
+        await chip.power_on()
+        print(f"power on: {stats.bus_writes} bus write(s), {stats.registers_written} registers")
+
+        # 同一轮事件循环中的写入合并为一次传输 重复的写入被省去
+        before = stats.bus_writes
+        await asyncio.gather(chip.set_volume(12), chip.set_mute(False), chip.set_volume(12))
+        print(f"volume + unmute + duplicate volume: {stats.bus_writes - before} bus write(s)")
+
+        before = stats.bus_reads
+        for _ in range(100):
+            await chip.controller.read(0x02, 4)
+        print(f"100 config reads: {stats.bus_reads - before} bus read(s), {stats.cached_reads} cached")
+
+        frequencies = [87000 + 100 * (index % 211) for index in range(args.tunes)]
+        for frequency in frequencies:
+            await chip.tune(frequency)
+        latencies = [latency * 1000 for latency in chip.latencies[-args.tunes :]]
+        print(
+            f"tune latency over {args.tunes} tunes: "
+            f"p50 {statistics.median(latencies):.2f}ms "
+            f"p95 {percentile(latencies, 0.95):.2f}ms "
+            f"max {max(latencies):.2f}ms"
+        )
+        print(f"totals: {stats}")
+
+        if device is not None:
+            assert device.frequency == frequencies[-1]
+            assert device.registers[0x05] & 0x0F == 12
+            assert device.tunes == args.tunes
+            print("fake chip state matches")
+    finally:
+        chip.close()
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Exercise the I2C tuner controller and report tune latency.",
+    )
+    parser.add_argument(
+        "--device",
+        help="Use a real i2c-dev bus such as /dev/i2c-1 instead of the fake chip",
+    )
+    parser.add_argument(
+        "--tunes",
+        type=int,
+        default=50,
+        help="Number of tunes to time (default: 50)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0002,
+        help="Fake bus per-transaction overhead in seconds (default: 0.0002)",
+    )
+    parser.add_argument(
+        "--tune-time",
+        type=float,
+        default=0.01,
+        help="Seconds the fake chip takes to report tune complete (default: 0.01)",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format="%(name)s: %(message)s")
+    asyncio.run(run(build_arg_parser().parse_args()))